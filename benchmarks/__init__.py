@@ -0,0 +1 @@
+"""Offline benchmarks and load-test tooling (not shipped with the package)."""
@@ -0,0 +1,360 @@
+"""Minimal in-process MQTT 3.1.1 broker for tests and benchmarks.
+
+A stand-in for Mosquitto where Docker is not available: enough of MQTT 3.1.1
+for the bridge and paho clients over localhost, with
+
+- retained messages (empty payload clears)
+- subscriptions with + and # wildcards ($-topics are not matched by them)
+- QoS 0 and 1 (QoS 2 publishes are acknowledged and delivered as QoS 1)
+- last will on unclean disconnect or keepalive timeout
+- client id takeover
+
+Not supported: persistent sessions, message redelivery, authentication (any
+username/password is accepted) and TLS.
+
+Runs on its own event loop thread:
+
+    with LocalBroker() as broker:
+        client.connect("127.0.0.1", broker.port)
+
+or standalone: python -m benchmarks.broker --port 1883
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import logging
+import struct
+import threading
+from dataclasses import dataclass, field
+
+logger = logging.getLogger("open3e_bridge.benchmarks.broker")
+
+# Packet types (upper nibble of the fixed header)
+CONNECT, CONNACK, PUBLISH, PUBACK, PUBREC, PUBREL, PUBCOMP = 1, 2, 3, 4, 5, 6, 7
+SUBSCRIBE, SUBACK, UNSUBSCRIBE, UNSUBACK, PINGREQ, PINGRESP, DISCONNECT = 8, 9, 10, 11, 12, 13, 14
+
+
+class ProtocolError(Exception):
+    """Malformed or unsupported packet; the connection is closed."""
+
+
+def topic_matches(topic_filter: str, topic: str) -> bool:
+    """MQTT topic filter matching with + and # wildcards."""
+    if topic.startswith("$") and topic_filter[:1] in ("+", "#"):
+        return False
+    f_parts = topic_filter.split("/")
+    t_parts = topic.split("/")
+    for i, part in enumerate(f_parts):
+        if part == "#":
+            return True
+        if i >= len(t_parts):
+            return False
+        if part != "+" and part != t_parts[i]:
+            return False
+    return len(f_parts) == len(t_parts)
+
+
+def encode_length(length: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte, length = length % 128, length // 128
+        out.append(byte | (0x80 if length else 0))
+        if not length:
+            return bytes(out)
+
+
+def encode_string(value: str | bytes) -> bytes:
+    raw = value.encode() if isinstance(value, str) else value
+    return struct.pack("!H", len(raw)) + raw
+
+
+def packet(ptype: int, flags: int, body: bytes) -> bytes:
+    return bytes([(ptype << 4) | flags]) + encode_length(len(body)) + body
+
+
+class _Reader:
+    """Cursor over a packet body."""
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.pos = 0
+
+    def u8(self) -> int:
+        self.pos += 1
+        return self.data[self.pos - 1]
+
+    def u16(self) -> int:
+        self.pos += 2
+        return struct.unpack_from("!H", self.data, self.pos - 2)[0]
+
+    def binary(self) -> bytes:
+        length = self.u16()
+        self.pos += length
+        if self.pos > len(self.data):
+            raise ProtocolError("truncated field")
+        return self.data[self.pos - length:self.pos]
+
+    def string(self) -> str:
+        return self.binary().decode("utf-8")
+
+    def rest(self) -> bytes:
+        return self.data[self.pos:]
+
+    def more(self) -> bool:
+        return self.pos < len(self.data)
+
+
+@dataclass
+class _Will:
+    topic: str
+    payload: bytes
+    qos: int
+    retain: bool
+
+
+@dataclass(eq=False)
+class _Session:
+    client_id: str
+    writer: asyncio.StreamWriter
+    subscriptions: dict[str, int] = field(default_factory=dict)
+    will: _Will | None = None
+    next_packet_id: int = 0
+
+    def packet_id(self) -> int:
+        self.next_packet_id = self.next_packet_id % 65535 + 1
+        return self.next_packet_id
+
+
+class LocalBroker:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        """
+        Args:
+            host: Interface to listen on
+            port: TCP port (0 = pick a free one, see .port after start())
+        """
+        self.host = host
+        self.port = port
+        self.retained: dict[str, tuple[bytes, int]] = {}
+        self.sessions: dict[str, _Session] = {}
+        self.stats = {"connections": 0, "received": 0, "delivered": 0}
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._server: asyncio.AbstractServer | None = None
+        self._thread: threading.Thread | None = None
+        self._ready = threading.Event()
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def start(self) -> LocalBroker:
+        """Start listening on a background thread; returns once the port is bound."""
+        self._thread = threading.Thread(target=self._run_thread, name="local-mqtt-broker", daemon=True)
+        self._thread.start()
+        if not self._ready.wait(5.0):
+            raise RuntimeError("Local MQTT broker did not start")
+        return self
+
+    def stop(self):
+        """Close all connections (without sending wills) and stop the thread."""
+        if self._loop is None or self._thread is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._close(), self._loop).result(5.0)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(5.0)
+        self._thread = None
+
+    def __enter__(self) -> LocalBroker:
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _run_thread(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_until_complete(self.serve())
+        self._ready.set()
+        self._loop.run_forever()
+        self._loop.close()
+
+    async def serve(self):
+        """Bind the listening socket on the running loop (for use inside asyncio code)."""
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.debug("Local MQTT broker listening on %s:%d", self.host, self.port)
+
+    async def _close(self):
+        if self._server is not None:
+            self._server.close()
+        for session in list(self.sessions.values()):
+            session.will = None
+            session.writer.close()
+        self.sessions.clear()
+
+    # ------------------------------------------------------------------
+    # Connection handling
+    # ------------------------------------------------------------------
+
+    async def _read_packet(self, reader: asyncio.StreamReader) -> tuple[int, int, bytes]:
+        header = (await reader.readexactly(1))[0]
+        length, multiplier = 0, 1
+        for _ in range(4):
+            byte = (await reader.readexactly(1))[0]
+            length += (byte & 0x7F) * multiplier
+            if not byte & 0x80:
+                break
+            multiplier *= 128
+        else:
+            raise ProtocolError("malformed remaining length")
+        return header >> 4, header & 0x0F, await reader.readexactly(length)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        session: _Session | None = None
+        clean = False
+        try:
+            ptype, _, body = await asyncio.wait_for(self._read_packet(reader), 10.0)
+            if ptype != CONNECT:
+                raise ProtocolError("first packet must be CONNECT")
+            session, keepalive = self._connect(body, writer)
+            self.stats["connections"] += 1
+            writer.write(packet(CONNACK, 0, b"\x00\x00"))
+            # [MQTT-3.1.2-24]: disconnect after 1.5x keepalive without traffic
+            timeout = keepalive * 1.5 if keepalive else None
+            while True:
+                ptype, flags, body = await asyncio.wait_for(self._read_packet(reader), timeout)
+                if ptype == DISCONNECT:
+                    clean = True
+                    break
+                self._dispatch(session, ptype, flags, body)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError, ProtocolError) as e:
+            if not isinstance(e, asyncio.IncompleteReadError):
+                logger.debug("Closing connection: %r", e)
+        finally:
+            if session is not None and self.sessions.get(session.client_id) is session:
+                del self.sessions[session.client_id]
+                if not clean and session.will is not None:
+                    will = session.will
+                    self._route(will.topic, will.payload, will.qos, will.retain)
+            writer.close()
+            with contextlib.suppress(ConnectionError):
+                await writer.wait_closed()
+
+    def _connect(self, body: bytes, writer: asyncio.StreamWriter) -> tuple[_Session, int]:
+        r = _Reader(body)
+        protocol, level = r.string(), r.u8()
+        if protocol not in ("MQTT", "MQIsdp") or level not in (3, 4):
+            raise ProtocolError(f"unsupported protocol {protocol} level {level}")
+        flags, keepalive = r.u8(), r.u16()
+        client_id = r.string() or f"auto-{id(writer):x}"
+        session = _Session(client_id, writer)
+        if flags & 0x04:
+            topic, payload = r.string(), r.binary()
+            session.will = _Will(topic, payload, (flags >> 3) & 0x03, bool(flags & 0x20))
+        # Username/password (flags 0x80/0x40) are accepted without checking
+        previous = self.sessions.get(client_id)
+        if previous is not None:
+            # Client id takeover: the old connection is closed, its will is published
+            if previous.will is not None:
+                will, previous.will = previous.will, None
+                self._route(will.topic, will.payload, will.qos, will.retain)
+            previous.writer.close()
+        self.sessions[client_id] = session
+        return session, keepalive
+
+    def _dispatch(self, session: _Session, ptype: int, flags: int, body: bytes):
+        if ptype == PUBLISH:
+            self._on_publish(session, flags, body)
+        elif ptype == PUBREL:
+            session.writer.write(packet(PUBCOMP, 0, body[:2]))
+        elif ptype == SUBSCRIBE:
+            self._on_subscribe(session, body)
+        elif ptype == UNSUBSCRIBE:
+            r = _Reader(body)
+            packet_id = r.u16()
+            while r.more():
+                session.subscriptions.pop(r.string(), None)
+            session.writer.write(packet(UNSUBACK, 0, struct.pack("!H", packet_id)))
+        elif ptype == PINGREQ:
+            session.writer.write(packet(PINGRESP, 0, b""))
+        elif ptype in (PUBACK, PUBREC, PUBCOMP):
+            pass  # acknowledgements of our deliveries; no redelivery is kept
+        else:
+            raise ProtocolError(f"unexpected packet type {ptype}")
+
+    def _on_publish(self, session: _Session, flags: int, body: bytes):
+        qos, retain = (flags >> 1) & 0x03, bool(flags & 0x01)
+        r = _Reader(body)
+        topic = r.string()
+        if qos:
+            packet_id = r.u16()
+            ack = PUBACK if qos == 1 else PUBREC
+            session.writer.write(packet(ack, 0, struct.pack("!H", packet_id)))
+        self.stats["received"] += 1
+        self._route(topic, r.rest(), min(qos, 1), retain)
+
+    def _on_subscribe(self, session: _Session, body: bytes):
+        r = _Reader(body)
+        packet_id = r.u16()
+        granted = bytearray()
+        new_filters = []
+        while r.more():
+            topic_filter, qos = r.string(), min(r.u8() & 0x03, 1)
+            session.subscriptions[topic_filter] = qos
+            granted.append(qos)
+            new_filters.append((topic_filter, qos))
+        session.writer.write(packet(SUBACK, 0, struct.pack("!H", packet_id) + bytes(granted)))
+        for topic, (payload, msg_qos) in list(self.retained.items()):
+            for topic_filter, qos in new_filters:
+                if topic_matches(topic_filter, topic):
+                    self._deliver(session, topic, payload, min(msg_qos, qos), retain=True)
+                    break
+
+    # ------------------------------------------------------------------
+    # Routing
+    # ------------------------------------------------------------------
+
+    def _route(self, topic: str, payload: bytes, qos: int, retain: bool):
+        if retain:
+            if payload:
+                self.retained[topic] = (payload, qos)
+            else:
+                self.retained.pop(topic, None)
+        for session in list(self.sessions.values()):
+            granted = max((q for f, q in session.subscriptions.items() if topic_matches(f, topic)), default=None)
+            if granted is not None:
+                self._deliver(session, topic, payload, min(qos, granted), retain=False)
+
+    def _deliver(self, session: _Session, topic: str, payload: bytes, qos: int, retain: bool):
+        if session.writer.is_closing():
+            return
+        body = encode_string(topic)
+        if qos:
+            body += struct.pack("!H", session.packet_id())
+        session.writer.write(packet(PUBLISH, (qos << 1) | int(retain), body + payload))
+        self.stats["delivered"] += 1
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Minimal local MQTT 3.1.1 broker")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1883)
+    parser.add_argument("--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"])
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=getattr(logging, args.log_level))
+
+    async def run():
+        broker = LocalBroker(args.host, args.port)
+        await broker.serve()
+        logger.info("Local MQTT broker listening on %s:%d", broker.host, broker.port)
+        await asyncio.Event().wait()
+
+    with contextlib.suppress(KeyboardInterrupt):
+        asyncio.run(run())
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover
+    raise SystemExit(main())
@@ -0,0 +1,109 @@
+"""Retained discovery size: full vs. compact payloads.
+
+Generates the discovery configs for every configured topic of a profile (on
+each ECU of benchmarks.pipeline) twice, once with the long keys and once with
+--compact-discovery, and reports the bytes per component and in total — what
+the broker keeps retained and Home Assistant parses at startup. The same
+topics in --discovery-mode device give one retained config per device (its
+"saved" column is relative to the full per-entity total).
+
+Usage:
+    python -m benchmarks.discovery_size                     # vitocal profile
+    python -m benchmarks.discovery_size --profile vitodens --json out.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from collections import defaultdict
+from pathlib import Path
+from typing import Any
+
+from benchmarks.pipeline import ECUS
+from benchmarks.topics import CONFIG_DIR, profile_topics
+from generators.homeassistant import HomeAssistantGenerator
+
+
+def payload_sizes(profile: str, compact: bool, ecus: tuple[str, ...] = ECUS) -> dict[str, list[int]]:
+    """Payload sizes in bytes (UTF-8) per HA component."""
+    generator = HomeAssistantGenerator(str(CONFIG_DIR), "en", profile=profile, compact=compact)
+    sizes: dict[str, list[int]] = defaultdict(list)
+    for spec in profile_topics(profile):
+        for ecu in ecus:
+            for topic, payload in generator.generate_discovery_message(spec.topic(ecu), "1", test_mode=False):
+                component = topic.split("/")[-3]
+                sizes[component].append(len(payload.encode("utf-8")))
+    return sizes
+
+
+def device_sizes(profile: str, compact: bool, ecus: tuple[str, ...] = ECUS) -> dict[str, int]:
+    """Final payload size in bytes per device config (discovery mode "device")."""
+    generator = HomeAssistantGenerator(str(CONFIG_DIR), "en", profile=profile, compact=compact,
+                                       discovery_mode="device")
+    sizes: dict[str, int] = {}
+    for spec in profile_topics(profile):
+        for ecu in ecus:
+            for topic, payload in generator.generate_discovery_message(spec.topic(ecu), "1", test_mode=False):
+                sizes[topic] = len(payload.encode("utf-8"))
+    return sizes
+
+
+def run(profile: str = "vitocal") -> dict[str, Any]:
+    full = payload_sizes(profile, compact=False)
+    compact = payload_sizes(profile, compact=True)
+    components = {}
+    for component in sorted(full):
+        full_bytes, compact_bytes = sum(full[component]), sum(compact[component])
+        components[component] = {
+            "configs": len(full[component]),
+            "full_bytes": full_bytes,
+            "compact_bytes": compact_bytes,
+            "saved_pct": round(100 * (1 - compact_bytes / full_bytes), 1),
+        }
+    full_total = sum(c["full_bytes"] for c in components.values())
+    compact_total = sum(c["compact_bytes"] for c in components.values())
+    device_full, device_compact = device_sizes(profile, compact=False), device_sizes(profile, compact=True)
+    return {
+        "python": sys.version.split()[0],
+        "profile": profile,
+        "components": components,
+        "total": {
+            "configs": sum(c["configs"] for c in components.values()),
+            "full_bytes": full_total,
+            "compact_bytes": compact_total,
+            "saved_pct": round(100 * (1 - compact_total / full_total), 1) if full_total else 0.0,
+        },
+        "device_mode": {
+            "configs": len(device_full),
+            "full_bytes": sum(device_full.values()),
+            "compact_bytes": sum(device_compact.values()),
+            "saved_pct": round(100 * (1 - sum(device_compact.values()) / full_total), 1) if full_total else 0.0,
+        },
+    }
+
+
+def format_report(report: dict[str, Any]) -> str:
+    lines = [f"{'component':<16} {'configs':>8} {'full B':>10} {'compact B':>10} {'saved':>7}"]
+    rows = [*report["components"].items(), ("total", report["total"]), ("device mode", report["device_mode"])]
+    for name, row in rows:
+        lines.append(f"{name:<16} {row['configs']:>8} {row['full_bytes']:>10} "
+                     f"{row['compact_bytes']:>10} {row['saved_pct']:>6.1f}%")
+    return "\n".join(lines)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="open3e-bridge retained discovery size")
+    parser.add_argument("--profile", default="vitocal", help="Device profile (default: vitocal)")
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args(argv)
+
+    report = run(args.profile)
+    print(format_report(report))
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2) + "\n")
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover
+    raise SystemExit(main())
@@ -0,0 +1,236 @@
+"""End-to-end latency and throughput over a real MQTT connection.
+
+Starts the in-process broker (benchmarks.broker), a real Open3EBridge
+connected to it and a probe client that plays open3e:
+
+- discovery latency: open3e state publish -> discovery config received
+- state latency: power DID publish -> derived COP state received
+- throughput: steady-state messages per second through broker and bridge
+
+Usage:
+    python -m benchmarks.latency [--profile vitocal] [--runtime asyncio] [--count 5000]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import statistics
+import threading
+import time
+from collections.abc import Iterator
+from typing import Any
+
+import paho.mqtt.client as mqtt
+
+from benchmarks.broker import LocalBroker, topic_matches
+from benchmarks.topics import CONFIG_DIR
+from benchmarks.traffic import TrafficGenerator
+
+PREFIX = "homeassistant"
+# What Open3EBridge._on_connect subscribes to; deeper topics never reach the bridge
+BRIDGE_FILTERS = ("open3e/+/+", "open3e/+")
+
+
+def percentiles(samples: list[float]) -> dict[str, float]:
+    """p50/p95/p99/max of latency samples in milliseconds."""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def pick(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 3)
+    return {"count": len(ordered), "p50_ms": pick(0.50), "p95_ms": pick(0.95),
+            "p99_ms": pick(0.99), "max_ms": round(ordered[-1] * 1000, 3),
+            "mean_ms": round(statistics.fmean(ordered) * 1000, 3)}
+
+
+@contextlib.contextmanager
+def running_bridge(port: int, profile: str = "vitocal", runtime: str = "thread") -> Iterator[Any]:
+    """A real Open3EBridge connected to 127.0.0.1:port, running in the background."""
+    from bridge import Open3EBridge
+
+    bridge = Open3EBridge(mqtt_host="127.0.0.1", mqtt_port=port, test_mode=False, add_test_prefix=False,
+                          discovery_prefix=PREFIX, profile=profile, config_dir=str(CONFIG_DIR))
+    if runtime == "asyncio":
+        from runtime.aio import AsyncioRuntime
+
+        aio = AsyncioRuntime(bridge)
+        loop = asyncio.new_event_loop()
+        thread = threading.Thread(target=loop.run_until_complete, args=(aio.serve(),), daemon=True)
+        thread.start()
+        try:
+            yield bridge
+        finally:
+            loop.call_soon_threadsafe(aio.request_stop)
+            thread.join(10.0)
+            loop.close()
+        return
+
+    bridge.client.connect("127.0.0.1", port, 60)
+    bridge.client.loop_start()
+    bridge.publisher.start()
+    bridge.ingest.start()
+    try:
+        yield bridge
+    finally:
+        bridge.ingest.stop(timeout=5.0)
+        bridge.publisher.stop(timeout=5.0)
+        bridge.client.disconnect()
+        bridge.client.loop_stop()
+
+
+class Probe:
+    """paho client that publishes like open3e and timestamps what the bridge sends back."""
+
+    def __init__(self, port: int):
+        self.received: dict[str, list[tuple[float, bytes]]] = {}
+        self._lock = threading.Lock()
+        self._subscribed = threading.Event()
+        self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)  # type: ignore[attr-defined]
+        self.client.on_message = self._on_message
+        self.client.on_subscribe = lambda *args: self._subscribed.set()
+        self.client.connect("127.0.0.1", port, 60)
+        self.client.loop_start()
+        self.client.subscribe([(f"{PREFIX}/#", 0), ("open3e/bridge/#", 0)])
+        if not self._subscribed.wait(5.0):
+            raise RuntimeError("probe could not subscribe")
+
+    def _on_message(self, client, userdata, msg):
+        now = time.perf_counter()
+        with self._lock:
+            self.received.setdefault(msg.topic, []).append((now, msg.payload))
+
+    def publish(self, topic: str, payload: str) -> float:
+        sent = time.perf_counter()
+        self.client.publish(topic, payload)
+        return sent
+
+    def wait_for(self, predicate, timeout: float = 10.0) -> bool:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if predicate():
+                return True
+            time.sleep(0.005)
+        return False
+
+    def close(self):
+        self.client.loop_stop()
+        self.client.disconnect()
+
+
+def wait_until_online(probe: Probe) -> bool:
+    return probe.wait_for(lambda: any(p == b"online" for _, p in probe.received.get("open3e/bridge/LWT", [])))
+
+
+def measure_discovery(probe: Probe, messages: list[tuple[str, str]], pace: float = 0.002) -> list[float]:
+    """Latency from first publish of each topic to its discovery config (by state_topic)."""
+    sent: dict[str, float] = {}
+    for topic, payload in messages:
+        sent.setdefault(topic, probe.publish(topic, payload))
+        time.sleep(pace)
+
+    def first_configs() -> dict[str, float]:
+        seen = {}
+        for topic, events in list(probe.received.items()):
+            if not topic.endswith("/config"):
+                continue
+            recv, payload = events[0]
+            with contextlib.suppress(ValueError):
+                state_topic = json.loads(payload).get("state_topic")
+                if state_topic in sent:
+                    seen.setdefault(state_topic, recv)
+        return seen
+
+    # Wait until discovery stops growing
+    last = -1
+    while probe.wait_for(lambda: len(first_configs()) > last, timeout=1.0):
+        last = len(first_configs())
+    return [recv - sent[topic] for topic, recv in first_configs().items()]
+
+
+def measure_state(probe: Probe, samples: int = 200) -> list[float]:
+    """Latency from a thermal power publish to the COP state it produces."""
+    probe.publish("open3e/680_2488_CurrentElectricalPowerConsumptionSystem", "1")
+    sent = {}
+    for i in range(samples):
+        value = 1000 + i
+        sent[float(value)] = probe.publish("open3e/680_2496_CurrentThermalCapacitySystem", str(value))
+        time.sleep(0.002)
+    probe.wait_for(lambda: len(probe.received.get("open3e/bridge/cop", [])) >= samples, timeout=5.0)
+    latencies = []
+    for recv, payload in probe.received.get("open3e/bridge/cop", []):
+        with contextlib.suppress(ValueError):
+            started = sent.get(float(payload))
+            if started is not None:
+                latencies.append(recv - started)
+    return latencies
+
+
+def bridge_receives(topic: str) -> bool:
+    return any(topic_matches(f, topic) for f in BRIDGE_FILTERS)
+
+
+def measure_throughput(probe: Probe, bridge: Any, messages: list[tuple[str, str]]) -> dict[str, float]:
+    """Steady-state messages/second from probe publish to bridge processed."""
+    messages = [(t, p) for t, p in messages if bridge_receives(t)]
+    # The ingest queue keeps only the newest value per topic, so superseded ones count as handled
+    def handled() -> int:
+        return bridge._messages_processed + bridge.ingest.stats()["superseded"]
+
+    target = handled() + len(messages)
+    start = time.perf_counter()
+    for topic, payload in messages:
+        probe.publish(topic, payload)
+    done = probe.wait_for(lambda: handled() >= target, timeout=60.0)
+    elapsed = time.perf_counter() - start
+    return {"messages": len(messages), "elapsed_s": round(elapsed, 3),
+            "msgs_per_s": round(len(messages) / elapsed, 1), "complete": done}
+
+
+def run(profile: str = "vitocal", runtime: str = "thread", count: int = 5000, ecus: int = 1) -> dict[str, Any]:
+    traffic = TrafficGenerator(profile, ecus=ecus, seed=1)
+    warmup = [(t, p) for t, p in traffic.messages(traffic.topics_per_cycle) if bridge_receives(t)]
+    with LocalBroker() as broker, running_bridge(broker.port, profile, runtime) as bridge:
+        probe = Probe(broker.port)
+        try:
+            if not wait_until_online(probe):
+                raise RuntimeError("bridge did not come online")
+            discovery = measure_discovery(probe, warmup)
+            state = measure_state(probe)
+            throughput = measure_throughput(probe, bridge, list(traffic.messages(count)))
+        finally:
+            probe.close()
+        broker_stats = dict(broker.stats)
+    return {
+        "meta": {"profile": profile, "runtime": runtime, "ecus": ecus, "topics": len(warmup)},
+        "discovery_latency": percentiles(discovery),
+        "state_latency": percentiles(state),
+        "throughput": throughput,
+        "broker": broker_stats,
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="End-to-end latency/throughput via the local MQTT broker")
+    parser.add_argument("--profile", default="vitocal", choices=["common", "vitocal", "vitodens"])
+    parser.add_argument("--runtime", default="thread", choices=["thread", "asyncio"])
+    parser.add_argument("--count", type=int, default=5000, help="Messages for the throughput run")
+    parser.add_argument("--ecus", type=int, default=1)
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.ERROR)
+    report = run(args.profile, args.runtime, args.count, args.ecus)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.json:
+        with open(args.json, "w") as f:
+            f.write(text + "\n")
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover
+    raise SystemExit(main())
@@ -0,0 +1,276 @@
+"""Micro-benchmarks for every stage of the message pipeline.
+
+Runs fully offline: the bridge is built around a NullClient that only counts
+publishes. The topic mix comes from the shipped profiles (benchmarks.topics).
+
+Usage:
+    python -m benchmarks.pipeline                       # print a report
+    python -m benchmarks.pipeline --json out.json       # also write results
+    python -m benchmarks.pipeline --compare benchmarks/baseline.json
+    python -m benchmarks.pipeline --save-baseline       # refresh the stored baseline
+
+Per stage the report shows ns/op, operations per second, bytes allocated per
+op (tracemalloc peak, sampled) and blocks still allocated after the run per
+op (sys.getallocatedblocks, a leak indicator). --compare exits with status 1
+if any stage got slower than the baseline by more than --threshold.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any
+from unittest.mock import patch
+
+from benchmarks.topics import CONFIG_DIR, profile_topics, unknown_topics
+from generators.heuristics import infer_entity_config
+
+BASELINE_PATH = Path(__file__).resolve().parent / "baseline.json"
+ECUS = ("680", "6a1")
+
+# A stage is built by a factory: (context) -> op(i)
+Op = Callable[[int], Any]
+
+
+class NullClient:
+    """Stand-in for paho's Client that accepts everything and counts publishes."""
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        self.published = 0
+
+    def publish(self, topic: str, payload: Any = None, qos: int = 0, retain: bool = False) -> None:
+        self.published += 1
+
+    def __getattr__(self, name: str) -> Callable[..., None]:
+        # connect/subscribe/will_set/... are no-ops
+        return lambda *args, **kwargs: None
+
+
+@dataclass
+class StageResult:
+    ns_per_op: float
+    ops_per_s: float
+    alloc_bytes_per_op: float
+    retained_blocks_per_op: float
+
+
+def make_bridge(profile: str):
+    """Open3EBridge with a NullClient, auto-discovery on (heuristics are part of the mix)."""
+    import bridge as bridge_module
+
+    with patch.object(bridge_module.mqtt, "Client", NullClient):
+        return bridge_module.Open3EBridge(
+            test_mode=False, add_test_prefix=False, profile=profile,
+            config_dir=str(CONFIG_DIR),
+        )
+
+
+class Context:
+    """Shared fixtures for all stages: bridge, generator and the topic mix."""
+
+    def __init__(self, profile: str, unknown: int = 8, seed: int = 1):
+        self.profile = profile
+        self.bridge = make_bridge(profile)
+        self.generator = self.bridge.generator
+        rng = random.Random(seed)  # noqa: S311 — reproducible test data, not crypto
+        self.specs = profile_topics(profile) + unknown_topics(unknown)
+        self.messages = [(spec.topic(ecu), spec.sample_value(rng)) for ecu in ECUS for spec in self.specs]
+        self.topics = [topic for topic, _ in self.messages]
+
+
+def _parse_topic(ctx: Context) -> Op:
+    topics, parse = ctx.topics, ctx.generator._parse_open3e_topic
+    return lambda i: parse(topics[i % len(topics)])
+
+
+def _parse_topic_cached(ctx: Context) -> Op:
+    topics, parse = ctx.topics, ctx.generator.parse_open3e_topic
+    return lambda i: parse(topics[i % len(topics)])
+
+
+def _infer_entity_config(ctx: Context) -> Op:
+    names = [(spec.sensor_name, spec.sub_item) for spec in ctx.specs]
+    return lambda i: infer_entity_config(*names[i % len(names)])
+
+
+def _generate_discovery(ctx: Context) -> Op:
+    gen = ctx.generator
+    parsed = [gen.parse_open3e_topic(t) for t in ctx.topics]
+    return lambda i: gen._generate_discovery(parsed[i % len(parsed)], False)
+
+
+def _generate_discovery_cached(ctx: Context) -> Op:
+    gen, messages = ctx.generator, ctx.messages
+    return lambda i: gen.generate_discovery_message(*messages[i % len(messages)], test_mode=False)
+
+
+def _serialize_entity_config(ctx: Context) -> Op:
+    gen = ctx.generator
+    jobs = []
+    for topic in ctx.topics:
+        parsed = gen.parse_open3e_topic(topic)
+        dp = gen.plan.datapoints.get(parsed['did']) if parsed else None
+        entity = dp.resolve(parsed['sub_item']) if dp and parsed else None
+        if parsed and dp and entity:
+            jobs.append((parsed, dp, entity))
+    return lambda i: gen._entity_message(gen._entity_component(*jobs[i % len(jobs)]), False)
+
+
+def _process_message(ctx: Context) -> Op:
+    """Steady state: discovery already published, only values change."""
+    bridge, messages = ctx.bridge, ctx.messages
+    for topic, payload in messages:
+        bridge.process_message(topic, payload)
+    return lambda i: bridge.process_message(*messages[i % len(messages)])
+
+
+def _process_message_cold(ctx: Context) -> Op:
+    """First sight of every topic: generation + publish, no caches."""
+    bridge, messages = ctx.bridge, ctx.messages
+
+    def op(i: int):
+        if i % len(messages) == 0:
+            bridge.published_digests.clear()
+            bridge.generator.invalidate_discovery_cache()
+        bridge.process_message(*messages[i % len(messages)])
+    return op
+
+
+STAGES: dict[str, Callable[[Context], Op]] = {
+    "parse_topic": _parse_topic,
+    "parse_topic_cached": _parse_topic_cached,
+    "infer_entity_config": _infer_entity_config,
+    "generate_discovery": _generate_discovery,
+    "generate_discovery_cached": _generate_discovery_cached,
+    "serialize_entity_config": _serialize_entity_config,
+    "process_message": _process_message,
+    "process_message_cold": _process_message_cold,
+}
+
+
+def measure(op: Op, iterations: int, alloc_samples: int = 200) -> StageResult:
+    """Time `iterations` calls of op, then sample allocations on a few more."""
+    for i in range(min(iterations, 100)):  # warm-up
+        op(i)
+
+    blocks_before = sys.getallocatedblocks()
+    start = time.perf_counter_ns()
+    for i in range(iterations):
+        op(i)
+    elapsed = time.perf_counter_ns() - start
+    retained = sys.getallocatedblocks() - blocks_before
+
+    samples = min(iterations, alloc_samples)
+    allocated = 0
+    tracemalloc.start()
+    try:
+        for i in range(samples):
+            tracemalloc.reset_peak()
+            current, _ = tracemalloc.get_traced_memory()
+            op(i)
+            allocated += tracemalloc.get_traced_memory()[1] - current
+    finally:
+        tracemalloc.stop()
+
+    ns_per_op = elapsed / iterations
+    return StageResult(
+        ns_per_op=round(ns_per_op, 1),
+        ops_per_s=round(1e9 / ns_per_op, 1) if ns_per_op else 0.0,
+        alloc_bytes_per_op=round(allocated / samples, 1),
+        retained_blocks_per_op=round(retained / iterations, 3),
+    )
+
+
+def run(profile: str = "vitocal", iterations: int = 5000, stages: list[str] | None = None) -> dict[str, Any]:
+    """Run the selected stages (default: all) and return a JSON-serializable report."""
+    ctx = Context(profile)
+    results = {}
+    for name in stages or list(STAGES):
+        # Fresh context per stage, so caches warmed by one stage don't skew the next
+        if results:
+            ctx = Context(profile)
+        results[name] = asdict(measure(STAGES[name](ctx), iterations))
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "profile": profile,
+            "topics": len(ctx.topics),
+            "iterations": iterations,
+        },
+        "stages": results,
+    }
+
+
+def compare(report: dict[str, Any], baseline: dict[str, Any], threshold: float = 0.25) -> list[str]:
+    """Return one message per stage whose ns/op exceeds the baseline by more than threshold."""
+    regressions = []
+    for name, result in report["stages"].items():
+        base = baseline.get("stages", {}).get(name)
+        if not base or not base.get("ns_per_op"):
+            continue
+        ratio = result["ns_per_op"] / base["ns_per_op"]
+        if ratio > 1 + threshold:
+            regressions.append(f"{name}: {result['ns_per_op']:.0f} ns/op vs baseline "
+                               f"{base['ns_per_op']:.0f} ns/op ({ratio:.2f}x)")
+    return regressions
+
+
+def format_report(report: dict[str, Any], baseline: dict[str, Any] | None = None) -> str:
+    lines = [f"{'stage':<26} {'ns/op':>10} {'ops/s':>12} {'alloc B/op':>11} {'retained/op':>12}"
+             + ("  vs baseline" if baseline else "")]
+    for name, r in report["stages"].items():
+        line = (f"{name:<26} {r['ns_per_op']:>10.0f} {r['ops_per_s']:>12.0f} "
+                f"{r['alloc_bytes_per_op']:>11.0f} {r['retained_blocks_per_op']:>12.3f}")
+        base = (baseline or {}).get("stages", {}).get(name)
+        if base and base.get("ns_per_op"):
+            line += f"  {r['ns_per_op'] / base['ns_per_op']:>6.2f}x"
+        lines.append(line)
+    meta = report["meta"]
+    lines.append(f"profile={meta['profile']} topics={meta['topics']} iterations={meta['iterations']} "
+                 f"python={meta['python']}")
+    return "\n".join(lines)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="open3e-bridge pipeline micro-benchmarks")
+    parser.add_argument("--profile", default="vitocal", choices=["common", "vitocal", "vitodens"])
+    parser.add_argument("--iterations", type=int, default=5000)
+    parser.add_argument("--stage", action="append", choices=list(STAGES), help="Run only this stage (repeatable)")
+    parser.add_argument("--json", help="Write results to this file")
+    parser.add_argument("--compare", nargs="?", const=str(BASELINE_PATH),
+                        help="Compare against a baseline file (default: benchmarks/baseline.json)")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Allowed slowdown vs baseline before failing (default: 0.25 = 25%%)")
+    parser.add_argument("--save-baseline", action="store_true", help="Overwrite benchmarks/baseline.json")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    report = run(args.profile, args.iterations, args.stage)
+
+    baseline = json.loads(Path(args.compare).read_text()) if args.compare else None
+    print(format_report(report, baseline))
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2) + "\n")
+    if args.save_baseline:
+        BASELINE_PATH.write_text(json.dumps(report, indent=2) + "\n")
+
+    if baseline is not None:
+        regressions = compare(report, baseline, args.threshold)
+        for message in regressions:
+            print(f"REGRESSION {message}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover
+    raise SystemExit(main())
@@ -0,0 +1,136 @@
+"""Import-time budget for the CLI entry point.
+
+Each mode runs in a fresh interpreter: import bridge, then main() with the
+mode's arguments. The time from before the import until main() returns is
+compared with a budget, and the modules the mode must not load (paho, asyncio,
+the YAML-based generator, ...) are checked, so that offline modes keep
+starting without the MQTT stack.
+
+Usage:
+    python -m benchmarks.startup                    # check all modes
+    python -m benchmarks.startup --scale 3          # slower machine: triple the budgets
+    python -m benchmarks.startup --json out.json
+
+Exits with status 1 if a mode is over budget or loads a forbidden module.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# Loaded by the MQTT runtime only
+NETWORK_MODULES = ("paho.mqtt.client", "asyncio")
+# The generator, its YAML loader and the package metadata lookup
+CONFIG_MODULES = ("generators.homeassistant", "yaml", "importlib.metadata")
+
+
+@dataclass(frozen=True)
+class Mode:
+    argv: tuple[str, ...]
+    budget_ms: float
+    forbidden: tuple[str, ...]
+
+
+# About twice what a desktop x86 machine needs (import bridge used to take ~200 ms
+# on its own); use --scale on slower hardware such as a Raspberry Pi
+MODES: dict[str, Mode] = {
+    "import": Mode((), 150.0, NETWORK_MODULES + CONFIG_MODULES),
+    "list-generators": Mode(("--list-generators",), 150.0, NETWORK_MODULES + CONFIG_MODULES),
+    "version": Mode(("--version",), 200.0, NETWORK_MODULES + CONFIG_MODULES[:2]),
+    "validate-config": Mode(("--validate-config",), 500.0, NETWORK_MODULES),
+    "dump-entities": Mode(("--dump-entities",), 500.0, NETWORK_MODULES),
+}
+
+# Runs in the child interpreter; prints {"ms": ..., "modules": [...]} as the last line
+_PROBE = """
+import contextlib, io, json, sys, time
+start = time.perf_counter()
+import bridge
+if ARGV:
+    sys.argv = ["open3e-bridge", *ARGV]
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.suppress(SystemExit):
+        bridge.main()
+elapsed = time.perf_counter() - start
+print(json.dumps({"ms": elapsed * 1000, "modules": sorted(sys.modules)}))
+"""
+
+
+def measure(mode: Mode, env: dict[str, str]) -> dict[str, Any]:
+    """Run one mode in a fresh interpreter."""
+    code = _PROBE.replace("ARGV", repr(list(mode.argv)))
+    result = subprocess.run([sys.executable, "-c", code], cwd=REPO_ROOT, env=env,  # noqa: S603 — fixed probe script
+                            capture_output=True, text=True, timeout=60, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def run(modes: list[str] | None = None, repeat: int = 5, scale: float = 1.0) -> dict[str, Any]:
+    """Best-of-`repeat` startup time per mode, checked against the scaled budgets."""
+    results: dict[str, Any] = {}
+    with tempfile.TemporaryDirectory() as cache_dir:
+        # Own config cache, filled by the first run, so results do not depend on ~/.cache
+        env = {**os.environ, "OPEN3E_CONFIG_CACHE": cache_dir, "PYTHONDONTWRITEBYTECODE": "1"}
+        for name in modes or list(MODES):
+            mode = MODES[name]
+            samples = [measure(mode, env) for _ in range(max(1, repeat))]
+            best = min(sample["ms"] for sample in samples)
+            loaded = set(samples[-1]["modules"])
+            budget = mode.budget_ms * scale
+            results[name] = {
+                "ms": round(best, 1),
+                "budget_ms": round(budget, 1),
+                "forbidden_loaded": [m for m in mode.forbidden if m in loaded],
+                "modules": len(loaded),
+            }
+    return {"python": sys.version.split()[0], "modes": results}
+
+
+def violations(report: dict[str, Any]) -> list[str]:
+    """Human-readable budget and forbidden-import failures."""
+    problems = []
+    for name, result in report["modes"].items():
+        if result["ms"] > result["budget_ms"]:
+            problems.append(f"{name}: {result['ms']:.1f} ms > budget {result['budget_ms']:.1f} ms")
+        for module in result["forbidden_loaded"]:
+            problems.append(f"{name}: imports {module}")
+    return problems
+
+
+def format_report(report: dict[str, Any]) -> str:
+    lines = [f"{'mode':<18} {'ms':>8} {'budget':>8} {'modules':>8}  forbidden"]
+    for name, result in report["modes"].items():
+        forbidden = ", ".join(result["forbidden_loaded"]) or "-"
+        lines.append(f"{name:<18} {result['ms']:>8.1f} {result['budget_ms']:>8.1f} "
+                     f"{result['modules']:>8}  {forbidden}")
+    return "\n".join(lines)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="open3e-bridge CLI import-time budget")
+    parser.add_argument("--mode", action="append", choices=list(MODES), help="Check only this mode (repeatable)")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per mode, the fastest counts (default: 5)")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiply all budgets (default: 1.0)")
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args(argv)
+
+    report = run(args.mode, args.repeat, args.scale)
+    print(format_report(report))
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2) + "\n")
+
+    problems = violations(report)
+    for message in problems:
+        print(f"OVER BUDGET {message}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":  # pragma: no cover
+    raise SystemExit(main())
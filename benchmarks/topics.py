@@ -0,0 +1,88 @@
+"""Realistic open3e topic mixes derived from the shipped device profiles.
+
+Every configured (DID, sub-item) of a profile becomes one TopicSpec, using the
+same merged config the bridge runs with. Unknown DIDs with open3e-style names
+exercise the heuristic auto-discovery path.
+"""
+from __future__ import annotations
+
+import random
+import re
+from dataclasses import dataclass
+from pathlib import Path
+
+from generators.homeassistant import HomeAssistantGenerator
+
+CONFIG_DIR = Path(__file__).resolve().parent.parent / "config"
+
+# open3e-style DID names that hit the different heuristic rules
+UNKNOWN_NAMES = (
+    "BufferTemperatureSensor", "HeatingCircuitPressureSensor", "CompressorEnergyConsumption",
+    "SecondaryPumpPowerState", "FanSpeedTarget", "MixerValvePosition", "CompressorStarts",
+    "OperatingHoursCompressor", "ElectricalPowerConsumption", "FourThreeWayValvePosition",
+)
+
+_SPLIT_WORDS = re.compile(r"[^0-9A-Za-z]+")
+
+
+def camel_case(name: str) -> str:
+    """ "Flow Temperature" -> "FlowTemperature" (open3e topic style)."""
+    return "".join(word[:1].upper() + word[1:] for word in _SPLIT_WORDS.split(name) if word)
+
+
+@dataclass(frozen=True, slots=True)
+class TopicSpec:
+    """One open3e state topic (without ECU address) and how its values look."""
+    did: int
+    sensor_name: str
+    sub_item: str | None
+    kind: str  # sensor, number, binary, select, text, unknown
+
+    def topic(self, ecu: str) -> str:
+        base = f"open3e/{ecu}_{self.did}_{self.sensor_name}"
+        return f"{base}/{self.sub_item}" if self.sub_item else base
+
+    def sample_value(self, rng: random.Random, previous: str | None = None, drift: float = 0.5) -> str:
+        """Plausible payload; numeric values random-walk from the previous one by up to ±drift."""
+        if self.kind == "binary":
+            return rng.choice(("0", "1"))
+        if self.kind == "select":
+            return str(rng.randint(0, 3))
+        if self.kind == "text":
+            return "Vitocal 250-A"
+        try:
+            base = float(previous) if previous is not None else rng.uniform(5.0, 55.0)
+        except ValueError:
+            base = rng.uniform(5.0, 55.0)
+        return f"{base + rng.uniform(-drift, drift):.1f}"
+
+
+_KIND_BY_ENTITY_TYPE = {
+    "binary_sensor": "binary",
+    "switch": "binary",
+    "select": "select",
+    "number": "number",
+}
+
+
+def profile_topics(profile: str = "vitocal", config_dir: str | Path = CONFIG_DIR) -> list[TopicSpec]:
+    """All configured (DID, sub-item) topics of a profile, plus its identification DIDs."""
+    generator = HomeAssistantGenerator(str(config_dir), "en", profile=profile)
+    configs = generator.datapoints.get("datapoints", {}) or {}
+    specs = []
+    for entity in generator.plan.entities():
+        dp_config = configs.get(entity.did) or {}
+        name = camel_case(dp_config.get("name") or f"Did{entity.did}")
+        specs.append(TopicSpec(entity.did, name, entity.sub_item, _KIND_BY_ENTITY_TYPE.get(entity.entity_type, "sensor")))
+    # Identification DIDs carry the device model as text and have no entity of their own
+    for did in sorted(generator.plan.identification_dids):
+        specs.append(TopicSpec(did, camel_case((configs.get(did) or {}).get("name") or f"Did{did}"), None, "text"))
+    return specs
+
+
+def unknown_topics(count: int, first_did: int = 9000) -> list[TopicSpec]:
+    """Topics for DIDs not in any profile, named so the heuristics have work to do."""
+    return [
+        TopicSpec(first_did + i, UNKNOWN_NAMES[i % len(UNKNOWN_NAMES)], "Actual", "unknown")
+        for i in range(count)
+    ]
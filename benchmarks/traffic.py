@@ -0,0 +1,187 @@
+"""Synthetic open3e traffic for load tests, driven by the shipped profiles.
+
+Produces the topics open3e would publish for every configured DID/sub-item
+of a profile (see benchmarks.topics), on any number of ECUs, plus unknown
+DIDs for the heuristic path. Numeric values random-walk per topic, and a
+configurable share of messages is replaced by NRC error payloads.
+
+Output goes to one of:
+- a capture file in --simulate format ("topic payload" per line)
+- an MQTT broker, where a running bridge picks it up
+- an in-process bridge (NullClient), which reports processing throughput
+
+Usage:
+    python -m benchmarks.traffic --ecus 2 --count 5000 --output capture.txt
+    python -m benchmarks.traffic --rate 200 --duration 60 --mqtt-host localhost
+    python -m benchmarks.traffic --ecus 4 --unknown 20 --count 20000 --bridge
+"""
+from __future__ import annotations
+
+import argparse
+import itertools
+import logging
+import random
+import sys
+import time
+from collections.abc import Callable, Iterator
+from pathlib import Path
+from typing import Any, TextIO
+
+from benchmarks.topics import CONFIG_DIR, TopicSpec, profile_topics, unknown_topics
+
+logger = logging.getLogger("open3e_bridge.benchmarks.traffic")
+
+# ECU addresses seen on real Vitocal/Vitodens installations, extended as needed
+KNOWN_ECUS = ("680", "6a1", "6c4", "6cf", "68c", "6c3")
+NRC_PAYLOADS = ("NRC 0x22", "NRC 0x31", "NRC 0x33")
+
+Sink = Callable[[str, str], Any]
+
+
+def ecu_addresses(count: int) -> list[str]:
+    """The first `count` ECU addresses (known ones first, then synthetic 7xx)."""
+    ecus: list[str] = list(KNOWN_ECUS[:count])
+    ecus.extend(f"{0x700 + i:x}" for i in range(count - len(ecus)))
+    return ecus
+
+
+class TrafficGenerator:
+    def __init__(self, profile: str = "vitocal", ecus: int = 1, unknown: int = 0,
+                 drift: float = 0.5, nrc_ratio: float = 0.0, seed: int | None = None,
+                 config_dir: str | Path = CONFIG_DIR):
+        """
+        Args:
+            profile: Profile whose DIDs are published (common, vitocal, vitodens)
+            ecus: Number of ECUs publishing the full DID set
+            unknown: Unknown DIDs per ECU (heuristic auto-discovery path)
+            drift: Max change of a numeric value between two messages
+            nrc_ratio: Share of messages replaced by an NRC payload (0..1)
+            seed: Random seed for reproducible traffic
+        """
+        self.specs: list[TopicSpec] = profile_topics(profile, config_dir) + unknown_topics(unknown)
+        self.ecus = ecu_addresses(ecus)
+        self.drift = drift
+        self.nrc_ratio = nrc_ratio
+        self._rng = random.Random(seed)  # noqa: S311 — synthetic test data, not crypto
+        self._last: dict[str, str] = {}
+
+    @property
+    def topics_per_cycle(self) -> int:
+        return len(self.specs) * len(self.ecus)
+
+    def cycle(self) -> Iterator[tuple[str, str]]:
+        """One polling cycle: every topic on every ECU once."""
+        for ecu in self.ecus:
+            for spec in self.specs:
+                topic = spec.topic(ecu)
+                if self.nrc_ratio and self._rng.random() < self.nrc_ratio:
+                    yield topic, self._rng.choice(NRC_PAYLOADS)
+                    continue
+                value = spec.sample_value(self._rng, self._last.get(topic), self.drift)
+                self._last[topic] = value
+                yield topic, value
+
+    def messages(self, count: int | None = None) -> Iterator[tuple[str, str]]:
+        """Endless (or `count`) messages, cycle after cycle."""
+        stream = itertools.chain.from_iterable(self.cycle() for _ in itertools.count())
+        return itertools.islice(stream, count)
+
+
+def stream(messages: Iterator[tuple[str, str]], sink: Sink, rate: float = 0.0,
+           duration: float | None = None) -> dict[str, float]:
+    """Send messages to sink at `rate` msg/s (0 = as fast as possible), for at most `duration` s."""
+    start = time.monotonic()
+    sent = 0
+    for topic, payload in messages:
+        now = time.monotonic()
+        if duration is not None and now - start >= duration:
+            break
+        if rate > 0:
+            # Fixed schedule, so slow sends are caught up instead of accumulating drift
+            delay = start + sent / rate - now
+            if delay > 0:
+                time.sleep(delay)
+        sink(topic, payload)
+        sent += 1
+    elapsed = time.monotonic() - start
+    return {"sent": sent, "elapsed_s": round(elapsed, 3), "rate": round(sent / elapsed, 1) if elapsed else 0.0}
+
+
+def file_sink(f: TextIO) -> Sink:
+    """Write messages in --simulate format."""
+    return lambda topic, payload: f.write(f"{topic} {payload}\n")
+
+
+def mqtt_sink(host: str, port: int, user: str | None = None, password: str | None = None):
+    """Connected paho client (network loop running) and a sink publishing through it."""
+    import paho.mqtt.client as mqtt
+
+    client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)  # type: ignore[attr-defined]
+    if user and password:
+        client.username_pw_set(user, password)
+    client.connect(host, port, 60)
+    client.loop_start()
+    return client, lambda topic, payload: client.publish(topic, payload)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Synthetic open3e MQTT traffic")
+    parser.add_argument("--profile", default="vitocal", choices=["common", "vitocal", "vitodens"])
+    parser.add_argument("--ecus", type=int, default=1, help="Number of ECUs (default: 1)")
+    parser.add_argument("--unknown", type=int, default=0, help="Unknown DIDs per ECU (default: 0)")
+    parser.add_argument("--drift", type=float, default=0.5, help="Max numeric change per message (default: 0.5)")
+    parser.add_argument("--nrc-ratio", type=float, default=0.0, help="Share of NRC payloads, 0..1 (default: 0)")
+    parser.add_argument("--seed", type=int, help="Random seed for reproducible traffic")
+    parser.add_argument("--rate", type=float, default=0.0, help="Messages per second (default: unlimited)")
+    parser.add_argument("--count", type=int, help="Stop after N messages (default: one cycle without --duration)")
+    parser.add_argument("--duration", type=float, help="Stop after N seconds")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--output", help="Write a capture file (--simulate format); '-' for stdout")
+    target.add_argument("--mqtt-host", help="Publish to this MQTT broker")
+    target.add_argument("--bridge", action="store_true", help="Feed an in-process bridge and report throughput")
+    parser.add_argument("--mqtt-port", type=int, default=1883)
+    parser.add_argument("--mqtt-user")
+    parser.add_argument("--mqtt-password")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    gen = TrafficGenerator(args.profile, args.ecus, args.unknown, args.drift, args.nrc_ratio, args.seed)
+    count = args.count
+    if count is None and args.duration is None:
+        count = gen.topics_per_cycle
+    messages = gen.messages(count)
+
+    if args.mqtt_host:
+        client, sink = mqtt_sink(args.mqtt_host, args.mqtt_port, args.mqtt_user, args.mqtt_password)
+        try:
+            result = stream(messages, sink, args.rate, args.duration)
+        finally:
+            client.loop_stop()
+            client.disconnect()
+    elif args.bridge:
+        from benchmarks.pipeline import make_bridge
+
+        bridge = make_bridge(args.profile)
+        # Injected NRCs would otherwise log one warning each
+        bridge_logger = logging.getLogger("open3e_bridge")
+        level = bridge_logger.level
+        bridge_logger.setLevel(logging.ERROR)
+        try:
+            result = stream(messages, bridge.process_message, args.rate, args.duration)
+        finally:
+            bridge_logger.setLevel(level)
+        result["published"] = bridge.client.published  # type: ignore[attr-defined]  # NullClient
+    elif args.output and args.output != "-":
+        with open(args.output, "w") as f:
+            result = stream(messages, file_sink(f), args.rate, args.duration)
+    else:
+        result = stream(messages, file_sink(sys.stdout), args.rate, args.duration)
+        print(f"# {result}", file=sys.stderr)
+        return 0
+
+    print(f"topics/cycle={gen.topics_per_cycle} " + " ".join(f"{k}={v}" for k, v in result.items()))
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover
+    raise SystemExit(main())
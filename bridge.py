@@ -6,30 +6,98 @@ Automatische Erstellung von Home Assistant MQTT Discovery Messages
 aus Open3E Datenpunkten.
 """
 import argparse
+import functools
 import json
 import logging
 import os
 import re
 import signal
+import socket
 import threading
 import time
 from collections import Counter
-from importlib.metadata import PackageNotFoundError
-from importlib.metadata import version as pkg_version
+from collections.abc import Callable
 from pathlib import Path
+from typing import TYPE_CHECKING, Any
 
-import paho.mqtt.client as mqtt
-
-from generators.homeassistant import HomeAssistantGenerator  # noqa: F401 — used by tests
+from generators.abbreviations import dumps_discovery
 from generators.registry import get_generator_class
-
-try:
-    __version__ = pkg_version("open3e-bridge")
-except PackageNotFoundError:
-    __version__ = "0.1.0-dev"
+from runtime.commands import CommandCoalescer, start_timer
+from runtime.delivery import DeliveryTracker
+from runtime.ingest import IngestQueue
+from runtime.metrics import StageMetrics
+from runtime.mqtt5 import (
+    SESSION_EXPIRY_S,
+    TOPIC_ALIAS_INVALID,
+    TopicAliases,
+    connect_hint,
+    connect_properties,
+    disconnect_hint,
+)
+from runtime.offline import BufferedMessage, OfflineBuffer
+from runtime.publisher import (
+    PRIORITY_COMMAND,
+    PRIORITY_DISCOVERY,
+    PRIORITY_HEALTH,
+    PRIORITY_STATE,
+    OutboundMessage,
+    OutboundPublisher,
+)
+from runtime.retained import (
+    DiscoverySeed,
+    RetainedScan,
+    config_entities,
+    config_sources,
+    open3e_discovery_pattern,
+)
+from runtime.subscriptions import BROAD_FILTERS, SubscriptionPlanner
+from runtime.writes import PendingWrites
+
+if TYPE_CHECKING:
+    from generators.plan import ConfigReload
 
 logger = logging.getLogger("open3e_bridge")
 
+# A08: power DIDs the COP is calculated from (needed even when not configured as entities)
+COP_DIDS = frozenset({2488, 2496})
+
+
+# paho, importlib.metadata and the generator with its YAML loader are imported
+# on first use, so offline CLI modes (--list-generators, --validate-config,
+# --dump-entities) start without them. `bridge.mqtt` and `bridge.__version__`
+# stay available as module attributes.
+def __getattr__(name: str) -> Any:
+    if name == "mqtt":
+        import paho.mqtt.client as mqtt
+        return mqtt
+    if name == "__version__":
+        return _package_version()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+@functools.cache
+def _package_version() -> str:
+    from importlib.metadata import PackageNotFoundError
+    from importlib.metadata import version as pkg_version
+
+    try:
+        return pkg_version("open3e-bridge")
+    except PackageNotFoundError:
+        return "0.1.0-dev"
+
+
+def create_generator(config_dir: str | None = None, language: str = "de", generator_type: str = "homeassistant",
+                     config_cache_dir: str | None = None, **kwargs: Any) -> Any:
+    """Instantiate the configured generator; needs no MQTT connection."""
+    resolved_config_dir = config_dir or str(Path(__file__).parent / "config")
+    generator_cls = get_generator_class(generator_type)
+    if config_cache_dir:
+        from generators.config_cache import ConfigCache
+
+        # Warm starts load the merged config from one compiled file instead of the YAML sources
+        kwargs["config_cache"] = ConfigCache(config_cache_dir)
+    return generator_cls(resolved_config_dir, language, **kwargs)
+
 class Open3EBridge:
     def __init__(self, mqtt_host: str = "localhost", mqtt_port: int = 1883,
                  mqtt_user: str | None = None, mqtt_password: str | None = None,
@@ -40,7 +108,32 @@ class Open3EBridge:
                  diagnostics_interval: int = 0,
                  auto_discover: bool = True,
                  generator_type: str = "homeassistant",
-                 profile: str = "auto"):
+                 profile: str = "auto",
+                 publish_rate: float = 0.0,
+                 publish_queue_size: int = 10000,
+                 ingest_workers: int = 1,
+                 ingest_queue_size: int = 1000,
+                 ingest_overflow: str = "drop-oldest",
+                 slow_message_ms: float = 50.0,
+                 config_cache_dir: str | None = None,
+                 config_reload_interval: float = 0.0,
+                 detect_profile: bool = False,
+                 compact_discovery: bool = False,
+                 discovery_mode: str = "entity",
+                 subscription_settle: float = 300.0,
+                 seed_discovery: bool = True,
+                 client_id: str | None = None,
+                 persistent_session: bool = False,
+                 mqtt5: bool = False,
+                 discovery_qos: int = 0,
+                 max_inflight: int | None = None,
+                 offline_buffer: str | None = None,
+                 offline_buffer_size: int = 1000,
+                 command_window: float = 0.05,
+                 command_batch: int = 10,
+                 write_timeout: float = 30.0,
+                 write_retries: int = 2,
+                 write_tolerance: float = 0.01):
 
         self.mqtt_host = mqtt_host
         self.mqtt_port = mqtt_port
@@ -49,12 +142,38 @@ class Open3EBridge:
         self.test_mode = test_mode
         self.discovery_prefix = discovery_prefix
         self.add_test_prefix = add_test_prefix
+        self.compact_discovery = compact_discovery
 
         # MQTT Client (paho-mqtt v2 API)
-        self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)  # type: ignore[attr-defined]
+        import paho.mqtt.client as mqtt
+
+        # Persistent session: the broker keeps subscriptions and queues QoS 1 messages
+        # for a fixed client id across reconnects (clean_session=False)
+        self.persistent_session = persistent_session
+        client_kwargs: dict[str, Any] = {}
+        # Extra client.connect() arguments (MQTT v5 clean start / session expiry)
+        self._connect_kwargs: dict[str, Any] = {}
+        if persistent_session:
+            client_id = client_id or f"open3e-bridge-{socket.gethostname()}"
+            if mqtt5:
+                self._connect_kwargs = {"clean_start": False, "properties": connect_properties(SESSION_EXPIRY_S)}
+            else:
+                client_kwargs["clean_session"] = False
+        if mqtt5:
+            client_kwargs["protocol"] = mqtt.MQTTv5
+        if client_id:
+            client_kwargs["client_id"] = client_id
+        self.client_id = client_id or ""
+        self._subscribe_qos = 1 if persistent_session else 0
+        self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, **client_kwargs)  # type: ignore[attr-defined]
         self.client.on_connect = self._on_connect
         self.client.on_message = self._on_message
         self.client.on_disconnect = self._on_disconnect
+        self.client.on_publish = self._on_publish
+        # QoS 1 in-flight window (paho default: 20), see diagnostics["delivery"]
+        if max_inflight is not None:
+            self.client.max_inflight_messages_set(max_inflight)
+        self.max_inflight = max_inflight
 
         if mqtt_user and mqtt_password:
             self.client.username_pw_set(mqtt_user, mqtt_password)
@@ -66,17 +185,88 @@ class Open3EBridge:
         # ROB-02: Reconnect with exponential backoff
         self.client.reconnect_delay_set(min_delay=1, max_delay=120)
 
+        # Outbound scheduler: priority lanes + messages/second budget
+        # MQTT v5: topic aliases for hot topics, message expiry for transient ones
+        self.mqtt5 = mqtt5
+        self.aliases = TopicAliases() if mqtt5 else None
+        # Publish -> PUBACK tracking of QoS 1 messages (commands, LWT, discovery with --discovery-qos 1)
+        self.delivery = DeliveryTracker()
+        self._discovery_qos = discovery_qos
+        self.publisher = OutboundPublisher(self.client, rate=publish_rate, max_queue=publish_queue_size,
+                                           aliases=self.aliases, delivery=self.delivery,
+                                           on_evict=self._on_publish_evicted, on_failed=self._on_publish_failed)
+        # Broker outage: commands and derived values go to disk and are replayed on connect
+        self.offline: OfflineBuffer | None = None
+        if offline_buffer:
+            self.offline = OfflineBuffer(offline_buffer, max_messages=offline_buffer_size)
+        # open3e/cmnd: reads and writes of a short window are merged per ECU and mode
+        self.commands = CommandCoalescer(self._send_command, window_s=command_window, max_batch=command_batch)
+        # Inbound queue: keeps message processing off the paho network thread
+        self.ingest = IngestQueue(self._handle_message, workers=ingest_workers,
+                                  max_depth=ingest_queue_size, overflow=ingest_overflow)
+        self._shutdown_drain_s = 5.0
+
         # Generator — use registry to select generator type
         resolved_config_dir = config_dir or str(Path(__file__).parent / "config")
-        generator_cls = get_generator_class(generator_type)
-        self.generator = generator_cls(
-            resolved_config_dir, language,
+        # Profile detection: start with what an earlier start detected, else with the
+        # vitocal default of "auto", and switch once the model name identifies the device
+        self._profile_pending = detect_profile and (Path(resolved_config_dir) / "profiles").is_dir()
+        if self._profile_pending and config_cache_dir:
+            from generators.config_cache import ConfigCache
+
+            profile = ConfigCache(config_cache_dir).load_profile(Path(resolved_config_dir)) or profile
+        self.generator = create_generator(
+            resolved_config_dir, language, generator_type, config_cache_dir,
             discovery_prefix=discovery_prefix, add_test_prefix=add_test_prefix,
-            auto_discover=auto_discover, profile=profile,
+            auto_discover=auto_discover, profile=profile, compact=compact_discovery,
+            discovery_mode=discovery_mode,
         )
 
-        # Cache veröffentlichter Discovery-Konfigurationen (Topic -> Payload)
-        self.published_configs: dict[str, str] = {}
+        # Compile the merged config into the entity plan once at startup
+        compile_start = time.monotonic()
+        plan = self.generator.compile_plan()
+        logger.debug("Compiled entity plan: %d datapoints in %.1f ms",
+                     len(plan.datapoints), (time.monotonic() - compile_start) * 1000)
+
+        # Veröffentlichte Discovery-Konfigurationen: Topic -> hash() des Payloads.
+        # Payloads are regenerated from the plan when needed (HA restart), so only a
+        # 64-bit digest is kept; str caches its hash, so comparing a cached payload is free
+        self.published_digests: dict[str, int] = {}
+        # Discovery topics each open3e topic produced, for the diff after a config reload
+        self._discovery_sources: dict[str, tuple[str, ...]] = {}
+        # Seed the table from the configs still retained on the broker (first connect),
+        # so a restart does not republish unchanged entities
+        prefix = discovery_prefix or "homeassistant"
+        if add_test_prefix and test_mode and not prefix.startswith("test/"):
+            prefix = f"test/{prefix}"
+        # Prefix the discovery topics are actually published under
+        self._discovery_topic_prefix = prefix
+        self._discovery_seed: DiscoverySeed | None = None
+        if seed_discovery:
+            self._discovery_seed = DiscoverySeed(
+                prefix, self.published_digests, f"open3e/bridge/seed/{socket.gethostname()}-{os.getpid()}")
+
+        # Without auto-discovery only the plan's DIDs are used: learn their topics and
+        # narrow the open3e subscriptions to them (settle <= 0 keeps the broad filters)
+        self._subscriptions: SubscriptionPlanner | None = None
+        if not auto_discover and subscription_settle > 0:
+            self._subscriptions = SubscriptionPlanner(self._wanted_dids(), settle_s=subscription_settle)
+
+        # Config hot reload: poll the config files, SIGHUP reloads immediately
+        self._config_reload_interval = config_reload_interval
+        self._config_reload_timer: threading.Timer | None = None
+        self._config_reload_lock = threading.Lock()
+        # Generator caches, published_digests and the message counters are shared by
+        # the ingest workers (--ingest-workers > 1). Taken after _config_reload_lock.
+        self._discovery_lock = threading.Lock()
+        self._config_reloads = 0
+
+        # Connection counters: connects, resumed persistent sessions, and the time from
+        # the last unexpected disconnect until the bridge was connected again
+        self._connects = 0
+        self._sessions_resumed = 0
+        self._disconnected_at: float | None = None
+        self._last_recovery_s: float | None = None
 
         # Diagnostics counters
         self._start_time = time.monotonic()
@@ -85,19 +275,28 @@ class Open3EBridge:
         self._entity_types: Counter = Counter()
         self._failed_writes = 0
         self._last_error: str = ""
+        # Per-stage latency histograms of process_message(), shared with the generator
+        self.metrics = StageMetrics(slow_threshold_s=slow_message_ms / 1000)
+        self.generator.metrics = self.metrics
 
         # Periodic diagnostics publishing
         self._diagnostics_interval = diagnostics_interval
         self._diagnostics_topic = "open3e/bridge/diagnostics"
         self._diagnostics_timer: threading.Timer | None = None
+        # False when an event loop (runtime.aio) drives periodic jobs instead of timers
+        self._use_timers = True
 
         # Health entity
         self._health_topic = "open3e/bridge/health"
         self._health_attributes_topic = "open3e/bridge/health/attributes"
 
         # A01: Write verification — pending writes awaiting read-back
-        # Key: (ecu_addr, did) → expected value (str)
-        self._pending_writes: dict[tuple[str, int], str] = {}
+        # Key: (ecu_addr, did) → expected value (str); expire after retried read-backs
+        self._pending_writes = PendingWrites(timeout_s=write_timeout, retries=write_retries,
+                                             tolerance=write_tolerance)
+        # Times the next deadline check: threading.Timer or the event loop (None: not started)
+        self._write_schedule: Callable[[float, Callable[[], Any]], Any] | None = None
+        self._write_check_armed = False
 
         # A08: COP calculation — latest power values
         self._electrical_power: float | None = None  # DID 2488
@@ -113,12 +312,12 @@ class Open3EBridge:
         }
 
         logger.info("Open3E Bridge v%s initialized: MQTT=%s:%d lang=%s config=%s prefix=%s generator=%s auto_discover=%s",
-                    __version__, mqtt_host, mqtt_port, language, resolved_config_dir,
+                    _package_version(), mqtt_host, mqtt_port, language, resolved_config_dir,
                     self.generator.discovery_prefix, generator_type, auto_discover)
 
     def _schedule_diagnostics(self):
         """Schedule the next periodic diagnostics publish."""
-        if self._diagnostics_interval <= 0:
+        if self._diagnostics_interval <= 0 or not self._use_timers:
             return
         self._diagnostics_timer = threading.Timer(
             self._diagnostics_interval, self._publish_diagnostics
@@ -128,17 +327,20 @@ class Open3EBridge:
 
     def _publish_diagnostics(self):
         """Publish diagnostics JSON to MQTT and reschedule."""
+        self._emit_diagnostics()
+        self._schedule_diagnostics()
+
+    def _emit_diagnostics(self):
+        """Publish diagnostics JSON to MQTT once."""
         try:
             diag = self.get_diagnostics()
-            self.client.publish(
-                self._diagnostics_topic,
-                json.dumps(diag),
-                retain=True,
-            )
+            # A stale retained copy expires (MQTT v5) when the bridge stops publishing
+            self._publish(self._diagnostics_topic, json.dumps(diag),
+                          priority=PRIORITY_HEALTH, retain=True,
+                          expiry=max(60, 3 * self._diagnostics_interval) if self.mqtt5 else 0)
             logger.debug("Published diagnostics: %s", diag)
         except Exception as e:
             logger.warning("Failed to publish diagnostics: %s", e)
-        self._schedule_diagnostics()
 
     def _cancel_diagnostics(self):
         """Cancel the periodic diagnostics timer."""
@@ -146,13 +348,207 @@ class Open3EBridge:
             self._diagnostics_timer.cancel()
             self._diagnostics_timer = None
 
+    def _schedule_config_reload(self):
+        """Schedule the next check for changed config files."""
+        if self._config_reload_interval <= 0 or not self._use_timers:
+            return
+        self._config_reload_timer = threading.Timer(self._config_reload_interval, self._poll_config)
+        self._config_reload_timer.daemon = True
+        self._config_reload_timer.start()
+
+    def _poll_config(self):
+        """Reload changed config files and reschedule."""
+        try:
+            self.reload_config()
+        except Exception as e:
+            logger.error("Config reload failed: %s", e, exc_info=True)
+        self._schedule_config_reload()
+
+    def _cancel_config_reload(self):
+        """Cancel the config polling timer."""
+        if self._config_reload_timer is not None:
+            self._config_reload_timer.cancel()
+            self._config_reload_timer = None
+
+    def _on_sighup(self, signum=None, frame=None):
+        """SIGHUP: reload the config now (off the signal handler, which may interrupt paho)."""
+        threading.Thread(target=self.reload_config, name="config-reload", daemon=True).start()
+
+    def reload_config(self, changed: list[Path] | None = None) -> bool:
+        """Apply config file changes without reconnecting.
+
+        The generator reloads the changed layers and recompiles its plan; only
+        open3e topics of DIDs whose plan changed are regenerated, and only
+        discovery configs whose payload changed are republished. Configs an
+        entity no longer produces are removed (empty retained payload).
+        Returns False if nothing was reloaded.
+        """
+        with self._config_reload_lock, self._discovery_lock:
+            reload = self.generator.reload_config(changed)
+            if reload is None:
+                return False
+            self._config_reloads += 1
+            self._apply_config_change(reload)
+            return True
+
+    def _detect_profile(self, did: int, value: str):
+        """Switch to the device profile an identification value points to.
+
+        Only a match on the model name (extract_model DID) ends detection and is
+        remembered for the next start; other identification DIDs may switch early.
+        """
+        profile = self.generator.detect_profile(value)
+        if profile is None:
+            return
+        with self._config_reload_lock, self._discovery_lock:
+            reload = self.generator.switch_profile(profile)
+            if reload is not None:
+                self._apply_config_change(reload)
+        if not self.generator.is_model_did(did):
+            return
+        self._profile_pending = False
+        if self.generator.config_cache is not None:
+            self.generator.config_cache.store_profile(self.generator.config_dir, self.generator._active_profile)
+
+    def _apply_config_change(self, reload: "ConfigReload"):
+        """Republish or remove the discovery configs a new plan changed (caller holds both locks)."""
+        entities: set[tuple[int, str | None]] = set()
+        updated = removed = 0
+        # Newest payload per discovery topic: in device mode several sources share one
+        # device config, which is published once with all of their changes
+        latest: dict[str, tuple[str, tuple[int, str | None]]] = {}
+        for source, old_topics in list(self._discovery_sources.items()):
+            parsed = self.generator.parse_open3e_topic(source)
+            if parsed is None:
+                continue
+            did = parsed['did']
+            if not (reload.everything or did in reload.dids):
+                continue
+            messages = self.generator.regenerate_discovery(source, self.test_mode)
+            new_topics = tuple(topic for topic, _ in messages)
+            for topic in old_topics:
+                if topic not in new_topics and self.published_digests.pop(topic, None) is not None:
+                    # Empty retained config removes the entity from Home Assistant
+                    self._publish(topic, "", priority=PRIORITY_DISCOVERY,
+                                  qos=self._discovery_qos, retain=True)
+                    entities.add((did, parsed['sub_item']))
+                    removed += 1
+            for topic, payload in messages:
+                latest[topic] = (payload, (did, parsed['sub_item']))
+            self._discovery_sources[source] = new_topics
+        for topic, (payload, entity) in latest.items():
+            digest = hash(payload)
+            if self.published_digests.get(topic) != digest and self._publish(
+                    topic, payload, priority=PRIORITY_DISCOVERY, qos=self._discovery_qos, retain=True):
+                self.published_digests[topic] = digest
+                self._discovery_published += 1
+                entities.add(entity)
+                updated += 1
+        logger.info("Config changed (%s): %d entities changed, %d discovery configs updated, %d removed",
+                    ", ".join(reload.layers), len(entities), updated, removed)
+        if entities:
+            logger.debug("Changed entities: %s", sorted(entities, key=lambda e: (e[0], e[1] or "")))
+        if self._subscriptions is not None:
+            subscribe, unsubscribe = self._subscriptions.update_wanted(self._wanted_dids())
+            if subscribe:
+                logger.info("Plan gained DIDs: subscribing to all open3e topics again to learn them")
+            self._change_subscriptions(subscribe, unsubscribe)
+
+    def _wanted_dids(self) -> frozenset[int]:
+        """DIDs whose open3e topics the bridge uses without auto-discovery."""
+        plan = self.generator.plan
+        return frozenset(plan.datapoints) | plan.identification_dids | COP_DIDS
+
+    def _narrow_subscriptions(self):
+        """Replace the broad open3e filters by the learned per-DID topic filters, or widen them again."""
+        subscriptions = self._subscriptions
+        if subscriptions is None:
+            return
+        if subscriptions.narrowed:
+            logger.info("Configured DIDs not seen yet: subscribing to all open3e topics again to learn them")
+            self._change_subscriptions(*subscriptions.widen())
+            return
+        subscribe, unsubscribe = subscriptions.narrow()
+        stats = subscriptions.stats()
+        logger.info("Narrowed open3e subscriptions to %d topic filters; %.0f%% of the open3e messages "
+                    "received while learning (%d of %d) were for DIDs without an entity",
+                    stats["filters"], stats["unwanted_ratio"] * 100, stats["unwanted_messages"],
+                    stats["wanted_messages"] + stats["unwanted_messages"])
+        self._change_subscriptions(subscribe, unsubscribe)
+
+    def _change_subscriptions(self, subscribe: list[str], unsubscribe: list[str]):
+        """Subscribe first, then drop the old filters, so no message falls into a gap."""
+        if subscribe:
+            self.client.subscribe([(topic_filter, self._subscribe_qos) for topic_filter in subscribe])
+        if unsubscribe:
+            self.client.unsubscribe(unsubscribe)
+
+    def _publish(self, topic: str, payload: str, *, priority: int = PRIORITY_DISCOVERY,
+                 qos: int = 0, retain: bool = False, expiry: int = 0) -> bool:
+        """Hand a message to the outbound scheduler (expiry: MQTT v5 message expiry in seconds).
+
+        While disconnected, commands and derived values go to the offline buffer instead;
+        discovery is retained and republished, so it is not buffered. Returns False if
+        the publish queue was full and the message was dropped.
+        """
+        offline = self.offline
+        if offline is not None and not offline.online and priority != PRIORITY_DISCOVERY:
+            msg = BufferedMessage(topic, payload, qos, retain, priority,
+                                  coalesce=priority != PRIORITY_COMMAND, expiry=expiry)
+            if offline.offer(msg):
+                return True
+        return self._submit(topic, payload, priority=priority, qos=qos, retain=retain, expiry=expiry)
+
+    def _submit(self, topic: str, payload: str, *, priority: int, qos: int, retain: bool, expiry: int) -> bool:
+        if expiry:
+            return self.publisher.submit(topic, payload, priority=priority, qos=qos, retain=retain, expiry=expiry)
+        return self.publisher.submit(topic, payload, priority=priority, qos=qos, retain=retain)
+
+    def _on_publish_evicted(self, msg: OutboundMessage):
+        """A queued discovery config was dropped: forget its digest so that it is published again."""
+        if (msg.priority == PRIORITY_DISCOVERY and msg.payload
+                and self.published_digests.get(msg.topic) == hash(msg.payload)):
+            self.published_digests.pop(msg.topic, None)
+
+    def _on_publish_failed(self, msg: OutboundMessage):
+        """paho refused a message (not connected, its queue full) and will not send it later."""
+        self._on_publish_evicted(msg)
+        offline = self.offline
+        if offline is not None and msg.priority != PRIORITY_DISCOVERY and not self.client.is_connected():
+            # Lost before on_disconnect switched to the buffer: keep it for the replay
+            offline.go_offline()
+            offline.offer(BufferedMessage(msg.topic, msg.payload, msg.qos, msg.retain, msg.priority,
+                                          coalesce=msg.priority != PRIORITY_COMMAND, expiry=msg.expiry))
+
+    def _send_command(self, payload: str):
+        self._publish("open3e/cmnd", payload, priority=PRIORITY_COMMAND, qos=1)
+
+    def _publish_now(self, topic: str, payload: str, *, qos: int = 0, retain: bool = False):
+        """Publish directly (bypassing the scheduler), tracking the PUBACK of QoS 1 messages."""
+        sent = self.delivery.start()
+        info = self.client.publish(topic, payload, qos=qos, retain=retain)
+        if qos:
+            self.delivery.track(info, topic, sent)
+
+    def _on_publish(self, client, userdata, mid, reason_code, properties):
+        """MQTT Publish Callback (paho v2): PUBACK for QoS 1, sent for QoS 0."""
+        self.delivery.acknowledged_mid(mid, reason_code)
+
+    def _connect(self):
+        """Connect the client (blocking) with the session options."""
+        self.client.connect(self.mqtt_host, self.mqtt_port, 60, **self._connect_kwargs)
+
     def _graceful_shutdown(self, signum=None, frame=None):
-        """Graceful shutdown: publish offline LWT, then disconnect."""
+        """Graceful shutdown: drain publish queue, publish offline LWT, then disconnect."""
         self._cancel_diagnostics()
+        self._cancel_config_reload()
         sig_name = signal.Signals(signum).name if signum else "unknown"
         logger.info("Received %s, shutting down gracefully...", sig_name)
+        self.ingest.stop(timeout=self._shutdown_drain_s)
+        self.commands.stop()
+        self.publisher.stop(timeout=self._shutdown_drain_s)
         try:
-            self.client.publish(self.lwt_topic, "offline", qos=1, retain=True)
+            self._publish_now(self.lwt_topic, "offline", qos=1, retain=True)
             self.client.disconnect()
         except Exception:  # noqa: S110
             pass  # best-effort during shutdown
@@ -161,9 +557,16 @@ class Open3EBridge:
         """Startet die Bridge"""
         signal.signal(signal.SIGTERM, self._graceful_shutdown)
         signal.signal(signal.SIGINT, self._graceful_shutdown)
+        if hasattr(signal, "SIGHUP"):
+            signal.signal(signal.SIGHUP, self._on_sighup)
         try:
             logger.info("Connecting to MQTT broker %s:%d ...", self.mqtt_host, self.mqtt_port)
-            self.client.connect(self.mqtt_host, self.mqtt_port, 60)
+            self._connect()
+            self.publisher.start()
+            self.commands.start()
+            self._write_schedule = start_timer
+            self.ingest.start()
+            self._schedule_config_reload()
             self.client.loop_forever()
         except KeyboardInterrupt:
             self._graceful_shutdown(signum=signal.SIGINT)
@@ -189,11 +592,11 @@ class Open3EBridge:
         self.client.on_message = _on_message
 
         logger.info("Connecting for cleanup to %s:%d ...", self.mqtt_host, self.mqtt_port)
-        self.client.connect(self.mqtt_host, self.mqtt_port, 60)
+        self._connect()
         self.client.loop_start()
         time.sleep(timeout_s)
 
-        pattern = re.compile(rf"^{re.escape(self.generator.discovery_prefix)}/(sensor|number|select|binary_sensor|climate|switch|button|water_heater)/open3e_[^/]+/config$")
+        pattern = open3e_discovery_pattern(self.generator.discovery_prefix)
         targets = [t for t in retained if pattern.match(t)]
         logger.info("Found %d retained under prefix, %d matching open3e entities.", len(retained), len(targets))
         for t in targets:
@@ -206,44 +609,196 @@ class Open3EBridge:
         self.client.loop_stop()
         self.client.disconnect()
 
+    def cleanup_orphans(self, timeout_s: float = 10.0, batch_size: int = 50,
+                        batch_pause_s: float = 0.1) -> dict[str, Any]:
+        """Delete only the retained open3e discovery configs the current plan no longer produces.
+
+        Unlike cleanup(), entities that are still configured keep their config (and
+        their history in HA). Retained configs are checked against the plan while
+        they stream in (their state/command topics regenerated, or for stateless
+        entities like buttons, their unique_id looked up in the plan); the end of the
+        retained burst is detected with a marker message instead of a fixed sleep.
+        Orphans are deleted in batches of `batch_size`, each acknowledged by the
+        broker (QoS 1) before a pause of `batch_pause_s`.
+
+        Returns counts and timing (also logged).
+        """
+        if self._profile_pending and self.generator.profile == "auto":
+            logger.error("Device profile not known yet (--profile auto): pass --profile so that "
+                         "profile datapoints are not taken for orphans")
+            return {"error": "profile unknown"}
+        scan = RetainedScan(self._discovery_topic_prefix, self._is_orphan, f"open3e/bridge/cleanup/{os.getpid()}")
+
+        def _on_connect(client, userdata, connect_flags, reason_code, properties):
+            if reason_code == 0:
+                client.subscribe(scan.topic_filter)
+                client.subscribe(scan.marker_topic)
+                client.publish(scan.marker_topic, "end")
+            else:
+                logger.error("Failed to connect for cleanup: rc=%s", reason_code)
+
+        def _on_message(client, userdata, msg):
+            scan.on_message(msg.topic, msg.payload, getattr(msg, 'retain', False))
+
+        self.client.on_connect = _on_connect
+        self.client.on_message = _on_message
+
+        logger.info("Connecting for orphan cleanup to %s:%d ...", self.mqtt_host, self.mqtt_port)
+        self._connect()
+        self.client.loop_start()
+        complete = scan.wait(timeout_s)
+        scan_s = time.monotonic() - scan.started
+        self.client.unsubscribe(scan.topic_filter)
+        orphans = list(scan.orphans)
+
+        delete_start = time.monotonic()
+        failed = 0
+        for start in range(0, len(orphans), batch_size):
+            if start:
+                time.sleep(batch_pause_s)
+            batch = orphans[start:start + batch_size]
+            infos = []
+            for topic in batch:
+                logger.debug("Clearing orphaned retain: %s", topic)
+                infos.append(self.client.publish(topic, payload="", qos=1, retain=True))
+            for info in infos:
+                try:
+                    info.wait_for_publish(timeout=timeout_s)
+                except (RuntimeError, ValueError):
+                    pass
+                if not info.is_published():
+                    failed += 1
+        delete_s = time.monotonic() - delete_start
+        self.client.loop_stop()
+        self.client.disconnect()
+
+        report = {
+            "retained": scan.retained,
+            "open3e": scan.open3e,
+            "kept": scan.open3e - len(orphans),
+            "orphans": len(orphans),
+            "deleted": len(orphans) - failed,
+            "failed": failed,
+            # "marker": end of the retained burst detected; "timeout": fell back to timeout_s
+            "end": "marker" if complete else "timeout",
+            "scan_s": round(scan_s, 3),
+            "delete_s": round(delete_s, 3),
+        }
+        logger.info("Orphan cleanup: %d retained open3e configs, %d kept, %d deleted, %d failed "
+                    "(scan %.2fs, end by %s; delete %.2fs)", report["open3e"], report["kept"], report["deleted"],
+                    failed, scan_s, report["end"], delete_s)
+        return report
+
+    def _is_orphan(self, topic: str, payload: bytes) -> bool:
+        """Whether a retained discovery config is no longer produced by the current plan."""
+        prefix = self._discovery_topic_prefix
+        # The bridge's own entities are not built by the generator
+        if topic in (f"{prefix}/sensor/open3e_bridge_cop/config", f"{prefix}/binary_sensor/open3e_bridge_status/config"):
+            return False
+        try:
+            config = json.loads(payload)
+        except ValueError:
+            return True
+        if not isinstance(config, dict):
+            return True
+        if any(topic == produced for source in config_sources(config)
+               for produced, _ in self.generator.regenerate_discovery(source, self.test_mode)):
+            return False
+        # Stateless entities (buttons) have no source topic: check their identity against the plan
+        return not any(topic in self.generator.entity_discovery_topics(ecu_addr, did, self.test_mode)
+                       for ecu_addr, did in config_entities(config))
+
     def _on_connect(self, client, userdata, connect_flags, reason_code, properties):
         """MQTT Connect Callback (paho v2)"""
         if reason_code == 0:
-            logger.info("Connected to MQTT broker")
-            client.publish(self.lwt_topic, "online", qos=1, retain=True)
-            client.subscribe("open3e/+/+")
-            client.subscribe("open3e/+")
-            client.subscribe("open3e/LWT")
-            # ROB-01: Re-publish discovery when HA restarts
-            client.subscribe("homeassistant/status")
-            logger.debug("Subscribed to open3e topics and homeassistant/status")
-            # A08: Publish COP sensor discovery
-            self._publish_cop_discovery()
-            # Publish health entity discovery
-            self._publish_health_discovery()
+            # Fast path: a resumed persistent session still has the subscriptions, and the
+            # bridge's discovery configs are retained and unchanged since the last connect
+            resumed = (self.persistent_session and self._connects > 0
+                       and getattr(connect_flags, "session_present", False))
+            self._connects += 1
+            if self._disconnected_at is not None:
+                self._last_recovery_s = time.monotonic() - self._disconnected_at
+                self._disconnected_at = None
+            if self.aliases is not None:
+                # Aliases are per connection; the broker announces how many it accepts
+                self.aliases.reset(getattr(properties, "TopicAliasMaximum", 0))
+            if resumed:
+                self._sessions_resumed += 1
+                logger.info("Connected to MQTT broker (session resumed)")
+            else:
+                logger.info("Connected to MQTT broker")
+            self._publish_now(self.lwt_topic, "online", qos=1, retain=True)
+            if self.offline is not None:
+                # Before the health state and discovery: buffered commands go out first
+                self.offline.go_online(lambda msg: self._submit(
+                    msg.topic, msg.payload, priority=msg.priority, qos=msg.qos, retain=msg.retain,
+                    expiry=msg.expiry))
+            if not resumed:
+                self._subscribe_all(client)
+                # A08: Publish COP sensor discovery
+                self._publish_cop_discovery()
+                # Publish health entity discovery
+                self._publish_health_discovery()
             self._publish_health_state("ON")
             self._schedule_diagnostics()
         else:
-            reason_hints = {
-                1: "incorrect protocol version",
-                2: "invalid client identifier",
-                3: "server unavailable",
-                4: "bad username or password — check --mqtt-user and --mqtt-password (or MQTT_PASSWORD env var)",
-                5: "not authorized — check MQTT broker ACL configuration",
-            }
-            hint = reason_hints.get(int(reason_code) if isinstance(reason_code, int) else 0, "")
+            hint = connect_hint(reason_code)
             extra = f" ({hint})" if hint else ""
             logger.error("Failed to connect to MQTT broker at %s:%d: rc=%s%s",
                          self.mqtt_host, self.mqtt_port, reason_code, extra)
 
+    def _subscribe_all(self, client):
+        qos = self._subscribe_qos
+        # Retained discovery configs first: the broker delivers them before open3e values
+        seed = self._discovery_seed
+        seeding = seed is not None and seed.start()
+        # The marker is delivered right behind the last retained config: it ends seeding
+        seed_filters = [seed.topic_filter, seed.marker_topic] if seed is not None and seeding else []
+        if self._subscriptions is None:
+            for topic_filter in seed_filters:
+                client.subscribe(topic_filter)
+            client.subscribe("open3e/+/+", qos)
+            client.subscribe("open3e/+", qos)
+            client.subscribe("open3e/LWT", qos)
+            # ROB-01: Re-publish discovery when HA restarts
+            client.subscribe("homeassistant/status", qos)
+        else:
+            # Broad or learned open3e filters, all in one SUBSCRIBE
+            filters = [*self._subscriptions.filters(), "open3e/LWT", "homeassistant/status"]
+            client.subscribe([(topic_filter, 0) for topic_filter in seed_filters]
+                             + [(topic_filter, qos) for topic_filter in filters])
+        if seed is not None and seeding:
+            client.publish(seed.marker_topic, "end")
+        logger.debug("Subscribed to open3e topics and homeassistant/status")
+
     def _republish_all_discovery(self):
-        """ROB-01: Re-publish all cached discovery configs (e.g. after HA restart)."""
-        count = len(self.published_configs)
-        if count == 0:
+        """ROB-01: Re-publish all discovery configs (e.g. after HA restart).
+
+        Payloads are not stored: they are regenerated from the compiled plan (mostly
+        discovery cache hits) for every open3e topic that produced a published config.
+        """
+        if not self.published_digests:
             return
-        logger.info("Re-publishing %d cached discovery configs", count)
-        for topic, payload in self.published_configs.items():
-            self.client.publish(topic, payload, retain=True)
+        count = 0
+        # Device configs are shared by many topics: publish each once
+        done: set[str] = set()
+        for source, topics in list(self._discovery_sources.items()):
+            if all(topic in done or topic not in self.published_digests for topic in topics):
+                continue
+            for topic, payload in self.generator.regenerate_discovery(source, self.test_mode):
+                if topic in self.published_digests and topic not in done:
+                    if self._publish(topic, payload, priority=PRIORITY_DISCOVERY,
+                                     qos=self._discovery_qos, retain=True):
+                        self.published_digests[topic] = hash(payload)
+                        count += 1
+                    else:
+                        # Published again with the next state message of its source
+                        del self.published_digests[topic]
+                    done.add(topic)
+        # The bridge's own entities are built here, not by the generator
+        count += self._publish_cop_discovery() + self._publish_health_discovery()
+        # Seeded configs without a source seen since the start are not republished
+        logger.info("Re-published %d discovery configs", count)
 
     # ------------------------------------------------------------------
     # A01: Write verification
@@ -255,26 +810,26 @@ class Open3EBridge:
         After the write, a read command is published. When the state topic
         updates, _check_write_verification compares the value.
         """
-        # Publish the write command
-        write_cmd = json.dumps({"mode": "write", "data": [[did, value]]})
-        self.client.publish("open3e/cmnd", write_cmd)
-        logger.info("Write command sent: DID %d = %s", did, value)
+        # Publish the write command (batched with other commands of the same window)
+        self.commands.write(ecu_addr, did, value)
+        logger.info("Write command queued: DID %d = %s", did, value)
 
         # Track the pending write for verification
         self._pending_writes[(ecu_addr, did)] = str(value)
+        self._arm_write_check()
 
-        # Publish a read command to verify
-        read_cmd = json.dumps({"mode": "read", "data": [did]})
-        self.client.publish("open3e/cmnd", read_cmd)
-        logger.debug("Read-back command sent for DID %d", did)
+        # Publish a read command to verify; it is never sent ahead of the write
+        self.commands.read(ecu_addr, did)
+        logger.debug("Read-back command queued for DID %d", did)
 
     def _check_write_verification(self, ecu_addr: str, did: int, actual_value: str):
         """Check if a pending write matches the read-back value."""
-        key = (ecu_addr, did)
-        expected = self._pending_writes.pop(key, None)
-        if expected is None:
+        result = self._pending_writes.resolve((ecu_addr, did), actual_value)
+        if result is None:
             return
-        if str(actual_value).strip() != str(expected).strip():
+        matched, write = result
+        expected = write.expected
+        if not matched:
             self._failed_writes += 1
             msg = (f"Write verification FAILED for DID {did}: expected={expected}, actual={actual_value}. "
                    f"The controller may have rejected the value (out of range or wrong mode). "
@@ -285,12 +840,42 @@ class Open3EBridge:
         else:
             logger.info("Write verification OK for DID %d: %s", did, actual_value)
 
+    def _arm_write_check(self):
+        """Schedule _check_write_deadlines() for the earliest pending deadline."""
+        if self._write_schedule is None or self._write_check_armed:
+            return
+        deadline = self._pending_writes.next_deadline()
+        if deadline is None:
+            return
+        self._write_check_armed = True
+        self._write_schedule(max(0.0, deadline - time.monotonic()), self._on_write_check)
+
+    def _on_write_check(self):
+        self._write_check_armed = False
+        self._check_write_deadlines()
+
+    def _check_write_deadlines(self):
+        """Read again where a read-back is overdue; fail writes that ran out of retries."""
+        for (ecu_addr, did), write, retry in self._pending_writes.due():
+            if retry:
+                logger.info("No read-back for DID %d within %.0fs, reading again (%d/%d)",
+                            did, self._pending_writes.timeout_s, write.retries, self._pending_writes.retries)
+                self.commands.read(ecu_addr, did)
+                continue
+            self._failed_writes += 1
+            msg = (f"Write verification TIMED OUT for DID {did}: no read-back of {write.expected} "
+                   f"after {write.retries + 1} reads. Check that open3e is running and the DID is readable.")
+            self._last_error = msg
+            logger.warning(msg)
+            self._publish_health_state("ON", error=msg)
+        self._arm_write_check()
+
     # ------------------------------------------------------------------
     # A08: COP calculation
     # ------------------------------------------------------------------
 
-    def _publish_cop_discovery(self):
-        """Publish HA MQTT Discovery config for the COP sensor."""
+    def _publish_cop_discovery(self) -> bool:
+        """Publish HA MQTT Discovery config for the COP sensor (False if the queue dropped it)."""
         prefix = self.discovery_prefix or "homeassistant"
         if self.add_test_prefix and self.test_mode and not prefix.startswith("test/"):
             prefix = f"test/{prefix}"
@@ -312,14 +897,17 @@ class Open3EBridge:
             },
             "origin": {
                 "name": "Open3E Bridge",
-                "sw_version": __version__,
+                "sw_version": _package_version(),
                 "support_url": "https://github.com/open3e/open3e-bridge",
             },
         }
-        payload = json.dumps(config, ensure_ascii=False)
-        self.client.publish(discovery_topic, payload, retain=True)
-        self.published_configs[discovery_topic] = payload
+        payload = dumps_discovery(config, self.compact_discovery)
+        if not self._publish(discovery_topic, payload, priority=PRIORITY_DISCOVERY,
+                             qos=self._discovery_qos, retain=True):
+            return False
+        self.published_digests[discovery_topic] = hash(payload)
         logger.debug("Published COP discovery: %s", discovery_topic)
+        return True
 
     def _update_cop(self, did: int, value: str):
         """Update COP calculation when power DIDs arrive."""
@@ -340,7 +928,7 @@ class Open3EBridge:
                 and self._thermal_power is not None
                 and self._electrical_power > 0):
             cop = round(self._thermal_power / self._electrical_power, 2)
-            self.client.publish(self._cop_topic, str(cop), retain=True)
+            self._publish(self._cop_topic, str(cop), priority=PRIORITY_STATE, retain=True)
             logger.debug("COP updated: %.2f (thermal=%.0fW, electrical=%.0fW)",
                          cop, self._thermal_power, self._electrical_power)
 
@@ -348,7 +936,7 @@ class Open3EBridge:
     # Health entity (binary_sensor with diagnostic attributes)
     # ------------------------------------------------------------------
 
-    def _publish_health_discovery(self):
+    def _publish_health_discovery(self) -> bool:
         """Publish HA MQTT Discovery for bridge health binary_sensor (entity_category: diagnostic)."""
         prefix = self.discovery_prefix or "homeassistant"
         if self.add_test_prefix and self.test_mode and not prefix.startswith("test/"):
@@ -374,34 +962,35 @@ class Open3EBridge:
             },
             "origin": {
                 "name": "Open3E Bridge",
-                "sw_version": __version__,
+                "sw_version": _package_version(),
                 "support_url": "https://github.com/open3e/open3e-bridge",
             },
         }
-        payload = json.dumps(config, ensure_ascii=False)
-        self.client.publish(discovery_topic, payload, retain=True)
-        self.published_configs[discovery_topic] = payload
+        payload = dumps_discovery(config, self.compact_discovery)
+        if not self._publish(discovery_topic, payload, priority=PRIORITY_DISCOVERY,
+                             qos=self._discovery_qos, retain=True):
+            return False
+        self.published_digests[discovery_topic] = hash(payload)
         logger.debug("Published health entity discovery: %s", discovery_topic)
+        return True
 
     def _publish_health_state(self, state: str = "ON", error: str | None = None):
         """Publish health state and attributes to MQTT."""
         try:
-            self.client.publish(self._health_topic, state, retain=True)
+            self._publish(self._health_topic, state, priority=PRIORITY_HEALTH, retain=True)
             uptime = time.monotonic() - self._start_time
             attributes = {
-                "version": __version__,
+                "version": _package_version(),
                 "uptime_s": round(uptime, 1),
                 "messages_processed": self._messages_processed,
                 "discovery_published": self._discovery_published,
                 "failed_writes": self._failed_writes,
                 "last_error": error or self._last_error or "none",
-                "entities_cached": len(self.published_configs),
+                "entities_cached": len(self.published_digests),
+                "latency": self.metrics.summary(),
             }
-            self.client.publish(
-                self._health_attributes_topic,
-                json.dumps(attributes, ensure_ascii=False),
-                retain=True,
-            )
+            self._publish(self._health_attributes_topic, json.dumps(attributes, ensure_ascii=False),
+                          priority=PRIORITY_HEALTH, retain=True)
         except Exception as e:
             logger.debug("Failed to publish health state: %s", e)
 
@@ -448,7 +1037,8 @@ class Open3EBridge:
         """
         # ROB-01: HA birth message → republish all discovery
         if topic == "homeassistant/status" and payload == "online":
-            self._republish_all_discovery()
+            with self._discovery_lock:
+                self._republish_all_discovery()
             return
 
         # Skip LWT und andere Systemnachrichten
@@ -456,70 +1046,146 @@ class Open3EBridge:
             return
 
         logger.debug("Processing: %s = %s", topic, payload)
-        self._messages_processed += 1
+        lock = self._discovery_lock
+        with lock:
+            self._messages_processed += 1
+        start = time.perf_counter_ns()
 
         # A09: NRC detection — log but don't generate discovery
         if self._handle_nrc(topic, payload):
+            self.metrics.record_message(topic, time.perf_counter_ns() - start)
             return
 
         # A08: COP calculation for power DIDs
-        parsed = self.generator.parse_open3e_topic(topic)
+        with lock:
+            parsed = self.generator.parse_open3e_topic(topic)
+        parse_ns = time.perf_counter_ns() - start
         if parsed:
             did = parsed['did']
             ecu_addr = parsed['ecu_addr']
             self._update_cop(did, payload)
+            subscriptions = self._subscriptions
+            if subscriptions is not None:
+                subscriptions.observe(topic, did)
+                if subscriptions.due():
+                    self._narrow_subscriptions()
+            if self._profile_pending and did in self.generator.plan.identification_dids:
+                self._detect_profile(did, payload)
             # A01: Write verification check
             self._check_write_verification(ecu_addr, did, payload)
 
-        # Generiere Discovery Messages
-        discovery_messages = self.generator.generate_discovery_message(
-            topic, payload, self.test_mode
-        )
-
-        # Publiziere Discovery Messages
-        for discovery_topic, discovery_payload in discovery_messages:
-            previous = self.published_configs.get(discovery_topic)
-            if previous == discovery_payload:
-                continue
-            logger.info("Publishing discovery: %s", discovery_topic)
-            if self.test_mode:
-                logger.debug("Payload: %s", discovery_payload)
-            self.client.publish(discovery_topic, discovery_payload, retain=True)
-            self.published_configs[discovery_topic] = discovery_payload
-            self._discovery_published += 1
-            # Track entity type from discovery topic path
-            parts = discovery_topic.split("/")
-            if len(parts) >= 3:
-                self._entity_types[parts[-3]] += 1
+        with lock:
+            # Generiere Discovery Messages
+            generator = self.generator
+            misses = generator.discovery_cache_misses
+            t0 = time.perf_counter_ns()
+            discovery_messages = generator.generate_discovery_message(
+                topic, payload, self.test_mode
+            )
+            t1 = time.perf_counter_ns()
+
+            generated = generator.discovery_cache_misses != misses
+            if generated and parsed:
+                self._discovery_sources[topic] = tuple(t for t, _ in discovery_messages)
+
+            # Publiziere Discovery Messages
+            published = 0
+            published_digests = self.published_digests
+            for discovery_topic, discovery_payload in discovery_messages:
+                digest = hash(discovery_payload)
+                if published_digests.get(discovery_topic) == digest:
+                    continue
+                logger.info("Publishing discovery: %s", discovery_topic)
+                if self.test_mode:
+                    logger.debug("Payload: %s", discovery_payload)
+                if not self._publish(discovery_topic, discovery_payload, priority=PRIORITY_DISCOVERY,
+                                     qos=self._discovery_qos, retain=True):
+                    continue
+                published_digests[discovery_topic] = digest
+                self._discovery_published += 1
+                published += 1
+                # Track entity type from discovery topic path
+                parts = discovery_topic.split("/")
+                if len(parts) >= 3:
+                    self._entity_types[parts[-3]] += 1
+
+        end = time.perf_counter_ns()
+        self.metrics.record_message(topic, end - start, parse_ns, t1 - t0, end - t1 if published else 0,
+                                    generated)
 
     def _on_message(self, client, userdata, msg):
-        """MQTT Message Callback — delegates to process_message()."""
+        """MQTT Message Callback — decodes and hands off to the ingest queue."""
+        seed = self._discovery_seed
+        if seed is not None:
+            if seed.active and seed.offer(msg.topic, msg.payload, getattr(msg, 'retain', False)):
+                return
+            if seed.active:
+                self._finish_seeding(seed)
+            if msg.topic == seed.marker_topic:
+                return
+        self._ingest(msg.topic, msg.payload)
+
+    def _ingest(self, topic: str, raw: bytes):
         try:
-            topic = msg.topic
-            payload = msg.payload.decode('utf-8')
-            self.process_message(topic, payload)
+            payload = raw.decode('utf-8')
         except UnicodeDecodeError:
-            logger.warning("Non-UTF-8 payload on topic %s, skipping", msg.topic)
+            logger.warning("Non-UTF-8 payload on topic %s, skipping", topic)
+            return
+        self.ingest.submit(topic, payload)
+
+    def _finish_seeding(self, seed: DiscoverySeed):
+        """The retained burst is over: stop receiving discovery configs, process what was held back."""
+        held = seed.finish()
+        if held is None:
+            return
+        self.client.unsubscribe([seed.topic_filter, seed.marker_topic])
+        logger.info("Seeded %d retained discovery configs from the broker; unchanged ones are not republished",
+                    seed.seeded)
+        for topic, raw in held:
+            self._ingest(topic, raw)
+
+    def _handle_message(self, topic: str, payload: str):
+        """Ingest worker entry point — process_message() with error isolation."""
+        try:
+            self.process_message(topic, payload)
         except json.JSONDecodeError as e:
-            logger.warning("Invalid JSON on topic %s: %s", msg.topic, e)
+            logger.warning("Invalid JSON on topic %s: %s", topic, e)
         except (ValueError, KeyError) as e:
-            logger.warning("Bad data on topic %s: %s", msg.topic, e)
+            logger.warning("Bad data on topic %s: %s", topic, e)
         except Exception as e:
-            logger.error("Unexpected error processing %s: %s", msg.topic, e, exc_info=True)
+            logger.error("Unexpected error processing %s: %s", topic, e, exc_info=True)
 
     def get_diagnostics(self) -> dict[str, object]:
         """Return bridge diagnostics as a dict (for monitoring / health checks)."""
         uptime = time.monotonic() - self._start_time
         return {
-            "version": __version__,
+            "version": _package_version(),
             "uptime_s": round(uptime, 1),
             "messages_processed": self._messages_processed,
             "discovery_published": self._discovery_published,
-            "entities_cached": len(self.published_configs),
+            "entities_cached": len(self.published_digests),
+            "discovery_seeded": self._discovery_seed.seeded if self._discovery_seed is not None else 0,
             "entity_types": dict(self._entity_types),
             "auto_discovered_entities": self.generator.auto_discovered_count,
             "failed_writes": self._failed_writes,
+            "config_reloads": self._config_reloads,
+            "subscriptions": (self._subscriptions.stats() if self._subscriptions is not None
+                              else {"mode": "broad", "filters": len(BROAD_FILTERS)}),
+            "session": {
+                "persistent": self.persistent_session,
+                "connects": self._connects,
+                "resumed": self._sessions_resumed,
+                "last_recovery_s": round(self._last_recovery_s, 3) if self._last_recovery_s is not None else None,
+            },
+            "delivery": {**self.delivery.stats(), "max_inflight": self.max_inflight or 20},
+            "mqtt5": self.aliases.stats() if self.aliases is not None else None,
+            "offline_buffer": self.offline.stats() if self.offline is not None else None,
+            "commands": self.commands.stats(),
+            "writes": self._pending_writes.stats(),
             "last_error": self._last_error or "none",
+            "publisher": self.publisher.stats(),
+            "ingest": self.ingest.stats(),
+            "latency": self.metrics.snapshot(),
         }
 
     def log_entity_summary(self):
@@ -531,36 +1197,61 @@ class Open3EBridge:
 
     def dump_entities(self):
         """Print all configured entities to stdout (no MQTT connection needed)."""
-        datapoints = self.generator.datapoints.get("datapoints", {}) or {}
-        type_counter: Counter = Counter()
-        print(f"{'DID':<6} {'Type':<25} {'Name':<40} {'Device':<12} {'Subs'}")
-        print("-" * 100)
-        for did_str, dp in sorted(datapoints.items(), key=lambda x: int(x[0])):
-            dp_type = dp.get("type", "?")
-            name = self.generator.translate_name(dp.get("name", "?"))
-            device = dp.get("device", "-")
-            subs = dp.get("subs", {})
-            sub_keys = ", ".join(subs.keys()) if subs else "(all)"
-            # Determine HA entity type from type template
-            template = self.generator.type_templates.get(dp_type, {})
-            ha_type = template.get("component", dp_type)
-            type_counter[ha_type] += 1
-            print(f"{did_str:<6} {dp_type:<25} {name:<40} {device:<12} {sub_keys}")
-        print("-" * 100)
-        total = sum(type_counter.values())
-        summary = ", ".join(f"{c} {t}" for t, c in sorted(type_counter.items()))
-        print(f"Total: {total} entities ({summary})")
+        print_entities(self.generator)
 
     def _on_disconnect(self, client, userdata, disconnect_flags, reason_code, properties):
         """MQTT Disconnect Callback (paho v2)"""
+        if self.aliases is not None:
+            self.aliases.reset()
+        if self.offline is not None:
+            self.offline.go_offline()
         if reason_code == 0:
             logger.info("Disconnected from MQTT broker")
         else:
-            logger.warning("Unexpected disconnect from MQTT broker: %s", reason_code)
+            hint = disconnect_hint(reason_code)
+            logger.warning("Unexpected disconnect from MQTT broker: %s%s", reason_code, f" ({hint})" if hint else "")
+            self._disconnected_at = time.monotonic()
+            if self.aliases is not None and reason_code == TOPIC_ALIAS_INVALID:
+                self.aliases.disable()
+
+
+def print_entities(generator: Any) -> None:
+    """Print all entities configured in the generator's datapoints to stdout."""
+    datapoints = generator.datapoints.get("datapoints", {}) or {}
+    type_counter: Counter = Counter()
+    print(f"{'DID':<6} {'Type':<25} {'Name':<40} {'Device':<12} {'Subs'}")
+    print("-" * 100)
+    for did_str, dp in sorted(datapoints.items(), key=lambda x: int(x[0])):
+        dp_type = dp.get("type", "?")
+        name = generator.translate_name(dp.get("name", "?"))
+        device = dp.get("device", "-")
+        subs = dp.get("subs", {})
+        sub_keys = ", ".join(subs.keys()) if subs else "(all)"
+        # Determine HA entity type from type template
+        template = generator.type_templates.get(dp_type, {})
+        ha_type = template.get("component", dp_type)
+        type_counter[ha_type] += 1
+        print(f"{did_str:<6} {dp_type:<25} {name:<40} {device:<12} {sub_keys}")
+    print("-" * 100)
+    total = sum(type_counter.values())
+    summary = ", ".join(f"{c} {t}" for t, c in sorted(type_counter.items()))
+    print(f"Total: {total} entities ({summary})")
+
+
+class _VersionAction(argparse.Action):
+    """--version that only looks up the package version when it is actually asked for."""
+
+    def __init__(self, option_strings, dest=argparse.SUPPRESS, default=argparse.SUPPRESS, help=None):
+        super().__init__(option_strings, dest=dest, default=default, nargs=0, help=help)
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        print(f"open3e-bridge {_package_version()}")
+        parser.exit()
+
 
 def main():
     parser = argparse.ArgumentParser(description="Open3E Home Assistant Bridge")
-    parser.add_argument("--version", action="version", version=f"open3e-bridge {__version__}")
+    parser.add_argument("--version", action=_VersionAction, help="show program's version number and exit")
     parser.add_argument("--mqtt-host", default="localhost", help="MQTT broker host")
     parser.add_argument("--mqtt-port", type=int, default=1883, help="MQTT broker port")
     parser.add_argument("--mqtt-user", help="MQTT username")
@@ -572,18 +1263,84 @@ def main():
     parser.add_argument("--no-test-prefix", action="store_true", help="Do not prepend 'test/' to discovery prefix even in simulation/test mode")
     parser.add_argument("--simulate", help="Simulate with MQTT messages from file")
     parser.add_argument("--cleanup", action="store_true", help="Cleanup retained discovery for open3e entities")
+    parser.add_argument("--cleanup-orphans", action="store_true",
+                        help="Remove only retained open3e discovery the current config no longer produces, then exit")
     parser.add_argument("--validate-config", action="store_true", help="Validate datapoints/templates and exit")
     parser.add_argument("--dump-entities", action="store_true", help="Show configured entities and exit (no MQTT needed)")
+    parser.add_argument("--compile-config", action="store_true",
+                        help="Validate the config, write the compiled config cache for all languages "
+                             "(and with --profile auto all profiles) and exit")
+    parser.add_argument("--config-cache", default=None,
+                        help="Directory for the compiled config cache (default: $OPEN3E_CONFIG_CACHE or ~/.cache/open3e-bridge)")
+    parser.add_argument("--no-config-cache", action="store_true", help="Always load the YAML config files")
+    parser.add_argument("--config-reload-interval", type=float, default=10.0,
+                        help="Seconds between checks for changed config files, applied without restart "
+                             "(0=disabled; SIGHUP reloads immediately; default: 10)")
+    parser.add_argument("--compact-discovery", action="store_true",
+                        help="Publish discovery configs with abbreviated keys and ~ base topics (smaller retained payloads)")
+    parser.add_argument("--discovery-mode", default="entity", choices=["entity", "device"],
+                        help="entity: one retained discovery config per entity (default); "
+                             "device: one per device carrying all its components")
+    parser.add_argument("--subscription-settle", type=float, default=300.0,
+                        help="With --no-auto-discover: seconds without a new configured DID topic before the "
+                             "open3e subscriptions are narrowed to the seen topics (0=keep open3e/+/+; default: 300)")
+    parser.add_argument("--no-seed-discovery", action="store_true",
+                        help="Republish every discovery config on startup instead of skipping the ones "
+                             "already retained unchanged on the broker")
+    parser.add_argument("--client-id", help="MQTT client id (default: random; open3e-bridge-<hostname> "
+                                            "with --persistent-session)")
+    parser.add_argument("--persistent-session", action="store_true",
+                        help="Keep the MQTT session across reconnects (clean_session=false, QoS 1 subscriptions): "
+                             "no re-subscribe or discovery republish when the broker resumed it")
+    parser.add_argument("--mqtt5", action="store_true",
+                        help="Use MQTT v5: topic aliases for repeated topics, expiring diagnostics, "
+                             "session expiry with --persistent-session")
+    parser.add_argument("--discovery-qos", type=int, default=0, choices=[0, 1],
+                        help="QoS of discovery configs (1: acknowledged by the broker and tracked in diagnostics)")
+    parser.add_argument("--max-inflight", type=int, default=None,
+                        help="Max unacknowledged QoS 1 messages in flight (paho default: 20)")
+    parser.add_argument("--offline-buffer", metavar="PATH", default=None,
+                        help="Buffer commands and derived values (COP, health) in this file while the broker "
+                             "is unreachable and replay them on reconnect")
+    parser.add_argument("--offline-buffer-size", type=int, default=1000,
+                        help="Max messages in the offline buffer after coalescing (default: 1000)")
+    parser.add_argument("--command-window", type=float, default=50.0, metavar="MS",
+                        help="Collect open3e read/write commands for MS milliseconds and send them batched "
+                             "per ECU (0 = send each command right away, default: 50)")
+    parser.add_argument("--command-batch", type=int, default=10,
+                        help="Max DIDs per batched open3e command (default: 10)")
+    parser.add_argument("--write-timeout", type=float, default=30.0, metavar="S",
+                        help="Seconds to wait for the read-back of a write before reading again (default: 30)")
+    parser.add_argument("--write-retries", type=int, default=2,
+                        help="Extra read-backs before a write counts as timed out (default: 2)")
+    parser.add_argument("--write-tolerance", type=float, default=0.01,
+                        help="Max difference for a numeric read-back to match the written value (default: 0.01)")
     parser.add_argument("--no-auto-discover", action="store_true",
                         help="Disable heuristic auto-discovery for DIDs not in datapoints.yaml (auto-discover is ON by default)")
     parser.add_argument("--profile", default="auto", choices=["auto", "vitocal", "vitodens", "common"],
-                        help="Device profile (default: auto). Determines which DIDs are configured.")
+                        help="Device profile (default: auto: start with the profile detected on an earlier "
+                             "run, else vitocal, and switch to the profile the device model name points to). "
+                             "Determines which DIDs are configured.")
     parser.add_argument("--generator", default="homeassistant",
                         help="Generator type (default: homeassistant). Use 'open3e-bridge --list-generators' to see available types")
     parser.add_argument("--list-generators", action="store_true",
                         help="List available generator types and exit")
+    parser.add_argument("--publish-rate", type=float, default=0.0,
+                        help="Max outbound MQTT messages per second (0=unlimited). Commands always go first")
+    parser.add_argument("--publish-queue-size", type=int, default=10000,
+                        help="Max queued outbound messages before low-priority ones are dropped (default: 10000)")
+    parser.add_argument("--ingest-workers", type=int, default=1,
+                        help="Message processing threads, partitioned by ECU (default: 1)")
+    parser.add_argument("--ingest-queue-size", type=int, default=1000,
+                        help="Max queued inbound topics per worker (default: 1000)")
+    parser.add_argument("--ingest-overflow", choices=["drop-oldest", "drop-new"], default="drop-oldest",
+                        help="What to drop when the inbound queue is full (default: drop-oldest)")
+    parser.add_argument("--runtime", default="thread", choices=["thread", "asyncio"],
+                        help="Concurrency model: worker threads (default) or a single asyncio event loop")
     parser.add_argument("--diagnostics-interval", type=int, default=0,
                         help="Publish diagnostics every N seconds to open3e/bridge/diagnostics (0=disabled)")
+    parser.add_argument("--slow-message-ms", type=float, default=50.0,
+                        help="Keep a latency sample of messages slower than this (default: 50)")
     parser.add_argument("--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"],
                         help="Logging level (default: INFO)")
 
@@ -601,6 +1358,35 @@ def main():
             print(f"  {name:<20} {desc}")
         raise SystemExit(0)
 
+    from generators.config_cache import default_cache_dir
+
+    config_cache_dir = None if args.no_config_cache else str(args.config_cache or default_cache_dir())
+
+    # Compile-config mode (e.g. during the Docker build)
+    if args.compile_config:
+        raise SystemExit(compile_config(args.config_dir, args.profile, args.config_cache or str(default_cache_dir()),
+                                        args.generator))
+
+    # Validate-only mode (no MQTT client)
+    if args.validate_config:
+        generator = create_generator(args.config_dir, args.language, args.generator, config_cache_dir,
+                                     auto_discover=not args.no_auto_discover, profile=args.profile)
+        result = generator.validate()
+        if result["errors"]:
+            logger.error("Config validation FAILED:")
+            for e in result["errors"]:
+                logger.error("  %s", e)
+            raise SystemExit(1)
+        else:
+            logger.info("Config validation OK.")
+            raise SystemExit(0)
+
+    # Dump entities mode (no MQTT needed)
+    if args.dump_entities:
+        print_entities(create_generator(args.config_dir, args.language, args.generator, config_cache_dir,
+                                        auto_discover=not args.no_auto_discover, profile=args.profile))
+        raise SystemExit(0)
+
     # MQTT password: CLI arg takes precedence, then env var
     mqtt_password = args.mqtt_password or os.environ.get("MQTT_PASSWORD")
 
@@ -629,29 +1415,50 @@ def main():
         auto_discover=not args.no_auto_discover,
         generator_type=args.generator,
         profile=args.profile,
+        publish_rate=args.publish_rate,
+        publish_queue_size=args.publish_queue_size,
+        ingest_workers=args.ingest_workers,
+        ingest_queue_size=args.ingest_queue_size,
+        ingest_overflow=args.ingest_overflow,
+        slow_message_ms=args.slow_message_ms,
+        config_cache_dir=config_cache_dir,
+        config_reload_interval=args.config_reload_interval,
+        detect_profile=args.profile == "auto",
+        compact_discovery=args.compact_discovery,
+        discovery_mode=args.discovery_mode,
+        subscription_settle=args.subscription_settle,
+        seed_discovery=not args.no_seed_discovery,
+        # The cleanup modes must not take over (or clean) the running bridge's session
+        client_id=None if args.cleanup or args.cleanup_orphans else args.client_id,
+        persistent_session=args.persistent_session and not (args.cleanup or args.cleanup_orphans),
+        mqtt5=args.mqtt5,
+        discovery_qos=args.discovery_qos,
+        max_inflight=args.max_inflight,
+        offline_buffer=None if args.cleanup or args.cleanup_orphans or args.simulate else args.offline_buffer,
+        offline_buffer_size=args.offline_buffer_size,
+        command_window=args.command_window / 1000,
+        command_batch=args.command_batch,
+        write_timeout=args.write_timeout,
+        write_retries=args.write_retries,
+        write_tolerance=args.write_tolerance,
     )
 
-    # Validate-only mode
-    if args.validate_config:
-        result = bridge.generator.validate()
-        if result["errors"]:
-            logger.error("Config validation FAILED:")
-            for e in result["errors"]:
-                logger.error("  %s", e)
-            raise SystemExit(1)
-        else:
-            logger.info("Config validation OK.")
-            raise SystemExit(0)
-
-    # Dump entities mode (no MQTT needed)
-    if args.dump_entities:
-        bridge.dump_entities()
-        raise SystemExit(0)
-
     # Cleanup-only mode
     if args.cleanup:
         bridge.cleanup()
         raise SystemExit(0)
+    if args.cleanup_orphans:
+        report = bridge.cleanup_orphans()
+        raise SystemExit(1 if "error" in report or report["failed"] else 0)
+
+    if args.runtime == "asyncio":
+        from runtime.aio import AsyncioRuntime
+        runtime = AsyncioRuntime(bridge)
+        if args.simulate:
+            runtime.simulate(args.simulate)
+        else:
+            runtime.run()
+        return
 
     # Simulation Mode
     if args.simulate:
@@ -659,6 +1466,41 @@ def main():
     else:
         bridge.start()
 
+def compile_config(config_dir: str | None, profile: str, cache_dir: str,
+                   generator_type: str = "homeassistant") -> int:
+    """Validate the config and write the compiled cache for every language. Returns the exit code.
+
+    With profile "auto" every profile is compiled: the bridge may start with a
+    stored detected profile or switch to one at runtime.
+    """
+    resolved_config_dir = Path(config_dir) if config_dir else Path(__file__).parent / "config"
+    languages = ["en"] + sorted(p.stem for p in (resolved_config_dir / "translations").glob("*.yaml"))
+    profiles = [profile]
+    if profile == "auto":
+        profiles += sorted(p.stem for p in (resolved_config_dir / "profiles").glob("*.yaml"))
+    from generators.config_cache import ConfigCache
+
+    generator_cls = get_generator_class(generator_type)
+    cache = ConfigCache(cache_dir)
+    for name in profiles:
+        for language in languages:
+            # Without a cache, so the YAML sources are always parsed afresh
+            generator = generator_cls(str(resolved_config_dir), language, profile=name)
+            result = generator.validate()
+            if result["errors"]:
+                logger.error("Config validation FAILED (%s, profile %s):", language, name)
+                for e in result["errors"]:
+                    logger.error("  %s", e)
+                return 1
+            generator.config_cache = cache
+            path = generator.save_config_cache()
+            if path is None:
+                logger.error("Could not write compiled config for language %s to %s", language, cache_dir)
+                return 1
+            logger.info("Compiled config (%s, profile %s): %s", language, name, path)
+    return 0
+
+
 def simulate_from_file(bridge: Open3EBridge, filepath: str):
     """Simuliert MQTT Messages aus Datei"""
     logger.info("Simulating MQTT messages from %s", filepath)
@@ -666,8 +1508,9 @@ def simulate_from_file(bridge: Open3EBridge, filepath: str):
     try:
         # Ensure MQTT connection for publishing discovery during simulation
         logger.info("Connecting to MQTT broker %s:%d for simulation...", bridge.mqtt_host, bridge.mqtt_port)
-        bridge.client.connect(bridge.mqtt_host, bridge.mqtt_port, 60)
+        bridge._connect()
         bridge.client.loop_start()
+        bridge.publisher.start()
         with open(filepath) as f:
             for line in f:
                 line = line.strip()
@@ -681,6 +1524,7 @@ def simulate_from_file(bridge: Open3EBridge, filepath: str):
                     bridge.process_message(topic, payload)
                     time.sleep(0.1)  # Kurze Pause zwischen Messages
         # Let any pending publishes flush
+        bridge.publisher.stop()
         time.sleep(0.5)
         bridge.client.loop_stop()
         bridge.client.disconnect()
@@ -0,0 +1,136 @@
+"""Compact Home Assistant discovery payloads.
+
+Home Assistant accepts abbreviated keys in MQTT discovery configs
+(https://www.home-assistant.io/integrations/mqtt/#discovery-payload) and a
+base topic under "~": a topic value that starts with "~" has it replaced by
+the base. Retained configs shrink by about a quarter that way, which matters
+for brokers on small devices and for HA parsing hundreds of configs at startup.
+"""
+from __future__ import annotations
+
+import json
+from typing import Any
+
+# Top-level entity keys used by the generators (keys without an abbreviation stay as they are)
+ABBREVIATIONS: dict[str, str] = {
+    "availability_topic": "avty_t",
+    "command_template": "cmd_tpl",
+    "command_topic": "cmd_t",
+    "components": "cmps",
+    "current_temperature_template": "curr_temp_tpl",
+    "current_temperature_topic": "curr_temp_t",
+    "device": "dev",
+    "device_class": "dev_cla",
+    "enabled_by_default": "en",
+    "entity_category": "ent_cat",
+    "expire_after": "exp_aft",
+    "force_update": "frc_upd",
+    "icon": "ic",
+    "json_attributes_template": "json_attr_tpl",
+    "json_attributes_topic": "json_attr_t",
+    "mode_command_template": "mode_cmd_tpl",
+    "mode_command_topic": "mode_cmd_t",
+    "mode_state_template": "mode_stat_tpl",
+    "mode_state_topic": "mode_stat_t",
+    "object_id": "obj_id",
+    "options": "ops",
+    "origin": "o",
+    "payload_available": "pl_avail",
+    "payload_not_available": "pl_not_avail",
+    "payload_off": "pl_off",
+    "payload_on": "pl_on",
+    "payload_press": "pl_prs",
+    "platform": "p",
+    "state_class": "stat_cla",
+    "state_off": "stat_off",
+    "state_on": "stat_on",
+    "state_topic": "stat_t",
+    "suggested_display_precision": "sug_dsp_prc",
+    "temperature_command_template": "temp_cmd_tpl",
+    "temperature_command_topic": "temp_cmd_t",
+    "temperature_state_template": "temp_stat_tpl",
+    "temperature_state_topic": "temp_stat_t",
+    "temperature_unit": "temp_unit",
+    "unique_id": "uniq_id",
+    "unit_of_measurement": "unit_of_meas",
+    "value_template": "val_tpl",
+}
+
+DEVICE_ABBREVIATIONS: dict[str, str] = {
+    "configuration_url": "cu",
+    "connections": "cns",
+    "hw_version": "hw",
+    "identifiers": "ids",
+    "manufacturer": "mf",
+    "model": "mdl",
+    "model_id": "mdl_id",
+    "serial_number": "sn",
+    "suggested_area": "sa",
+    "sw_version": "sw",
+}
+
+ORIGIN_ABBREVIATIONS: dict[str, str] = {
+    "sw_version": "sw",
+    "support_url": "url",
+}
+
+# Values equal to Home Assistant's defaults, left out of compact payloads
+DEFAULTS: dict[str, Any] = {
+    "payload_available": "online",
+    "payload_not_available": "offline",
+}
+
+_NESTED = {"device": DEVICE_ABBREVIATIONS, "origin": ORIGIN_ABBREVIATIONS}
+
+# Bytes the "~" entry itself costs besides the base: "~":"",
+_BASE_OVERHEAD = len('"~":"",')
+
+
+def _base_topic(topics: list[str]) -> str:
+    """Longest common level prefix of the topics, if replacing it by "~" saves bytes."""
+    if len(topics) < 2:
+        return ""
+    common = topics[0].split("/")
+    for topic in topics[1:]:
+        levels = topic.split("/")
+        n = 0
+        while n < min(len(common), len(levels)) and common[n] == levels[n]:
+            n += 1
+        del common[n:]
+        if not common:
+            return ""
+    base = "/".join(common)
+    # Each topic shrinks by len(base) - 1, the "~" entry costs the base once plus its overhead
+    if len(topics) * (len(base) - 1) <= len(base) + _BASE_OVERHEAD:
+        return ""
+    return base
+
+
+def compact_config(config: dict[str, Any]) -> dict[str, Any]:
+    """Abbreviated copy of a discovery config, with a "~" base topic where it pays off.
+
+    Keys whose value is Home Assistant's default are dropped.
+    """
+    base = _base_topic([value for key, value in config.items()
+                        if key.endswith("_topic") and isinstance(value, str)])
+    compact: dict[str, Any] = {"~": base} if base else {}
+    for key, value in config.items():
+        if key in DEFAULTS and DEFAULTS[key] == value:
+            continue
+        if base and key.endswith("_topic") and isinstance(value, str):
+            value = "~" + value[len(base):]
+        nested = _NESTED.get(key)
+        if nested is not None and isinstance(value, dict):
+            value = {nested.get(k, k): v for k, v in value.items()}
+        elif key == "components" and isinstance(value, dict):
+            # Device discovery: every component is an entity config of its own
+            value = {object_id: compact_config(component) for object_id, component in value.items()}
+        compact[ABBREVIATIONS.get(key, key)] = value
+    return compact
+
+
+def dumps_discovery(config: dict[str, Any], compact: bool = False) -> str:
+    """JSON payload of a discovery config; compact abbreviates keys and drops whitespace."""
+    if compact:
+        return json.dumps(compact_config(config), ensure_ascii=False, separators=(",", ":"))
+    return json.dumps(config, ensure_ascii=False)
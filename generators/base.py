@@ -1,12 +1,15 @@
 """
 Base generator for MQTT Discovery Messages
 """
+import copy
 import logging
 import re
 from pathlib import Path
+from types import MappingProxyType
 from typing import Any
 
-import yaml
+from .config_cache import ConfigCache, load_yaml_file
+from .plan import CompositePlan, ConfigReload, DatapointPlan, EntityPlan, GeneratorPlan, changed_dids
 
 logger = logging.getLogger("open3e_bridge.generators")
 
@@ -16,39 +19,219 @@ _EN_SUFFIXES = {
     "avg": "Average", "unknown": "Unknown", "error": "Error",
 }
 
+# Independently reloadable parts of the merged config
+LAYER_DATAPOINTS = "datapoints"      # profiles / datapoints.yaml + local/datapoints.yaml
+LAYER_TYPES = "types"                # templates/types.yaml + local/types.yaml
+LAYER_TRANSLATIONS = "translations"  # translations/<language>.yaml
+LAYER_NAMES = "names"                # user/names.yaml
+
+# Max open3e topics with cached discovery output; the oldest entry is dropped beyond it
+DISCOVERY_CACHE_SIZE = 2048
+
+
+def _bounded_store(cache: dict[Any, Any], key: Any, value: Any, size: int):
+    """cache[key] = value, dropping the oldest entry when the cache holds `size` entries."""
+    if key not in cache and len(cache) >= size:
+        cache.pop(next(iter(cache), key), None)
+    cache[key] = value
+
 
 class BaseGenerator:
-    def __init__(self, config_dir: str = "config", language: str = "en", profile: str = "auto"):
+    def __init__(self, config_dir: str = "config", language: str = "en", profile: str = "auto",
+                 config_cache: ConfigCache | None = None):
         self.config_dir = Path(config_dir)
         self.language = language
         self.profile = profile
+        self.config_cache = config_cache
         self.datapoints: dict[str, Any] = {}
         self._active_profile = "common"
+        self.type_templates: dict[str, Any] = {}
+        self.translations: dict[str, Any] = {}
+        self.user_names: dict[Any, Any] = {}
+
+        # Merged config: from the compiled cache if still valid, else from the YAML sources
+        if not self._load_cached_config():
+            self._load_sources()
+            self.save_config_cache()
+        # (size, mtime_ns) per source, for detecting config changes at runtime
+        self._source_stats = self._stat_sources()
+
+        # Device info cache
+        self.device_cache = {}
+
+        # Generated discovery output per (open3e topic, test_mode). Steady-state
+        # messages repeat the same topics every polling cycle, so a hit skips
+        # parsing, config merging and JSON serialization entirely. Bounded, since
+        # auto-discovery admits any topic open3e publishes.
+        self._discovery_cache: dict[tuple[str, bool], list[tuple[str, str]]] = {}
+        self.discovery_cache_size = DISCOVERY_CACHE_SIZE
+        self._parsed_topics: dict[str, dict[str, Any]] = {}
+
+        # Compiled entity plan (built by compile_plan(), lazily on first use)
+        self._plan: GeneratorPlan | None = None
+
+    # ------------------------------------------------------------------
+    # Entity plan
+    # ------------------------------------------------------------------
+
+    @property
+    def plan(self) -> GeneratorPlan:
+        """Active compiled entity plan (compiled on first access)."""
+        plan = self._plan
+        if plan is None:
+            plan = self.compile_plan()
+        return plan
+
+    def compile_plan(self) -> GeneratorPlan:
+        """Compile the merged config into an immutable entity plan and activate it.
+
+        Resolves type templates, sub-item overrides, translations, user names and
+        device blocks once, so discovery generation does no merging or lookups.
+        """
+        write_blacklisted = self._did_set(self.datapoints.get("write_blacklisted_dids"))
+        datapoints: dict[int, DatapointPlan] = {}
+        for did, dp_config in (self.datapoints.get("datapoints") or {}).items():
+            # Non-integer keys are reported by validate() and never match a topic
+            if not isinstance(did, int) or not isinstance(dp_config, dict) or not dp_config:
+                continue
+            datapoints[did] = self._compile_datapoint(did, dp_config, write_blacklisted)
+
+        plan = GeneratorPlan(
+            datapoints=MappingProxyType(datapoints),
+            ignored_dids=self._did_set(self.datapoints.get("ignored_dids")),
+            write_blacklisted_dids=write_blacklisted,
+            identification_dids=self._did_set(self.datapoints.get("device_identification_dids")),
+        )
+        self._plan = plan
+        self.invalidate_discovery_cache()
+        return plan
+
+    @staticmethod
+    def _did_set(value: Any) -> frozenset[int]:
+        """Integer DIDs of a config list/mapping as frozenset (invalid entries are skipped)."""
+        if not isinstance(value, (list, tuple, dict)):
+            return frozenset()
+        return frozenset(did for did in value if isinstance(did, int))
+
+    def _compile_datapoint(self, did: int, dp_config: dict[str, Any],
+                           write_blacklisted: frozenset[int]) -> DatapointPlan:
+        """Compile one datapoint into its entity records."""
+        type_name = dp_config.get('type')
+        type_template = self.get_type_template(type_name) if type_name else {}
+
+        # Entity name from English canonical + translation + user override
+        base_name = self.translate_name(dp_config.get('name', f'DID {did}'))
+        base_name = self.resolve_name(did, None, base_name)
+
+        subs_config = dp_config.get('subs') or {}
+        entity = None
+        subs: dict[str, EntityPlan] = {}
+        if type_template:
+            entity = self._compile_entity(
+                did, None, base_name, type_template, dp_config,
+                type_template.get('entity_type', 'sensor'), write_blacklisted,
+            )
+            for sub_item, sub_config in (subs_config.items() if isinstance(subs_config, dict) else ()):
+                if not isinstance(sub_item, str) or not isinstance(sub_config, dict):
+                    continue
+                if not sub_config.get('enabled', True):  # Default: enabled
+                    continue
+                # Sub-specific config: suffix for display name
+                suffix_key = sub_config.get('suffix', sub_item)
+                translated_suffix = self.translate_suffix(suffix_key)
+                sub_name = f"{base_name} {translated_suffix}" if translated_suffix else base_name
+                sub_name = self.resolve_name(did, sub_item, sub_name)
+                entity_type = sub_config.get('entity_type') or type_template.get('entity_type', 'sensor')
+                subs[sub_item] = self._compile_entity(
+                    did, sub_item, sub_name, self.merge_config(type_template, sub_config),
+                    dp_config, entity_type, write_blacklisted,
+                )
+
+        device_key = dp_config.get('device')
+        if not isinstance(device_key, str):
+            device_key = None
+
+        return DatapointPlan(
+            did=did,
+            device_key=device_key,
+            device=self._compile_device(device_key) if device_key else None,
+            trigger_sub=dp_config.get('trigger_sub'),
+            has_subs=bool(subs_config),
+            entity=entity,
+            subs=MappingProxyType(subs),
+            climate=self._compile_composite(did, 'climate', dp_config.get('climate'), 'Climate'),
+            water_heater=self._compile_composite(did, 'water_heater', dp_config.get('water_heater'), 'Hot Water'),
+        )
+
+    def _compile_entity(self, did: int, sub_item: str | None, name: str, template: dict[str, Any],
+                        dp_config: dict[str, Any], entity_type: str,
+                        write_blacklisted: frozenset[int]) -> EntityPlan:
+        """Build one entity record; generator-specific keys come from _compile_entity_attributes."""
+        writable = bool(dp_config.get('writable') or template.get('writable')) and did not in write_blacklisted
+        attributes, command = self._compile_entity_attributes(did, template, dp_config, entity_type, writable)
+        return EntityPlan(
+            did=did,
+            sub_item=sub_item,
+            entity_type=entity_type,
+            name=name,
+            template=MappingProxyType(dict(template)),
+            attributes=MappingProxyType(attributes),
+            command=MappingProxyType(command),
+        )
+
+    def _compile_entity_attributes(self, did: int, template: dict[str, Any], dp_config: dict[str, Any],
+                                   entity_type: str, writable: bool) -> tuple[dict[str, Any], dict[str, Any]]:
+        """Hook for generators: pre-built (state attributes, command attributes) of an entity."""
+        return {}, {}
+
+    def _compile_device(self, device_key: str) -> MappingProxyType | None:
+        """Device block (without identifiers) for a key of the devices: section."""
+        device_def = (self.datapoints.get('devices') or {}).get(device_key)
+        if not device_def:
+            return None
+        name = self.translate_device_name(device_def.get('name', device_key))
+        return MappingProxyType({
+            "name": name,
+            "manufacturer": "Viessmann",
+            "model": device_def.get('model', name),
+            "suggested_area": self.translate_string("suggested_area", "Heating"),
+        })
 
-        # Load config: profile-based if profiles/ exists, else legacy datapoints.yaml
-        self._load_config()
-        self.type_templates = self._load_yaml(self.config_dir / "templates" / "types.yaml")
+    def _compile_composite(self, did: int, kind: str, cfg: Any, default_name: str) -> CompositePlan | None:
+        """Climate / water_heater record with pre-resolved name."""
+        if not cfg or not isinstance(cfg, dict):
+            return None
+        name = self.translate_name(cfg.get('name', default_name))
+        name = self.resolve_name(did, None, name)
+        return CompositePlan(kind=kind, name=name, config=MappingProxyType(dict(cfg)))
+
+    # ------------------------------------------------------------------
+    # Discovery cache
+    # ------------------------------------------------------------------
+
+    def invalidate_discovery_cache(self):
+        """Drop all cached discovery output (config, device identity or language changed)."""
+        if self._discovery_cache:
+            logger.debug("Invalidating %d cached discovery results", len(self._discovery_cache))
+        self._discovery_cache.clear()
 
-        # Load local overlay (config/local/ — custom DIDs without forking)
-        self._load_local_overlay()
+    def _cache_discovery(self, key: tuple[str, bool], results: list[tuple[str, str]]):
+        """Store discovery output, dropping the oldest entry when full (hits stay O(1) dict lookups)."""
+        _bounded_store(self._discovery_cache, key, results, self.discovery_cache_size)
 
-        # Load translations only for non-English languages
+    def set_language(self, language: str):
+        """Switch the entity name language and invalidate cached discovery output."""
+        if language == self.language:
+            return
+        self.language = language
         if language != "en":
             self.translations = self._load_yaml(
                 self.config_dir / "translations" / f"{language}.yaml"
             )
         else:
             self.translations = {}
-
-        # Load optional user name overrides (survives updates)
-        user_names_path = self.config_dir / "user" / "names.yaml"
-        if user_names_path.exists():
-            self.user_names = self._load_yaml(user_names_path).get("names", {})
-        else:
-            self.user_names = {}
-
-        # Device info cache
-        self.device_cache = {}
+        # Names are resolved into the plan, recompile (also drops cached discovery)
+        self.compile_plan()
 
     # ------------------------------------------------------------------
     # Translation methods
@@ -224,6 +407,213 @@ class BaseGenerator:
                     if tk in climate and isinstance(climate[tk], str):
                         _check(key, f"climate {tk}", climate[tk])
 
+    def _load_sources(self):
+        """Load and merge all YAML config files."""
+        self._load_layer(LAYER_DATAPOINTS)
+        self._load_layer(LAYER_TYPES)
+        self._load_layer(LAYER_TRANSLATIONS)
+        self._load_layer(LAYER_NAMES)
+
+    def _load_layer(self, layer: str):
+        """(Re)load one config layer from its YAML files."""
+        if layer == LAYER_DATAPOINTS:
+            # Profile-based if profiles/ exists, else legacy datapoints.yaml; then
+            # the local overlay (config/local/ — custom DIDs without forking)
+            self._load_config()
+            self._load_local_datapoints()
+        elif layer == LAYER_TYPES:
+            self.type_templates = self._load_yaml(self.config_dir / "templates" / "types.yaml")
+            self._load_local_types()
+        elif layer == LAYER_TRANSLATIONS:
+            # Load translations only for non-English languages
+            if self.language != "en":
+                self.translations = self._load_yaml(
+                    self.config_dir / "translations" / f"{self.language}.yaml"
+                )
+            else:
+                self.translations = {}
+        elif layer == LAYER_NAMES:
+            # Load optional user name overrides (survives updates)
+            user_names_path = self.config_dir / "user" / "names.yaml"
+            if user_names_path.exists():
+                self.user_names = self._load_yaml(user_names_path).get("names", {})
+            else:
+                self.user_names = {}
+
+    def _source_layer(self, path: Path) -> str | None:
+        """Config layer a source file belongs to (None: not config, e.g. the code itself)."""
+        if path.parent.name == "translations":
+            return LAYER_TRANSLATIONS
+        if path == self.config_dir / "user" / "names.yaml":
+            return LAYER_NAMES
+        if path.name == "types.yaml":
+            return LAYER_TYPES
+        if path.suffix == ".yaml":
+            return LAYER_DATAPOINTS
+        return None
+
+    # ------------------------------------------------------------------
+    # Hot reload
+    # ------------------------------------------------------------------
+
+    def _stat_sources(self) -> dict[Path, tuple[int, int] | None]:
+        stats: dict[Path, tuple[int, int] | None] = {}
+        for path in self._config_sources():
+            try:
+                st = path.stat()
+            except OSError:
+                stats[path] = None
+            else:
+                stats[path] = (st.st_size, st.st_mtime_ns)
+        return stats
+
+    def changed_sources(self) -> list[Path]:
+        """Config files created, deleted or modified since they were last loaded."""
+        current = self._stat_sources()
+        return [path for path, stat in current.items() if self._source_stats.get(path) != stat]
+
+    def reload_config(self, changed: list[Path] | None = None) -> ConfigReload | None:
+        """Reload the layers of changed config files and activate the recompiled plan.
+
+        Only the affected layers are parsed again; the datapoints layer (profiles
+        plus local overlay) is re-merged as a whole because later files replace
+        entries of earlier ones. The new config is staged on a copy and only
+        swapped in if it parses and validates, so a half-saved file never
+        replaces a working config. Returns None if nothing was reloaded.
+        """
+        if changed is None:
+            changed = self.changed_sources()
+        if not changed:
+            return None
+        # Remember the new state even if it fails below: the next edit triggers a retry
+        self._source_stats = self._stat_sources()
+        layers = {layer for layer in map(self._source_layer, changed) if layer}
+        if not layers:
+            logger.warning("Changed code is only picked up on restart: %s", ", ".join(map(str, changed)))
+            return None
+
+        return self._apply_staged(layers)
+
+    def switch_profile(self, profile: str) -> ConfigReload | None:
+        """Activate another device profile at runtime (e.g. once the device is identified).
+
+        Loads the compiled config of the new profile if cached, else re-merges the
+        datapoints layer; returns None if the profile is already active or invalid.
+        """
+        if profile in ("auto", self._active_profile):
+            return None
+        if not (self.config_dir / "profiles" / f"{profile}.yaml").exists():
+            logger.warning("Detected profile '%s' has no profile file, keeping %s", profile, self._active_profile)
+            return None
+        logger.info("Switching device profile: %s -> %s", self._active_profile, profile)
+        return self._apply_staged({LAYER_DATAPOINTS}, profile)
+
+    def _apply_staged(self, layers: set[str], profile: str | None = None) -> ConfigReload | None:
+        """Load layers into a copy, validate it and swap the result in."""
+        staged = copy.copy(self)
+        if profile is not None:
+            staged.profile = profile
+        try:
+            if profile is None or not staged._load_cached_config():
+                for layer in sorted(layers):
+                    staged._load_layer(layer)
+        except Exception as e:
+            logger.error("Config reload failed, keeping the current config: %s", e)
+            return None
+        errors = staged.validate()["errors"]
+        if errors:
+            logger.error("Config reload rejected (%d errors), keeping the current config:", len(errors))
+            for error in errors:
+                logger.error("  %s", error)
+            return None
+
+        old_plan = self.plan
+        # Device blocks of DIDs without a device: key and suggested_area feed every entity
+        everything = (LAYER_TRANSLATIONS in layers
+                      or staged.datapoints.get("default_device") != self.datapoints.get("default_device"))
+        self.profile = staged.profile
+        self.datapoints = staged.datapoints
+        self._active_profile = staged._active_profile
+        self.type_templates = staged.type_templates
+        self.translations = staged.translations
+        self.user_names = staged.user_names
+        new_plan = self.compile_plan()
+        if profile is not None:
+            # Another profile file is now a source
+            self._source_stats = self._stat_sources()
+        self.save_config_cache()
+        return ConfigReload(layers=tuple(sorted(layers)), dids=changed_dids(old_plan, new_plan),
+                            everything=everything)
+
+    def detect_profile(self, value: str) -> str | None:
+        """Profile named by the profile_patterns entry matching an identification value."""
+        pattern_config = self._match_device_pattern(value, "profile_patterns")
+        if pattern_config is None:
+            return None
+        profile = pattern_config.get("profile")
+        return profile if isinstance(profile, str) else None
+
+    def is_model_did(self, did: int) -> bool:
+        """Whether an identification DID carries the model name (extract_model)."""
+        did_config = self.datapoints.get("device_identification_dids", {}).get(did)
+        return isinstance(did_config, dict) and bool(did_config.get("extract_model"))
+
+    # ------------------------------------------------------------------
+    # Compiled config cache
+    # ------------------------------------------------------------------
+
+    def _config_sources(self) -> list[Path]:
+        """Every file the merged config can depend on (missing ones included)."""
+        profiles_dir = self.config_dir / "profiles"
+        sources = [profiles_dir / "common.yaml", self.config_dir / "datapoints.yaml"]
+        if self.profile == "auto":
+            sources.append(profiles_dir / "vitocal.yaml")
+        elif self.profile != "common":
+            sources.append(profiles_dir / f"{self.profile}.yaml")
+        sources += [
+            self.config_dir / "templates" / "types.yaml",
+            self.config_dir / "local" / "datapoints.yaml",
+            self.config_dir / "local" / "types.yaml",
+            self.config_dir / "user" / "names.yaml",
+        ]
+        if self.language != "en":
+            sources.append(self.config_dir / "translations" / f"{self.language}.yaml")
+        # The merge logic itself: an update of the bridge invalidates old caches
+        sources.append(Path(__file__))
+        return sources
+
+    def _load_cached_config(self) -> bool:
+        """Restore the merged config from the compiled cache; False if missing or stale."""
+        cache = self.config_cache
+        if cache is None:
+            return False
+        path = cache.path_for(self.config_dir, self.profile, self.language)
+        data = cache.load(path, self._config_sources())
+        if data is None:
+            return False
+        self.datapoints = data["datapoints"]
+        self.type_templates = data["type_templates"]
+        self.translations = data["translations"]
+        self.user_names = data["user_names"]
+        self._active_profile = data["active_profile"]
+        logger.info("Loaded compiled config: profile %s (%s)", self._active_profile, path)
+        return True
+
+    def save_config_cache(self) -> Path | None:
+        """Write the merged config to the compiled cache; returns the file, None if not cached."""
+        cache = self.config_cache
+        if cache is None:
+            return None
+        path = cache.path_for(self.config_dir, self.profile, self.language)
+        stored = cache.store(path, self._config_sources(), {
+            "datapoints": self.datapoints,
+            "type_templates": self.type_templates,
+            "translations": self.translations,
+            "user_names": self.user_names,
+            "active_profile": self._active_profile,
+        })
+        return path if stored else None
+
     def _load_config(self):
         """Load datapoints config: profile-based if profiles/ exists, else legacy datapoints.yaml."""
         profiles_dir = self.config_dir / "profiles"
@@ -238,14 +628,15 @@ class BaseGenerator:
 
         Merge order: common → profile → (later: local overlay wins)
         """
-        # Always start with common
+        # common.yaml is the base every profile is merged onto
         self.datapoints = self._load_yaml(profiles_dir / "common.yaml")
 
         # Determine which profile to load
         profile_name = self.profile
         if profile_name == "auto":
-            # Auto-detect: for now default to vitocal if available, else common-only
-            # Real auto-detection happens at runtime via DID 377 (not implemented yet)
+            # Static default: vitocal if available, else common-only. The bridge
+            # starts on the profile an earlier run detected (else this default) and
+            # switches once the model name matches a profile pattern (switch_profile())
             if (profiles_dir / "vitocal.yaml").exists():
                 profile_name = "vitocal"
             else:
@@ -275,23 +666,18 @@ class BaseGenerator:
             base_dps.update(overlay["datapoints"])
 
         # Merge top-level keys (device_identification_dids, device_patterns, etc.)
-        for key in ("device_identification_dids", "device_patterns", "default_device",
+        for key in ("device_identification_dids", "device_patterns", "profile_patterns", "default_device",
                      "write_blacklisted_dids", "ignored_dids"):
             if key in overlay:
                 self.datapoints[key] = overlay[key]
 
-    def _load_local_overlay(self):
-        """Load config/local/ overlay files and merge into main config.
+    def _load_local_datapoints(self):
+        """Merge config/local/datapoints.yaml into the main config.
 
-        Allows adding custom datapoints and type templates without modifying
-        the shipped config files — no fork needed for custom DIDs.
+        Allows adding custom datapoints without modifying the shipped config
+        files — no fork needed for custom DIDs.
         """
-        local_dir = self.config_dir / "local"
-        if not local_dir.is_dir():
-            return
-
-        # Merge local datapoints.yaml
-        local_dp = local_dir / "datapoints.yaml"
+        local_dp = self.config_dir / "local" / "datapoints.yaml"
         if local_dp.exists():
             overlay = self._load_yaml(local_dp)
             # Merge datapoints dict (local wins)
@@ -304,8 +690,9 @@ class BaseGenerator:
                 base_devs.update(overlay["devices"])
             logger.info("Loaded local datapoints overlay: %s", local_dp)
 
-        # Merge local types.yaml
-        local_types = local_dir / "types.yaml"
+    def _load_local_types(self):
+        """Merge config/local/types.yaml into the type templates."""
+        local_types = self.config_dir / "local" / "types.yaml"
         if local_types.exists():
             overlay_types = self._load_yaml(local_types)
             self.type_templates.update(overlay_types)
@@ -314,8 +701,7 @@ class BaseGenerator:
     def _load_yaml(self, filepath: Path) -> dict[str, Any]:
         """Load YAML file"""
         try:
-            with open(filepath, encoding='utf-8') as f:
-                return yaml.safe_load(f) or {}
+            return load_yaml_file(filepath) or {}
         except FileNotFoundError:
             logger.warning("Config file not found: %s", filepath)
             return {}
@@ -330,17 +716,30 @@ class BaseGenerator:
 
     def is_ignored_did(self, did: int) -> bool:
         """Check if DID should be ignored"""
-        return did in self.datapoints.get("ignored_dids", [])
+        return did in self.plan.ignored_dids
 
     def is_write_blacklisted(self, did: int) -> bool:
         """Check if DID is write-blacklisted (read allowed, write blocked)."""
-        return did in self.datapoints.get("write_blacklisted_dids", [])
+        return did in self.plan.write_blacklisted_dids
 
     def parse_open3e_topic(self, topic: str) -> dict[str, Any] | None:
         """
         Parse Open3E MQTT Topic
         Format: open3e/680_268_FlowTemperatureSensor/Actual
+
+        Results of valid topics are memoized (bounded like the discovery cache);
+        callers must treat the dict as read-only.
         """
+        try:
+            return self._parsed_topics[topic]
+        except KeyError:
+            pass
+        parsed = self._parse_open3e_topic(topic)
+        if parsed is not None:
+            _bounded_store(self._parsed_topics, topic, parsed, self.discovery_cache_size)
+        return parsed
+
+    def _parse_open3e_topic(self, topic: str) -> dict[str, Any] | None:
         try:
             parts = topic.split('/')
             if len(parts) < 2 or parts[0] != 'open3e':
@@ -408,20 +807,20 @@ class BaseGenerator:
             if ecu_addr not in self.device_cache:
                 self.device_cache[ecu_addr] = {}
 
-            self.device_cache[ecu_addr].update(device_info)
+            cached = self.device_cache[ecu_addr]
+            if any(cached.get(k) != v for k, v in device_info.items()):
+                cached.update(device_info)
+                # Device identity feeds the device block of every entity
+                self.invalidate_discovery_cache()
 
     def _extract_device_info(self, value: str) -> dict[str, str]:
         """Extract device info from a value"""
-        device_patterns = self.datapoints.get("device_patterns", [])
-
-        # Try to match patterns
-        for pattern_config in device_patterns:
-            pattern = pattern_config.get("pattern", "")
-            if re.search(pattern, value, re.IGNORECASE):
-                return {
-                    "name": pattern_config.get("name", value),
-                    "model": pattern_config.get("model", pattern)
-                }
+        pattern_config = self._match_device_pattern(value)
+        if pattern_config is not None:
+            return {
+                "name": pattern_config.get("name", value),
+                "model": pattern_config.get("model", pattern_config.get("pattern", "")),
+            }
 
         # Fallback: use value directly (cleaned)
         clean_value = re.sub(r'[^a-zA-Z0-9\-\s]', '', value).strip()
@@ -430,6 +829,13 @@ class BaseGenerator:
             "model": clean_value or "E3 Controller"
         }
 
+    def _match_device_pattern(self, value: str, key: str = "device_patterns") -> dict[str, Any] | None:
+        """First entry of a pattern list (device_patterns, profile_patterns) whose pattern occurs in the value."""
+        for pattern_config in self.datapoints.get(key, []):
+            if re.search(pattern_config.get("pattern", ""), value, re.IGNORECASE):
+                return pattern_config
+        return None
+
     def create_device_info(self, ecu_addr: str, device_name: str | None = None) -> dict[str, Any]:
         """Create device info"""
         # Use cached device info if available
@@ -467,27 +873,10 @@ class BaseGenerator:
 
     def create_device_info_for_did(self, ecu_addr: str, did: int) -> dict[str, Any]:
         """Create device info for a specific DID, using per-device mapping if configured."""
-        dp_config = self.get_datapoint_config(did)
-        device_key = dp_config.get('device') if dp_config else None
-
-        if not device_key:
+        dp = self.plan.datapoints.get(did)
+        if dp is None or dp.device is None:
             return self.create_device_info(ecu_addr)
-
-        devices = self.datapoints.get('devices', {})
-        device_def = devices.get(device_key)
-        if not device_def:
-            return self.create_device_info(ecu_addr)
-
-        name = self.translate_device_name(device_def.get('name', device_key))
-        model = device_def.get('model', name)
-
-        return {
-            "identifiers": [f"open3e_{ecu_addr}_{device_key}"],
-            "name": name,
-            "manufacturer": "Viessmann",
-            "model": model,
-            "suggested_area": self.translate_string("suggested_area", "Heating"),
-        }
+        return {"identifiers": [f"open3e_{ecu_addr}_{dp.device_key}"], **dp.device}
 
     def merge_config(self, base_config: dict[str, Any], override_config: dict[str, Any]) -> dict[str, Any]:
         """Merge configs together"""
@@ -0,0 +1,157 @@
+"""Compiled cache of the merged YAML configuration.
+
+Loading the config means parsing common.yaml, a profile, types.yaml,
+translations, local overlays and names.yaml, which takes noticeable time with
+pure-Python PyYAML on a Raspberry Pi. The merged result is stored as one
+marshal file per (config dir, profile, language). It is reused while every
+source file is unchanged: paths, sizes and mtimes are compared first, and
+content hashes only when those differ (e.g. after a copy that did not keep
+mtimes), so a warm start reads no YAML at all.
+
+marshal is fast but only meant for trusted, local data: the cache directory
+must not be writable by anyone who could not also edit the config.
+"""
+from __future__ import annotations
+
+import contextlib
+import hashlib
+import logging
+import marshal
+import os
+import sys
+from pathlib import Path
+from typing import Any
+
+import yaml
+
+logger = logging.getLogger("open3e_bridge.generators.config_cache")
+
+# Bump when the layout of the cached data or the merge logic changes
+CACHE_VERSION = 1
+
+# libyaml-based loader when PyYAML was built with it (much faster), else pure Python
+SafeLoader: type = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+# Manifest entry: (path, size, mtime_ns, sha256) — size -1 and no hash for a missing file
+SourceEntry = tuple[str, int, int, str]
+
+
+def load_yaml_file(path: Path) -> Any:
+    """Parse a YAML file with the fastest available safe loader."""
+    with open(path, encoding="utf-8") as f:
+        return yaml.load(f, Loader=SafeLoader)  # noqa: S506 — SafeLoader/CSafeLoader
+
+
+def default_cache_dir() -> Path:
+    """$OPEN3E_CONFIG_CACHE, else $XDG_CACHE_HOME/open3e-bridge, else ~/.cache/open3e-bridge."""
+    env = os.environ.get("OPEN3E_CONFIG_CACHE")
+    if env:
+        return Path(env)
+    xdg = os.environ.get("XDG_CACHE_HOME")
+    return (Path(xdg) if xdg else Path.home() / ".cache") / "open3e-bridge"
+
+
+def _file_hash(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def _source_entry(path: Path) -> SourceEntry:
+    try:
+        st = path.stat()
+    except OSError:
+        return str(path), -1, 0, ""
+    return str(path), st.st_size, st.st_mtime_ns, _file_hash(path)
+
+
+class ConfigCache:
+    def __init__(self, cache_dir: str | Path | None = None):
+        """
+        Args:
+            cache_dir: Directory for compiled configs (default: default_cache_dir())
+        """
+        self.cache_dir = Path(cache_dir) if cache_dir else default_cache_dir()
+
+    def path_for(self, config_dir: Path, profile: str, language: str) -> Path:
+        key = f"{config_dir.resolve()}|{profile}|{language}"
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+        return self.cache_dir / f"config-{profile}-{language}-{digest}.bin"
+
+    def load(self, path: Path, sources: list[Path]) -> dict[str, Any] | None:
+        """Cached data if the file exists and all sources are unchanged, else None."""
+        try:
+            header, manifest, data = marshal.loads(path.read_bytes())  # noqa: S302 — our own local cache file
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, EOFError, TypeError) as e:
+            logger.debug("Ignoring unreadable config cache %s: %s", path, e)
+            return None
+        if header != self._header() or [entry[0] for entry in manifest] != [str(p) for p in sources]:
+            return None
+
+        rehashed = False
+        for (name, size, mtime_ns, digest), source in zip(manifest, sources):
+            try:
+                st = source.stat()
+            except OSError:
+                if size != -1:
+                    return None
+                continue
+            if size == st.st_size and mtime_ns == st.st_mtime_ns:
+                continue
+            # Touched or copied without mtimes: fall back to the content hash
+            if size != st.st_size or _file_hash(source) != digest:
+                logger.debug("Config cache stale: %s changed", name)
+                return None
+            rehashed = True
+        if rehashed:
+            # Same content, new mtimes: refresh the manifest so the next start skips hashing
+            self.store(path, sources, data)
+        return data
+
+    def store(self, path: Path, sources: list[Path], data: dict[str, Any]) -> bool:
+        """Write the compiled config atomically; False if it cannot be cached."""
+        manifest = [_source_entry(source) for source in sources]
+        try:
+            blob = marshal.dumps((self._header(), manifest, data))
+        except ValueError as e:
+            # YAML types marshal cannot represent (e.g. timestamps) — just don't cache
+            logger.debug("Config not cacheable: %s", e)
+            return False
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp.write_bytes(blob)
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.debug("Could not write config cache %s: %s", path, e)
+            with contextlib.suppress(OSError):
+                tmp.unlink()
+            return False
+        return True
+
+    def _profile_path(self, config_dir: Path) -> Path:
+        digest = hashlib.sha256(str(config_dir.resolve()).encode("utf-8")).hexdigest()[:16]
+        return self.cache_dir / f"profile-{digest}.txt"
+
+    def load_profile(self, config_dir: Path) -> str | None:
+        """Device profile detected at runtime by an earlier start, if any."""
+        try:
+            return self._profile_path(config_dir).read_text(encoding="utf-8").strip() or None
+        except OSError:
+            return None
+
+    def store_profile(self, config_dir: Path, profile: str) -> bool:
+        """Remember the detected device profile so the next start begins with it."""
+        path = self._profile_path(config_dir)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(profile + "\n", encoding="utf-8")
+        except OSError as e:
+            logger.debug("Could not store detected profile in %s: %s", path, e)
+            return False
+        return True
+
+    @staticmethod
+    def _header() -> tuple[int, str]:
+        # marshal's format is only stable within one Python version
+        return CACHE_VERSION, f"{sys.implementation.name}-{sys.version_info[0]}.{sys.version_info[1]}"
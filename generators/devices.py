@@ -0,0 +1,144 @@
+"""Device-based discovery: one retained config per Home Assistant device.
+
+Instead of one <prefix>/<component>/<object_id>/config per entity, Home
+Assistant accepts a single <prefix>/device/<device_id>/config carrying the
+device, origin and a "components" mapping of all its entities
+(https://www.home-assistant.io/integrations/mqtt/#device-discovery-payload).
+That turns hundreds of retained messages into one per device.
+
+Components arrive one open3e topic at a time, so a device payload grows
+incrementally: each topic (a "source") contributes its components, and the
+payload is republished whenever the set changes. A component that disappears
+(config reload, profile switch) stays in the payload with only its platform,
+which is how Home Assistant removes a single component of a device.
+"""
+from __future__ import annotations
+
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from typing import Any
+
+# A source is the open3e topic that produced components, with the test_mode flag
+Source = tuple[str, bool]
+
+# Entity options moved to the root of the device payload when all components share them
+SHARED_KEYS = ("availability_topic", "payload_available", "payload_not_available")
+
+
+@dataclass(frozen=True, slots=True)
+class DiscoveryComponent:
+    """One entity's discovery config before it is published."""
+    entity_type: str
+    object_id: str
+    config: dict[str, Any]
+
+
+class _Device:
+    __slots__ = ("device", "origin", "sources", "removed", "payload")
+
+    def __init__(self, device: dict[str, Any]):
+        self.device = device
+        self.origin: dict[str, Any] | None = None
+        # source -> {object_id: component config incl. "platform"}
+        self.sources: dict[Source, dict[str, dict[str, Any]]] = {}
+        # object_id -> platform of components that were published and have gone away
+        self.removed: dict[str, str] = {}
+        self.payload: str | None = None
+
+    def config(self) -> dict[str, Any]:
+        live = [component for components in self.sources.values() for component in components.values()]
+        shared = {}
+        for key in SHARED_KEYS:
+            values = [component.get(key) for component in live]
+            if values and values[0] is not None and values.count(values[0]) == len(values):
+                shared[key] = values[0]
+        components: dict[str, dict[str, Any]] = {}
+        for source_components in self.sources.values():
+            for object_id, component in source_components.items():
+                components[object_id] = {k: v for k, v in component.items() if k not in shared}
+        for object_id, platform in self.removed.items():
+            components.setdefault(object_id, {"platform": platform})
+        config: dict[str, Any] = {"device": self.device}
+        if self.origin is not None:
+            config["origin"] = self.origin
+        config.update(shared)
+        config["components"] = components
+        return config
+
+
+class DeviceDiscovery:
+    """Aggregates the components of every source into one payload per device topic."""
+
+    def __init__(self, serialize: Callable[[dict[str, Any]], str]):
+        """
+        Args:
+            serialize: Turns a device config into the payload (JSON, optionally compact)
+        """
+        self._serialize = serialize
+        self._devices: dict[str, _Device] = {}
+        # Device topics a source ever contributed to, in first-seen order. Kept when its
+        # components go away, so the source keeps reporting the device (never an empty config)
+        self._source_devices: dict[Source, tuple[str, ...]] = {}
+        # device topic -> sources that contributed to it (ordered set)
+        self._members: dict[str, dict[Source, None]] = {}
+
+    def update(self, source: Source, components: Iterable[tuple[str, DiscoveryComponent]]) -> list[str]:
+        """Replace the components `source` contributes; returns the device topics whose payload changed."""
+        contributed: dict[str, dict[str, dict[str, Any]]] = {}
+        for device_topic, component in components:
+            config = dict(component.config)
+            device_info = config.pop("device")
+            origin = config.pop("origin", None)
+            device = self._devices.get(device_topic)
+            if device is None:
+                device = self._devices[device_topic] = _Device(device_info)
+                self._members[device_topic] = {}
+            elif device.device != device_info:
+                # e.g. the model was learned from an identification DID
+                device.device = device_info
+                device.payload = None
+            if origin is not None and device.origin != origin:
+                device.origin = origin
+                device.payload = None
+            contributed.setdefault(device_topic, {})[component.object_id] = {"platform": component.entity_type, **config}
+
+        device_topics = self._source_devices.get(source, ())
+        for device_topic in contributed:
+            if device_topic not in device_topics:
+                device_topics += (device_topic,)
+                self._members[device_topic][source] = None
+        self._source_devices[source] = device_topics
+
+        changed = []
+        for device_topic in device_topics:
+            device = self._devices[device_topic]
+            new = contributed.get(device_topic, {})
+            old = device.sources.get(source, {})
+            if new != old:
+                for object_id, component in old.items():
+                    if object_id not in new:
+                        device.removed[object_id] = component["platform"]
+                for object_id in new:
+                    device.removed.pop(object_id, None)
+                if new:
+                    device.sources[source] = new
+                else:
+                    device.sources.pop(source, None)
+                device.payload = None
+            if device.payload is None:
+                changed.append(device_topic)
+        return changed
+
+    def messages(self, source: Source) -> list[tuple[str, str]]:
+        """(device topic, payload) for every device the source contributed to."""
+        return [(device_topic, self.payload(device_topic)) for device_topic in self._source_devices.get(source, ())]
+
+    def members(self, device_topic: str) -> tuple[Source, ...]:
+        """Sources that contributed to a device."""
+        return tuple(self._members.get(device_topic, ()))
+
+    def payload(self, device_topic: str) -> str:
+        device = self._devices[device_topic]
+        if device.payload is None:
+            device.payload = self._serialize(device.config())
+        return device.payload
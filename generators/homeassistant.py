@@ -1,19 +1,30 @@
 """
 Home Assistant MQTT Discovery Generator
 """
-import json
+import functools
 import logging
+import time
 from typing import Any
 
+from runtime.metrics import STAGE_SERIALIZE, StageMetrics
+
+from .abbreviations import dumps_discovery
 from .base import BaseGenerator
+from .config_cache import ConfigCache
+from .devices import DeviceDiscovery, DiscoveryComponent
 from .heuristics import infer_entity_config
+from .plan import CompositePlan, DatapointPlan, EntityPlan
+
+
+@functools.cache
+def _sw_version() -> str:
+    # Resolved on first use: importlib.metadata is slow to import and offline CLI modes never need it
+    try:
+        from importlib.metadata import version as pkg_version
+        return pkg_version("open3e-bridge")
+    except Exception:
+        return "0.1.0-dev"
 
-try:
-    from importlib.metadata import PackageNotFoundError
-    from importlib.metadata import version as pkg_version
-    _SW_VERSION = pkg_version("open3e-bridge")
-except (PackageNotFoundError, Exception):
-    _SW_VERSION = "0.1.0-dev"
 
 logger = logging.getLogger("open3e_bridge.generators.ha")
 
@@ -28,24 +39,49 @@ _ENTITY_KEYS = (
 # Entity types that have no persistent state (no state_topic)
 _STATELESS_ENTITY_TYPES = frozenset({"button"})
 
+# entity: one retained config per entity; device: one per device with all its components
+DISCOVERY_MODE_ENTITY = "entity"
+DISCOVERY_MODE_DEVICE = "device"
+DISCOVERY_MODES = (DISCOVERY_MODE_ENTITY, DISCOVERY_MODE_DEVICE)
+
 
 class HomeAssistantGenerator(BaseGenerator):
-    def __init__(self, config_dir: str = "config", language: str = "en", discovery_prefix: str = "homeassistant", add_test_prefix: bool = True, auto_discover: bool = False, profile: str = "auto"):
-        super().__init__(config_dir=config_dir, language=language, profile=profile)
+    def __init__(self, config_dir: str = "config", language: str = "en", discovery_prefix: str = "homeassistant", add_test_prefix: bool = True, auto_discover: bool = False, profile: str = "auto",
+                 config_cache: ConfigCache | None = None, compact: bool = False,
+                 discovery_mode: str = DISCOVERY_MODE_ENTITY):
+        if discovery_mode not in DISCOVERY_MODES:
+            raise ValueError(f"Unknown discovery mode '{discovery_mode}'. Available: {', '.join(DISCOVERY_MODES)}")
+        super().__init__(config_dir=config_dir, language=language, profile=profile, config_cache=config_cache)
         self.discovery_prefix = discovery_prefix
         self.add_test_prefix = add_test_prefix
         self.auto_discover = auto_discover
+        # Abbreviated keys and "~" base topics (generators.abbreviations)
+        self.compact = compact
+        self.discovery_mode = discovery_mode
+        # Device payloads built up so far (discovery_mode "device" only)
+        self._devices = DeviceDiscovery(self._serialize)
         self.auto_discovered_count = 0
+        self.discovery_cache_misses = 0
+        # Stage latency recording, set by the bridge (None = not instrumented)
+        self.metrics: StageMetrics | None = None
 
     def generate_discovery_message(self, topic: str, value: str, test_mode: bool = True) -> list[tuple[str, str]]:
         """
         Generiert Home Assistant Discovery Messages für ein Open3E Topic
 
         Returns:
-            List of (discovery_topic, discovery_payload) tuples
+            List of (discovery_topic, discovery_payload) tuples. Results are
+            cached per topic and shared between calls — do not mutate.
         """
+        cache_key = (topic, test_mode)
+        cached = self._discovery_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        self.discovery_cache_misses += 1
+
         parsed = self.parse_open3e_topic(topic)
         if not parsed:
+            self._cache_discovery(cache_key, [])
             return []
 
         did = parsed['did']
@@ -53,107 +89,131 @@ class HomeAssistantGenerator(BaseGenerator):
 
         # Prüfe ob DID ignoriert werden soll
         if self.is_ignored_did(did):
+            self._cache_discovery(cache_key, [])
+            return []
+
+        # Identification DIDs carry changing values that feed the device cache,
+        # so they always take the slow path (update_device_info invalidates on change)
+        if did in self.plan.identification_dids:
+            self.update_device_info(ecu_addr, did, value)
+            results = self._generate_discovery(parsed, test_mode)
+        else:
+            plan = self._plan
+            results = self._generate_discovery(parsed, test_mode)
+            # A config reload swapped the plan meanwhile: don't cache output of the old one
+            if self._plan is plan:
+                self._cache_discovery(cache_key, results)
+        return results
+
+    def regenerate_discovery(self, topic: str, test_mode: bool = True) -> list[tuple[str, str]]:
+        """
+        Discovery messages for an already seen Open3E topic, without a value.
+
+        Used to republish (HA restart, config reload) from the current plan
+        instead of keeping payloads around. Unlike generate_discovery_message
+        this never touches the device info cache, so identification DIDs are
+        rebuilt from the values seen so far.
+        """
+        cached = self._discovery_cache.get((topic, test_mode))
+        if cached is not None:
+            return cached
+        parsed = self.parse_open3e_topic(topic)
+        if not parsed or self.is_ignored_did(parsed['did']):
             return []
+        return self._generate_discovery(parsed, test_mode)
 
-        # Aktualisiere Device-Info falls dieser DID Device-Identifikation enthält
-        self.update_device_info(ecu_addr, did, value)
+    def entity_discovery_topics(self, ecu_addr: str, did: int, test_mode: bool = True) -> set[str]:
+        """
+        Discovery topics the plan publishes for a configured DID on an ECU.
+
+        Identity based, for configs that no open3e topic regenerates: stateless
+        entities (buttons) only refer to open3e/cmnd and open3e/LWT.
+        """
+        dp = self.plan.datapoints.get(did)
+        if dp is None or self.is_ignored_did(did):
+            return set()
+        if self.discovery_mode == DISCOVERY_MODE_DEVICE:
+            device_id = self.create_device_info_for_did(ecu_addr, did)['identifiers'][0]
+            return {self._build_discovery_topic('device', device_id, test_mode)}
+        return {self._build_discovery_topic(entity.entity_type,
+                                            self.generate_entity_id(ecu_addr, did, entity.sub_item), test_mode)
+                for entity in dp.entities()}
+
+    def _generate_discovery(self, parsed: dict[str, Any], test_mode: bool) -> list[tuple[str, str]]:
+        """Uncached discovery generation for a parsed Open3E topic."""
+        components = self._build_components(parsed)
+        if self.discovery_mode == DISCOVERY_MODE_DEVICE:
+            return self._generate_device_discovery(parsed['full_topic'], components, test_mode)
+        return [self._entity_message(component, test_mode) for component in components]
+
+    def _entity_message(self, component: DiscoveryComponent, test_mode: bool) -> tuple[str, str]:
+        """One retained config per entity: <prefix>/<entity_type>/<object_id>/config."""
+        discovery_topic = self._build_discovery_topic(component.entity_type, component.object_id, test_mode)
+        return discovery_topic, self._serialize(component.config)
+
+    def _generate_device_discovery(self, topic: str, components: list[DiscoveryComponent],
+                                   test_mode: bool) -> list[tuple[str, str]]:
+        """One retained config per device, carrying the components of every topic seen so far."""
+        placed = []
+        for component in components:
+            device_id = component.config['device']['identifiers'][0]
+            placed.append((self._build_discovery_topic('device', device_id, test_mode), component))
+        source = (topic, test_mode)
+        changed = self._devices.update(source, placed)
+        # Cached results of the device's other topics still hold the previous payload
+        for device_topic in changed:
+            for member in self._devices.members(device_topic):
+                if member != source and member in self._discovery_cache:
+                    self._discovery_cache[member] = self._devices.messages(member)
+        return self._devices.messages(source)
+
+    def _build_components(self, parsed: dict[str, Any]) -> list[DiscoveryComponent]:
+        """Entity configs for a parsed Open3E topic (configured, composite or heuristic)."""
+        did = parsed['did']
 
-        # Hole Datenpunkt-Konfiguration
-        dp_config = self.get_datapoint_config(did)
-        if not dp_config:
+        # Hole Datenpunkt-Plan
+        dp = self.plan.datapoints.get(did)
+        if dp is None:
             if not self.auto_discover:
                 logger.debug("Skipping unknown DID %d (not configured)", did)
                 return []
             # Tier 1: Heuristic auto-discovery fallback
-            return self._generate_heuristic_discovery(parsed, test_mode)
+            return [self._heuristic_component(parsed)]
+
+        results = []
+        sub_item = parsed['sub_item']
 
-        # Generiere Discovery Messages basierend auf Typ
-        results = self._generate_typed_discovery(parsed, dp_config, value, test_mode)
+        # Generiere Discovery Message für das Entity dieses Sub-Items
+        entity = dp.resolve(sub_item)
+        if entity is not None:
+            results.append(self._entity_component(parsed, dp, entity))
 
         # Optionale Climate-Entität, wenn im Datapoint konfiguriert und passender Trigger (z. B. Mode/ID)
-        climate_cfg = dp_config.get('climate')
-        if climate_cfg and parsed.get('sub_item', '').lower().startswith(climate_cfg.get('trigger_sub', 'Mode/ID').lower()):
-            climate_res = self._generate_climate_discovery(parsed, climate_cfg, test_mode)
-            results.extend(climate_res)
+        climate = dp.climate
+        if climate and (sub_item or '').lower().startswith(climate.config.get('trigger_sub', 'Mode/ID').lower()):
+            results.append(self._climate_component(parsed, climate))
 
         # Optionale water_heater-Entität (Multi-DID: Temp + Setpoint + Mode)
-        wh_cfg = dp_config.get('water_heater')
-        if wh_cfg and did == wh_cfg.get('trigger_did', did):
-            wh_res = self._generate_water_heater_discovery(parsed, wh_cfg, test_mode)
-            results.extend(wh_res)
+        water_heater = dp.water_heater
+        if water_heater and did == water_heater.config.get('trigger_did', did):
+            results.append(self._water_heater_component(parsed, water_heater))
 
         return results
 
-    def _generate_typed_discovery(self, parsed: dict[str, Any], dp_config: dict[str, Any], value: str, test_mode: bool) -> list[tuple[str, str]]:
-        """Generiert Discovery Messages basierend auf Datenpunkt-Typ"""
-        type_name = dp_config.get('type')
-        if not type_name:
-            return []
-
-        type_template = self.get_type_template(type_name)
-        if not type_template:
-            return []
-
+    def _entity_component(self, parsed: dict[str, Any], dp: DatapointPlan, entity: EntityPlan) -> DiscoveryComponent:
+        """Discovery config for a compiled entity on a concrete ECU/topic."""
         ecu_addr = parsed['ecu_addr']
-        did = parsed['did']
-        sub_item = parsed['sub_item']
-
-        # Entity name from English canonical + translation + user override
-        base_name = self.translate_name(dp_config.get('name', f'DID {did}'))
-        base_name = self.resolve_name(did, None, base_name)
-
-        results = []
-
-        # Einfacher Sensor (ohne Sub-Items)
-        if not sub_item or not dp_config.get('subs'):
-            # trigger_sub: only publish discovery for the specified sub-item
-            trigger_sub = dp_config.get('trigger_sub')
-            if trigger_sub and sub_item and sub_item != trigger_sub:
-                return results
-            entity_type = type_template.get('entity_type', 'sensor')
-            entity_id = self.generate_entity_id(ecu_addr, did)
-            unique_id = self.generate_unique_id(ecu_addr, did)
-
-            discovery_topic = self._build_discovery_topic(entity_type, entity_id, test_mode)
-            config = self._build_entity_config(
-                base_name, unique_id, entity_id, parsed['full_topic'],
-                ecu_addr, type_template, dp_config, did, entity_type=entity_type
-            )
-            results.append((discovery_topic, json.dumps(config, ensure_ascii=False)))
-
-        # Sensor mit Sub-Items
+        entity_id = self.generate_entity_id(ecu_addr, entity.did, entity.sub_item)
+        unique_id = self.generate_unique_id(ecu_addr, entity.did, entity.sub_item)
+        if dp.device is None:
+            device = self.create_device_info(ecu_addr)
         else:
-            subs_dict = dp_config.get('subs', {})
-            if sub_item not in subs_dict:
-                # Sub-Item not configured → skip silently
-                return results
-            sub_config = subs_dict[sub_item]
-            if sub_config.get('enabled', True):  # Default: enabled
-                # Sub-specific config: suffix for display name
-                suffix_key = sub_config.get('suffix', sub_item)
-                translated_suffix = self.translate_suffix(suffix_key)
-                sub_name = f"{base_name} {translated_suffix}" if translated_suffix else base_name
-                sub_name = self.resolve_name(did, sub_item, sub_name)
-
-                entity_id = self.generate_entity_id(ecu_addr, did, sub_item)
-                unique_id = self.generate_unique_id(ecu_addr, did, sub_item)
-
-                # Bestimme Entity-Typ
-                entity_type = sub_config.get('entity_type') or type_template.get('entity_type', 'sensor')
-
-                # Merje Template-Konfiguration
-                merged_template = self.merge_config(type_template, sub_config)
-
-                discovery_topic = self._build_discovery_topic(entity_type, entity_id, test_mode)
-                config = self._build_entity_config(
-                    sub_name, unique_id, entity_id, parsed['full_topic'],
-                    ecu_addr, merged_template, dp_config, did, entity_type=entity_type
-                )
-                results.append((discovery_topic, json.dumps(config, ensure_ascii=False)))
+            device = {"identifiers": [f"open3e_{ecu_addr}_{dp.device_key}"], **dp.device}
 
-        return results
+        config = self._build_entity_config(entity, unique_id, entity_id, parsed['full_topic'], device)
+        return DiscoveryComponent(entity.entity_type, entity_id, config)
 
-    def _generate_heuristic_discovery(self, parsed: dict[str, Any], test_mode: bool) -> list[tuple[str, str]]:
+    def _heuristic_component(self, parsed: dict[str, Any]) -> DiscoveryComponent:
         """Tier 1: Generate discovery from heuristic inference for unknown DIDs."""
         ecu_addr = parsed['ecu_addr']
         did = parsed['did']
@@ -171,8 +231,6 @@ class HomeAssistantGenerator(BaseGenerator):
         if sub_item:
             name = f"{name} {sub_item}"
 
-        discovery_topic = self._build_discovery_topic(entity_type, entity_id, test_mode)
-
         config: dict[str, Any] = {
             "name": name,
             "unique_id": unique_id,
@@ -198,16 +256,17 @@ class HomeAssistantGenerator(BaseGenerator):
 
         config["origin"] = {
             "name": "Open3E Bridge",
-            "sw_version": _SW_VERSION,
+            "sw_version": _sw_version(),
             "support_url": "https://github.com/open3e/open3e-bridge",
         }
 
         self.auto_discovered_count += 1
         logger.info("Auto-discovered DID %d (%s) as %s", did, sensor_name, entity_type)
 
-        return [(discovery_topic, json.dumps(config, ensure_ascii=False))]
+        return DiscoveryComponent(entity_type, entity_id, config)
 
-    def _generate_climate_discovery(self, parsed: dict[str, Any], climate_cfg: dict[str, Any], test_mode: bool) -> list[tuple[str, str]]:
+    def _climate_component(self, parsed: dict[str, Any], climate: CompositePlan) -> DiscoveryComponent:
+        climate_cfg = climate.config
         ecu_addr = parsed['ecu_addr']
         did = parsed['did']
         sensor_name = parsed['sensor_name']
@@ -218,13 +277,9 @@ class HomeAssistantGenerator(BaseGenerator):
 
         entity_id = self.generate_entity_id(ecu_addr, did, 'climate')
         unique_id = self.generate_unique_id(ecu_addr, did, 'climate')
-        discovery_topic = self._build_discovery_topic('climate', entity_id, test_mode)
-
-        name = self.translate_name(climate_cfg.get('name', 'Climate'))
-        name = self.resolve_name(did, None, name)
 
         config: dict[str, Any] = {
-            'name': name,
+            'name': climate.name,
             'unique_id': unique_id,
             'object_id': entity_id,
             'device': self.create_device_info_for_did(ecu_addr, did),
@@ -236,7 +291,7 @@ class HomeAssistantGenerator(BaseGenerator):
         # Origin information
         config['origin'] = {
             'name': 'Open3E Bridge',
-            'sw_version': _SW_VERSION,
+            'sw_version': _sw_version(),
             'support_url': 'https://github.com/open3e/open3e-bridge',
         }
 
@@ -261,22 +316,19 @@ class HomeAssistantGenerator(BaseGenerator):
             if key in climate_cfg:
                 config[key] = climate_cfg[key]
 
-        return [(discovery_topic, json.dumps(config, ensure_ascii=False))]
+        return DiscoveryComponent('climate', entity_id, config)
 
-    def _generate_water_heater_discovery(self, parsed: dict[str, Any], wh_cfg: dict[str, Any], test_mode: bool) -> list[tuple[str, str]]:
+    def _water_heater_component(self, parsed: dict[str, Any], water_heater: CompositePlan) -> DiscoveryComponent:
         """Generate HA water_heater MQTT discovery for DHW (multi-DID pattern)."""
+        wh_cfg = water_heater.config
         ecu_addr = parsed['ecu_addr']
         did = parsed['did']
 
         entity_id = self.generate_entity_id(ecu_addr, did, 'water_heater')
         unique_id = self.generate_unique_id(ecu_addr, did, 'water_heater')
-        discovery_topic = self._build_discovery_topic('water_heater', entity_id, test_mode)
-
-        name = self.translate_name(wh_cfg.get('name', 'Hot Water'))
-        name = self.resolve_name(did, None, name)
 
         config: dict[str, Any] = {
-            'name': name,
+            'name': water_heater.name,
             'unique_id': unique_id,
             'object_id': entity_id,
             'device': self.create_device_info_for_did(ecu_addr, did),
@@ -287,7 +339,7 @@ class HomeAssistantGenerator(BaseGenerator):
 
         config['origin'] = {
             'name': 'Open3E Bridge',
-            'sw_version': _SW_VERSION,
+            'sw_version': _sw_version(),
             'support_url': 'https://github.com/open3e/open3e-bridge',
         }
 
@@ -323,7 +375,16 @@ class HomeAssistantGenerator(BaseGenerator):
             if key in wh_cfg:
                 config[key] = wh_cfg[key]
 
-        return [(discovery_topic, json.dumps(config, ensure_ascii=False))]
+        return DiscoveryComponent('water_heater', entity_id, config)
+
+    def _serialize(self, config: dict[str, Any]) -> str:
+        """JSON payload of a discovery config (timed when metrics are enabled)."""
+        if self.metrics is None:
+            return dumps_discovery(config, self.compact)
+        start = time.perf_counter_ns()
+        payload = dumps_discovery(config, self.compact)
+        self.metrics.record(STAGE_SERIALIZE, time.perf_counter_ns() - start)
+        return payload
 
     def _build_discovery_topic(self, entity_type: str, entity_id: str, test_mode: bool) -> str:
         """Baut Discovery Topic zusammen"""
@@ -333,15 +394,14 @@ class HomeAssistantGenerator(BaseGenerator):
             prefix = f"test/{prefix}"
         return f"{prefix}/{entity_type}/{entity_id}/config"
 
-    def _build_entity_config(self, name: str, unique_id: str, entity_id: str, state_topic: str,
-                           ecu_addr: str, template: dict[str, Any], dp_config: dict[str, Any],
-                           did: int, entity_type: str = "sensor") -> dict[str, Any]:
-        """Baut Entity-Konfiguration zusammen"""
+    def _build_entity_config(self, entity: EntityPlan, unique_id: str, entity_id: str, state_topic: str,
+                             device: dict[str, Any]) -> dict[str, Any]:
+        """Baut Entity-Konfiguration aus dem kompilierten Plan zusammen"""
         config = {
-            "name": name,
+            "name": entity.name,
             "unique_id": unique_id,
             "object_id": entity_id,
-            "device": self.create_device_info_for_did(ecu_addr, did),
+            "device": device,
             # Basic availability (expects open3e to publish LWT)
             "availability_topic": "open3e/LWT",
             "payload_available": "online",
@@ -349,45 +409,57 @@ class HomeAssistantGenerator(BaseGenerator):
         }
 
         # Stateless entity types (e.g. button) have no state_topic
-        if entity_type not in _STATELESS_ENTITY_TYPES:
+        if entity.entity_type not in _STATELESS_ENTITY_TYPES:
             config["state_topic"] = state_topic
 
+        # Template-Eigenschaften + dp_config overrides (vorab gemerged)
+        config.update(entity.attributes)
+
+        # Origin information
+        config["origin"] = {
+            "name": "Open3E Bridge",
+            "sw_version": _sw_version(),
+            "support_url": "https://github.com/open3e/open3e-bridge",
+        }
+
+        # Schreibbare Entities: command_topic, min/max/step, command_template
+        config.update(entity.command)
+        return config
+
+    def _compile_entity_attributes(self, did: int, template: dict[str, Any], dp_config: dict[str, Any],
+                                   entity_type: str, writable: bool) -> tuple[dict[str, Any], dict[str, Any]]:
+        """Merge template and dp_config keys into the static part of the entity config."""
+        attributes: dict[str, Any] = {}
+
         # Template-Eigenschaften übernehmen
         for key in _ENTITY_KEYS:
             if key in template:
-                config[key] = template[key]
+                attributes[key] = template[key]
 
         # dp_config overrides (payloads, icons, custom value/command templates)
         for key in _ENTITY_KEYS:
             if key in dp_config:
-                config[key] = dp_config[key]
+                attributes[key] = dp_config[key]
 
         # Value template i18n overlay
-        if 'value_template' in config:
-            config['value_template'] = self.get_value_template(did, config['value_template'])
-
-        # Origin information
-        config["origin"] = {
-            "name": "Open3E Bridge",
-            "sw_version": _SW_VERSION,
-            "support_url": "https://github.com/open3e/open3e-bridge",
-        }
+        if 'value_template' in attributes:
+            attributes['value_template'] = self.get_value_template(did, attributes['value_template'])
 
-        # Schreibbare Entities (skip if write-blacklisted)
-        if (dp_config.get('writable') or template.get('writable')) and not self.is_write_blacklisted(did):
-            config["command_topic"] = "open3e/cmnd"
+        # Schreibbare Entities (write-blacklisted DIDs are never writable)
+        command: dict[str, Any] = {}
+        if writable:
+            command["command_topic"] = "open3e/cmnd"
 
             # Min/Max/Step für Number-Entities
             for attr in ['min', 'max', 'step']:
                 if attr in dp_config:
-                    config[attr] = dp_config[attr]
+                    command[attr] = dp_config[attr]
                 elif attr in template:
-                    config[attr] = template[attr]
+                    command[attr] = template[attr]
 
             # Command Template (auto-generated for number entities without explicit template)
-            if template.get('entity_type') == 'number' and 'command_template' not in config:
+            if template.get('entity_type') == 'number' and 'command_template' not in attributes:
                 write_mode = dp_config.get('write_mode', 'write')
-                config["command_template"] = f'{{"mode": "{write_mode}", "data": [[{did}, {{{{ value | float }}}}]]}}'
-
-        return config
+                command["command_template"] = f'{{"mode": "{write_mode}", "data": [[{did}, {{{{ value | float }}}}]]}}'
 
+        return attributes, command
@@ -0,0 +1,96 @@
+"""Compiled entity plan — immutable records built once from the merged config.
+
+The plan is the output of BaseGenerator.compile_plan(): profile, local overlay,
+type templates, translations and user names are merged and resolved up front,
+so discovery generation only has to fill in the per-ECU parts (identifiers,
+topics) of an already finished entity description.
+"""
+from __future__ import annotations
+
+from collections.abc import Iterator, Mapping
+from dataclasses import dataclass
+from typing import Any
+
+
+@dataclass(frozen=True, slots=True)
+class EntityPlan:
+    """One discoverable entity of a datapoint (sub_item None = whole-DID entity)."""
+    did: int
+    sub_item: str | None
+    entity_type: str
+    name: str
+    template: Mapping[str, Any]
+    attributes: Mapping[str, Any]
+    command: Mapping[str, Any]
+
+
+@dataclass(frozen=True, slots=True)
+class CompositePlan:
+    """Multi-DID entity (climate, water_heater) attached to a datapoint."""
+    kind: str
+    name: str
+    config: Mapping[str, Any]
+
+
+@dataclass(frozen=True, slots=True)
+class DatapointPlan:
+    """All entities derived from one configured DID."""
+    did: int
+    device_key: str | None
+    device: Mapping[str, Any] | None
+    trigger_sub: str | None
+    has_subs: bool
+    entity: EntityPlan | None
+    subs: Mapping[str, EntityPlan]
+    climate: CompositePlan | None
+    water_heater: CompositePlan | None
+
+    def resolve(self, sub_item: str | None) -> EntityPlan | None:
+        """Return the entity published for a topic sub-item, if any."""
+        if not sub_item or not self.has_subs:
+            # trigger_sub: only publish discovery for the specified sub-item
+            if self.trigger_sub and sub_item and sub_item != self.trigger_sub:
+                return None
+            return self.entity
+        return self.subs.get(sub_item)
+
+    def entities(self) -> Iterator[EntityPlan]:
+        """Iterate over all entities of this datapoint."""
+        if self.entity is not None:
+            yield self.entity
+        yield from self.subs.values()
+
+
+@dataclass(frozen=True, slots=True)
+class GeneratorPlan:
+    """Compiled view of the complete datapoint configuration."""
+    datapoints: Mapping[int, DatapointPlan]
+    ignored_dids: frozenset[int]
+    write_blacklisted_dids: frozenset[int]
+    identification_dids: frozenset[int]
+
+    def entities(self) -> Iterator[EntityPlan]:
+        """Iterate over all (DID, sub-item) entities in DID order."""
+        for did in sorted(self.datapoints):
+            yield from self.datapoints[did].entities()
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self.entities())
+
+
+def changed_dids(old: GeneratorPlan, new: GeneratorPlan) -> frozenset[int]:
+    """DIDs whose compiled records or ignore status differ between two plans."""
+    dids = {did for did in old.datapoints.keys() | new.datapoints.keys()
+            if old.datapoints.get(did) != new.datapoints.get(did)}
+    dids |= old.ignored_dids ^ new.ignored_dids
+    dids |= old.identification_dids ^ new.identification_dids
+    return frozenset(dids)
+
+
+@dataclass(frozen=True, slots=True)
+class ConfigReload:
+    """Outcome of BaseGenerator.reload_config()."""
+    layers: tuple[str, ...]
+    dids: frozenset[int]
+    # Something every entity depends on changed (translations, default device)
+    everything: bool = False
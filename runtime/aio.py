@@ -0,0 +1,218 @@
+"""asyncio runtime: the whole bridge on one event loop (--runtime asyncio).
+
+The default runtime uses paho's network thread, worker threads for ingest and
+publishing and a threading.Timer for diagnostics. AsyncioRuntime replaces all
+of them with coroutines on a single event loop:
+
+- paho network I/O through its external-loop socket callbacks
+  (add_reader/add_writer + a loop_misc() task for keepalives)
+- ingest and publishing via IngestQueue.serve() / OutboundPublisher.serve()
+- periodic diagnostics and config reload checks as tasks instead of Timers
+- reconnect with exponential backoff
+
+Everything runs on one thread, so the processing order is deterministic.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import signal
+from collections.abc import Awaitable
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from bridge import Open3EBridge
+
+logger = logging.getLogger("open3e_bridge.runtime.aio")
+
+# paho return code of loop_misc() while connected (mqtt.MQTT_ERR_SUCCESS)
+_MQTT_ERR_SUCCESS = 0
+# Same bounds as the threaded runtime (client.reconnect_delay_set)
+_RECONNECT_MIN_DELAY = 1.0
+_RECONNECT_MAX_DELAY = 120.0
+# Reload the config immediately (not available on Windows)
+_RELOAD_SIGNALS = (signal.SIGHUP,) if hasattr(signal, "SIGHUP") else ()
+
+
+class AsyncioRuntime:
+    def __init__(self, bridge: Open3EBridge, misc_interval: float = 1.0):
+        """
+        Args:
+            bridge: Bridge to drive (constructed normally, not yet connected)
+            misc_interval: Seconds between paho loop_misc() calls (keepalive/retries)
+        """
+        self.bridge = bridge
+        self.client = bridge.client
+        self.misc_interval = misc_interval
+        # Replaced in _start() so they belong to the running loop
+        self._stop = asyncio.Event()
+        self._closed = asyncio.Event()
+        self._tasks: list[asyncio.Task] = []
+        self._misc_task: asyncio.Task | None = None
+        # Periodic jobs are driven by this loop, not by threading.Timer
+        bridge._use_timers = False
+
+    # ------------------------------------------------------------------
+    # Entry points
+    # ------------------------------------------------------------------
+
+    def run(self):
+        """Run the bridge until SIGTERM/SIGINT (blocking)."""
+        asyncio.run(self.serve())
+
+    def simulate(self, filepath: str, delay: float = 0.1):
+        """Replay a simulation file (see simulate_from_file) on the event loop."""
+        asyncio.run(self._simulate(filepath, delay))
+
+    def request_stop(self):
+        """Ask serve() to shut down (safe to call from the loop thread)."""
+        self._stop.set()
+
+    async def serve(self):
+        """Connect, run all components until stopped, then shut down gracefully."""
+        await self._start()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            with contextlib.suppress(NotImplementedError, RuntimeError, ValueError):
+                loop.add_signal_handler(sig, self.request_stop)
+        for sig in _RELOAD_SIGNALS:
+            with contextlib.suppress(NotImplementedError, RuntimeError, ValueError):
+                loop.add_signal_handler(sig, self.bridge.reload_config)
+        if self.bridge._diagnostics_interval > 0:
+            self._spawn(self._diagnostics_loop(), "diagnostics")
+        if self.bridge._config_reload_interval > 0:
+            self._spawn(self._config_reload_loop(), "config-reload")
+        try:
+            await self._stop.wait()
+            logger.info("Shutting down gracefully...")
+        finally:
+            for sig in (signal.SIGTERM, signal.SIGINT, *_RELOAD_SIGNALS):
+                with contextlib.suppress(NotImplementedError, RuntimeError, ValueError):
+                    loop.remove_signal_handler(sig)
+            await self._shutdown()
+
+    async def _simulate(self, filepath: str, delay: float):
+        await self._start()
+        try:
+            with open(filepath) as f:
+                for line in f:
+                    line = line.strip()
+                    if not line or line.startswith('#'):
+                        continue
+                    parts = line.split(' ', 1)
+                    if len(parts) == 2:
+                        self.bridge.ingest.submit(*parts)
+                        await asyncio.sleep(delay)
+        finally:
+            await self._shutdown(publish_offline=False)
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    async def _start(self):
+        self._stop = asyncio.Event()
+        self._closed = asyncio.Event()
+        self._attach_socket_callbacks(asyncio.get_running_loop())
+        logger.info("Connecting to MQTT broker %s:%d (asyncio runtime) ...",
+                    self.bridge.mqtt_host, self.bridge.mqtt_port)
+        self.bridge._connect()
+        self._spawn(self.bridge.publisher.serve(), "publisher")
+        self._spawn(self.bridge.ingest.serve(), "ingest")
+        loop = asyncio.get_running_loop()
+        self.bridge.commands.start(loop.call_later)
+        self.bridge._write_schedule = loop.call_later
+        self._misc_task = self._spawn(self._misc_loop(), "mqtt-misc")
+        # Let the component tasks start before traffic arrives
+        await asyncio.sleep(0)
+
+    async def _shutdown(self, timeout: float | None = None, publish_offline: bool = True):
+        """Drain ingest, then publishing, then send the offline LWT and disconnect."""
+        if timeout is None:
+            timeout = self.bridge._shutdown_drain_s
+        # No reconnects while shutting down
+        if self._misc_task is not None:
+            self._misc_task.cancel()
+        await self.bridge.ingest.aclose(timeout)
+        self.bridge.commands.stop()
+        await self.bridge.publisher.aclose(timeout)
+        try:
+            if publish_offline:
+                # Like the thread runtime: PUBACK tracked by the bridge's delivery tracker
+                self.bridge._publish_now(self.bridge.lwt_topic, "offline", qos=1, retain=True)
+            self.client.disconnect()
+        except Exception:  # noqa: S110
+            pass  # best-effort during shutdown
+        # Give the writer a chance to flush the DISCONNECT packet
+        with contextlib.suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(self._closed.wait(), 1.0)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    def _spawn(self, coro: Awaitable[Any], name: str) -> asyncio.Task:
+        task = asyncio.ensure_future(coro)
+        self._tasks.append(task)
+        logger.debug("Started %s task", name)
+        return task
+
+    # ------------------------------------------------------------------
+    # paho external event loop integration
+    # ------------------------------------------------------------------
+
+    def _attach_socket_callbacks(self, loop: asyncio.AbstractEventLoop):
+        client = self.client
+
+        def on_socket_open(_client, _userdata, sock):
+            loop.add_reader(sock, client.loop_read)
+
+        def on_socket_close(_client, _userdata, sock):
+            loop.remove_reader(sock)
+            self._closed.set()
+
+        def on_socket_register_write(_client, _userdata, sock):
+            loop.add_writer(sock, client.loop_write)
+
+        def on_socket_unregister_write(_client, _userdata, sock):
+            loop.remove_writer(sock)
+
+        client.on_socket_open = on_socket_open
+        client.on_socket_close = on_socket_close
+        client.on_socket_register_write = on_socket_register_write
+        client.on_socket_unregister_write = on_socket_unregister_write
+
+    async def _misc_loop(self):
+        """Keepalive pings, QoS retries and reconnect with exponential backoff."""
+        delay = _RECONNECT_MIN_DELAY
+        while True:
+            if self.client.loop_misc() == _MQTT_ERR_SUCCESS:
+                delay = _RECONNECT_MIN_DELAY
+                await asyncio.sleep(self.misc_interval)
+                continue
+            await asyncio.sleep(delay)
+            try:
+                self._closed.clear()
+                logger.info("Reconnecting to MQTT broker ...")
+                self.client.reconnect()
+            except OSError as e:
+                logger.warning("Reconnect failed: %s (next attempt in %.0fs)", e, delay)
+                delay = min(delay * 2, _RECONNECT_MAX_DELAY)
+
+    # ------------------------------------------------------------------
+    # Periodic jobs
+    # ------------------------------------------------------------------
+
+    async def _diagnostics_loop(self):
+        while True:
+            await asyncio.sleep(self.bridge._diagnostics_interval)
+            self.bridge._emit_diagnostics()
+
+    async def _config_reload_loop(self):
+        while True:
+            await asyncio.sleep(self.bridge._config_reload_interval)
+            try:
+                self.bridge.reload_config()
+            except Exception as e:
+                logger.error("Config reload failed: %s", e, exc_info=True)
@@ -0,0 +1,148 @@
+"""Batching of open3e read/write commands (open3e/cmnd).
+
+open3e accepts several DIDs per command: {"mode": "read", "data": [a, b]}
+and {"mode": "write", "data": [[a, x], [b, y]]}. write_and_verify() issues a
+write and a read-back per DID, so changing several setpoints at once used to
+mean two MQTT messages, two open3e requests, per setpoint. The
+CommandCoalescer collects the commands of a short window and sends one
+message per ECU and mode, with at most max_batch DIDs each.
+
+Order within a window, per ECU: the writes in arrival order, then the
+reads. Consecutive writes of the same mode share a message; a change of mode
+(write, write-raw) starts a new one, so writes of different modes are never
+reordered. A read is only ever sent later than it was issued, so a read-back
+never overtakes the write it verifies. Duplicate reads of a DID are merged.
+The bridge's commands carry no "addr" (like the generated command templates),
+so grouping by ECU only keeps DIDs of different ECUs apart.
+
+The window is timed by a threading.Timer (thread runtime) or the event loop
+(asyncio runtime, which passes its call_later). Until start() is called every
+command is sent right away, which keeps offline modes and unit tests
+synchronous.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import threading
+from collections.abc import Callable
+from typing import Any
+
+logger = logging.getLogger("open3e_bridge.runtime.commands")
+
+READ_MODE = "read"
+
+
+def start_timer(delay: float, callback: Callable[[], Any]) -> threading.Timer:
+    """Default schedule(): run callback on a daemon threading.Timer."""
+    timer = threading.Timer(delay, callback)
+    timer.daemon = True
+    timer.start()
+    return timer
+
+
+class CommandCoalescer:
+    def __init__(self, send: Callable[[str], Any], window_s: float = 0.05, max_batch: int = 10):
+        """
+        Args:
+            send: Publishes one command payload (JSON) on open3e/cmnd
+            window_s: How long commands are collected before they are sent (0 = no batching)
+            max_batch: Max DIDs per command message
+        """
+        self.send = send
+        self.window_s = window_s
+        self.max_batch = max(1, max_batch)
+        self._lock = threading.Lock()
+        self._schedule: Callable[[float, Callable[[], Any]], Any] | None = None
+        self._scheduled = False
+        # ecu -> (write batches [(mode, [DID, value] pairs)] in arrival order, DIDs to read)
+        self._pending: dict[str, tuple[list[tuple[str, list[Any]]], list[Any]]] = {}
+
+        # Metrics
+        self.commands = 0
+        self.messages = 0
+        self.max_batch_seen = 0
+
+    def start(self, schedule: Callable[[float, Callable[[], Any]], Any] = start_timer):
+        """Batch from now on; schedule(delay, callback) times the window."""
+        if self.window_s > 0:
+            self._schedule = schedule
+
+    def stop(self):
+        """Send what is pending and stop batching."""
+        self._schedule = None
+        self.flush()
+
+    # ------------------------------------------------------------------
+    # Submitting
+    # ------------------------------------------------------------------
+
+    def read(self, ecu: str, did: int):
+        self._add(ecu, READ_MODE, did)
+
+    def write(self, ecu: str, did: int, value: Any, mode: str = "write"):
+        self._add(ecu, mode, [did, value])
+
+    def _add(self, ecu: str, mode: str, item: Any):
+        with self._lock:
+            self.commands += 1
+            if self._schedule is None:
+                self._send(mode, [item])
+                return
+            writes, reads = self._pending.setdefault(ecu, ([], []))
+            if mode == READ_MODE:
+                if item in reads:
+                    return
+                items = reads
+            else:
+                if not writes or writes[-1][0] != mode:
+                    # Another write mode: a new message, so writes keep their order
+                    writes.append((mode, []))
+                items = writes[-1][1]
+            items.append(item)
+            if len(items) >= self.max_batch:
+                # A full batch goes out now, with everything queued before it
+                self._flush()
+            elif not self._scheduled:
+                self._scheduled = True
+                self._schedule(self.window_s, self.flush)
+
+    def flush(self):
+        with self._lock:
+            self._scheduled = False
+            self._flush()
+
+    def _flush(self):
+        """Send all pending commands. Caller holds the lock (keeps concurrent flushes in order)."""
+        pending, self._pending = self._pending, {}
+        for writes, reads in pending.values():
+            for mode, items in [*writes, (READ_MODE, reads)]:
+                for i in range(0, len(items), self.max_batch):
+                    self._send(mode, items[i:i + self.max_batch])
+
+    def _send(self, mode: str, items: list[Any]):
+        self.messages += 1
+        self.max_batch_seen = max(self.max_batch_seen, len(items))
+        try:
+            self.send(json.dumps({"mode": mode, "data": items}))
+        except Exception as e:
+            logger.warning("Sending %s command failed: %s", mode, e)
+
+    # ------------------------------------------------------------------
+    # Metrics
+    # ------------------------------------------------------------------
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            pending = sum(len(reads) + sum(len(items) for _, items in writes)
+                          for writes, reads in self._pending.values())
+            return {
+                "window_ms": round(self.window_s * 1000, 1),
+                "max_batch": self.max_batch,
+                "commands": self.commands,
+                "messages": self.messages,
+                "pending": pending,
+                # Messages not sent thanks to batching
+                "saved": self.commands - self.messages - pending,
+                "largest_batch": self.max_batch_seen,
+            }
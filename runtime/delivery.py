@@ -0,0 +1,103 @@
+"""Delivery tracking for QoS 1 publishes: publish -> PUBACK latency.
+
+client.publish() returns an MQTTMessageInfo; for QoS 1 the broker's PUBACK
+later arrives as on_publish(mid). DeliveryTracker keeps the send time per mid
+until then, so the bridge knows how many messages are in flight (the figure
+paho's max_inflight limits), how long the broker takes to acknowledge them,
+and which never made it: rejected by paho (queue full) or by the broker (MQTT
+v5 PUBACK reason code >= 0x80).
+
+paho calls on_publish on its network thread while holding its own message
+lock, so publish() must not be wrapped in a lock the callback also takes. A
+PUBACK can thus arrive before track() has registered its mid; such early
+acknowledgements are parked briefly and matched when track() runs. QoS 0
+publishes report on_publish too; their mids end up in the same bounded
+buffer and are never matched.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from typing import Any
+
+from runtime.metrics import LatencyHistogram
+
+# paho MQTT_ERR_QUEUE_SIZE: the message was not queued (max_queued_messages reached)
+_ERR_QUEUE_SIZE = 15
+# Unmatched acknowledgements kept for a track() that has not run yet
+_EARLY_ACKS = 256
+
+
+class DeliveryTracker:
+    def __init__(self, overdue_s: float = 30.0, clock: Callable[[], int] = time.perf_counter_ns):
+        """
+        Args:
+            overdue_s: In-flight messages older than this are reported as overdue
+            clock: Nanosecond time source (tests)
+        """
+        self.overdue_s = overdue_s
+        self._clock = clock
+        self._lock = threading.Lock()
+        # mid -> (send time ns, topic)
+        self._in_flight: dict[int, tuple[int, str]] = {}
+        self._early: OrderedDict[int, tuple[int, bool]] = OrderedDict()  # mid -> (ack time ns, failed)
+        self._latency = LatencyHistogram()
+        self.tracked = 0
+        self.acknowledged = 0
+        self.failed = 0
+        self.max_in_flight = 0
+
+    def start(self) -> int:
+        """Timestamp to pass to track(); taken right before client.publish()."""
+        return self._clock()
+
+    def track(self, info: Any, topic: str, sent_ns: int) -> None:
+        """Register the MQTTMessageInfo of a QoS 1 publish."""
+        with self._lock:
+            self.tracked += 1
+            if getattr(info, "rc", 0) == _ERR_QUEUE_SIZE:
+                self.failed += 1
+                return
+            early = self._early.pop(info.mid, None)
+            if early is not None and early[0] >= sent_ns:
+                self._acknowledge(sent_ns, early[0], early[1])
+                return
+            self._in_flight[info.mid] = (sent_ns, topic)
+            self.max_in_flight = max(self.max_in_flight, len(self._in_flight))
+
+    def acknowledged_mid(self, mid: int, reason_code: Any = 0) -> None:
+        """on_publish: the broker acknowledged `mid` (reason_code from the v5 PUBACK)."""
+        now = self._clock()
+        failed = bool(getattr(reason_code, "is_failure", False))
+        with self._lock:
+            sent = self._in_flight.pop(mid, None)
+            if sent is None:
+                self._early[mid] = (now, failed)
+                if len(self._early) > _EARLY_ACKS:
+                    self._early.popitem(last=False)
+                return
+            self._acknowledge(sent[0], now, failed)
+
+    def _acknowledge(self, sent_ns: int, ack_ns: int, failed: bool) -> None:
+        if failed:
+            self.failed += 1
+            return
+        self.acknowledged += 1
+        self._latency.record(ack_ns - sent_ns)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            now = self._clock()
+            ages = [now - sent for sent, _ in self._in_flight.values()]
+            return {
+                "tracked": self.tracked,
+                "acknowledged": self.acknowledged,
+                "failed": self.failed,
+                "in_flight": len(self._in_flight),
+                "max_in_flight": self.max_in_flight,
+                "overdue": sum(1 for age in ages if age > self.overdue_s * 1e9),
+                "oldest_in_flight_s": round(max(ages, default=0) / 1e9, 3),
+                "ack_latency": self._latency.snapshot(),
+            }
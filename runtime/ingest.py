@@ -0,0 +1,280 @@
+"""Inbound message queue between the paho network thread and processing.
+
+paho calls on_message from its network loop; processing a message there
+(discovery generation, logging, publishing) delays keepalives and acks. The
+IngestQueue takes decoded messages from on_message and hands them to worker
+threads. Each worker owns one partition and messages are partitioned by ECU,
+so all messages of one DID are processed in arrival order.
+
+Per topic only the newest value is kept: a message arriving for a topic that
+is still queued replaces the queued payload in place. When a partition is
+full, the overflow policy decides whether the oldest queued topic
+("drop-oldest") or the incoming message ("drop-new") is dropped.
+
+The workers are either threads (start()) or a single task on an asyncio
+event loop that serves all partitions in turn (serve(), used by the asyncio
+runtime). Until one of them runs, submit() processes messages synchronously,
+which keeps offline modes and unit tests deterministic.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from collections.abc import Callable
+from typing import TYPE_CHECKING, Any
+
+# asyncio is only imported by serve()/aclose(): the thread runtime never loads it
+if TYPE_CHECKING:
+    import asyncio
+
+logger = logging.getLogger("open3e_bridge.runtime.ingest")
+
+OVERFLOW_POLICIES = ("drop-oldest", "drop-new")
+
+
+def ecu_partition_key(topic: str) -> str:
+    """Partition key for an open3e topic: the ECU address ("open3e/680_268_X" -> "680").
+
+    Non-open3e topics (e.g. homeassistant/status) share the empty key.
+    """
+    parts = topic.split('/', 2)
+    if len(parts) < 2 or parts[0] != 'open3e':
+        return ""
+    return parts[1].split('_', 1)[0]
+
+
+class _Partition:
+    """One worker's queue: topic -> (payload, enqueue time), oldest first."""
+    __slots__ = ("queue", "thread", "processed", "superseded", "overflowed")
+
+    def __init__(self):
+        self.queue: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self.thread: threading.Thread | None = None
+        self.processed = 0
+        self.superseded = 0
+        self.overflowed = 0
+
+
+class IngestQueue:
+    def __init__(self, handler: Callable[[str, str], Any], workers: int = 1,
+                 max_depth: int = 1000, overflow: str = "drop-oldest",
+                 partition_key: Callable[[str], str] = ecu_partition_key):
+        """
+        Args:
+            handler: Called as handler(topic, payload) for every message
+            workers: Number of worker threads (= partitions)
+            max_depth: Max queued topics per partition
+            overflow: "drop-oldest" or "drop-new"
+            partition_key: Maps a topic to the key used for partitioning
+        """
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        self.handler = handler
+        self.max_depth = max_depth
+        self.overflow = overflow
+        self.partition_key = partition_key
+        self._partitions = [_Partition() for _ in range(max(1, workers))]
+        self._cond = threading.Condition()
+        self._wakeup: asyncio.Event | None = None
+        self._running = False
+
+        # Lag metrics (seconds between submit and start of processing)
+        self._lag_last = 0.0
+        self._lag_max = 0.0
+        self._lag_avg = 0.0
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def start(self):
+        """Start the worker threads; from now on submit() only enqueues."""
+        if self._running:
+            return
+        self._running = True
+        for index, part in enumerate(self._partitions):
+            part.thread = threading.Thread(target=self._run, args=(part,),
+                                           name=f"open3e-ingest-{index}", daemon=True)
+            part.thread.start()
+        logger.debug("Ingest queue started (workers=%d, max_depth=%d, overflow=%s)",
+                     len(self._partitions), self.max_depth, self.overflow)
+
+    def drain(self, timeout: float = 5.0) -> bool:
+        """Wait until all queued messages are processed. Returns False on timeout."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._depth():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._running:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def stop(self, timeout: float = 5.0):
+        """Process what is queued (bounded by timeout), then stop the workers."""
+        if not self._running:
+            return
+        if not self.drain(timeout):
+            logger.warning("Ingest queue not drained within %.1fs, dropping %d messages",
+                           timeout, self.depth())
+        self._halt()
+        for part in self._partitions:
+            if part.thread is not None:
+                part.thread.join(timeout=1.0)
+                part.thread = None
+
+    async def serve(self):
+        """Process all partitions round-robin on the current event loop instead of threads."""
+        import asyncio
+
+        self._running = True
+        self._wakeup = asyncio.Event()
+        index = 0
+        try:
+            while self._running:
+                item = None
+                with self._cond:
+                    for offset in range(len(self._partitions)):
+                        part = self._partitions[(index + offset) % len(self._partitions)]
+                        if part.queue:
+                            item = (part, *self._take(part))
+                            index += offset + 1
+                            break
+                if item is None:
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                    continue
+                self._process(*item)
+                # Let network I/O and other tasks run between messages
+                await asyncio.sleep(0)
+        finally:
+            self._wakeup = None
+
+    async def aclose(self, timeout: float = 5.0):
+        """Async counterpart of stop() for a queue running via serve()."""
+        import asyncio
+
+        deadline = time.monotonic() + timeout
+        while self._running and self.depth() and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+        if self.depth():
+            logger.warning("Ingest queue not drained within %.1fs, dropping %d messages",
+                           timeout, self.depth())
+        self._halt()
+
+    def _halt(self):
+        """Stop the workers and drop everything still queued."""
+        with self._cond:
+            self._running = False
+            for part in self._partitions:
+                part.overflowed += len(part.queue)
+                part.queue.clear()
+            self._cond.notify_all()
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    # ------------------------------------------------------------------
+    # Submitting
+    # ------------------------------------------------------------------
+
+    def submit(self, topic: str, payload: str) -> bool:
+        """Queue a message for processing. Returns False if it was dropped."""
+        if not self._running:
+            self.handler(topic, payload)
+            return True
+        key = self.partition_key(topic)
+        part = self._partitions[zlib.crc32(key.encode()) % len(self._partitions)]
+        with self._cond:
+            queued = part.queue.get(topic)
+            if queued is not None:
+                # Newer value supersedes the queued one, keep position and age
+                part.queue[topic] = (payload, queued[1])
+                part.superseded += 1
+                return True
+            if len(part.queue) >= self.max_depth:
+                part.overflowed += 1
+                if self.overflow == "drop-new":
+                    logger.warning("Ingest queue full, dropping message for %s", topic)
+                    return False
+                dropped, _ = part.queue.popitem(last=False)
+                logger.warning("Ingest queue full, dropped oldest message for %s", dropped)
+            part.queue[topic] = (payload, time.monotonic())
+            self._cond.notify_all()
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return True
+
+    # ------------------------------------------------------------------
+    # Worker
+    # ------------------------------------------------------------------
+
+    def _run(self, part: _Partition):
+        while True:
+            with self._cond:
+                while self._running and not part.queue:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                topic, payload = self._take(part)
+            self._process(part, topic, payload)
+
+    def _take(self, part: _Partition) -> tuple[str, str]:
+        """Pop the oldest message of a partition. Caller holds the lock."""
+        topic, (payload, enqueued) = part.queue.popitem(last=False)
+        self._record_lag(time.monotonic() - enqueued)
+        return topic, payload
+
+    def _process(self, part: _Partition, topic: str, payload: str):
+        try:
+            self.handler(topic, payload)
+        except Exception as e:
+            logger.error("Unexpected error processing %s: %s", topic, e, exc_info=True)
+        with self._cond:
+            part.processed += 1
+            # Wake up drain() waiters
+            self._cond.notify_all()
+
+    def _record_lag(self, lag: float):
+        self._lag_last = lag
+        self._lag_max = max(self._lag_max, lag)
+        # Exponentially weighted moving average over roughly the last 100 messages
+        self._lag_avg += (lag - self._lag_avg) * 0.01
+
+    # ------------------------------------------------------------------
+    # Metrics
+    # ------------------------------------------------------------------
+
+    def _depth(self) -> int:
+        return sum(len(part.queue) for part in self._partitions)
+
+    def depth(self) -> int:
+        """Number of queued messages across all partitions."""
+        with self._cond:
+            return self._depth()
+
+    def stats(self) -> dict[str, Any]:
+        """Queue depth, lag and drop counters for diagnostics."""
+        with self._cond:
+            now = time.monotonic()
+            oldest = min((next(iter(p.queue.values()))[1] for p in self._partitions if p.queue),
+                         default=None)
+            return {
+                "workers": len(self._partitions),
+                "depth": [len(p.queue) for p in self._partitions],
+                "processed": sum(p.processed for p in self._partitions),
+                "superseded": sum(p.superseded for p in self._partitions),
+                "overflowed": sum(p.overflowed for p in self._partitions),
+                "lag_s": {
+                    "last": round(self._lag_last, 4),
+                    "avg": round(self._lag_avg, 4),
+                    "max": round(self._lag_max, 4),
+                    "oldest": round(now - oldest, 4) if oldest is not None else 0.0,
+                },
+            }
@@ -0,0 +1,185 @@
+"""Per-stage latency histograms for the message pipeline.
+
+process_message() times its stages (parse, discovery lookup or generation,
+publish) and the generator times JSON serialization. Recording only appends
+the raw timings to a bounded buffer, which costs about as much as one dict
+lookup and needs no lock (deque.append is atomic). The buffer is folded into
+fixed-bucket histograms (1-2-5 steps from 1 µs to 5 s) whenever a snapshot is
+taken or it holds `window` timings, so memory stays constant however long the
+bridge runs and the percentiles cover every message since the start.
+
+Percentiles are reported as the upper bound of the bucket they fall into,
+capped at the observed maximum. Messages slower than a threshold are kept as
+samples (topic and per-stage breakdown) in a small ring buffer, for finding
+the topic behind a p99 spike.
+"""
+from __future__ import annotations
+
+import bisect
+import threading
+import time
+from collections import deque
+from typing import Any
+
+# Pipeline stages, in processing order
+STAGE_PARSE = "parse"          # NRC check + topic -> ECU/DID/sub-item
+STAGE_LOOKUP = "lookup"        # discovery served from the cache (steady state)
+STAGE_GENERATE = "generate"    # discovery cache miss, including serialize
+STAGE_SERIALIZE = "serialize"  # json.dumps of one discovery config
+STAGE_PUBLISH = "publish"      # handing changed discovery configs to the publisher
+STAGE_TOTAL = "total"          # whole process_message()
+
+STAGES = (STAGE_PARSE, STAGE_LOOKUP, STAGE_GENERATE, STAGE_SERIALIZE, STAGE_PUBLISH, STAGE_TOTAL)
+
+# Bucket upper bounds in ns: 1, 2, 5, 10, 20, 50 ... 5_000_000 µs; one overflow bucket above
+BUCKET_BOUNDS_NS = tuple(step * 10 ** exp * 1000 for exp in range(7) for step in (1, 2, 5))
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram."""
+
+    __slots__ = ("counts", "total_ns", "max_ns")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS_NS) + 1)
+        self.total_ns = 0
+        self.max_ns = 0
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def record(self, ns: int) -> None:
+        self.counts[bisect.bisect_left(BUCKET_BOUNDS_NS, ns)] += 1
+        self.total_ns += ns
+        if ns > self.max_ns:
+            self.max_ns = ns
+
+    def percentile(self, q: float) -> int:
+        """Upper bucket bound (ns) below which a share q of the samples fall."""
+        count = self.count
+        if not count:
+            return 0
+        rank = q * count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n:
+                bound = BUCKET_BOUNDS_NS[i] if i < len(BUCKET_BOUNDS_NS) else self.max_ns
+                return min(bound, self.max_ns)
+        return self.max_ns
+
+    def snapshot(self) -> dict[str, Any]:
+        count = self.count
+        return {
+            "count": count,
+            "p50_us": round(self.percentile(0.50) / 1000, 1),
+            "p95_us": round(self.percentile(0.95) / 1000, 1),
+            "p99_us": round(self.percentile(0.99) / 1000, 1),
+            "max_us": round(self.max_ns / 1000, 1),
+            "mean_us": round(self.total_ns / count / 1000, 1) if count else 0.0,
+        }
+
+
+class StageMetrics:
+    def __init__(self, slow_threshold_s: float = 0.05, slow_samples: int = 10, window: int = 8192):
+        """
+        Args:
+            slow_threshold_s: Messages taking longer than this in total are sampled
+            slow_samples: Number of slow-message samples kept (oldest dropped first)
+            window: Raw timings buffered before they are folded into the histograms
+        """
+        self.slow_threshold_ns = int(slow_threshold_s * 1e9)
+        self.window = window
+        self._histograms = {stage: LatencyHistogram() for stage in STAGES}
+        # (total, parse, discovery, publish, generated) per message / (stage, ns) per single timing
+        self._messages: deque[tuple[int, int, int, int, bool]] = deque()
+        self._timings: deque[tuple[str, int]] = deque()
+        self._slow: deque[dict[str, Any]] = deque(maxlen=slow_samples)
+        self._slow_count = 0
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, ns: int) -> None:
+        """Record a single stage timing."""
+        timings = self._timings
+        timings.append((stage, ns))
+        if len(timings) >= self.window:
+            with self._lock:
+                self._fold()
+
+    def record_message(self, topic: str, total_ns: int, parse_ns: int = 0, discovery_ns: int = 0,
+                       publish_ns: int = 0, generated: bool = False) -> None:
+        """Record one processed message; stages that did not run are passed as 0.
+
+        discovery_ns counts as generate if the generator had to build the
+        discovery configs (cache miss), else as lookup.
+        """
+        messages = self._messages
+        messages.append((total_ns, parse_ns, discovery_ns, publish_ns, generated))
+        if len(messages) >= self.window:
+            with self._lock:
+                self._fold()
+        if total_ns >= self.slow_threshold_ns:
+            self._record_slow(topic, total_ns, {
+                STAGE_PARSE: parse_ns,
+                STAGE_GENERATE if generated else STAGE_LOOKUP: discovery_ns,
+                STAGE_PUBLISH: publish_ns,
+            })
+
+    def _record_slow(self, topic: str, total_ns: int, breakdown: dict[str, int]) -> None:
+        with self._lock:
+            self._slow_count += 1
+            self._slow.append({
+                "topic": topic,
+                "at": time.time(),
+                "total_ms": round(total_ns / 1e6, 3),
+                "stages_ms": {stage: round(ns / 1e6, 3) for stage, ns in breakdown.items() if ns},
+            })
+
+    def _fold(self) -> None:
+        """Move buffered timings into the histograms (caller holds the lock)."""
+        h = self._histograms
+        total, parse, lookup, generate, publish = (h[STAGE_TOTAL], h[STAGE_PARSE], h[STAGE_LOOKUP],
+                                                   h[STAGE_GENERATE], h[STAGE_PUBLISH])
+        messages, timings = self._messages, self._timings
+        while True:
+            try:
+                total_ns, parse_ns, discovery_ns, publish_ns, generated = messages.popleft()
+            except IndexError:
+                break
+            total.record(total_ns)
+            if parse_ns:
+                parse.record(parse_ns)
+            if discovery_ns:
+                (generate if generated else lookup).record(discovery_ns)
+            if publish_ns:
+                publish.record(publish_ns)
+        while True:
+            try:
+                stage, ns = timings.popleft()
+            except IndexError:
+                break
+            h[stage].record(ns)
+
+    def snapshot(self) -> dict[str, Any]:
+        """Percentiles per stage plus the slow-message samples (JSON-serializable)."""
+        with self._lock:
+            self._fold()
+            return {
+                "stages": {stage: h.snapshot() for stage, h in self._histograms.items()},
+                "slow_threshold_ms": round(self.slow_threshold_ns / 1e6, 3),
+                "slow_messages": self._slow_count,
+                "slow_samples": list(self._slow),
+            }
+
+    def summary(self) -> dict[str, Any]:
+        """Compact form for the health entity: p50/p95/p99/max per recorded stage."""
+        with self._lock:
+            self._fold()
+            summary: dict[str, Any] = {}
+            for stage, h in self._histograms.items():
+                if h.count:
+                    snap = h.snapshot()
+                    summary[stage] = {k: snap[k] for k in ("p50_us", "p95_us", "p99_us", "max_us")}
+            summary["slow_messages"] = self._slow_count
+            return summary
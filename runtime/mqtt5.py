@@ -0,0 +1,168 @@
+"""MQTT v5 transport features (--mqtt5).
+
+- Topic aliases: a topic published repeatedly (open3e/cmnd, COP, health,
+  discovery configs republished after an HA restart) is mapped to a 2-byte
+  alias; later publishes send an empty topic plus the alias. Aliases belong to
+  one network connection, so the table is reset on every (dis)connect and
+  sized by the broker's Topic Alias Maximum from the CONNACK. Only QoS 0
+  messages are aliased: paho resends QoS 1 messages after a reconnect, where
+  an alias from the old connection would be a protocol error.
+- Message expiry: transient messages (diagnostics) carry a Message Expiry
+  Interval, so the broker drops a stale retained copy when the bridge is gone.
+- Session expiry for persistent sessions (clean_start=False).
+- Reason codes: paho reports v5 reason codes for both protocol versions;
+  connect_hint()/disconnect_hint() turn the common failures into advice.
+"""
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Any
+
+# How long the broker keeps a persistent session after the connection is gone
+SESSION_EXPIRY_S = 86400
+
+# Bytes a PUBLISH carries for the Topic Alias property (identifier + 2-byte value)
+_ALIAS_PROPERTY_BYTES = 3
+
+# CONNACK reason codes (paho maps MQTT 3.1.1 return codes onto these)
+CONNECT_HINTS = {
+    0x84: "unsupported protocol version — the broker does not speak MQTT v5, drop --mqtt5",
+    0x85: "client identifier not valid — check --client-id",
+    0x86: "bad username or password — check --mqtt-user and --mqtt-password (or MQTT_PASSWORD env var)",
+    0x87: "not authorized — check MQTT broker ACL configuration",
+    0x88: "server unavailable",
+    0x89: "server busy — retrying",
+    0x8A: "banned by the broker",
+    0x8C: "bad authentication method",
+    0x9C: "use another server (see the broker's server reference)",
+    0x9D: "server moved (see the broker's server reference)",
+    0x9F: "connection rate exceeded — retrying with backoff",
+}
+
+# DISCONNECT reason codes sent by the broker
+DISCONNECT_HINTS = {
+    0x89: "server busy",
+    0x8B: "server shutting down",
+    0x8D: "keep alive timeout",
+    0x8E: "session taken over — another client connected with the same --client-id",
+    0x93: "receive maximum exceeded",
+    0x94: "topic alias invalid — topic aliases disabled for this run",
+    0x95: "packet too large",
+    0x96: "message rate too high — consider --publish-rate",
+    0x97: "quota exceeded",
+    0x9C: "use another server",
+    0x9D: "server moved",
+}
+
+# Disconnect reason: the broker rejected an alias
+TOPIC_ALIAS_INVALID = 0x94
+
+
+def _code(reason_code: Any) -> int:
+    """Numeric value of a paho ReasonCode (or a plain int)."""
+    return int(getattr(reason_code, "value", reason_code) or 0)
+
+
+def connect_hint(reason_code: Any) -> str:
+    return CONNECT_HINTS.get(_code(reason_code), "")
+
+
+def disconnect_hint(reason_code: Any) -> str:
+    return DISCONNECT_HINTS.get(_code(reason_code), "")
+
+
+def connect_properties(session_expiry: int) -> Any:
+    """CONNECT properties for a persistent v5 session."""
+    from paho.mqtt.packettypes import PacketTypes
+    from paho.mqtt.properties import Properties
+
+    properties = Properties(PacketTypes.CONNECT)
+    properties.SessionExpiryInterval = session_expiry
+    return properties
+
+
+class TopicAliases:
+    def __init__(self, maximum: int = 32, hot_after: int = 2):
+        """
+        Args:
+            maximum: Aliases the bridge uses at most (capped by the broker's maximum)
+            hot_after: Publishes of a topic before it gets an alias
+        """
+        self.maximum = maximum
+        self.hot_after = hot_after
+        # Serializes alias decisions with the publish itself: a reset() in between
+        # would send an alias the new connection does not know
+        self._lock = threading.Lock()
+        self._limit = 0
+        self._aliases: OrderedDict[str, int] = OrderedDict()  # topic -> alias, least recently used first
+        self._counts: dict[str, int] = {}
+        self.enabled = True
+        # Savings report
+        self.aliased_publishes = 0
+        self.alias_assignments = 0
+        self.bytes_saved = 0
+
+    def reset(self, broker_maximum: int = 0):
+        """New connection (CONNACK Topic Alias Maximum) or disconnect (0: no aliases)."""
+        with self._lock:
+            self._limit = min(self.maximum, broker_maximum) if self.enabled else 0
+            self._aliases.clear()
+
+    def disable(self):
+        with self._lock:
+            self.enabled = False
+            self._limit = 0
+            self._aliases.clear()
+
+    def publish(self, client: Any, topic: str, payload: Any, qos: int = 0, retain: bool = False,
+                expiry: int = 0) -> Any:
+        """client.publish() with a topic alias for hot topics and an optional message expiry."""
+        with self._lock:
+            alias, send_topic = self._alias(topic) if qos == 0 else (0, topic)
+            properties = None
+            if alias or expiry:
+                from paho.mqtt.packettypes import PacketTypes
+                from paho.mqtt.properties import Properties
+
+                properties = Properties(PacketTypes.PUBLISH)
+                if alias:
+                    properties.TopicAlias = alias
+                if expiry:
+                    properties.MessageExpiryInterval = expiry
+            return client.publish(send_topic, payload, qos=qos, retain=retain, properties=properties)
+
+    def _alias(self, topic: str) -> tuple[int, str]:
+        """(alias, topic to send): ("" once the broker knows the alias). Caller holds the lock."""
+        if not self._limit:
+            return 0, topic
+        alias = self._aliases.get(topic)
+        if alias is not None:
+            self._aliases.move_to_end(topic)
+            self.aliased_publishes += 1
+            self.bytes_saved += len(topic.encode("utf-8")) - _ALIAS_PROPERTY_BYTES
+            return alias, ""
+        count = self._counts.get(topic, 0) + 1
+        self._counts[topic] = count
+        if count < self.hot_after:
+            return 0, topic
+        if len(self._aliases) < self._limit:
+            alias = len(self._aliases) + 1
+        else:
+            # Remap the least recently used alias: the full topic is sent once more
+            _, alias = self._aliases.popitem(last=False)
+        self._aliases[topic] = alias
+        self.alias_assignments += 1
+        self.bytes_saved -= _ALIAS_PROPERTY_BYTES
+        return alias, topic
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "topic_aliases": len(self._aliases),
+                "alias_limit": self._limit,
+                "aliased_publishes": self.aliased_publishes,
+                "alias_assignments": self.alias_assignments,
+                # Topic bytes not sent minus the alias properties added
+                "bytes_saved": self.bytes_saved,
+            }
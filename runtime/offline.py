@@ -0,0 +1,265 @@
+"""Disk-backed buffer for outbound messages while the broker is unreachable.
+
+Without it, write commands published during an outage pile up in paho's
+unbounded in-memory queue, and QoS 0 updates (COP, health) are dropped. With
+--offline-buffer, the bridge hands those messages to an OfflineBuffer while
+disconnected. The buffer appends them as JSON lines to a file, so they also
+survive a restart of the bridge. Once the bridge is connected again,
+_on_connect replays them in their original order.
+
+- Commands (open3e/cmnd) are kept in order, each one.
+- Derived values (COP, health, diagnostics) are coalesced per topic: only the
+  newest value survives, at the position of its last update.
+- Discovery configs are not buffered; they are retained and republished.
+
+The file is append-only. Superseded and expired lines are removed by a
+compaction (rewrite plus rename) when the file outgrows max_bytes. If the
+live messages alone still exceed max_messages or max_bytes, new commands are
+dropped and counted. Commands older than max_age_s are not replayed: writing
+an hour-old setpoint to the heat pump would surprise more than it helps.
+Lines are flushed, not fsynced, so a crash of the bridge loses nothing but a
+power cut may lose the last writes.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any
+
+logger = logging.getLogger("open3e_bridge.runtime.offline")
+
+
+@dataclass(slots=True)
+class BufferedMessage:
+    """One buffered publish, as stored on disk (one JSON object per line)."""
+    topic: str
+    payload: str
+    qos: int = 0
+    retain: bool = False
+    priority: int = 0
+    # Only the newest message per topic is kept
+    coalesce: bool = False
+    # Wall-clock time of the original publish, survives restarts
+    created: float = 0.0
+    expiry: int = 0
+
+    def line(self) -> bytes:
+        return (json.dumps(asdict(self), ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+class OfflineBuffer:
+    def __init__(self, path: str | Path, max_messages: int = 1000, max_bytes: int = 1 << 20,
+                 max_age_s: float = 3600.0, clock: Callable[[], float] = time.time):
+        """
+        Args:
+            path: Buffer file (created with its directory when needed)
+            max_messages: Max buffered messages after coalescing
+            max_bytes: Max size of the buffer file; larger files are compacted
+            max_age_s: Messages older than this are discarded instead of replayed
+            clock: Wall-clock time source (tests)
+        """
+        self.path = Path(path)
+        self.max_messages = max_messages
+        self.max_bytes = max_bytes
+        self.max_age_s = max_age_s
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.online = False
+        # seq -> message, oldest first; a coalesced topic points at its newest seq
+        self._messages: dict[int, BufferedMessage] = {}
+        self._latest: dict[str, int] = {}
+        self._seq = 0
+        self._live_bytes = 0
+        self._file_bytes = 0
+
+        # Metrics
+        self.buffered = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.expired = 0
+        self.replayed = 0
+        self.compactions = 0
+        self.corrupt = 0
+        self.last_replay_s: float | None = None
+
+        self._load()
+
+    # ------------------------------------------------------------------
+    # Connection state
+    # ------------------------------------------------------------------
+
+    def offer(self, msg: BufferedMessage) -> bool:
+        """Buffer msg while offline. Returns False when online: the caller publishes it."""
+        with self._lock:
+            if self.online:
+                return False
+            if not msg.created:
+                msg.created = self._clock()
+            self._store(msg)
+            return True
+
+    def go_online(self, publish: Callable[[BufferedMessage], Any]) -> int:
+        """Replay the buffered messages through publish(), oldest first, then pass messages through.
+
+        Runs under the lock, so a message offered concurrently is either replayed
+        or published after the replay, never buffered and forgotten.
+        """
+        with self._lock:
+            self.online = True
+            if not self._messages:
+                return 0
+            start = time.monotonic()
+            cutoff = self._clock() - self.max_age_s
+            replayed = 0
+            for msg in self._messages.values():
+                if msg.created < cutoff:
+                    self.expired += 1
+                    continue
+                try:
+                    publish(msg)
+                    replayed += 1
+                except Exception as e:
+                    logger.warning("Replay of buffered message for %s failed: %s", msg.topic, e)
+            self.replayed += replayed
+            self._clear()
+            self.last_replay_s = time.monotonic() - start
+        logger.info("Replayed %d buffered messages in %.3fs", replayed, self.last_replay_s)
+        return replayed
+
+    def go_offline(self):
+        with self._lock:
+            self.online = False
+
+    # ------------------------------------------------------------------
+    # Storage
+    # ------------------------------------------------------------------
+
+    def _store(self, msg: BufferedMessage, persist: bool = True):
+        """Add msg to the index and append it to the file. Caller holds the lock."""
+        line = msg.line()
+        previous = self._latest.get(msg.topic) if msg.coalesce else None
+        if previous is None and not self._has_room(len(line)):
+            self.dropped += 1
+            logger.warning("Offline buffer full, dropping message for %s", msg.topic)
+            return
+        if previous is not None:
+            self._live_bytes -= len(self._messages.pop(previous).line())
+            self.coalesced += 1
+        self._seq += 1
+        self._messages[self._seq] = msg
+        if msg.coalesce:
+            self._latest[msg.topic] = self._seq
+        self._live_bytes += len(line)
+        if not persist:
+            return
+        self.buffered += 1
+        if self._file_bytes + len(line) > self.max_bytes:
+            self._compact()
+        else:
+            self._append(line)
+
+    def _has_room(self, size: int) -> bool:
+        if len(self._messages) >= self.max_messages or self._live_bytes + size > self.max_bytes:
+            # Expired messages would not be replayed anyway
+            self._drop_expired()
+        return len(self._messages) < self.max_messages and self._live_bytes + size <= self.max_bytes
+
+    def _drop_expired(self):
+        cutoff = self._clock() - self.max_age_s
+        for seq, msg in list(self._messages.items()):
+            if msg.created >= cutoff:
+                break
+            del self._messages[seq]
+            if self._latest.get(msg.topic) == seq:
+                del self._latest[msg.topic]
+            self._live_bytes -= len(msg.line())
+            self.expired += 1
+
+    def _append(self, line: bytes):
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "ab") as f:
+                f.write(line)
+            self._file_bytes += len(line)
+        except OSError as e:
+            # The message is still replayed from memory
+            logger.warning("Could not write offline buffer %s: %s", self.path, e)
+
+    def _compact(self):
+        """Rewrite the file with only the live messages."""
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        data = b"".join(msg.line() for msg in self._messages.values())
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp.write_bytes(data)
+            os.replace(tmp, self.path)
+            self._file_bytes = len(data)
+            self.compactions += 1
+        except OSError as e:
+            logger.warning("Could not compact offline buffer %s: %s", self.path, e)
+
+    def _clear(self):
+        self._messages.clear()
+        self._latest.clear()
+        self._live_bytes = 0
+        if self._file_bytes:
+            try:
+                self.path.write_bytes(b"")
+                self._file_bytes = 0
+            except OSError as e:
+                logger.warning("Could not truncate offline buffer %s: %s", self.path, e)
+
+    def _load(self):
+        """Pick up what a previous run could not publish."""
+        try:
+            data = self.path.read_bytes()
+        except FileNotFoundError:
+            return
+        except OSError as e:
+            logger.warning("Could not read offline buffer %s: %s", self.path, e)
+            return
+        self._file_bytes = len(data)
+        for raw in data.splitlines():
+            try:
+                msg = BufferedMessage(**json.loads(raw))
+            except (ValueError, TypeError):
+                # e.g. a line cut short by a crash
+                self.corrupt += 1
+                continue
+            self._store(msg, persist=False)
+        if self._messages:
+            logger.info("Offline buffer %s holds %d messages from a previous run", self.path, len(self._messages))
+        if self.corrupt or self._live_bytes < self._file_bytes:
+            self._compact()
+
+    # ------------------------------------------------------------------
+    # Metrics
+    # ------------------------------------------------------------------
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            oldest = min((msg.created for msg in self._messages.values()), default=None)
+            return {
+                "path": str(self.path),
+                "online": self.online,
+                "queued": len(self._messages),
+                "bytes": self._file_bytes,
+                "max_messages": self.max_messages,
+                "max_bytes": self.max_bytes,
+                "oldest_age_s": round(self._clock() - oldest, 1) if oldest is not None else 0.0,
+                "buffered": self.buffered,
+                "coalesced": self.coalesced,
+                "dropped": self.dropped,
+                "expired": self.expired,
+                "replayed": self.replayed,
+                "compactions": self.compactions,
+                "corrupt": self.corrupt,
+                "last_replay_s": round(self.last_replay_s, 3) if self.last_replay_s is not None else None,
+            }
+
@@ -0,0 +1,320 @@
+"""Prioritized outbound MQTT publishing with rate limiting.
+
+All bridge publishes go through one OutboundPublisher. Messages are queued in
+priority lanes (commands > derived state > health > discovery) and sent by a
+single worker thread under a messages/second budget, so a discovery storm
+(e.g. after a Home Assistant restart) can never delay a setpoint write.
+
+The send loop runs either on a worker thread (start()) or as a task on an
+asyncio event loop (serve(), used by the asyncio runtime). Until one of them
+runs, the publisher passes messages straight to the client, which keeps
+offline modes and unit tests synchronous.
+"""
+from __future__ import annotations
+
+import contextlib
+import logging
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any
+
+# asyncio is only imported by serve()/aclose(): the thread runtime never loads it
+if TYPE_CHECKING:
+    import asyncio
+
+    from runtime.delivery import DeliveryTracker
+    from runtime.mqtt5 import TopicAliases
+
+logger = logging.getLogger("open3e_bridge.runtime.publisher")
+
+# Priority lanes — lower value is sent first
+PRIORITY_COMMAND = 0
+PRIORITY_STATE = 1
+PRIORITY_HEALTH = 2
+PRIORITY_DISCOVERY = 3
+
+LANE_NAMES = ("command", "state", "health", "discovery")
+
+# paho return codes of publish() (mqtt.MQTT_ERR_SUCCESS, MQTT_ERR_NO_CONN)
+_ERR_SUCCESS = 0
+_ERR_NO_CONN = 4
+
+
+@dataclass(slots=True)
+class OutboundMessage:
+    """A queued publish."""
+    topic: str
+    payload: str
+    qos: int = 0
+    retain: bool = False
+    priority: int = PRIORITY_DISCOVERY
+    enqueued: float = 0.0
+    # MQTT v5 message expiry in seconds (0 = none; ignored without --mqtt5)
+    expiry: int = 0
+
+
+class OutboundPublisher:
+    def __init__(self, client: Any, rate: float = 0.0, max_queue: int = 10000,
+                 aliases: TopicAliases | None = None, delivery: DeliveryTracker | None = None,
+                 on_evict: Callable[[OutboundMessage], Any] | None = None,
+                 on_failed: Callable[[OutboundMessage], Any] | None = None):
+        """
+        Args:
+            client: paho MQTT client (anything with a compatible publish())
+            rate: Max messages per second (0 = unlimited)
+            max_queue: Max queued messages across all lanes
+            aliases: MQTT v5 topic aliases / message expiry (None: plain publish())
+            delivery: Tracks the PUBACK of QoS 1 messages
+            on_evict: Called with a queued message dropped to make room (under the queue lock)
+            on_failed: Called with a message paho refused and will not send later
+        """
+        self.client = client
+        self.aliases = aliases
+        self.delivery = delivery
+        self.on_evict = on_evict
+        self.on_failed = on_failed
+        self.rate = rate
+        self.max_queue = max_queue
+        # Allow short bursts of up to one second worth of messages
+        self._burst = max(1.0, rate)
+        self._tokens = self._burst
+        self._last_refill = time.monotonic()
+
+        self._lanes: tuple[deque[OutboundMessage], ...] = tuple(deque() for _ in LANE_NAMES)
+        self._cond = threading.Condition()
+        self._thread: threading.Thread | None = None
+        self._wakeup: asyncio.Event | None = None
+        self._running = False
+
+        # Metrics
+        self._published = [0] * len(LANE_NAMES)
+        self._dropped = [0] * len(LANE_NAMES)
+        self._errors = 0
+        self._max_depth = 0
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def start(self):
+        """Start the worker thread; from now on submit() only enqueues."""
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="open3e-publisher", daemon=True)
+        self._thread.start()
+        logger.debug("Outbound publisher started (rate=%s msg/s, max_queue=%d)",
+                     self.rate or "unlimited", self.max_queue)
+
+    def drain(self, timeout: float = 5.0) -> bool:
+        """Wait until all queued messages are sent. Returns False on timeout."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._depth():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._running:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def stop(self, timeout: float = 5.0):
+        """Drain (bounded by timeout), then stop the worker and drop what is left."""
+        if not self._running:
+            return
+        if not self.drain(timeout):
+            logger.warning("Publish queue not drained within %.1fs, dropping %d messages",
+                           timeout, self.depth())
+        self._halt()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    async def serve(self):
+        """Run the send loop on the current event loop instead of a thread."""
+        import asyncio
+
+        self._running = True
+        self._wakeup = asyncio.Event()
+        try:
+            while self._running:
+                with self._cond:
+                    msg, wait = self._next()
+                if msg is None:
+                    self._wakeup.clear()
+                    with contextlib.suppress(asyncio.TimeoutError):
+                        await asyncio.wait_for(self._wakeup.wait(), wait)
+                    continue
+                self._send(msg)
+                # Let inbound I/O run between sends
+                await asyncio.sleep(0)
+        finally:
+            self._wakeup = None
+
+    async def aclose(self, timeout: float = 5.0):
+        """Async counterpart of stop() for a publisher running via serve()."""
+        import asyncio
+
+        deadline = time.monotonic() + timeout
+        while self._running and self.depth() and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+        if self.depth():
+            logger.warning("Publish queue not drained within %.1fs, dropping %d messages",
+                           timeout, self.depth())
+        self._halt()
+
+    def _halt(self):
+        """Stop the send loop and drop everything still queued."""
+        with self._cond:
+            self._running = False
+            for lane, queue in enumerate(self._lanes):
+                self._dropped[lane] += len(queue)
+                queue.clear()
+            self._cond.notify_all()
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    # ------------------------------------------------------------------
+    # Submitting
+    # ------------------------------------------------------------------
+
+    def submit(self, topic: str, payload: str, *, priority: int = PRIORITY_DISCOVERY,
+               qos: int = 0, retain: bool = False, expiry: int = 0) -> bool:
+        """Queue a message for publishing. Returns False if it was dropped."""
+        msg = OutboundMessage(topic, payload, qos, retain, priority, time.monotonic(), expiry)
+        if not self._running:
+            self._send(msg)
+            return True
+        with self._cond:
+            if self._depth() >= self.max_queue and not self._evict(priority):
+                self._dropped[priority] += 1
+                logger.warning("Publish queue full, dropping %s message for %s", LANE_NAMES[priority], topic)
+                return False
+            self._lanes[priority].append(msg)
+            self._max_depth = max(self._max_depth, self._depth())
+            self._cond.notify_all()
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return True
+
+    def _evict(self, priority: int) -> bool:
+        """Make room by dropping the oldest message of the lowest lane not above priority."""
+        for lane in range(len(self._lanes) - 1, priority - 1, -1):
+            if self._lanes[lane]:
+                dropped = self._lanes[lane].popleft()
+                self._dropped[lane] += 1
+                logger.warning("Publish queue full, evicted %s message for %s", LANE_NAMES[lane], dropped.topic)
+                if self.on_evict is not None:
+                    self.on_evict(dropped)
+                return True
+        return False
+
+    # ------------------------------------------------------------------
+    # Worker
+    # ------------------------------------------------------------------
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if not self._running:
+                        return
+                    msg, wait = self._next()
+                    if msg is not None:
+                        break
+                    self._cond.wait(wait)
+            self._send(msg)
+            with self._cond:
+                # Wake up drain() waiters
+                self._cond.notify_all()
+
+    def _next(self) -> tuple[OutboundMessage | None, float | None]:
+        """Return (message, None) if one may be sent now, else (None, seconds to wait).
+
+        A wait of None means: wait until something is submitted. Caller holds the lock.
+        """
+        if not self._depth():
+            return None, None
+        wait = self._reserve_token()
+        if wait > 0:
+            return None, wait
+        return self._pop(), None
+
+    def _reserve_token(self) -> float:
+        """Token bucket: take a token and return 0, or return seconds until one is available."""
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        self._tokens = min(self._burst, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+        if self._tokens >= 1.0:
+            self._tokens -= 1.0
+            return 0.0
+        return (1.0 - self._tokens) / self.rate
+
+    def _pop(self) -> OutboundMessage:
+        for queue in self._lanes:
+            if queue:
+                return queue.popleft()
+        raise IndexError("publish queue is empty")
+
+    def _send(self, msg: OutboundMessage):
+        delivery = self.delivery if msg.qos else None
+        try:
+            sent = delivery.start() if delivery is not None else 0
+            if self.aliases is not None:
+                info = self.aliases.publish(self.client, msg.topic, msg.payload, msg.qos, msg.retain, msg.expiry)
+            else:
+                kwargs: dict[str, Any] = {}
+                if msg.qos:
+                    kwargs["qos"] = msg.qos
+                if msg.retain:
+                    kwargs["retain"] = True
+                info = self.client.publish(msg.topic, msg.payload, **kwargs)
+            if delivery is not None:
+                delivery.track(info, msg.topic, sent)
+        except Exception as e:
+            self._errors += 1
+            logger.warning("Publish to %s failed: %s", msg.topic, e)
+            return
+        rc = getattr(info, "rc", _ERR_SUCCESS)
+        if isinstance(rc, int) and rc != _ERR_SUCCESS:
+            self._errors += 1
+            logger.warning("Publish to %s failed: rc=%s", msg.topic, rc)
+            # paho keeps a QoS 1 message for the next connection; anything else is lost
+            if not (msg.qos and rc == _ERR_NO_CONN) and self.on_failed is not None:
+                self.on_failed(msg)
+            return
+        self._published[msg.priority] += 1
+
+    # ------------------------------------------------------------------
+    # Metrics
+    # ------------------------------------------------------------------
+
+    def _depth(self) -> int:
+        return sum(len(queue) for queue in self._lanes)
+
+    def depth(self) -> int:
+        """Number of queued messages across all lanes."""
+        with self._cond:
+            return self._depth()
+
+    def stats(self) -> dict[str, Any]:
+        """Queue depth and throughput counters for diagnostics."""
+        with self._cond:
+            oldest = min((q[0].enqueued for q in self._lanes if q), default=None)
+            return {
+                "rate_limit": self.rate,
+                "queued": {name: len(q) for name, q in zip(LANE_NAMES, self._lanes)},
+                "max_depth": self._max_depth,
+                "oldest_age_s": round(time.monotonic() - oldest, 3) if oldest is not None else 0.0,
+                "published": dict(zip(LANE_NAMES, self._published)),
+                "dropped": dict(zip(LANE_NAMES, self._dropped)),
+                "errors": self._errors,
+            }
@@ -0,0 +1,213 @@
+"""Retained open3e discovery configs on the broker.
+
+The broker keeps every discovery config the bridge published (retain=True).
+After a restart the bridge would otherwise republish all of them, although the
+retained payloads are usually identical to what it is about to generate.
+DiscoverySeed reads them right after connecting: the bridge subscribes to
+"<prefix>/+/+/config" in front of its open3e filters, so the broker delivers
+the retained configs before the first open3e value. Their digests seed the
+bridge's published-state table, and a config is only published again once
+the generated payload differs.
+
+Behind the discovery filter the bridge subscribes to a private marker topic
+and publishes one message to it; seeding ends when that marker arrives (the
+retained burst is over) and the discovery filter is unsubscribed. Other
+messages that arrive meanwhile, e.g. open3e values queued in a persistent
+session, are held back and handed on after seeding, so they neither end it
+early nor republish a config whose retained copy is still on its way. A
+timeout ends seeding for brokers that deny the marker.
+
+RetainedScan streams the same configs for --cleanup-orphans, which deletes
+only those the current entity plan no longer produces.
+"""
+from __future__ import annotations
+
+import re
+import threading
+import time
+from collections.abc import Callable
+from typing import Any
+
+# Components the bridge publishes discovery configs for
+DISCOVERY_COMPONENTS = ("sensor", "number", "select", "binary_sensor", "climate", "switch", "button",
+                        "water_heater", "device")
+
+
+def open3e_discovery_pattern(prefix: str) -> re.Pattern[str]:
+    """Matches the discovery config topics of open3e entities under `prefix`."""
+    components = "|".join(DISCOVERY_COMPONENTS)
+    return re.compile(rf"^{re.escape(prefix)}/({components})/open3e_[^/]+/config$")
+
+
+class DiscoverySeed:
+    def __init__(self, prefix: str, digests: dict[str, int], marker_topic: str, timeout_s: float = 10.0,
+                 max_held: int = 1000, clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            prefix: Effective discovery prefix (incl. test/ in test mode)
+            digests: The bridge's published-state table (topic -> hash(payload)), filled in place
+            marker_topic: Topic only this bridge uses to detect the end of the retained burst
+            timeout_s: Seeding ends after this long without the marker
+            max_held: Max other messages held back while seeding; one more ends seeding
+            clock: Monotonic time source (tests)
+        """
+        self.topic_filter = f"{prefix}/+/+/config"
+        self.marker_topic = marker_topic
+        self.timeout_s = timeout_s
+        self.max_held = max_held
+        self._config_topic = re.compile(rf"^{re.escape(prefix)}/[^/]+/[^/]+/config$")
+        self._open3e_topic = open3e_discovery_pattern(prefix)
+        self._digests = digests
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._started = False
+        self._started_at = 0.0
+        self._held: list[tuple[str, bytes]] = []
+        self.active = False
+        # Retained open3e configs seeded, other retained configs under the prefix skipped
+        self.seeded = 0
+        self.skipped = 0
+
+    def start(self) -> bool:
+        """Begin seeding; False if it already ran (once per process, not on reconnects)."""
+        with self._lock:
+            if self._started:
+                return False
+            self._started = self.active = True
+            self._started_at = self._clock()
+            return True
+
+    def offer(self, topic: str, payload: bytes, retain: bool) -> bool:
+        """Handle a message while seeding; True if it was consumed (seeded or held back).
+
+        Returns False for the marker, after the timeout and when too many messages
+        are held back: the caller then ends seeding (`finish()`).
+        """
+        if topic == self.marker_topic or self._clock() - self._started_at >= self.timeout_s:
+            return False
+        if not self._config_topic.match(topic):
+            with self._lock:
+                if len(self._held) >= self.max_held:
+                    return False
+                self._held.append((topic, payload))
+            return True
+        if retain and self._open3e_topic.match(topic) and payload:
+            try:
+                text = payload.decode("utf-8")
+            except UnicodeDecodeError:
+                return True
+            # Something published since connecting is newer than the retained copy
+            self._digests.setdefault(topic, hash(text))
+            self.seeded += 1
+        else:
+            self.skipped += 1
+        return True
+
+    def finish(self) -> list[tuple[str, bytes]] | None:
+        """End seeding; the held-back messages for the caller that actually ended it, else None."""
+        with self._lock:
+            if not self.active:
+                return None
+            self.active = False
+            held, self._held = self._held, []
+            return held
+
+
+# Shared by every entity: they say nothing about which entity a config belongs to
+NON_SOURCE_TOPICS = frozenset({"open3e/cmnd", "open3e/LWT"})
+
+# unique_id of a generated entity: open3e_<ecu>_<did>[_<sub item>]
+_ENTITY_ID = re.compile(r"^open3e_([0-9a-fA-F]+)_(\d+)(?:_|$)")
+
+
+def config_sources(config: dict[str, Any]) -> set[str]:
+    """open3e topics a discovery config refers to (state, command, ...; device components included).
+
+    The shared open3e/cmnd and open3e/LWT are left out. Handles abbreviated keys ("stat_t") and the "~" base topic of compact payloads.
+    """
+    base = config.get("~")
+    sources = set()
+    for key, value in config.items():
+        if isinstance(value, dict) and key in ("components", "cmps"):
+            for component in value.values():
+                if isinstance(component, dict):
+                    sources |= config_sources(component)
+            continue
+        if not isinstance(value, str) or not (key.endswith("_topic") or key.endswith("_t")):
+            continue
+        if isinstance(base, str):
+            if value.startswith("~"):
+                value = base + value[1:]
+            elif value.endswith("~"):
+                value = value[:-1] + base
+        if value.startswith("open3e/") and value not in NON_SOURCE_TOPICS:
+            sources.add(value)
+    return sources
+
+
+def config_entities(config: dict[str, Any]) -> set[tuple[str, int]]:
+    """(ecu, did) of the generated entities in a discovery config, from their unique ids."""
+    entities = set()
+    for key in ("unique_id", "uniq_id"):
+        match = _ENTITY_ID.match(str(config.get(key, "")))
+        if match:
+            entities.add((match.group(1), int(match.group(2))))
+    for key in ("components", "cmps"):
+        components = config.get(key)
+        if isinstance(components, dict):
+            for component in components.values():
+                if isinstance(component, dict):
+                    entities |= config_entities(component)
+    return entities
+
+
+class RetainedScan:
+    """Streams the retained open3e discovery configs under a prefix, sorting out orphans as they arrive.
+
+    After the discovery filter the caller subscribes to a private marker topic
+    and publishes one message to it. The broker delivers in order, so the
+    marker arrives right behind the last retained config and the end of the
+    burst is known without sleeping; the timeout in wait() is only the
+    fallback for brokers that deny the marker.
+    """
+
+    def __init__(self, prefix: str, is_orphan: Callable[[str, bytes], bool], marker_topic: str,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            prefix: Effective discovery prefix (incl. test/ in test mode)
+            is_orphan: (topic, payload) -> True if the current plan no longer produces the config
+            marker_topic: Topic only this scan uses to detect the end of the retained burst
+            clock: Monotonic time source (tests)
+        """
+        self.topic_filter = f"{prefix}/+/+/config"
+        self.marker_topic = marker_topic
+        self._open3e_topic = open3e_discovery_pattern(prefix)
+        self._is_orphan = is_orphan
+        self._clock = clock
+        self._done = threading.Event()
+        self.started = clock()
+        self.duration_s: float | None = None
+        # Retained configs under the prefix, those of open3e entities, and the orphans among them
+        self.retained = 0
+        self.open3e = 0
+        self.orphans: list[str] = []
+
+    def on_message(self, topic: str, payload: bytes, retain: bool):
+        if topic == self.marker_topic:
+            self.duration_s = self._clock() - self.started
+            self._done.set()
+            return
+        # Live messages (e.g. our own deletions) are not part of the snapshot
+        if not retain or self._done.is_set():
+            return
+        self.retained += 1
+        if not payload or not self._open3e_topic.match(topic):
+            return
+        self.open3e += 1
+        if self._is_orphan(topic, payload):
+            self.orphans.append(topic)
+
+    def wait(self, timeout_s: float) -> bool:
+        """Block until the retained burst is over; False if only the timeout ended it."""
+        return self._done.wait(timeout_s)
@@ -0,0 +1,167 @@
+"""Narrow the open3e subscriptions to the DIDs the bridge can use.
+
+Without auto-discovery only configured DIDs become entities, yet the broad
+filters make the broker deliver every open3e topic. MQTT wildcards only match
+whole topic levels, so a per-DID filter like "open3e/+_268_+/#" is not valid:
+the DID shares the first level with the ECU address and open3e's DID name
+(680_268_FlowTemperatureSensor). The planner therefore learns those levels.
+It starts with the broad filters, records the first level of every message
+for a wanted DID, and once no new one has appeared for `settle_s` seconds
+the broad filters are replaced by one "open3e/<level>/#" per learned level
+(which also matches "open3e/<level>" itself), sent as a single SUBSCRIBE.
+
+When the plan gains DIDs (config reload, profile switch) the broad filters
+come back until the new levels have been learned. So does the narrowed set
+every `rewiden_s` seconds while some wanted DID has no learned level yet: a
+DID that open3e only starts publishing later (a new ECU, a value polled
+rarely) is picked up at the next widening instead of never.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections.abc import Callable, Iterable
+from typing import Any
+
+# What the bridge subscribes to without a narrowed set
+BROAD_FILTERS: tuple[str, ...] = ("open3e/+/+", "open3e/+")
+
+
+def _level_did(level: str) -> int | None:
+    """DID of an open3e first level ("680_268_FlowTemperatureSensor" -> 268)."""
+    parts = level.split("_", 2)
+    if len(parts) < 2 or not parts[1].isdigit():
+        return None
+    return int(parts[1])
+
+
+class SubscriptionPlanner:
+    def __init__(self, wanted_dids: Iterable[int], settle_s: float = 300.0, rewiden_s: float = 3600.0,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            wanted_dids: DIDs whose topics the bridge needs
+            settle_s: Narrow once no new wanted topic level appeared for this long
+            rewiden_s: Widen again after this long while wanted DIDs are still unseen
+            clock: Monotonic time source (tests)
+        """
+        self.wanted_dids = frozenset(wanted_dids)
+        self.settle_s = settle_s
+        self.rewiden_s = rewiden_s
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._levels: set[str] = set()
+        self._narrowed = False
+        self._last_learned = clock()
+        self._narrowed_at = 0.0
+        # Wanted DIDs without a learned level when narrowing
+        self._unseen = 0
+        self.rewidenings = 0
+        # Filters currently subscribed (as far as the planner told the bridge)
+        self._active: set[str] = set(BROAD_FILTERS)
+        # Message counts while broad, the basis of the traffic reduction estimate
+        self.wanted_messages = 0
+        self.unwanted_messages = 0
+        # Unwanted messages that still arrive after narrowing (overlap, retained)
+        self.unwanted_after_narrowing = 0
+
+    @property
+    def narrowed(self) -> bool:
+        return self._narrowed
+
+    def filters(self) -> list[str]:
+        """Filters to subscribe to on (re)connect."""
+        with self._lock:
+            self._active = set(self._current_filters())
+            return sorted(self._active)
+
+    def _current_filters(self) -> Iterable[str]:
+        if not self._narrowed:
+            return BROAD_FILTERS
+        return (f"open3e/{level}/#" for level in self._levels)
+
+    def observe(self, topic: str, did: int) -> bool:
+        """Count an open3e message and learn its level; True if the DID is wanted."""
+        wanted = did in self.wanted_dids
+        if self._narrowed:
+            if not wanted:
+                self.unwanted_after_narrowing += 1
+            return wanted
+        if not wanted:
+            self.unwanted_messages += 1
+            return False
+        self.wanted_messages += 1
+        level = topic.split("/", 2)[1]
+        if level not in self._levels:
+            with self._lock:
+                self._levels.add(level)
+                self._last_learned = self._clock()
+        return True
+
+    def due(self) -> bool:
+        """True once the filters should change: narrow() when not narrowed, else widen()."""
+        if self._narrowed:
+            return bool(self._unseen) and self._clock() - self._narrowed_at >= self.rewiden_s
+        return bool(self._levels) and self._clock() - self._last_learned >= self.settle_s
+
+    def narrow(self) -> tuple[list[str], list[str]]:
+        """Switch to the learned filters; returns (subscribe, unsubscribe)."""
+        with self._lock:
+            self._narrowed = True
+            self._narrowed_at = self._clock()
+            self._unseen = len(self._unseen_dids())
+            filters = set(self._current_filters())
+            subscribe, unsubscribe = sorted(filters - self._active), sorted(self._active - filters)
+            self._active = filters
+            return subscribe, unsubscribe
+
+    def widen(self) -> tuple[list[str], list[str]]:
+        """Back to the broad filters to learn the levels of unseen DIDs; returns (subscribe, unsubscribe)."""
+        with self._lock:
+            self.rewidenings += 1
+            return self._widen()
+
+    def _widen(self) -> tuple[list[str], list[str]]:
+        """Caller holds the lock. The learned filters stay until the next narrow()."""
+        self._narrowed = False
+        self._last_learned = self._clock()
+        subscribe = sorted(set(BROAD_FILTERS) - self._active)
+        self._active |= set(BROAD_FILTERS)
+        return subscribe, []
+
+    def _unseen_dids(self) -> set[int]:
+        return set(self.wanted_dids) - {_level_did(level) for level in self._levels}
+
+    def update_wanted(self, wanted_dids: Iterable[int]) -> tuple[list[str], list[str]]:
+        """New plan: forget levels of dropped DIDs, widen again for added ones; returns (subscribe, unsubscribe)."""
+        wanted = frozenset(wanted_dids)
+        with self._lock:
+            added = wanted - self.wanted_dids
+            self.wanted_dids = wanted
+            self._levels = {level for level in self._levels if _level_did(level) in wanted}
+            if not self._narrowed:
+                return [], []
+            if not added:
+                self._unseen = len(self._unseen_dids())
+                filters = set(self._current_filters())
+                unsubscribe = sorted(self._active - filters)
+                self._active = filters
+                return [], unsubscribe
+            # Learn the levels of the new DIDs from the broad filters again
+            return self._widen()
+
+    def stats(self) -> dict[str, Any]:
+        """Subscription mode and the share of open3e traffic for unwanted DIDs."""
+        total = self.wanted_messages + self.unwanted_messages
+        return {
+            "mode": "narrow" if self._narrowed else "learning",
+            "filters": len(self._active),
+            "learned_topics": len(self._levels),
+            "wanted_messages": self.wanted_messages,
+            "unwanted_messages": self.unwanted_messages,
+            # Share of the broad subscription's traffic the narrowed filters avoid
+            "unwanted_ratio": round(self.unwanted_messages / total, 3) if total else 0.0,
+            "unwanted_after_narrowing": self.unwanted_after_narrowing,
+            # Times the broad filters came back to look for wanted DIDs not seen yet
+            "rewidenings": self.rewidenings,
+        }
@@ -0,0 +1,223 @@
+"""Pending write verifications with deadlines (write_and_verify).
+
+After a write the bridge reads the DID back and compares the value with what
+it wrote. PendingWrites maps (ecu, did) to the expected value, like the plain
+dict it replaces. In addition, every entry has a deadline, kept in a heap:
+
+- A read-back that has not arrived by the deadline is requested again, up to
+  `retries` times, each with a fresh deadline.
+- After that the write counts as timed out and is removed. A value that
+  arrives later is no longer compared against it.
+
+due() pops the expired heap entries; the earliest deadline is the heap's
+first entry, so finding nothing due costs O(1) and each retry or timeout
+costs O(log n). Entries that were verified or replaced stay in the heap until
+they surface and are then skipped (lazy deletion). The heap is rebuilt when
+those stale entries outnumber the live ones.
+
+Numeric values match within `tolerance` ("55" matches "55.0"; a controller
+that stores 45.25 as 45.2 needs a tolerance of 0.05). Other values must be
+equal after stripping whitespace.
+"""
+from __future__ import annotations
+
+import heapq
+import threading
+import time
+from collections.abc import Callable, Iterator, MutableMapping
+from dataclasses import dataclass
+from typing import Any
+
+from runtime.metrics import LatencyHistogram
+
+WriteKey = tuple[str, int]
+
+
+@dataclass(slots=True)
+class PendingWrite:
+    expected: str
+    created: float
+    deadline: float
+    # Read-backs requested again after a missed deadline
+    retries: int = 0
+    seq: int = 0
+
+
+@dataclass(slots=True)
+class _DidStats:
+    verified: int = 0
+    mismatched: int = 0
+    timed_out: int = 0
+    retries: int = 0
+    total_s: float = 0.0
+    max_s: float = 0.0
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "verified": self.verified,
+            "mismatched": self.mismatched,
+            "timed_out": self.timed_out,
+            "retries": self.retries,
+            "mean_s": round(self.total_s / self.verified, 3) if self.verified else None,
+            "max_s": round(self.max_s, 3),
+        }
+
+
+def values_match(expected: str, actual: str, tolerance: float = 0.0) -> bool:
+    expected, actual = str(expected).strip(), str(actual).strip()
+    if expected == actual:
+        return True
+    try:
+        return abs(float(expected) - float(actual)) <= tolerance
+    except ValueError:
+        return False
+
+
+class PendingWrites(MutableMapping[WriteKey, str]):
+    def __init__(self, timeout_s: float = 30.0, retries: int = 2, tolerance: float = 0.01,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            timeout_s: Seconds to wait for a read-back before reading again or giving up
+            retries: Extra read-backs before a write counts as timed out
+            tolerance: Max difference for numeric values to match
+            clock: Monotonic time source in seconds (tests)
+        """
+        self.timeout_s = timeout_s
+        self.retries = retries
+        self.tolerance = tolerance
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._pending: dict[WriteKey, PendingWrite] = {}
+        # (deadline, seq, key); stale when the entry's seq no longer matches
+        self._heap: list[tuple[float, int, WriteKey]] = []
+        self._seq = 0
+        self._per_did: dict[WriteKey, _DidStats] = {}
+        self._latency = LatencyHistogram()
+        self.max_pending = 0
+
+    # ------------------------------------------------------------------
+    # Mapping interface: (ecu, did) -> expected value
+    # ------------------------------------------------------------------
+
+    def __getitem__(self, key: WriteKey) -> str:
+        with self._lock:
+            return self._pending[key].expected
+
+    def __setitem__(self, key: WriteKey, expected: str):
+        with self._lock:
+            now = self._clock()
+            self._seq += 1
+            entry = PendingWrite(str(expected), now, now + self.timeout_s, seq=self._seq)
+            self._pending[key] = entry
+            self._push(entry, key)
+            self.max_pending = max(self.max_pending, len(self._pending))
+
+    def __delitem__(self, key: WriteKey):
+        with self._lock:
+            del self._pending[key]
+
+    def __iter__(self) -> Iterator[WriteKey]:
+        with self._lock:
+            return iter(list(self._pending))
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    # ------------------------------------------------------------------
+    # Verification
+    # ------------------------------------------------------------------
+
+    def resolve(self, key: WriteKey, actual: str) -> tuple[bool, PendingWrite] | None:
+        """Compare a read-back value with the pending write of key, if any.
+
+        Returns (matched, write) and removes the write, or None if none is pending.
+        """
+        with self._lock:
+            entry = self._pending.pop(key, None)
+            if entry is None:
+                return None
+            stats = self._stats(key)
+            matched = values_match(entry.expected, actual, self.tolerance)
+            if matched:
+                elapsed = max(0.0, self._clock() - entry.created)
+                stats.verified += 1
+                stats.total_s += elapsed
+                stats.max_s = max(stats.max_s, elapsed)
+                self._latency.record(int(elapsed * 1e9))
+            else:
+                stats.mismatched += 1
+            return matched, entry
+
+    def due(self) -> list[tuple[WriteKey, PendingWrite, bool]]:
+        """Writes whose deadline passed: (key, write, retry).
+
+        retry=True: read the DID again (the write got a new deadline).
+        retry=False: the write timed out and was removed.
+        """
+        result: list[tuple[WriteKey, PendingWrite, bool]] = []
+        with self._lock:
+            now = self._clock()
+            while self._heap and self._heap[0][0] <= now:
+                _, seq, key = heapq.heappop(self._heap)
+                entry = self._pending.get(key)
+                if entry is None or entry.seq != seq:
+                    continue
+                stats = self._stats(key)
+                if entry.retries < self.retries:
+                    entry.retries += 1
+                    stats.retries += 1
+                    self._seq += 1
+                    entry.seq = self._seq
+                    entry.deadline = now + self.timeout_s
+                    self._push(entry, key)
+                    result.append((key, entry, True))
+                else:
+                    del self._pending[key]
+                    stats.timed_out += 1
+                    result.append((key, entry, False))
+        return result
+
+    def next_deadline(self) -> float | None:
+        """Earliest deadline of a pending write (clock time), None if nothing is pending."""
+        with self._lock:
+            while self._heap:
+                _, seq, key = self._heap[0]
+                entry = self._pending.get(key)
+                if entry is not None and entry.seq == seq:
+                    return entry.deadline
+                heapq.heappop(self._heap)
+            return None
+
+    def _push(self, entry: PendingWrite, key: WriteKey):
+        """Caller holds the lock."""
+        heapq.heappush(self._heap, (entry.deadline, entry.seq, key))
+        if len(self._heap) > 2 * len(self._pending) + 64:
+            self._heap = [(e.deadline, e.seq, k) for k, e in self._pending.items()]
+            heapq.heapify(self._heap)
+
+    def _stats(self, key: WriteKey) -> _DidStats:
+        stats = self._per_did.get(key)
+        if stats is None:
+            stats = self._per_did[key] = _DidStats()
+        return stats
+
+    # ------------------------------------------------------------------
+    # Metrics
+    # ------------------------------------------------------------------
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            per_did = {f"{ecu}_{did}": s.snapshot() for (ecu, did), s in self._per_did.items()}
+            return {
+                "pending": len(self._pending),
+                "max_pending": self.max_pending,
+                "timeout_s": self.timeout_s,
+                "retries": self.retries,
+                "tolerance": self.tolerance,
+                "verified": sum(s.verified for s in self._per_did.values()),
+                "mismatched": sum(s.mismatched for s in self._per_did.values()),
+                "timed_out": sum(s.timed_out for s in self._per_did.values()),
+                "latency": self._latency.snapshot(),
+                "per_did": per_did,
+            }
@@ -46,3 +46,9 @@ def generator_auto():
 def config_dir():
     """Path to config directory."""
     return CONFIG_DIR
+
+
+@pytest.fixture(autouse=True)
+def _isolated_config_cache(tmp_path, monkeypatch):
+    """Keep CLI runs (main()) from writing the compiled config cache to the user's home."""
+    monkeypatch.setenv("OPEN3E_CONFIG_CACHE", str(tmp_path / "config-cache"))
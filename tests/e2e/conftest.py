@@ -1,5 +1,11 @@
-"""E2E test fixtures — session-scoped Mosquitto Docker container."""
+"""E2E test fixtures — session-scoped MQTT broker.
 
+Uses a Mosquitto Docker container when Docker is available, otherwise the
+in-process stand-in from benchmarks/broker.py. Set OPEN3E_E2E_BROKER=local
+or =docker to force one of them.
+"""
+
+import os
 import socket
 import tempfile
 import time
@@ -17,14 +23,36 @@ MOSQUITTO_IMAGE = "eclipse-mosquitto:2"
 _MOSQUITTO_CONF = "listener 1883\nallow_anonymous true\n"
 
 
+def _docker_client():
+    """Docker client if a daemon is reachable, else None."""
+    if docker is None:
+        return None
+    try:
+        client = docker.from_env()
+        client.ping()
+        return client
+    except Exception:
+        return None
+
+
 @pytest.fixture(scope="session")
 def mqtt_broker():
-    """Start a Mosquitto MQTT broker in Docker for E2E tests."""
-    if docker is None:
-        pytest.skip("docker package not installed (pip install docker)")
+    """MQTT broker for E2E tests: Mosquitto in Docker, or the local stand-in."""
+    mode = os.environ.get("OPEN3E_E2E_BROKER", "auto")
+    client = _docker_client() if mode != "local" else None
+    if client is None:
+        if mode == "docker":
+            pytest.skip("Docker not available (pip install docker, start the daemon)")
+        from benchmarks.broker import LocalBroker
+        with LocalBroker() as broker:
+            yield {"host": "127.0.0.1", "port": broker.port}
+        return
+
+    yield from _mosquitto(client)
 
-    client = docker.from_env()
 
+def _mosquitto(client):
+    """Start a Mosquitto MQTT broker in Docker."""
     # Write minimal config that enables anonymous access (required since Mosquitto 2.0)
     conf_file = tempfile.NamedTemporaryFile(mode="w", suffix=".conf", delete=False)
     conf_file.write(_MOSQUITTO_CONF)
@@ -56,6 +84,4 @@ def mqtt_broker():
     yield {"host": "localhost", "port": MOSQUITTO_PORT}
 
     container.stop()
-
-    import os
     os.unlink(conf_path)
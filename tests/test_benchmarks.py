@@ -0,0 +1,89 @@
+"""Tests for the offline pipeline benchmarks (benchmarks/)."""
+import json
+
+from benchmarks import discovery_size, pipeline, startup
+from benchmarks.topics import camel_case, profile_topics, unknown_topics
+
+
+class TestTopicMix:
+    def test_camel_case(self):
+        assert camel_case("Flow Temperature") == "FlowTemperature"
+        assert camel_case("DHW Setpoint") == "DHWSetpoint"
+
+    def test_profile_topics_cover_configured_subs(self):
+        specs = profile_topics("vitocal")
+        topics = {spec.topic("680") for spec in specs}
+        assert "open3e/680_268_FlowTemperature/Actual" in topics
+        assert any(spec.kind == "text" for spec in specs)  # device identification
+
+    def test_profiles_differ(self):
+        assert {s.did for s in profile_topics("vitocal")} != {s.did for s in profile_topics("vitodens")}
+
+    def test_unknown_topics_not_configured(self, generator_en):
+        for spec in unknown_topics(5):
+            assert spec.did not in generator_en.plan.datapoints
+
+
+class TestPipeline:
+    def test_run_reports_all_stages(self):
+        report = pipeline.run("common", iterations=20)
+        assert set(report["stages"]) == set(pipeline.STAGES)
+        for result in report["stages"].values():
+            assert result["ns_per_op"] > 0
+            assert result["ops_per_s"] > 0
+        json.dumps(report)
+
+    def test_null_client_counts_publishes(self):
+        ctx = pipeline.Context("common")
+        for topic, payload in ctx.messages[:10]:
+            ctx.bridge.process_message(topic, payload)
+        assert ctx.bridge.client.published > 0
+
+    def test_compare_flags_regressions(self):
+        baseline = {"stages": {"a": {"ns_per_op": 100.0}, "b": {"ns_per_op": 100.0}}}
+        report = {"stages": {"a": {"ns_per_op": 110.0}, "b": {"ns_per_op": 200.0}, "c": {"ns_per_op": 1.0}}}
+        regressions = pipeline.compare(report, baseline, threshold=0.25)
+        assert len(regressions) == 1
+        assert regressions[0].startswith("b:")
+
+    def test_stored_baseline_matches_stages(self):
+        baseline = json.loads(pipeline.BASELINE_PATH.read_text())
+        assert set(baseline["stages"]) == set(pipeline.STAGES)
+
+    def test_main_compare_exit_code(self, tmp_path, capsys):
+        slow = {"stages": {name: {"ns_per_op": 1e12} for name in pipeline.STAGES}}
+        fast = {"stages": {name: {"ns_per_op": 0.001} for name in pipeline.STAGES}}
+        (tmp_path / "slow.json").write_text(json.dumps(slow))
+        (tmp_path / "fast.json").write_text(json.dumps(fast))
+        args = ["--profile", "common", "--iterations", "10", "--stage", "parse_topic"]
+        assert pipeline.main([*args, "--compare", str(tmp_path / "slow.json")]) == 0
+        assert pipeline.main([*args, "--compare", str(tmp_path / "fast.json")]) == 1
+        assert "REGRESSION parse_topic" in capsys.readouterr().out
+
+
+class TestStartup:
+    def test_offline_modes_skip_network_stack(self):
+        report = startup.run(["import", "list-generators", "dump-entities"], repeat=1, scale=100)
+        for name, result in report["modes"].items():
+            assert result["forbidden_loaded"] == [], name
+        assert report["modes"]["import"]["modules"] < report["modes"]["dump-entities"]["modules"]
+
+    def test_violations(self):
+        report = {"modes": {
+            "ok": {"ms": 10.0, "budget_ms": 20.0, "forbidden_loaded": []},
+            "slow": {"ms": 30.0, "budget_ms": 20.0, "forbidden_loaded": ["asyncio"]},
+        }}
+        assert startup.violations(report) == ["slow: 30.0 ms > budget 20.0 ms", "slow: imports asyncio"]
+
+
+class TestDiscoverySize:
+    def test_compact_and_device_mode_smaller(self):
+        report = discovery_size.run("vitocal")
+        assert report["total"]["configs"] > 0
+        for result in report["components"].values():
+            assert 0 < result["compact_bytes"] < result["full_bytes"]
+        # One config per device instead of per entity
+        assert 0 < report["device_mode"]["configs"] < report["total"]["configs"]
+        assert report["device_mode"]["full_bytes"] < report["total"]["full_bytes"]
+        assert "device mode" in discovery_size.format_report(report)
+        json.dumps(report)
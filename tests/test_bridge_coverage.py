@@ -94,20 +94,41 @@ def test_on_message_unknown_did_auto_discovers_by_default(mock_bridge):
 # --- _republish_all_discovery ---
 def test_republish_empty_cache(mock_bridge):
     bridge, mock_client = mock_bridge
-    bridge.published_configs = {}
+    bridge.published_digests = {}
     bridge._republish_all_discovery()
     mock_client.publish.assert_not_called()
 
 
 def test_republish_sends_all(mock_bridge):
     bridge, mock_client = mock_bridge
-    bridge.published_configs = {
-        "ha/sensor/a/config": '{"a":1}',
-        "ha/sensor/b/config": '{"b":2}',
-        "ha/sensor/c/config": '{"c":3}',
-    }
+    for did, name in ((268, "FlowTemperatureSensor"), (269, "ReturnTemperatureSensor"),
+                      (274, "OutsideTemperatureSensor")):
+        bridge.process_message(f"open3e/680_{did}_{name}/Actual", "20.0")
+    published = {c.args[0]: c.args[1] for c in mock_client.publish.call_args_list}
+    mock_client.publish.reset_mock()
     bridge._republish_all_discovery()
-    assert mock_client.publish.call_count == 3
+    # Three entities plus the bridge's own COP and health entities
+    republished = {c.args[0]: c.args[1] for c in mock_client.publish.call_args_list}
+    assert len(republished) == 5
+    assert set(republished) == set(bridge.published_digests)
+    assert all(republished[topic] == payload for topic, payload in published.items())
+
+
+def test_republish_regenerates_after_cache_invalidation(mock_bridge):
+    bridge, mock_client = mock_bridge
+    bridge.process_message("open3e/680_268_FlowTemperatureSensor/Actual", "20.0")
+    [(topic, payload)] = [c.args[:2] for c in mock_client.publish.call_args_list]
+    bridge.generator.invalidate_discovery_cache()
+    mock_client.publish.reset_mock()
+    bridge._republish_all_discovery()
+    assert (topic, payload) in [c.args[:2] for c in mock_client.publish.call_args_list]
+
+
+def test_published_digests_hold_no_payloads(mock_bridge):
+    bridge, _ = mock_bridge
+    bridge.process_message("open3e/680_268_FlowTemperatureSensor/Actual", "20.0")
+    assert bridge.published_digests
+    assert all(isinstance(digest, int) for digest in bridge.published_digests.values())
 
 
 # --- main() paths ---
@@ -168,6 +189,20 @@ def test_simulate_from_file(tmp_path):
         assert mock_client.publish.called
 
 
+def test_simulate_uses_session_options(tmp_path):
+    from bridge import Open3EBridge, simulate_from_file
+    test_file = tmp_path / "test.txt"
+    test_file.write_text("")
+
+    with patch("bridge.mqtt.Client") as MockClient:
+        mock_client = MagicMock()
+        MockClient.return_value = mock_client
+        bridge = Open3EBridge(test_mode=True, add_test_prefix=False, persistent_session=True, mqtt5=True)
+        with patch("bridge.time.sleep"):
+            simulate_from_file(bridge, str(test_file))
+    assert mock_client.connect.call_args.kwargs["clean_start"] is False
+
+
 def test_simulate_file_not_found():
     from bridge import Open3EBridge, simulate_from_file
     with patch("bridge.mqtt.Client") as MockClient:
@@ -0,0 +1,163 @@
+"""Tests for the diff-based orphan cleanup (--cleanup-orphans, runtime/retained.py)."""
+import json
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from runtime.retained import RetainedScan, config_entities, config_sources
+
+FLOW = "open3e/680_268_FlowTemperatureSensor/Actual"
+FLOW_CONFIG = "homeassistant/sensor/open3e_680_268_actual/config"
+CUSTOM_CONFIG = "homeassistant/sensor/open3e_680_9999/config"
+COP_CONFIG = "homeassistant/sensor/open3e_bridge_cop/config"
+BUTTON = "open3e/680_1710_DomesticHotWaterOneTimeCharge"
+BUTTON_CONFIG = "homeassistant/button/open3e_680_1710/config"
+STALE_BUTTON_CONFIG = "homeassistant/button/open3e_680_9998/config"
+
+
+class TestConfigSources:
+    def test_entity_topics(self):
+        config = {"state_topic": FLOW, "command_topic": "open3e/cmnd", "availability_topic": "open3e/LWT",
+                  "json_attributes_topic": "other/attributes", "name": "open3e/not_a_topic"}
+        assert config_sources(config) == {FLOW}
+
+    def test_compact_base_topic(self):
+        config = {"~": "open3e/680_268_FlowTemperatureSensor", "stat_t": "~/Actual", "cmd_t": "open3e/cmnd"}
+        assert config_sources(config) == {FLOW}
+
+    def test_device_components(self):
+        config = {"device": {"identifiers": ["open3e_680_indoor"]},
+                  "cmps": {"a": {"p": "sensor", "stat_t": FLOW}, "b": {"p": "sensor"}}}
+        assert config_sources(config) == {FLOW}
+
+    def test_entities_from_unique_ids(self):
+        assert config_entities({"uniq_id": "open3e_680_1710"}) == {("680", 1710)}
+        assert config_entities({"cmps": {"a": {"unique_id": "open3e_6a1_268_actual"}},
+                                "unique_id": "open3e_bridge_cop"}) == {("6a1", 268)}
+
+
+class TestRetainedScan:
+    def test_classifies_while_streaming(self):
+        scan = RetainedScan("homeassistant", lambda topic, payload: payload == b"old", "marker")
+        scan.on_message(FLOW_CONFIG, b"{}", True)
+        scan.on_message(CUSTOM_CONFIG, b"old", True)
+        scan.on_message("homeassistant/sensor/zigbee_lamp/config", b"{}", True)
+        scan.on_message(CUSTOM_CONFIG, b"old", False)
+        assert not scan.wait(0)
+        scan.on_message("marker", b"end", False)
+        assert scan.wait(0)
+        assert (scan.retained, scan.open3e, scan.orphans) == (3, 2, [CUSTOM_CONFIG])
+        assert scan.duration_s is not None
+
+    def test_ignores_messages_after_marker(self):
+        scan = RetainedScan("homeassistant", lambda topic, payload: True, "marker")
+        scan.on_message("marker", b"end", False)
+        scan.on_message(CUSTOM_CONFIG, b"{}", True)
+        assert scan.orphans == []
+
+
+def _bridge(**kwargs):
+    with patch("bridge.mqtt.Client") as MockClient:
+        MockClient.return_value = MagicMock()
+        from bridge import Open3EBridge
+        return Open3EBridge(test_mode=False, add_test_prefix=False, auto_discover=False, **kwargs)
+
+
+@pytest.fixture
+def retained():
+    """Retained configs on the broker: current, orphaned and unrelated ones."""
+    bridge = _bridge()
+    bridge.process_message(FLOW, "20.0")
+    bridge.process_message(BUTTON, "0")
+    bridge._publish_cop_discovery()
+    published = dict(c.args[:2] for c in bridge.client.publish.call_args_list)
+    stale_button = json.loads(published[BUTTON_CONFIG])
+    stale_button.update(unique_id="open3e_680_9998", object_id="open3e_680_9998")
+    return {
+        FLOW_CONFIG: published[FLOW_CONFIG],
+        BUTTON_CONFIG: published[BUTTON_CONFIG],
+        STALE_BUTTON_CONFIG: json.dumps(stale_button),
+        COP_CONFIG: published[COP_CONFIG],
+        CUSTOM_CONFIG: json.dumps({"name": "Custom", "state_topic": "open3e/680_9999_Custom"}),
+        "homeassistant/climate/open3e_680_broken/config": "{not json",
+        "homeassistant/sensor/zigbee_lamp/config": "{}",
+    }
+
+
+def _run_cleanup(bridge, retained, marker=True, **kwargs):
+    client = bridge.client
+
+    def fake_loop_start():
+        client.on_connect(client, None, {}, 0, None)
+        for topic, payload in retained.items():
+            client.on_message(client, None, SimpleNamespace(topic=topic, payload=payload.encode(), retain=True))
+        if marker:
+            marker_topic = client.publish.call_args.args[0]
+            client.on_message(client, None, SimpleNamespace(topic=marker_topic, payload=b"end", retain=False))
+
+    client.loop_start.side_effect = fake_loop_start
+    with patch("bridge.time.sleep") as sleep:
+        report = bridge.cleanup_orphans(**kwargs)
+    return report, sleep
+
+
+def _cleared(bridge):
+    return [c.args[0] for c in bridge.client.publish.call_args_list if c.kwargs.get("payload") == ""]
+
+
+class TestCleanupOrphans:
+    def test_deletes_only_orphans(self, retained):
+        bridge = _bridge()
+        report, _ = _run_cleanup(bridge, retained)
+        assert sorted(_cleared(bridge)) == [STALE_BUTTON_CONFIG, "homeassistant/climate/open3e_680_broken/config",
+                                            CUSTOM_CONFIG]
+        assert report["retained"] == 7
+        assert report["open3e"] == 6
+        assert (report["kept"], report["deleted"], report["failed"]) == (3, 3, 0)
+        assert report["end"] == "marker"
+        bridge.client.publish.assert_any_call(CUSTOM_CONFIG, payload="", qos=1, retain=True)
+        bridge.client.disconnect.assert_called_once()
+
+    def test_paced_batches(self, retained):
+        bridge = _bridge()
+        _, sleep = _run_cleanup(bridge, retained, batch_size=1, batch_pause_s=0.25)
+        assert [c.args for c in sleep.call_args_list] == [(0.25,), (0.25,)]
+
+    def test_timeout_fallback(self, retained):
+        bridge = _bridge()
+        report, _ = _run_cleanup(bridge, retained, marker=False, timeout_s=0.01)
+        assert report["end"] == "timeout"
+        assert report["orphans"] == 3
+
+    def test_unacknowledged_deletions_counted(self, retained):
+        bridge = _bridge()
+        bridge.client.publish.return_value.is_published.return_value = False
+        report, _ = _run_cleanup(bridge, retained)
+        assert report["failed"] == 3
+
+    def test_device_mode_removes_entity_configs(self, retained):
+        bridge = _bridge(discovery_mode="device")
+        report, _ = _run_cleanup(bridge, retained)
+        assert {FLOW_CONFIG, BUTTON_CONFIG} <= set(_cleared(bridge))
+        assert report["kept"] == 1
+
+    def test_unknown_profile_refused(self, config_dir):
+        bridge = _bridge(config_dir=str(config_dir), detect_profile=True)
+        assert bridge.cleanup_orphans() == {"error": "profile unknown"}
+        bridge.client.connect.assert_not_called()
+
+
+def test_main_cleanup_orphans():
+    from bridge import main
+    with patch("bridge.get_generator_class") as mock_get_gen, \
+         patch("sys.argv", ["bridge", "--cleanup-orphans"]):
+        mock_gen_cls = MagicMock()
+        mock_gen_cls.return_value.auto_discovered_count = 0
+        mock_get_gen.return_value = mock_gen_cls
+        with patch("bridge.Open3EBridge") as MockBridge:
+            MockBridge.return_value.cleanup_orphans.return_value = {"failed": 0}
+            with pytest.raises(SystemExit) as exc_info:
+                main()
+            assert exc_info.value.code == 0
+            MockBridge.return_value.cleanup_orphans.assert_called_once()
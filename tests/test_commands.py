@@ -0,0 +1,149 @@
+"""Tests for batched open3e commands (runtime/commands.py)."""
+import json
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from runtime.commands import CommandCoalescer
+
+
+class ManualSchedule:
+    """Collects scheduled flushes; run() fires them."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, delay, callback):
+        self.calls.append((delay, callback))
+
+    def run(self):
+        calls, self.calls = self.calls, []
+        for _, callback in calls:
+            callback()
+
+
+@pytest.fixture
+def sent():
+    return []
+
+
+@pytest.fixture
+def schedule():
+    return ManualSchedule()
+
+
+def _coalescer(sent, schedule, **kwargs):
+    coalescer = CommandCoalescer(lambda payload: sent.append(json.loads(payload)), **kwargs)
+    coalescer.start(schedule)
+    return coalescer
+
+
+class TestCommandCoalescer:
+    def test_unstarted_sends_immediately(self, sent):
+        coalescer = CommandCoalescer(lambda payload: sent.append(json.loads(payload)))
+        coalescer.write("680", 396, "55.0")
+        coalescer.read("680", 396)
+        assert sent == [{"mode": "write", "data": [[396, "55.0"]]}, {"mode": "read", "data": [396]}]
+
+    def test_window_merges_per_mode(self, sent, schedule):
+        coalescer = _coalescer(sent, schedule, window_s=0.05)
+        for did, value in ((396, "55.0"), (397, "45.0")):
+            coalescer.write("680", did, value)
+            coalescer.read("680", did)
+        assert sent == []
+        assert [delay for delay, _ in schedule.calls] == [0.05]
+        schedule.run()
+        assert sent == [{"mode": "write", "data": [[396, "55.0"], [397, "45.0"]]},
+                        {"mode": "read", "data": [396, 397]}]
+        stats = coalescer.stats()
+        assert (stats["commands"], stats["messages"], stats["saved"]) == (4, 2, 2)
+
+    def test_reads_follow_writes(self, sent, schedule):
+        coalescer = _coalescer(sent, schedule)
+        coalescer.read("680", 268)
+        coalescer.write("680", 396, "55.0")
+        coalescer.write("680", 396, "56.0")
+        coalescer.read("680", 396)
+        coalescer.read("680", 268)
+        schedule.run()
+        assert sent == [{"mode": "write", "data": [[396, "55.0"], [396, "56.0"]]},
+                        {"mode": "read", "data": [268, 396]}]
+
+    def test_separate_ecus_and_write_modes(self, sent, schedule):
+        coalescer = _coalescer(sent, schedule)
+        coalescer.write("680", 396, "55.0")
+        coalescer.write("6a1", 1100, "1")
+        coalescer.write("680", 2000, "0a0b", mode="write-raw")
+        schedule.run()
+        assert [(c["mode"], c["data"]) for c in sent] == [("write", [[396, "55.0"]]),
+                                                           ("write-raw", [[2000, "0a0b"]]),
+                                                           ("write", [[1100, "1"]])]
+
+    def test_write_modes_keep_order(self, sent, schedule):
+        coalescer = _coalescer(sent, schedule)
+        coalescer.write("680", 396, "55.0")
+        coalescer.write("680", 396, "3700", mode="write-raw")
+        coalescer.write("680", 396, "56.0")
+        coalescer.write("680", 397, "45.0")
+        coalescer.read("680", 396)
+        schedule.run()
+        assert [(c["mode"], c["data"]) for c in sent] == [("write", [[396, "55.0"]]),
+                                                           ("write-raw", [[396, "3700"]]),
+                                                           ("write", [[396, "56.0"], [397, "45.0"]]),
+                                                           ("read", [396])]
+
+    def test_full_batch_sent_early(self, sent, schedule):
+        coalescer = _coalescer(sent, schedule, max_batch=3)
+        coalescer.write("680", 396, "55.0")
+        for did in (1, 2, 3):
+            coalescer.read("680", did)
+        assert sent == [{"mode": "write", "data": [[396, "55.0"]]}, {"mode": "read", "data": [1, 2, 3]}]
+        coalescer.read("680", 4)
+        schedule.run()
+        assert sent[-1] == {"mode": "read", "data": [4]}
+        assert coalescer.stats()["largest_batch"] == 3
+
+    def test_stop_flushes(self, sent, schedule):
+        coalescer = _coalescer(sent, schedule)
+        coalescer.read("680", 268)
+        coalescer.stop()
+        assert sent == [{"mode": "read", "data": [268]}]
+        coalescer.read("680", 269)
+        assert len(sent) == 2
+
+    def test_zero_window_disables_batching(self, sent, schedule):
+        coalescer = _coalescer(sent, schedule, window_s=0)
+        coalescer.read("680", 268)
+        assert sent and not schedule.calls
+
+
+def _bridge(**kwargs):
+    with patch("bridge.mqtt.Client") as MockClient:
+        MockClient.return_value = MagicMock()
+        from bridge import Open3EBridge
+        return Open3EBridge(test_mode=False, add_test_prefix=False, **kwargs)
+
+
+def test_bridge_batches_write_and_verify(schedule):
+    bridge = _bridge(command_batch=5)
+    bridge.commands.start(schedule)
+    bridge.write_and_verify("680", 396, "55.0")
+    bridge.write_and_verify("680", 397, "45.0")
+    schedule.run()
+    calls = bridge.client.publish.call_args_list
+    assert [c.args[0] for c in calls] == ["open3e/cmnd", "open3e/cmnd"]
+    assert json.loads(calls[1].args[1]) == {"mode": "read", "data": [396, 397]}
+    assert calls[0].kwargs["qos"] == 1
+    assert bridge._pending_writes == {("680", 396): "55.0", ("680", 397): "45.0"}
+    assert bridge.get_diagnostics()["commands"]["saved"] == 2
+
+
+def test_main_command_args():
+    from bridge import main
+    with patch("bridge.get_generator_class") as mock_get_gen, \
+         patch("sys.argv", ["bridge", "--command-window", "20", "--command-batch", "4"]):
+        mock_get_gen.return_value.return_value.auto_discovered_count = 0
+        with patch("bridge.Open3EBridge") as MockBridge:
+            main()
+    kwargs = MockBridge.call_args.kwargs
+    assert (kwargs["command_window"], kwargs["command_batch"]) == (0.02, 4)
@@ -0,0 +1,142 @@
+"""Tests for the compiled config cache (generators/config_cache.py)."""
+import os
+import shutil
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+import generators.config_cache as config_cache
+from generators.base import BaseGenerator
+from generators.config_cache import ConfigCache, default_cache_dir
+from generators.homeassistant import HomeAssistantGenerator
+
+
+@pytest.fixture
+def config_copy(tmp_path, config_dir):
+    """Writable copy of the shipped config."""
+    target = tmp_path / "config"
+    shutil.copytree(config_dir, target)
+    return target
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ConfigCache(tmp_path / "cache")
+
+
+def _no_yaml(*args, **kwargs):
+    raise AssertionError("YAML parsed despite a valid compiled config")
+
+
+def _state(gen):
+    return gen.datapoints, gen.type_templates, gen.translations, gen.user_names, gen._active_profile
+
+
+class TestConfigCache:
+    def test_warm_start_reads_no_yaml(self, config_copy, cache):
+        cold = BaseGenerator(str(config_copy), "de", config_cache=cache)
+        with patch("generators.base.load_yaml_file", _no_yaml):
+            warm = BaseGenerator(str(config_copy), "de", config_cache=cache)
+        assert _state(warm) == _state(cold)
+        assert _state(warm) == _state(BaseGenerator(str(config_copy), "de"))
+
+    def test_keyed_on_profile_and_language(self, config_copy, cache):
+        BaseGenerator(str(config_copy), "de", profile="vitocal", config_cache=cache)
+        vitodens = BaseGenerator(str(config_copy), "de", profile="vitodens", config_cache=cache)
+        english = BaseGenerator(str(config_copy), "en", profile="vitocal", config_cache=cache)
+        assert vitodens._active_profile == "vitodens"
+        assert english.translations == {}
+        assert len(list(cache.cache_dir.glob("*.bin"))) == 3
+
+    def test_changed_source_invalidates(self, config_copy, cache):
+        BaseGenerator(str(config_copy), "en", config_cache=cache)
+        types = config_copy / "templates" / "types.yaml"
+        types.write_text(types.read_text() + "\ncustom_type:\n  component: sensor\n")
+        gen = BaseGenerator(str(config_copy), "en", config_cache=cache)
+        assert "custom_type" in gen.type_templates
+
+    def test_new_overlay_file_invalidates(self, config_copy, cache):
+        BaseGenerator(str(config_copy), "en", config_cache=cache)
+        (config_copy / "local" / "datapoints.yaml").write_text(
+            "datapoints:\n  9999:\n    name: Custom\n    type: temperature_sensor\n")
+        gen = BaseGenerator(str(config_copy), "en", config_cache=cache)
+        assert 9999 in gen.datapoints["datapoints"]
+
+    def test_touched_file_with_same_content_reused(self, config_copy, cache):
+        BaseGenerator(str(config_copy), "en", config_cache=cache)
+        common = config_copy / "profiles" / "common.yaml"
+        os.utime(common, ns=(1, 1))
+        with patch("generators.base.load_yaml_file", _no_yaml):
+            BaseGenerator(str(config_copy), "en", config_cache=cache)
+        # The manifest was refreshed, so the next start does not hash again
+        with patch.object(config_cache, "_file_hash", _no_yaml), \
+             patch("generators.base.load_yaml_file", _no_yaml):
+            BaseGenerator(str(config_copy), "en", config_cache=cache)
+
+    def test_corrupt_cache_ignored(self, config_copy, cache):
+        gen = BaseGenerator(str(config_copy), "en", config_cache=cache)
+        path = cache.path_for(config_copy, "auto", "en")
+        path.write_bytes(b"garbage")
+        assert _state(BaseGenerator(str(config_copy), "en", config_cache=cache)) == _state(gen)
+
+    def test_version_bump_invalidates(self, config_copy, cache):
+        BaseGenerator(str(config_copy), "en", config_cache=cache)
+        with patch.object(config_cache, "CACHE_VERSION", config_cache.CACHE_VERSION + 1):
+            path = cache.path_for(config_copy, "auto", "en")
+            assert cache.load(path, BaseGenerator(str(config_copy), "en")._config_sources()) is None
+
+    def test_unwritable_cache_dir(self, config_copy, tmp_path):
+        blocker = tmp_path / "file"
+        blocker.write_text("")
+        gen = BaseGenerator(str(config_copy), "en", config_cache=ConfigCache(blocker / "cache"))
+        assert gen.datapoints["datapoints"]
+
+    def test_unmarshallable_config_not_cached(self, config_copy, cache):
+        (config_copy / "user" / "names.yaml").write_text("names:\n  since: 2024-01-01\n")
+        gen = BaseGenerator(str(config_copy), "en", config_cache=cache)
+        assert gen.save_config_cache() is None
+
+
+class TestDefaultCacheDir:
+    def test_env_override(self, monkeypatch, tmp_path):
+        monkeypatch.setenv("OPEN3E_CONFIG_CACHE", str(tmp_path))
+        assert default_cache_dir() == tmp_path
+
+    def test_xdg(self, monkeypatch, tmp_path):
+        monkeypatch.delenv("OPEN3E_CONFIG_CACHE", raising=False)
+        monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+        assert default_cache_dir() == tmp_path / "open3e-bridge"
+
+
+class TestCompileConfig:
+    def test_compiles_every_language(self, config_copy, tmp_path):
+        from bridge import compile_config
+
+        assert compile_config(str(config_copy), "auto", str(tmp_path / "cache")) == 0
+        cache = ConfigCache(tmp_path / "cache")
+        assert cache.path_for(config_copy, "auto", "en").exists()
+        assert cache.path_for(config_copy, "auto", "de").exists()
+        # The profiles the bridge may load after detection
+        for profile in ("common", "vitocal", "vitodens"):
+            assert cache.path_for(config_copy, profile, "en").exists()
+            assert cache.path_for(config_copy, profile, "de").exists()
+        with patch("generators.base.load_yaml_file", _no_yaml):
+            gen = HomeAssistantGenerator(str(config_copy), "de", config_cache=cache)
+            assert gen.switch_profile("vitodens") is not None
+            HomeAssistantGenerator(str(config_copy), "de", profile="common", config_cache=cache)
+
+    def test_invalid_config_fails(self, config_copy, tmp_path):
+        from bridge import compile_config
+
+        (config_copy / "local" / "datapoints.yaml").write_text("datapoints:\n  9999:\n    name: Broken\n")
+        assert compile_config(str(config_copy), "auto", str(tmp_path / "cache")) == 1
+
+    def test_bridge_uses_cache_dir(self, config_copy, tmp_path):
+        with patch("bridge.mqtt.Client") as MockClient:
+            MockClient.return_value = MagicMock()
+            from bridge import Open3EBridge
+
+            Open3EBridge(config_dir=str(config_copy), config_cache_dir=str(tmp_path / "cache"))
+            with patch("generators.base.load_yaml_file", _no_yaml):
+                bridge = Open3EBridge(config_dir=str(config_copy), config_cache_dir=str(tmp_path / "cache"))
+        assert bridge.generator.plan.datapoints
@@ -0,0 +1,129 @@
+"""Tests for config hot reload with incremental discovery diff."""
+import json
+import os
+import shutil
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from generators.base import LAYER_DATAPOINTS, LAYER_NAMES, BaseGenerator
+
+FLOW = "open3e/680_268_FlowTemperatureSensor/Actual"
+RETURN = "open3e/680_269_ReturnTemperatureSensor/Actual"
+CUSTOM = "open3e/680_9999_CustomSensor"
+
+
+@pytest.fixture
+def config_copy(tmp_path, config_dir):
+    """Writable copy of the shipped config."""
+    target = tmp_path / "config"
+    shutil.copytree(config_dir, target)
+    return target
+
+
+def _write(path, text):
+    """Write and bump the mtime, so the change is seen even within one timestamp tick."""
+    path.write_text(text)
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+
+@pytest.fixture
+def bridge(config_copy):
+    with patch("bridge.mqtt.Client") as MockClient:
+        MockClient.return_value = MagicMock()
+        from bridge import Open3EBridge
+        bridge = Open3EBridge(config_dir=str(config_copy), test_mode=False, add_test_prefix=False,
+                              auto_discover=False, language="en")
+    for topic in (FLOW, RETURN, CUSTOM):
+        bridge.process_message(topic, "20.0")
+    bridge.client.publish.reset_mock()
+    return bridge
+
+
+def _published(bridge):
+    return {c.args[0]: c.args[1] for c in bridge.client.publish.call_args_list}
+
+
+class TestGeneratorReload:
+    def test_nothing_changed(self, config_copy):
+        assert BaseGenerator(str(config_copy), "en").reload_config() is None
+
+    def test_only_changed_layer_reloaded(self, config_copy):
+        gen = BaseGenerator(str(config_copy), "en")
+        datapoints = gen.datapoints
+        _write(config_copy / "user" / "names.yaml", "names:\n  268:\n    Actual: Vorlauf\n")
+        with patch.object(BaseGenerator, "_load_config", side_effect=AssertionError("datapoints reparsed")):
+            reload = gen.reload_config()
+        assert reload is not None
+        assert reload.layers == (LAYER_NAMES,)
+        assert reload.dids == {268}
+        assert gen.datapoints is datapoints
+        assert gen.plan.datapoints[268].subs["Actual"].name == "Vorlauf"
+
+    def test_local_overlay_remerged(self, config_copy):
+        gen = BaseGenerator(str(config_copy), "en")
+        local = config_copy / "local" / "datapoints.yaml"
+        _write(local, "datapoints:\n  9999:\n    name: Custom\n    type: temperature_sensor\n")
+        assert gen.reload_config().layers == (LAYER_DATAPOINTS,)
+        assert 9999 in gen.plan.datapoints
+        local.unlink()
+        assert gen.reload_config().dids == {9999}
+        assert 9999 not in gen.plan.datapoints
+
+    def test_broken_yaml_keeps_config(self, config_copy):
+        gen = BaseGenerator(str(config_copy), "en")
+        plan = gen.plan
+        _write(config_copy / "local" / "datapoints.yaml", "datapoints: [unclosed\n")
+        assert gen.reload_config() is None
+        assert gen.plan is plan
+        # Not retried until the file changes again
+        assert gen.changed_sources() == []
+
+    def test_invalid_config_rejected(self, config_copy):
+        gen = BaseGenerator(str(config_copy), "en")
+        _write(config_copy / "local" / "datapoints.yaml", "datapoints:\n  9999:\n    name: No type\n")
+        assert gen.reload_config() is None
+        assert 9999 not in gen.plan.datapoints
+
+
+class TestBridgeReload:
+    def test_only_changed_entity_republished(self, bridge, config_copy):
+        _write(config_copy / "user" / "names.yaml", "names:\n  268:\n    Actual: Vorlauf\n")
+        assert bridge.reload_config()
+        published = _published(bridge)
+        assert len(published) == 1
+        assert json.loads(next(iter(published.values())))["name"] == "Vorlauf"
+        assert bridge.get_diagnostics()["config_reloads"] == 1
+
+    def test_no_change_no_publish(self, bridge):
+        assert not bridge.reload_config()
+        bridge.client.publish.assert_not_called()
+
+    def test_added_and_removed_datapoints(self, bridge, config_copy):
+        local = config_copy / "local" / "datapoints.yaml"
+        _write(local, "datapoints:\n  9999:\n    name: Custom\n    type: temperature_sensor\n")
+        bridge.reload_config()
+        added = _published(bridge)
+        assert len(added) == 1
+        topic = next(iter(added))
+        assert json.loads(added[topic])["state_topic"] == CUSTOM
+
+        bridge.client.publish.reset_mock()
+        local.unlink()
+        bridge.reload_config()
+        assert _published(bridge) == {topic: ""}
+        assert topic not in bridge.published_digests
+
+    def test_connection_and_state_kept(self, bridge, config_copy):
+        bridge._electrical_power = 1000.0
+        _write(config_copy / "user" / "names.yaml", "names:\n  269: Ruecklauf\n")
+        bridge.reload_config()
+        bridge.client.disconnect.assert_not_called()
+        bridge.client.connect.assert_not_called()
+        assert bridge._electrical_power == 1000.0
+        # Steady-state messages after the reload publish nothing new
+        bridge.client.publish.reset_mock()
+        bridge.process_message(RETURN, "21.0")
+        bridge.process_message(FLOW, "21.0")
+        assert _published(bridge) == {}
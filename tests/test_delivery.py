@@ -0,0 +1,119 @@
+"""Tests for QoS 1 delivery tracking (runtime/delivery.py)."""
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from paho.mqtt.packettypes import PacketTypes
+from paho.mqtt.reasoncodes import ReasonCode
+
+from runtime.delivery import DeliveryTracker
+from runtime.publisher import PRIORITY_COMMAND, OutboundPublisher
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000_000
+
+    def __call__(self):
+        return self.now
+
+
+def _info(mid, rc=0):
+    return SimpleNamespace(mid=mid, rc=rc)
+
+
+class TestDeliveryTracker:
+    def test_ack_latency(self):
+        clock = FakeClock()
+        tracker = DeliveryTracker(clock=clock)
+        tracker.track(_info(1), "open3e/cmnd", tracker.start())
+        assert tracker.stats()["in_flight"] == 1
+        clock.now += 2_000_000
+        tracker.acknowledged_mid(1)
+        stats = tracker.stats()
+        assert (stats["acknowledged"], stats["in_flight"], stats["max_in_flight"]) == (1, 0, 1)
+        assert stats["ack_latency"]["max_us"] == 2000.0
+
+    def test_ack_before_track(self):
+        clock = FakeClock()
+        tracker = DeliveryTracker(clock=clock)
+        sent = tracker.start()
+        clock.now += 500_000
+        tracker.acknowledged_mid(7)
+        tracker.track(_info(7), "open3e/cmnd", sent)
+        stats = tracker.stats()
+        assert (stats["acknowledged"], stats["in_flight"]) == (1, 0)
+
+    def test_stale_early_ack_ignored(self):
+        clock = FakeClock()
+        tracker = DeliveryTracker(clock=clock)
+        tracker.acknowledged_mid(7)  # a QoS 0 publish with the same mid
+        clock.now += 1
+        tracker.track(_info(7), "open3e/cmnd", tracker.start())
+        assert tracker.stats()["in_flight"] == 1
+
+    def test_failures(self):
+        tracker = DeliveryTracker(clock=FakeClock())
+        tracker.track(_info(1, rc=15), "open3e/cmnd", tracker.start())
+        tracker.track(_info(2), "open3e/cmnd", tracker.start())
+        tracker.acknowledged_mid(2, ReasonCode(PacketTypes.PUBACK, identifier=0x87))
+        stats = tracker.stats()
+        assert (stats["failed"], stats["acknowledged"], stats["in_flight"]) == (2, 0, 0)
+
+    def test_overdue(self):
+        clock = FakeClock()
+        tracker = DeliveryTracker(overdue_s=30, clock=clock)
+        tracker.track(_info(1), "open3e/cmnd", tracker.start())
+        clock.now += 31 * 10 ** 9
+        stats = tracker.stats()
+        assert stats["overdue"] == 1
+        assert stats["oldest_in_flight_s"] == 31.0
+
+
+class TestPublisherTracking:
+    def test_only_qos1_tracked(self):
+        client, tracker = MagicMock(), DeliveryTracker()
+        client.publish.return_value = _info(3)
+        publisher = OutboundPublisher(client, delivery=tracker)
+        publisher.submit("open3e/bridge/cop", "3.1")
+        publisher.submit("open3e/cmnd", "{}", priority=PRIORITY_COMMAND, qos=1)
+        assert tracker.stats()["tracked"] == 1
+
+
+class TestBridgeDelivery:
+    def _bridge(self, **kwargs):
+        with patch("bridge.mqtt.Client") as MockClient:
+            MockClient.return_value = MagicMock()
+            from bridge import Open3EBridge
+            bridge = Open3EBridge(test_mode=False, add_test_prefix=False, **kwargs)
+        return bridge
+
+    def test_commands_and_lwt_tracked(self):
+        bridge = self._bridge()
+        bridge.client.publish.side_effect = lambda *args, **kwargs: _info(bridge.client.publish.call_count)
+        bridge._on_connect(bridge.client, None, None, 0, None)
+        bridge.write_and_verify("680", 1100, "1")
+        delivery = bridge.get_diagnostics()["delivery"]
+        assert delivery["tracked"] == 3
+        assert delivery["max_inflight"] == 20
+        for mid in range(1, bridge.client.publish.call_count + 1):
+            bridge._on_publish(bridge.client, None, mid, ReasonCode(PacketTypes.PUBACK), None)
+        assert bridge.get_diagnostics()["delivery"]["acknowledged"] == 3
+
+    def test_discovery_qos_and_max_inflight(self):
+        bridge = self._bridge(discovery_qos=1, max_inflight=50)
+        bridge.client.max_inflight_messages_set.assert_called_once_with(50)
+        bridge.process_message("open3e/680_268_FlowTemperatureSensor/Actual", "20.0")
+        [call] = [c for c in bridge.client.publish.call_args_list if c.args[0].endswith("/config")]
+        assert call.kwargs["qos"] == 1
+        assert bridge.get_diagnostics()["delivery"]["max_inflight"] == 50
+
+
+def test_main_delivery_args():
+    from bridge import main
+    with patch("bridge.get_generator_class") as mock_get_gen, \
+         patch("sys.argv", ["bridge", "--discovery-qos", "1", "--max-inflight", "40"]):
+        mock_get_gen.return_value.return_value.auto_discovered_count = 0
+        with patch("bridge.Open3EBridge") as MockBridge:
+            main()
+    kwargs = MockBridge.call_args.kwargs
+    assert (kwargs["discovery_qos"], kwargs["max_inflight"]) == (1, 40)
@@ -0,0 +1,102 @@
+"""Tests for the per-topic discovery result cache."""
+import json
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+FLOW_TOPIC = "open3e/680_268_FlowTemperatureSensor/Actual"
+
+
+class TestGeneratorCache:
+    def test_repeat_topic_returns_cached_result(self, generator_en):
+        first = generator_en.generate_discovery_message(FLOW_TOPIC, "22.5", test_mode=False)
+        second = generator_en.generate_discovery_message(FLOW_TOPIC, "23.0", test_mode=False)
+        assert first
+        assert second is first
+
+    def test_cache_hit_skips_generation(self, generator_en):
+        generator_en.generate_discovery_message(FLOW_TOPIC, "22.5", test_mode=False)
+        with patch.object(generator_en, "_generate_discovery") as gen:
+            generator_en.generate_discovery_message(FLOW_TOPIC, "22.6", test_mode=False)
+        gen.assert_not_called()
+
+    def test_test_mode_is_part_of_key(self, generator_en):
+        live = generator_en.generate_discovery_message(FLOW_TOPIC, "1", test_mode=False)
+        test = generator_en.generate_discovery_message(FLOW_TOPIC, "1", test_mode=True)
+        assert live is not test
+
+    def test_unconfigured_topic_cached_as_empty(self, generator_en):
+        topic = "open3e/680_99999_Unknown/Value"
+        assert generator_en.generate_discovery_message(topic, "1") == []
+        assert generator_en._discovery_cache[(topic, True)] == []
+
+    def test_heuristic_entity_counted_once(self, generator_auto):
+        topic = "open3e/680_99999_SomeTemperatureSensor/Actual"
+        for _ in range(5):
+            generator_auto.generate_discovery_message(topic, "42", test_mode=False)
+        assert generator_auto.auto_discovered_count == 1
+
+    def test_parse_is_memoized(self, generator_en):
+        assert generator_en.parse_open3e_topic(FLOW_TOPIC) is generator_en.parse_open3e_topic(FLOW_TOPIC)
+
+
+class TestCacheInvalidation:
+    def test_device_identity_change_invalidates(self, generator_en):
+        generator_en.generate_discovery_message(FLOW_TOPIC, "22.5", test_mode=False)
+        generator_en.generate_discovery_message("open3e/680_377_IdentNumber", "Vitocal 250-A", test_mode=False)
+        assert generator_en._discovery_cache == {}
+
+    def test_unchanged_device_identity_keeps_cache(self, generator_en):
+        generator_en.generate_discovery_message("open3e/680_377_IdentNumber", "Vitocal 250-A", test_mode=False)
+        generator_en.generate_discovery_message(FLOW_TOPIC, "22.5", test_mode=False)
+        generator_en.generate_discovery_message("open3e/680_377_IdentNumber", "Vitocal 250-A", test_mode=False)
+        assert (FLOW_TOPIC, False) in generator_en._discovery_cache
+
+    def test_identification_did_not_cached(self, generator_en):
+        topic = "open3e/680_377_IdentNumber"
+        generator_en.generate_discovery_message(topic, "Vitocal 250-A", test_mode=False)
+        generator_en.generate_discovery_message(topic, "VX3", test_mode=False)
+        assert (topic, False) not in generator_en._discovery_cache
+        assert generator_en.device_cache["680"]["name"] == "Viessmann VX3"
+
+    def test_language_change_invalidates_and_retranslates(self, generator_en):
+        en = generator_en.generate_discovery_message(FLOW_TOPIC, "1", test_mode=False)
+        generator_en.set_language("de")
+        de = generator_en.generate_discovery_message(FLOW_TOPIC, "1", test_mode=False)
+        assert json.loads(en[0][1])["name"] != json.loads(de[0][1])["name"]
+        assert "Vorlauftemperatur" in json.loads(de[0][1])["name"]
+
+    def test_same_language_keeps_cache(self, generator_en):
+        generator_en.generate_discovery_message(FLOW_TOPIC, "1", test_mode=False)
+        generator_en.set_language("en")
+        assert generator_en._discovery_cache
+
+    def test_cache_bounded(self, generator_en):
+        generator_en.discovery_cache_size = 2
+        topics = [f"open3e/680_{did}_Sensor" for did in (268, 269, 274)]
+        for topic in topics:
+            generator_en.generate_discovery_message(topic, "1", test_mode=False)
+        assert list(generator_en._discovery_cache) == [(t, False) for t in topics[1:]]
+        assert list(generator_en._parsed_topics) == topics[1:]
+
+    def test_invalid_topics_not_memoized(self, generator_en):
+        assert generator_en.parse_open3e_topic("open3e/garbage") is None
+        assert generator_en.parse_open3e_topic("zigbee/lamp") is None
+        assert generator_en._parsed_topics == {}
+
+
+@pytest.fixture
+def bridge():
+    with patch("bridge.mqtt.Client") as MockClient:
+        MockClient.return_value = MagicMock()
+        from bridge import Open3EBridge
+        yield Open3EBridge(test_mode=False, add_test_prefix=False)
+
+
+class TestBridgeSteadyState:
+    def test_repeat_message_publishes_once(self, bridge):
+        for value in ("22.5", "22.6", "22.7"):
+            bridge.process_message(FLOW_TOPIC, value)
+        discovery_calls = [c for c in bridge.client.publish.call_args_list if c.args[0].endswith("/config")]
+        assert len(discovery_calls) == 1
+        assert bridge._discovery_published == 1
@@ -0,0 +1,121 @@
+"""Tests for compact discovery payloads (generators/abbreviations.py)."""
+import json
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from generators.abbreviations import (
+    ABBREVIATIONS,
+    DEFAULTS,
+    DEVICE_ABBREVIATIONS,
+    ORIGIN_ABBREVIATIONS,
+    compact_config,
+    dumps_discovery,
+)
+from generators.homeassistant import HomeAssistantGenerator
+
+TOPICS = (
+    "open3e/680_268_FlowTemperatureSensor/Actual",   # sensor
+    "open3e/680_396_DomesticHotWaterTemperatureSetpoint",  # number
+    "open3e/680_531_DHWOperationMode",               # select + water_heater
+    "open3e/680_1415_Circuit1OperationMode/Mode/ID",  # climate
+    "open3e/680_9999_BufferTemperatureSensor/Actual",  # heuristic
+)
+
+
+def _expand(payload: dict) -> dict:
+    """What Home Assistant makes of a compact payload (abbreviations, ~ and defaults)."""
+    full = {v: k for k, v in ABBREVIATIONS.items()}
+    nested = {"device": {v: k for k, v in DEVICE_ABBREVIATIONS.items()},
+              "origin": {v: k for k, v in ORIGIN_ABBREVIATIONS.items()}}
+    base = payload.get("~")
+    config = {}
+    for key, value in payload.items():
+        if key == "~":
+            continue
+        key = full.get(key, key)
+        if base and key.endswith("_topic") and value.startswith("~"):
+            value = base + value[1:]
+        if key in nested:
+            value = {nested[key].get(k, k): v for k, v in value.items()}
+        config[key] = value
+    if "availability_topic" in config:
+        config = {**DEFAULTS, **config}
+    return config
+
+
+@pytest.fixture
+def generators(config_dir):
+    kwargs = dict(language="en", add_test_prefix=False, auto_discover=True)
+    return (HomeAssistantGenerator(str(config_dir), **kwargs),
+            HomeAssistantGenerator(str(config_dir), compact=True, **kwargs))
+
+
+class TestCompactConfig:
+    def test_keys_abbreviated(self):
+        compact = compact_config({
+            "unique_id": "open3e_680_268", "state_topic": "open3e/680_268_Flow",
+            "device": {"identifiers": ["x"], "manufacturer": "Viessmann"},
+            "origin": {"name": "Open3E Bridge", "support_url": "https://example.org"},
+        })
+        assert compact == {
+            "uniq_id": "open3e_680_268", "stat_t": "open3e/680_268_Flow",
+            "dev": {"ids": ["x"], "mf": "Viessmann"},
+            "o": {"name": "Open3E Bridge", "url": "https://example.org"},
+        }
+
+    def test_base_topic(self):
+        compact = compact_config({
+            "state_topic": "open3e/680_268_Flow/Actual",
+            "availability_topic": "open3e/LWT",
+            "command_topic": "open3e/cmnd",
+        })
+        assert compact == {"~": "open3e", "stat_t": "~/680_268_Flow/Actual", "avty_t": "~/LWT", "cmd_t": "~/cmnd"}
+
+    def test_no_base_when_it_does_not_pay_off(self):
+        compact = compact_config({"state_topic": "open3e/a", "availability_topic": "open3e/LWT"})
+        assert "~" not in compact
+        assert compact_config({"state_topic": "a/b", "command_topic": "c/d", "availability_topic": "e/f"}).keys() \
+            == {"stat_t", "cmd_t", "avty_t"}
+
+    def test_defaults_dropped(self):
+        assert compact_config({"payload_available": "online", "payload_not_available": "gone"}) \
+            == {"pl_not_avail": "gone"}
+
+    def test_dumps_without_whitespace(self):
+        assert dumps_discovery({"name": "Vorlauf"}) == '{"name": "Vorlauf"}'
+        assert dumps_discovery({"name": "Vorlauf", "icon": "mdi:x"}, compact=True) == '{"name":"Vorlauf","ic":"mdi:x"}'
+
+
+class TestCompactGenerator:
+    def test_equivalent_to_full_payloads(self, generators):
+        full, compact = generators
+        count = 0
+        for topic in TOPICS:
+            full_messages = full.generate_discovery_message(topic, "1", test_mode=False)
+            compact_messages = compact.generate_discovery_message(topic, "1", test_mode=False)
+            assert [t for t, _ in compact_messages] == [t for t, _ in full_messages]
+            for (_, full_payload), (_, compact_payload) in zip(full_messages, compact_messages):
+                assert _expand(json.loads(compact_payload)) == json.loads(full_payload)
+                assert len(compact_payload) < len(full_payload)
+                count += 1
+        assert count >= len(TOPICS)
+
+    def test_default_is_full(self, generators):
+        full, _ = generators
+        [(_, payload)] = full.generate_discovery_message(TOPICS[0], "1", test_mode=False)
+        assert "state_topic" in json.loads(payload)
+
+
+class TestBridgeCompact:
+    def test_bridge_entities_compact(self):
+        with patch("bridge.mqtt.Client") as MockClient:
+            MockClient.return_value = MagicMock()
+            from bridge import Open3EBridge
+            bridge = Open3EBridge(test_mode=False, add_test_prefix=False, compact_discovery=True)
+        assert bridge.generator.compact
+        bridge._publish_cop_discovery()
+        bridge._publish_health_discovery()
+        for call in bridge.client.publish.call_args_list:
+            payload = json.loads(call.args[1])
+            assert "uniq_id" in payload and "unique_id" not in payload
@@ -0,0 +1,123 @@
+"""Tests for device-based discovery (--discovery-mode device, generators/devices.py)."""
+import json
+import shutil
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from generators.homeassistant import HomeAssistantGenerator
+
+FLOW = "open3e/680_268_FlowTemperatureSensor/Actual"
+RETURN = "open3e/680_269_ReturnTemperatureSensor/Actual"
+OUTSIDE = "open3e/680_274_OutsideTemperatureSensor/Actual"
+CUSTOM = "open3e/680_9999_CustomSensor"
+INDOOR = "homeassistant/device/open3e_680_indoor/config"
+
+
+@pytest.fixture
+def generator(config_dir):
+    return HomeAssistantGenerator(str(config_dir), "en", add_test_prefix=False, discovery_mode="device")
+
+
+def _config(messages, topic=INDOOR):
+    return json.loads(dict(messages)[topic])
+
+
+class TestDeviceGenerator:
+    def test_one_config_per_device(self, generator):
+        assert [t for t, _ in generator.generate_discovery_message(FLOW, "1", False)] == [INDOOR]
+        assert [t for t, _ in generator.generate_discovery_message(OUTSIDE, "1", False)] == \
+            ["homeassistant/device/open3e_680_outdoor/config"]
+
+    def test_payload_structure(self, generator):
+        config = _config(generator.generate_discovery_message(FLOW, "1", False))
+        assert config["device"]["identifiers"] == ["open3e_680_indoor"]
+        assert config["origin"]["name"] == "Open3E Bridge"
+        # Shared by all components: moved to the root
+        assert config["availability_topic"] == "open3e/LWT"
+        component = config["components"]["open3e_680_268_actual"]
+        assert component["platform"] == "sensor"
+        assert component["unique_id"] == "open3e_680_268_actual"
+        assert component["state_topic"] == FLOW
+        assert not {"device", "origin", "availability_topic"} & set(component)
+
+    def test_components_added_incrementally(self, generator):
+        first = generator.generate_discovery_message(FLOW, "1", False)
+        second = generator.generate_discovery_message(RETURN, "1", False)
+        assert set(_config(second)["components"]) == {"open3e_680_268_actual", "open3e_680_269_actual"}
+        # The first topic's cached result follows the device payload
+        assert generator.generate_discovery_message(FLOW, "2", False) == second
+        assert first != second
+
+    def test_repeat_message_same_payload(self, generator):
+        generator.generate_discovery_message(FLOW, "1", False)
+        [(_, payload)] = generator.generate_discovery_message(RETURN, "1", False)
+        [(_, again)] = generator.generate_discovery_message(RETURN, "2", False)
+        assert again is payload
+
+    def test_compact(self, config_dir):
+        generator = HomeAssistantGenerator(str(config_dir), "en", add_test_prefix=False,
+                                           discovery_mode="device", compact=True)
+        config = _config(generator.generate_discovery_message(FLOW, "1", False))
+        assert set(config) == {"dev", "o", "avty_t", "cmps"}
+        assert config["cmps"]["open3e_680_268_actual"]["p"] == "sensor"
+        assert config["cmps"]["open3e_680_268_actual"]["stat_t"] == FLOW
+
+    def test_unknown_mode_rejected(self, config_dir):
+        with pytest.raises(ValueError, match="discovery mode"):
+            HomeAssistantGenerator(str(config_dir), "en", discovery_mode="single")
+
+
+@pytest.fixture
+def config_copy(tmp_path, config_dir):
+    target = tmp_path / "config"
+    shutil.copytree(config_dir, target)
+    return target
+
+
+@pytest.fixture
+def bridge(config_copy):
+    with patch("bridge.mqtt.Client") as MockClient:
+        MockClient.return_value = MagicMock()
+        from bridge import Open3EBridge
+        return Open3EBridge(config_dir=str(config_copy), test_mode=False, add_test_prefix=False,
+                            auto_discover=False, language="en", discovery_mode="device")
+
+
+def _published(bridge):
+    return [c.args[:2] for c in bridge.client.publish.call_args_list]
+
+
+class TestDeviceBridge:
+    def test_incremental_updates(self, bridge):
+        bridge.process_message(FLOW, "20.0")
+        bridge.process_message(RETURN, "20.0")
+        bridge.process_message(FLOW, "21.0")
+        published = _published(bridge)
+        assert [t for t, _ in published] == [INDOOR, INDOOR]
+        assert len(json.loads(published[-1][1])["components"]) == 2
+
+    def test_ha_restart_publishes_each_device_once(self, bridge):
+        for topic in (FLOW, RETURN, OUTSIDE):
+            bridge.process_message(topic, "20.0")
+        bridge.client.publish.reset_mock()
+        bridge._republish_all_discovery()
+        topics = [t for t, _ in _published(bridge)]
+        assert topics.count(INDOOR) == 1
+        assert topics.count("homeassistant/device/open3e_680_outdoor/config") == 1
+
+    def test_removed_component_published_as_platform_only(self, bridge, config_copy):
+        local = config_copy / "local" / "datapoints.yaml"
+        local.write_text("datapoints:\n  9999:\n    name: Custom\n    type: temperature_sensor\n    device: indoor\n")
+        bridge.reload_config()
+        bridge.process_message(FLOW, "20.0")
+        bridge.process_message(CUSTOM, "20.0")
+        bridge.client.publish.reset_mock()
+
+        local.unlink()
+        assert bridge.reload_config()
+        [(topic, payload)] = _published(bridge)
+        assert topic == INDOOR
+        components = json.loads(payload)["components"]
+        assert components["open3e_680_9999"] == {"platform": "sensor"}
+        assert components["open3e_680_268_actual"]["platform"] == "sensor"
@@ -0,0 +1,160 @@
+"""Tests for seeding the published state from retained discovery (runtime/retained.py)."""
+import logging
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from runtime.retained import DiscoverySeed
+
+FLOW = "open3e/680_268_FlowTemperatureSensor/Actual"
+FLOW_CONFIG = "homeassistant/sensor/open3e_680_268_actual/config"
+MARKER = "open3e/bridge/seed/test"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _msg(topic, payload, retain=True):
+    return SimpleNamespace(topic=topic, payload=payload.encode(), retain=retain)
+
+
+class TestDiscoverySeed:
+    def test_seeds_retained_open3e_configs(self):
+        digests = {}
+        seed = DiscoverySeed("homeassistant", digests, MARKER)
+        assert seed.start()
+        assert seed.offer(FLOW_CONFIG, b'{"name": "x"}', True)
+        assert seed.offer("homeassistant/sensor/zigbee_lamp/config", b"{}", True)
+        assert digests == {FLOW_CONFIG: hash('{"name": "x"}')}
+        assert (seed.seeded, seed.skipped) == (1, 1)
+
+    def test_ignores_live_and_empty_configs(self):
+        digests = {}
+        seed = DiscoverySeed("homeassistant", digests, MARKER)
+        seed.start()
+        assert seed.offer(FLOW_CONFIG, b"{}", False)
+        assert seed.offer(FLOW_CONFIG, b"", True)
+        assert digests == {}
+
+    def test_other_topics_held_until_marker(self):
+        seed = DiscoverySeed("homeassistant", {}, MARKER)
+        seed.start()
+        assert seed.offer(FLOW, b"20.0", False)
+        assert seed.offer("homeassistant/status", b"online", True)
+        assert not seed.offer(MARKER, b"end", False)
+        assert seed.finish() == [(FLOW, b"20.0"), ("homeassistant/status", b"online")]
+
+    def test_timeout_and_overflow_end_seeding(self):
+        clock = FakeClock()
+        seed = DiscoverySeed("homeassistant", {}, MARKER, timeout_s=5, max_held=1, clock=clock)
+        seed.start()
+        assert seed.offer(FLOW, b"20.0", False)
+        assert not seed.offer(FLOW, b"20.1", False)
+        clock.now += 5
+        assert not seed.offer(FLOW_CONFIG, b"{}", True)
+
+    def test_keeps_newer_digest(self):
+        digests = {FLOW_CONFIG: 1}
+        seed = DiscoverySeed("homeassistant", digests, MARKER)
+        seed.start()
+        seed.offer(FLOW_CONFIG, b"{}", True)
+        assert digests[FLOW_CONFIG] == 1
+
+    def test_runs_once(self):
+        seed = DiscoverySeed("homeassistant", {}, MARKER)
+        assert seed.start()
+        assert seed.finish() == []
+        assert seed.finish() is None
+        assert not seed.start()
+        assert not seed.active
+
+
+def _bridge(**kwargs):
+    with patch("bridge.mqtt.Client") as MockClient:
+        MockClient.return_value = MagicMock()
+        from bridge import Open3EBridge
+        bridge = Open3EBridge(test_mode=False, add_test_prefix=False, **kwargs)
+    bridge.ingest = MagicMock()
+    return bridge
+
+
+def _discovery_publishes(bridge):
+    return [c.args[0] for c in bridge.client.publish.call_args_list if c.args[0] == FLOW_CONFIG]
+
+
+@pytest.fixture
+def retained():
+    """The discovery config an earlier run left retained on the broker."""
+    bridge = _bridge()
+    bridge.process_message(FLOW, "20.0")
+    return dict(c.args[:2] for c in bridge.client.publish.call_args_list)[FLOW_CONFIG]
+
+
+class TestBridgeSeeding:
+    def test_unchanged_config_not_republished(self, retained):
+        bridge = _bridge()
+        bridge._on_connect(bridge.client, None, None, 0, None)
+        marker = bridge._discovery_seed.marker_topic
+        assert [c.args[0] for c in bridge.client.subscribe.call_args_list[:2]] == ["homeassistant/+/+/config", marker]
+        bridge.client.publish.assert_any_call(marker, "end")
+        bridge._on_message(bridge.client, None, _msg(FLOW_CONFIG, retained))
+        bridge._on_message(bridge.client, None, _msg(marker, "end", retain=False))
+        bridge.client.unsubscribe.assert_called_once_with(["homeassistant/+/+/config", marker])
+        bridge._on_message(bridge.client, None, _msg(FLOW, "20.0", retain=False))
+        bridge.ingest.submit.assert_called_once_with(FLOW, "20.0")
+
+        bridge.process_message(FLOW, "20.0")
+        assert _discovery_publishes(bridge) == []
+        assert bridge.get_diagnostics()["discovery_seeded"] == 1
+
+    def test_republish_counts_only_submitted(self, retained, caplog):
+        bridge = _bridge()
+        bridge._on_connect(bridge.client, None, None, 0, None)
+        bridge._on_message(bridge.client, None, _msg(FLOW_CONFIG, retained))
+        bridge._on_message(bridge.client, None, _msg(bridge._discovery_seed.marker_topic, "end", retain=False))
+        with caplog.at_level(logging.INFO, logger="open3e_bridge"):
+            bridge._republish_all_discovery()
+        assert _discovery_publishes(bridge) == []
+        # Only the bridge's own COP and health entities
+        assert "Re-published 2 discovery configs" in caplog.text
+
+    def test_changed_config_republished(self, retained):
+        bridge = _bridge()
+        bridge._on_connect(bridge.client, None, None, 0, None)
+        bridge._on_message(bridge.client, None, _msg(FLOW_CONFIG, retained.replace("Flow", "Old")))
+        bridge._on_message(bridge.client, None, _msg(bridge._discovery_seed.marker_topic, "end", retain=False))
+        bridge.process_message(FLOW, "20.0")
+        assert _discovery_publishes(bridge) == [FLOW_CONFIG]
+
+    def test_queued_values_do_not_end_seeding(self, retained):
+        """A persistent session delivers queued open3e values before the retained configs."""
+        bridge = _bridge()
+        bridge._on_connect(bridge.client, None, None, 0, None)
+        bridge._on_message(bridge.client, None, _msg(FLOW, "19.5", retain=False))
+        bridge._on_message(bridge.client, None, _msg(FLOW_CONFIG, retained))
+        assert bridge._discovery_seed.active
+        bridge.ingest.submit.assert_not_called()
+        bridge._on_message(bridge.client, None, _msg(bridge._discovery_seed.marker_topic, "end", retain=False))
+        bridge.ingest.submit.assert_called_once_with(FLOW, "19.5")
+        bridge.process_message(FLOW, "19.5")
+        assert _discovery_publishes(bridge) == []
+
+    def test_not_repeated_on_reconnect(self):
+        bridge = _bridge()
+        bridge._on_connect(bridge.client, None, None, 0, None)
+        bridge._on_message(bridge.client, None, _msg(bridge._discovery_seed.marker_topic, "end", retain=False))
+        bridge.client.subscribe.reset_mock()
+        bridge._on_connect(bridge.client, None, None, 0, None)
+        assert "homeassistant/+/+/config" not in [c.args[0] for c in bridge.client.subscribe.call_args_list]
+
+    def test_disabled(self):
+        bridge = _bridge(seed_discovery=False)
+        bridge._on_connect(bridge.client, None, None, 0, None)
+        assert "homeassistant/+/+/config" not in [c.args[0] for c in bridge.client.subscribe.call_args_list]
+        assert bridge.get_diagnostics()["discovery_seeded"] == 0
@@ -0,0 +1,104 @@
+"""Tests for the compiled entity plan (BaseGenerator.compile_plan)."""
+import dataclasses
+import json
+
+import pytest
+
+from generators.plan import EntityPlan, GeneratorPlan
+
+
+class TestCompilePlan:
+    def test_plan_compiled_lazily(self, generator_en):
+        assert generator_en._plan is None
+        assert isinstance(generator_en.plan, GeneratorPlan)
+        assert generator_en._plan is generator_en.plan
+
+    def test_sub_entities_have_resolved_names(self, generator_de):
+        entity = generator_de.plan.datapoints[268].subs["Actual"]
+        assert entity.name.startswith("Vorlauftemperatur")
+        assert entity.entity_type == "sensor"
+        assert entity.sub_item == "Actual"
+
+    def test_value_template_translation_applied(self, generator_de):
+        overlay = generator_de.translations.get("value_templates", {})
+        did = next(iter(overlay))
+        dp = generator_de.plan.datapoints[int(did)]
+        templates = [e.attributes.get("value_template") for e in dp.entities()]
+        assert overlay[did] in templates
+
+    def test_device_block_pre_resolved(self, generator_de):
+        dp = generator_de.plan.datapoints[271]
+        assert dp.device_key == "tank"
+        assert "identifiers" not in dp.device
+        assert dp.device["suggested_area"] == "Heizung"
+
+    def test_blacklisted_did_not_writable(self, generator_en):
+        entity = generator_en.plan.datapoints[875].entity
+        assert "command_topic" not in entity.command
+
+    def test_writable_number_has_command_template(self, generator_en):
+        entity = generator_en.plan.datapoints[396].entity
+        assert entity.command["command_topic"] == "open3e/cmnd"
+        assert '"data": [[396,' in entity.command["command_template"]
+
+    def test_membership_sets_are_frozensets(self, generator_en):
+        plan = generator_en.plan
+        assert isinstance(plan.ignored_dids, frozenset)
+        assert 875 in plan.write_blacklisted_dids
+        assert 377 in plan.identification_dids
+
+    def test_disabled_sub_not_in_plan(self, generator_en):
+        generator_en.datapoints["datapoints"][77773] = {
+            "type": "temperature_sensor",
+            "name": "Test",
+            "subs": {"Actual": {"enabled": False}, "Minimum": {}},
+        }
+        dp = generator_en.compile_plan().datapoints[77773]
+        assert list(dp.subs) == ["Minimum"]
+
+    def test_records_are_immutable(self, generator_en):
+        entity = generator_en.plan.datapoints[268].subs["Actual"]
+        with pytest.raises(dataclasses.FrozenInstanceError):
+            entity.name = "x"  # type: ignore[misc]
+        with pytest.raises(TypeError):
+            entity.attributes["icon"] = "x"  # type: ignore[index]
+        assert not hasattr(entity, "__dict__")
+
+    def test_entities_iterates_all_records(self, generator_en):
+        entities = list(generator_en.plan.entities())
+        assert all(isinstance(e, EntityPlan) for e in entities)
+        assert (268, "Actual") in {(e.did, e.sub_item) for e in entities}
+        assert len(generator_en.plan) == len(entities)
+
+
+class TestResolve:
+    def test_trigger_sub_filters_other_subs(self, generator_en):
+        dp = next(d for d in generator_en.plan.datapoints.values() if d.trigger_sub)
+        assert dp.resolve(dp.trigger_sub) is dp.entity
+        assert dp.resolve("SomethingElse") is None
+
+    def test_unconfigured_sub_returns_none(self, generator_en):
+        assert generator_en.plan.datapoints[268].resolve("Unknown") is None
+
+    def test_no_sub_item_uses_whole_did_entity(self, generator_en):
+        dp = generator_en.plan.datapoints[268]
+        assert dp.resolve(None) is dp.entity
+
+
+class TestRecompile:
+    def test_recompile_picks_up_user_names(self, generator_en):
+        generator_en.generate_discovery_message("open3e/680_396_Setpoint", "50", test_mode=False)
+        generator_en.user_names = {396: "WW Soll"}
+        generator_en.compile_plan()
+        results = generator_en.generate_discovery_message("open3e/680_396_Setpoint", "50", test_mode=False)
+        assert json.loads(results[0][1])["name"] == "WW Soll"
+
+    def test_climate_without_sub_item_does_not_crash(self, generator_en):
+        generator_en.datapoints["datapoints"][77774] = {
+            "type": "select_mode",
+            "name": "Test Climate",
+            "climate": {"name": "Test Climate", "trigger_sub": "Mode/ID"},
+        }
+        generator_en.compile_plan()
+        results = generator_en.generate_discovery_message("open3e/680_77774_TestClimate", "1")
+        assert all("/climate/" not in t for t, _ in results)
@@ -0,0 +1,224 @@
+"""Tests for the inbound ingest queue (runtime/ingest.py)."""
+import signal
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from runtime.ingest import IngestQueue, ecu_partition_key
+
+
+class Recorder:
+    """Handler that records calls and can be held on a gate."""
+
+    def __init__(self):
+        self.calls = []
+        self.gate = threading.Event()
+        self.gate.set()
+        self.threads = {}
+
+    def __call__(self, topic, payload):
+        self.gate.wait(2.0)
+        self.calls.append((topic, payload))
+        self.threads.setdefault(ecu_partition_key(topic), set()).add(threading.current_thread().name)
+
+
+def _hold(queue, recorder):
+    """Occupy the (single) worker with a blocker message."""
+    recorder.gate.clear()
+    queue.submit("open3e/680_1_Blocker", "x")
+    time.sleep(0.05)
+
+
+class TestPartitionKey:
+    def test_ecu_address(self):
+        assert ecu_partition_key("open3e/680_268_FlowTemperatureSensor/Actual") == "680"
+        assert ecu_partition_key("open3e/6a1_1_X") == "6a1"
+
+    def test_non_open3e_topic(self):
+        assert ecu_partition_key("homeassistant/status") == ""
+
+
+class TestSynchronous:
+    def test_submit_before_start_calls_handler(self):
+        handler = MagicMock()
+        IngestQueue(handler).submit("open3e/680_268_X", "1")
+        handler.assert_called_once_with("open3e/680_268_X", "1")
+
+    def test_invalid_policy_rejected(self):
+        with pytest.raises(ValueError):
+            IngestQueue(MagicMock(), overflow="drop-everything")
+
+
+class TestQueueing:
+    def test_processes_in_order(self):
+        rec = Recorder()
+        queue = IngestQueue(rec)
+        queue.start()
+        try:
+            for i in range(50):
+                queue.submit(f"open3e/680_{i}_X", str(i))
+            assert queue.drain(2.0)
+        finally:
+            queue.stop()
+        assert [p for _, p in rec.calls] == [str(i) for i in range(50)]
+
+    def test_same_topic_superseded_in_place(self):
+        rec = Recorder()
+        queue = IngestQueue(rec)
+        queue.start()
+        try:
+            _hold(queue, rec)
+            queue.submit("open3e/680_268_X", "1")
+            queue.submit("open3e/680_269_X", "a")
+            queue.submit("open3e/680_268_X", "2")
+            rec.gate.set()
+            assert queue.drain(2.0)
+        finally:
+            queue.stop()
+        assert rec.calls[1:] == [("open3e/680_268_X", "2"), ("open3e/680_269_X", "a")]
+        assert queue.stats()["superseded"] == 1
+
+    def test_drop_oldest_on_overflow(self):
+        rec = Recorder()
+        queue = IngestQueue(rec, max_depth=2)
+        queue.start()
+        try:
+            _hold(queue, rec)
+            for did in (1, 2, 3):
+                assert queue.submit(f"open3e/680_{did}_X", "v")
+            rec.gate.set()
+            assert queue.drain(2.0)
+        finally:
+            queue.stop()
+        assert [t for t, _ in rec.calls[1:]] == ["open3e/680_2_X", "open3e/680_3_X"]
+        assert queue.stats()["overflowed"] == 1
+
+    def test_drop_new_on_overflow(self):
+        rec = Recorder()
+        queue = IngestQueue(rec, max_depth=2, overflow="drop-new")
+        queue.start()
+        try:
+            _hold(queue, rec)
+            queue.submit("open3e/680_2_X", "v")
+            queue.submit("open3e/680_3_X", "v")
+            assert not queue.submit("open3e/680_4_X", "v")
+            rec.gate.set()
+            assert queue.drain(2.0)
+        finally:
+            queue.stop()
+        assert "open3e/680_4_X" not in [t for t, _ in rec.calls]
+
+    def test_partitioned_by_ecu(self):
+        rec = Recorder()
+        queue = IngestQueue(rec, workers=4)
+        queue.start()
+        try:
+            for i in range(40):
+                for ecu in ("680", "6a1", "6c4"):
+                    queue.submit(f"open3e/{ecu}_{i}_X", str(i))
+            assert queue.drain(2.0)
+        finally:
+            queue.stop()
+        # Every ECU is served by exactly one worker, in order
+        assert all(len(names) == 1 for names in rec.threads.values())
+        for ecu in ("680", "6a1", "6c4"):
+            values = [p for t, p in rec.calls if t.startswith(f"open3e/{ecu}_")]
+            assert values == [str(i) for i in range(40)]
+
+    def test_handler_exception_does_not_kill_worker(self):
+        calls = []
+
+        def handler(topic, payload):
+            calls.append(topic)
+            if payload == "boom":
+                raise RuntimeError("boom")
+
+        queue = IngestQueue(handler)
+        queue.start()
+        try:
+            queue.submit("open3e/680_1_X", "boom")
+            queue.submit("open3e/680_2_X", "ok")
+            assert queue.drain(2.0)
+        finally:
+            queue.stop()
+        assert calls == ["open3e/680_1_X", "open3e/680_2_X"]
+
+
+class TestMetrics:
+    def test_lag_recorded(self):
+        rec = Recorder()
+        queue = IngestQueue(rec)
+        queue.start()
+        try:
+            _hold(queue, rec)
+            queue.submit("open3e/680_2_X", "v")
+            time.sleep(0.05)
+            stats = queue.stats()
+            assert stats["depth"] == [1]
+            assert stats["lag_s"]["oldest"] >= 0.04
+            rec.gate.set()
+            assert queue.drain(2.0)
+        finally:
+            queue.stop()
+        stats = queue.stats()
+        assert stats["processed"] == 2
+        assert stats["lag_s"]["max"] >= 0.04
+
+
+@pytest.fixture
+def bridge():
+    with patch("bridge.mqtt.Client") as MockClient:
+        MockClient.return_value = MagicMock()
+        from bridge import Open3EBridge
+        b = Open3EBridge(test_mode=False, add_test_prefix=False, ingest_workers=2, ingest_queue_size=50)
+        yield b
+        b.ingest.stop(timeout=0.1)
+        b.publisher.stop(timeout=0.1)
+
+
+class FakeMessage:
+    def __init__(self, topic, payload):
+        self.topic = topic
+        self.payload = payload.encode("utf-8")
+
+
+class TestBridgeIntegration:
+    def test_on_message_does_not_process_inline(self, bridge):
+        bridge.ingest.start()
+        with patch.object(bridge, "process_message") as process:
+            process.side_effect = lambda *a: time.sleep(0.2)
+            start = time.monotonic()
+            bridge._on_message(bridge.client, None, FakeMessage("open3e/680_268_X/Actual", "1"))
+            assert time.monotonic() - start < 0.1
+            assert bridge.ingest.drain(2.0)
+        process.assert_called_once_with("open3e/680_268_X/Actual", "1")
+
+    def test_diagnostics_include_ingest_stats(self, bridge):
+        diag = bridge.get_diagnostics()
+        assert diag["ingest"]["workers"] == 2
+        assert diag["ingest"]["depth"] == [0, 0]
+
+    def test_shutdown_processes_queued_messages(self, bridge):
+        bridge.ingest.start()
+        bridge.publisher.start()
+        bridge._on_message(bridge.client, None,
+                           FakeMessage("open3e/680_268_FlowTemperatureSensor/Actual", "22.5"))
+        bridge._graceful_shutdown(signum=signal.SIGTERM)
+        topics = [c.args[0] for c in bridge.client.publish.call_args_list]
+        assert any(t.endswith("/config") for t in topics)
+        assert topics[-1] == bridge.lwt_topic
+
+    def test_workers_share_generator_state(self, bridge, caplog):
+        bridge.generator.discovery_cache_size = 4
+        bridge.ingest.start()
+        topics = [f"open3e/{ecu}_{did}_Sensor" for did in range(268, 368) for ecu in ("680", "6a1")]
+        for i in range(0, len(topics), 40):
+            # Within ingest_queue_size, so that nothing is dropped for overflow
+            for topic in topics[i:i + 40]:
+                bridge._on_message(bridge.client, None, FakeMessage(topic, "1"))
+            assert bridge.ingest.drain(5.0)
+        assert bridge.get_diagnostics()["messages_processed"] == len(topics)
+        assert "Unexpected error" not in caplog.text
+        assert len(bridge.generator._discovery_cache) <= 4
@@ -83,19 +83,21 @@ def test_bridge_caches_discovery(mock_bridge):
 def test_bridge_republish_on_ha_restart(mock_bridge):
     bridge, mock_client = mock_bridge
 
-    # Pre-fill the cache with two fake discovery entries
-    bridge.published_configs = {
-        "homeassistant/sensor/open3e_680_268_actual/config": '{"name":"a"}',
-        "homeassistant/sensor/open3e_680_274_actual/config": '{"name":"b"}',
-    }
+    bridge.process_message("open3e/680_268_FlowTemperatureSensor/Actual", "30.0")
+    bridge.process_message("open3e/680_274_OutsideTemperatureSensor/Actual", "12.5")
+    discovery = {call[0][0]: call[0][1] for call in mock_client.publish.call_args_list}
+    mock_client.publish.reset_mock()
 
     msg = FakeMessage("homeassistant/status", "online")
     bridge._on_message(mock_client, None, msg)
 
-    # All cached configs must be republished
-    published_topics = [call[0][0] for call in mock_client.publish.call_args_list]
-    for topic in bridge.published_configs:
-        assert topic in published_topics, f"Expected {topic} to be republished"
+    # All published configs must be republished, regenerated with the same payload
+    republished = {call[0][0]: call[0][1] for call in mock_client.publish.call_args_list}
+    for topic in bridge.published_digests:
+        assert topic in republished, f"Expected {topic} to be republished"
+    for topic, payload in discovery.items():
+        if topic in bridge.published_digests:
+            assert republished[topic] == payload
 
 
 # ---------------------------------------------------------------------------
@@ -64,7 +64,7 @@ class TestReconnectScenario:
         """When HA sends 'online', all cached configs are republished."""
         # First, cache some discovery configs
         bridge.process_message("open3e/680_274_OutsideTemperatureSensor/Actual", "12.5")
-        cached_count = len(bridge.published_configs)
+        cached_count = len(bridge.published_digests)
         assert cached_count > 0
 
         initial_publish_count = bridge.client.publish.call_count
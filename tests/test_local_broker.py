@@ -0,0 +1,156 @@
+"""Tests for the in-process MQTT broker stand-in (benchmarks/broker.py)."""
+import socket
+import threading
+import time
+
+import paho.mqtt.client as mqtt
+import pytest
+
+from benchmarks.broker import CONNECT, LocalBroker, encode_string, packet, topic_matches
+from benchmarks.latency import run as run_latency
+
+
+class Collector:
+    """paho client recording (topic, payload, retain, qos) of received messages."""
+
+    def __init__(self, port, client_id="", will=None):
+        self.messages = []
+        self.event = threading.Event()
+        self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=client_id)
+        if will:
+            self.client.will_set(*will, qos=1, retain=True)
+        self.client.on_message = self._on_message
+        self.client.connect("127.0.0.1", port, 60)
+        self.client.loop_start()
+
+    def _on_message(self, client, userdata, msg):
+        self.messages.append((msg.topic, msg.payload, msg.retain, msg.qos))
+        self.event.set()
+
+    def subscribe(self, topic, qos=0):
+        done = threading.Event()
+        self.client.on_subscribe = lambda *args: done.set()
+        self.client.subscribe(topic, qos)
+        assert done.wait(2.0)
+
+    def wait(self, count, timeout=2.0):
+        deadline = time.monotonic() + timeout
+        while len(self.messages) < count and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return self.messages
+
+    def close(self):
+        self.client.disconnect()
+        self.client.loop_stop()
+
+
+@pytest.fixture
+def broker():
+    with LocalBroker() as b:
+        yield b
+
+
+class TestTopicMatching:
+    @pytest.mark.parametrize("topic_filter,topic,expected", [
+        ("open3e/+/+", "open3e/680_268_X/Actual", True),
+        ("open3e/+/+", "open3e/680_268_X", False),
+        ("open3e/+/+", "open3e/680_1415_X/Mode/ID", False),
+        ("open3e/#", "open3e/680_1415_X/Mode/ID", True),
+        ("open3e/#", "open3e", True),
+        ("homeassistant/status", "homeassistant/status", True),
+        ("#", "$SYS/uptime", False),
+        ("+/uptime", "$SYS/uptime", False),
+    ])
+    def test_wildcards(self, topic_filter, topic, expected):
+        assert topic_matches(topic_filter, topic) is expected
+
+
+class TestBroker:
+    def test_publish_subscribe_qos1(self, broker):
+        sub = Collector(broker.port)
+        pub = Collector(broker.port)
+        sub.subscribe("open3e/+/+", qos=1)
+        info = pub.client.publish("open3e/680_268_X/Actual", "22.5", qos=1)
+        info.wait_for_publish(2.0)
+        assert info.is_published()
+        assert sub.wait(1) == [("open3e/680_268_X/Actual", b"22.5", False, 1)]
+        sub.close()
+        pub.close()
+
+    def test_retained_delivered_on_subscribe_and_cleared(self, broker):
+        pub = Collector(broker.port)
+        pub.client.publish("homeassistant/sensor/x/config", "{}", qos=1, retain=True).wait_for_publish(2.0)
+        sub = Collector(broker.port)
+        sub.subscribe("homeassistant/#")
+        assert sub.wait(1)[0][:3] == ("homeassistant/sensor/x/config", b"{}", True)
+        pub.client.publish("homeassistant/sensor/x/config", "", retain=True).wait_for_publish(2.0)
+        time.sleep(0.1)
+        assert "homeassistant/sensor/x/config" not in broker.retained
+        sub.close()
+        pub.close()
+
+    def test_last_will_on_unclean_disconnect(self, broker):
+        sub = Collector(broker.port)
+        sub.subscribe("open3e/bridge/LWT")
+        raw = socket.create_connection(("127.0.0.1", broker.port))
+        body = (encode_string("MQTT") + bytes([4, 0x04 | 0x08 | 0x20]) + (60).to_bytes(2, "big")
+                + encode_string("raw") + encode_string("open3e/bridge/LWT") + encode_string("offline"))
+        raw.sendall(packet(CONNECT, 0, body))
+        assert raw.recv(4) == b"\x20\x02\x00\x00"
+        raw.close()
+        assert sub.wait(1)[0][:2] == ("open3e/bridge/LWT", b"offline")
+        assert broker.retained["open3e/bridge/LWT"][0] == b"offline"
+        sub.close()
+
+    def test_no_will_on_clean_disconnect(self, broker):
+        sub = Collector(broker.port)
+        sub.subscribe("lwt/#")
+        client = Collector(broker.port, will=("lwt/x", "gone"))
+        client.close()
+        time.sleep(0.2)
+        assert sub.messages == []
+        sub.close()
+
+    def test_client_id_takeover(self, broker):
+        first = Collector(broker.port, client_id="bridge")
+        first.client.reconnect_delay_set(60, 120)  # stay down after takeover
+        second = Collector(broker.port, client_id="bridge")
+        deadline = time.monotonic() + 2.0
+        while broker.sessions.get("bridge") is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert len(broker.sessions) == 1
+        first.client.loop_stop()
+        second.close()
+
+
+class TestEndToEnd:
+    @pytest.mark.parametrize("runtime", ["thread", "asyncio"])
+    def test_latency_run(self, runtime):
+        report = run_latency("common", runtime, count=200)
+        assert report["discovery_latency"]["count"] > 0
+        assert report["throughput"]["complete"]
+        assert report["broker"]["connections"] == 2
+
+    def test_puback_latency_tracked(self, broker):
+        from unittest.mock import patch
+
+        from bridge import Open3EBridge
+
+        with patch("bridge.logging.getLogger"):
+            bridge = Open3EBridge(mqtt_host="127.0.0.1", mqtt_port=broker.port, test_mode=False,
+                                  add_test_prefix=False)
+        bridge._connect()
+        bridge.client.loop_start()
+        try:
+            deadline = time.monotonic() + 2.0
+            bridge.write_and_verify("680", 1100, "1")
+            while bridge.delivery.stats()["acknowledged"] < 3 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            delivery = bridge.get_diagnostics()["delivery"]
+            # LWT "online" + write + read-back, acknowledged by the broker
+            assert delivery["acknowledged"] == 3
+            assert delivery["in_flight"] == 0
+            assert delivery["ack_latency"]["count"] == 3
+        finally:
+            bridge.client.disconnect()
+            bridge.client.loop_stop()
@@ -0,0 +1,135 @@
+"""Tests for per-stage latency histograms (runtime/metrics.py)."""
+import json
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from runtime.metrics import (
+    BUCKET_BOUNDS_NS,
+    STAGE_GENERATE,
+    STAGE_LOOKUP,
+    STAGE_TOTAL,
+    STAGES,
+    LatencyHistogram,
+    StageMetrics,
+)
+
+US = 1000
+
+
+class TestLatencyHistogram:
+    def test_empty(self):
+        h = LatencyHistogram()
+        assert h.percentile(0.99) == 0
+        assert h.snapshot()["count"] == 0
+
+    def test_percentiles_use_bucket_upper_bound(self):
+        h = LatencyHistogram()
+        for _ in range(90):
+            h.record(3 * US)    # 5 µs bucket
+        for _ in range(10):
+            h.record(150 * US)  # 200 µs bucket
+        assert h.percentile(0.50) == 5 * US
+        assert h.percentile(0.95) == 150 * US  # capped at the observed max
+        snap = h.snapshot()
+        assert snap["p50_us"] == 5.0
+        assert snap["max_us"] == 150.0
+        assert snap["mean_us"] == pytest.approx(17.7)
+
+    def test_overflow_bucket(self):
+        h = LatencyHistogram()
+        h.record(BUCKET_BOUNDS_NS[-1] * 3)
+        assert h.counts[-1] == 1
+        assert h.percentile(0.5) == BUCKET_BOUNDS_NS[-1] * 3
+
+    def test_exact_bound_falls_into_its_bucket(self):
+        h = LatencyHistogram()
+        h.record(10 * US)
+        assert h.percentile(1.0) == 10 * US
+
+
+class TestStageMetrics:
+    def test_snapshot_has_every_stage(self):
+        snap = StageMetrics().snapshot()
+        assert set(snap["stages"]) == set(STAGES)
+        json.dumps(snap)
+
+    def test_slow_messages_sampled(self):
+        metrics = StageMetrics(slow_threshold_s=0.001, slow_samples=2)
+        metrics.record_message("open3e/fast", 100 * US)
+        for i in range(3):
+            metrics.record_message(f"open3e/slow{i}", 5_000 * US, parse_ns=4_000 * US)
+        snap = metrics.snapshot()
+        assert snap["stages"]["total"]["count"] == 4
+        assert snap["slow_messages"] == 3
+        assert [s["topic"] for s in snap["slow_samples"]] == ["open3e/slow1", "open3e/slow2"]
+        assert snap["slow_samples"][0]["stages_ms"] == {"parse": 4.0}
+
+    def test_discovery_split_by_cache_hit(self):
+        metrics = StageMetrics()
+        metrics.record_message("t", 50 * US, discovery_ns=40 * US, generated=True)
+        metrics.record_message("t", 5 * US, discovery_ns=1 * US)
+        stages = metrics.snapshot()["stages"]
+        assert stages[STAGE_GENERATE]["max_us"] == 40.0
+        assert stages[STAGE_LOOKUP]["max_us"] == 1.0
+
+    def test_full_window_folded_on_record(self):
+        metrics = StageMetrics(window=2)
+        for _ in range(5):
+            metrics.record_message("t", 1 * US)
+            metrics.record(STAGE_LOOKUP, 1 * US)
+        assert metrics._histograms[STAGE_TOTAL].count == 5  # before any snapshot
+        stages = metrics.snapshot()["stages"]
+        assert stages["total"]["count"] == 5
+        assert stages[STAGE_LOOKUP]["count"] == 5
+
+    def test_summary_only_recorded_stages(self):
+        metrics = StageMetrics()
+        metrics.record(STAGE_LOOKUP, 2 * US)
+        summary = metrics.summary()
+        assert set(summary) == {STAGE_LOOKUP, "slow_messages"}
+        assert set(summary[STAGE_LOOKUP]) == {"p50_us", "p95_us", "p99_us", "max_us"}
+
+
+@pytest.fixture
+def bridge():
+    with patch("bridge.mqtt.Client") as MockClient:
+        MockClient.return_value = MagicMock()
+        from bridge import Open3EBridge
+        yield Open3EBridge(test_mode=False, add_test_prefix=False)
+
+
+class TestBridgeInstrumentation:
+    TOPIC = "open3e/680_268_FlowTemperatureSensor/Actual"
+
+    def test_stages_recorded(self, bridge):
+        bridge.process_message(self.TOPIC, "22.5")
+        bridge.process_message(self.TOPIC, "22.6")
+        stages = bridge.get_diagnostics()["latency"]["stages"]
+        assert stages["total"]["count"] == 2
+        assert stages["parse"]["count"] == 2
+        assert stages[STAGE_GENERATE]["count"] == 1
+        assert stages[STAGE_LOOKUP]["count"] == 1
+        assert stages["serialize"]["count"] >= 1
+        # Discovery only published for the first message
+        assert stages["publish"]["count"] == 1
+
+    def test_system_topics_not_recorded(self, bridge):
+        bridge.process_message("open3e/bridge/LWT", "online")
+        assert bridge.get_diagnostics()["latency"]["stages"]["total"]["count"] == 0
+
+    def test_slow_message_sample_has_breakdown(self, bridge):
+        bridge.metrics.slow_threshold_ns = 0
+        bridge.process_message(self.TOPIC, "22.5")
+        sample = bridge.get_diagnostics()["latency"]["slow_samples"][0]
+        assert sample["topic"] == self.TOPIC
+        assert set(sample["stages_ms"]) == {"parse", "generate", "publish"}
+
+    def test_health_attributes_include_latency(self, bridge):
+        bridge.process_message(self.TOPIC, "22.5")
+        bridge._publish_health_state("ON")
+        calls = [c for c in bridge.client.publish.call_args_list
+                 if c.args[0] == "open3e/bridge/health/attributes"]
+        attributes = json.loads(calls[-1].args[1])
+        assert attributes["latency"]["total"]["p99_us"] > 0
+        assert attributes["latency"]["slow_messages"] == 0
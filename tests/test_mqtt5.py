@@ -0,0 +1,164 @@
+"""Tests for the MQTT v5 transport (--mqtt5, runtime/mqtt5.py)."""
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import paho.mqtt.client as mqtt
+import pytest
+from paho.mqtt.packettypes import PacketTypes
+from paho.mqtt.reasoncodes import ReasonCode
+
+from runtime.mqtt5 import TopicAliases, connect_hint, disconnect_hint
+
+TOPIC = "homeassistant/sensor/open3e_680_268_actual/config"
+
+
+def _sent(client):
+    """(topic, alias, expiry) of every publish."""
+    result = []
+    for c in client.publish.call_args_list:
+        properties = c.kwargs["properties"]
+        result.append((c.args[0], getattr(properties, "TopicAlias", None),
+                       getattr(properties, "MessageExpiryInterval", None)))
+    return result
+
+
+class TestTopicAliases:
+    def test_hot_topic_aliased(self):
+        aliases, client = TopicAliases(hot_after=2), MagicMock()
+        aliases.reset(10)
+        for _ in range(4):
+            aliases.publish(client, TOPIC, "{}")
+        assert _sent(client) == [(TOPIC, None, None), (TOPIC, 1, None), ("", 1, None), ("", 1, None)]
+        stats = aliases.stats()
+        assert stats["aliased_publishes"] == 2
+        assert stats["bytes_saved"] == 2 * (len(TOPIC) - 3) - 3
+
+    def test_qos1_not_aliased(self):
+        aliases, client = TopicAliases(hot_after=1), MagicMock()
+        aliases.reset(10)
+        aliases.publish(client, TOPIC, "{}", qos=1)
+        aliases.publish(client, TOPIC, "{}", qos=1)
+        assert _sent(client) == [(TOPIC, None, None), (TOPIC, None, None)]
+
+    def test_broker_without_aliases(self):
+        aliases, client = TopicAliases(hot_after=1), MagicMock()
+        aliases.reset(0)
+        aliases.publish(client, TOPIC, "{}")
+        assert _sent(client) == [(TOPIC, None, None)]
+
+    def test_least_recently_used_remapped(self):
+        aliases, client = TopicAliases(hot_after=1), MagicMock()
+        aliases.reset(2)
+        for topic in ("a/1", "a/2", "a/1", "a/3", "a/1"):
+            aliases.publish(client, topic, "x")
+        assert _sent(client) == [("a/1", 1, None), ("a/2", 2, None), ("", 1, None), ("a/3", 2, None),
+                                 ("", 1, None)]
+
+    def test_reset_forgets_aliases(self):
+        aliases, client = TopicAliases(hot_after=1), MagicMock()
+        aliases.reset(10)
+        aliases.publish(client, TOPIC, "{}")
+        aliases.reset(10)
+        aliases.publish(client, TOPIC, "{}")
+        assert _sent(client) == [(TOPIC, 1, None), (TOPIC, 1, None)]
+
+    def test_disable(self):
+        aliases, client = TopicAliases(hot_after=1), MagicMock()
+        aliases.disable()
+        aliases.reset(10)
+        aliases.publish(client, TOPIC, "{}")
+        assert _sent(client) == [(TOPIC, None, None)]
+
+    def test_message_expiry(self):
+        aliases, client = TopicAliases(), MagicMock()
+        aliases.publish(client, "open3e/bridge/diagnostics", "{}", retain=True, expiry=90)
+        assert _sent(client) == [("open3e/bridge/diagnostics", None, 90)]
+        assert client.publish.call_args.kwargs["retain"] is True
+
+    def test_real_client_accepts_alias_only_publish(self):
+        client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, protocol=mqtt.MQTTv5)
+        aliases = TopicAliases(hot_after=1)
+        aliases.reset(10)
+        aliases.publish(client, TOPIC, "{}")
+        # Not connected, but the empty topic with an alias passes paho's validation
+        assert aliases.publish(client, TOPIC, "{}").rc == mqtt.MQTT_ERR_NO_CONN
+
+
+class TestReasonCodes:
+    def test_connect_hints(self):
+        assert "password" in connect_hint(ReasonCode(PacketTypes.CONNACK, identifier=0x86))
+        assert "ACL" in connect_hint(0x87)
+        assert connect_hint(0) == ""
+
+    def test_disconnect_hints(self):
+        assert "client-id" in disconnect_hint(ReasonCode(PacketTypes.DISCONNECT, identifier=0x8E))
+        assert disconnect_hint(ReasonCode(PacketTypes.DISCONNECT, identifier=0x80)) == ""
+
+
+def _bridge(**kwargs):
+    with patch("bridge.mqtt.Client") as MockClient:
+        MockClient.return_value = MagicMock()
+        from bridge import Open3EBridge
+        bridge = Open3EBridge(test_mode=False, add_test_prefix=False, mqtt5=True, **kwargs)
+    bridge.client_cls = MockClient
+    return bridge
+
+
+class TestBridgeMqtt5:
+    def test_client_protocol(self):
+        bridge = _bridge()
+        assert bridge.client_cls.call_args.kwargs == {"protocol": mqtt.MQTTv5}
+        bridge._connect()
+        bridge.client.connect.assert_called_once_with("localhost", 1883, 60)
+
+    def test_persistent_session_expiry(self):
+        bridge = _bridge(persistent_session=True)
+        assert "clean_session" not in bridge.client_cls.call_args.kwargs
+        bridge._connect()
+        kwargs = bridge.client.connect.call_args.kwargs
+        assert kwargs["clean_start"] is False
+        assert kwargs["properties"].SessionExpiryInterval > 0
+
+    def test_alias_limit_from_connack(self):
+        bridge = _bridge()
+        bridge._on_connect(bridge.client, None, None, 0, SimpleNamespace(TopicAliasMaximum=5))
+        assert bridge.get_diagnostics()["mqtt5"]["alias_limit"] == 5
+        bridge._on_disconnect(bridge.client, None, None, ReasonCode(PacketTypes.DISCONNECT, identifier=0x8B), None)
+        assert bridge.get_diagnostics()["mqtt5"]["alias_limit"] == 0
+
+    def test_invalid_alias_disables_aliases(self):
+        bridge = _bridge()
+        bridge._on_disconnect(bridge.client, None, None, ReasonCode(PacketTypes.DISCONNECT, identifier=0x94), None)
+        bridge._on_connect(bridge.client, None, None, 0, SimpleNamespace(TopicAliasMaximum=5))
+        assert bridge.get_diagnostics()["mqtt5"]["alias_limit"] == 0
+
+    def test_diagnostics_expire(self):
+        bridge = _bridge(diagnostics_interval=60)
+        bridge._emit_diagnostics()
+        [call] = [c for c in bridge.client.publish.call_args_list if c.args[0] == "open3e/bridge/diagnostics"]
+        assert call.kwargs["properties"].MessageExpiryInterval == 180
+
+    def test_connect_failure_hint_logged(self, caplog):
+        bridge = _bridge()
+        bridge._on_connect(bridge.client, None, None, ReasonCode(PacketTypes.CONNACK, identifier=0x86), None)
+        assert "bad username or password" in caplog.text
+
+
+def test_v311_diagnostics_without_properties():
+    with patch("bridge.mqtt.Client") as MockClient:
+        MockClient.return_value = MagicMock()
+        from bridge import Open3EBridge
+        bridge = Open3EBridge(test_mode=False, add_test_prefix=False, diagnostics_interval=60)
+    bridge._emit_diagnostics()
+    assert "properties" not in bridge.client.publish.call_args.kwargs
+    assert bridge.get_diagnostics()["mqtt5"] is None
+
+
+@pytest.mark.parametrize("argv, expected", [([], False), (["--mqtt5"], True)])
+def test_main_mqtt5(argv, expected):
+    from bridge import main
+    with patch("bridge.get_generator_class") as mock_get_gen, patch("sys.argv", ["bridge", *argv]):
+        mock_get_gen.return_value.return_value.auto_discovered_count = 0
+        with patch("bridge.Open3EBridge") as MockBridge:
+            main()
+    assert MockBridge.call_args.kwargs["mqtt5"] is expected
@@ -0,0 +1,158 @@
+"""Tests for the disk-backed offline buffer (--offline-buffer, runtime/offline.py)."""
+import contextlib
+import json
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from runtime.offline import BufferedMessage, OfflineBuffer
+from runtime.publisher import PRIORITY_COMMAND, PRIORITY_STATE
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _command(n):
+    return BufferedMessage("open3e/cmnd", json.dumps({"mode": "read", "data": [n]}), qos=1,
+                           priority=PRIORITY_COMMAND)
+
+
+def _cop(value):
+    return BufferedMessage("open3e/bridge/cop", value, retain=True, priority=PRIORITY_STATE, coalesce=True)
+
+
+def _replay(buffer):
+    replayed = []
+    buffer.go_online(replayed.append)
+    return [(msg.topic, msg.payload) for msg in replayed]
+
+
+class TestOfflineBuffer:
+    def test_replay_in_order_with_coalescing(self, tmp_path):
+        buffer = OfflineBuffer(tmp_path / "buffer.jsonl")
+        for msg in (_command(1), _cop("3.1"), _command(2), _cop("3.4")):
+            assert buffer.offer(msg)
+        assert _replay(buffer) == [("open3e/cmnd", '{"mode": "read", "data": [1]}'),
+                                   ("open3e/cmnd", '{"mode": "read", "data": [2]}'),
+                                   ("open3e/bridge/cop", "3.4")]
+        stats = buffer.stats()
+        assert (stats["buffered"], stats["coalesced"], stats["replayed"], stats["queued"]) == (4, 1, 3, 0)
+        assert (tmp_path / "buffer.jsonl").read_bytes() == b""
+
+    def test_online_passes_through(self, tmp_path):
+        buffer = OfflineBuffer(tmp_path / "buffer.jsonl")
+        buffer.go_online(MagicMock())
+        assert not buffer.offer(_command(1))
+        buffer.go_offline()
+        assert buffer.offer(_command(1))
+
+    def test_survives_restart(self, tmp_path):
+        path = tmp_path / "buffer.jsonl"
+        buffer = OfflineBuffer(path)
+        buffer.offer(_command(1))
+        buffer.offer(_cop("3.1"))
+        buffer.offer(_cop("3.2"))
+        with open(path, "ab") as f:
+            f.write(b'{"topic": "open3e/cm')  # cut short by a crash
+        restarted = OfflineBuffer(path)
+        assert restarted.stats()["corrupt"] == 1
+        assert len(path.read_bytes().splitlines()) == 2  # compacted
+        assert [topic for topic, _ in _replay(restarted)] == ["open3e/cmnd", "open3e/bridge/cop"]
+
+    def test_message_cap(self, tmp_path):
+        buffer = OfflineBuffer(tmp_path / "buffer.jsonl", max_messages=2)
+        for n in range(3):
+            buffer.offer(_command(n))
+        buffer.offer(_cop("3.1"))
+        assert buffer.stats()["dropped"] == 2
+        assert len(_replay(buffer)) == 2
+
+    def test_file_compacted_at_byte_cap(self, tmp_path):
+        path = tmp_path / "buffer.jsonl"
+        line = len(_cop("3.10").line())
+        buffer = OfflineBuffer(path, max_bytes=3 * line)
+        for n in range(10):
+            buffer.offer(_cop(f"3.{n}0"))
+        assert path.stat().st_size <= 3 * line
+        assert buffer.stats()["compactions"] >= 1
+        assert _replay(buffer) == [("open3e/bridge/cop", "3.90")]
+
+    def test_old_messages_expire(self, tmp_path):
+        clock = FakeClock()
+        buffer = OfflineBuffer(tmp_path / "buffer.jsonl", max_age_s=60, clock=clock)
+        buffer.offer(_command(1))
+        clock.now += 120
+        buffer.offer(_command(2))
+        assert _replay(buffer) == [("open3e/cmnd", '{"mode": "read", "data": [2]}')]
+        assert buffer.stats()["expired"] == 1
+
+
+def _bridge(path, **kwargs):
+    with patch("bridge.mqtt.Client") as MockClient:
+        MockClient.return_value = MagicMock()
+        from bridge import Open3EBridge
+        return Open3EBridge(test_mode=False, add_test_prefix=False, offline_buffer=str(path), **kwargs)
+
+
+def _published(bridge):
+    return [c.args[:2] for c in bridge.client.publish.call_args_list]
+
+
+class TestBridgeOfflineBuffer:
+    @pytest.fixture
+    def bridge(self, tmp_path):
+        bridge = _bridge(tmp_path / "buffer.jsonl")
+        bridge._on_connect(bridge.client, None, None, 0, None)
+        bridge._on_disconnect(bridge.client, None, None, 7, None)
+        bridge.client.reset_mock()
+        return bridge
+
+    def test_buffered_while_disconnected(self, bridge):
+        bridge.write_and_verify("680", 1100, "1")
+        bridge._update_cop(2488, "1000")
+        bridge._update_cop(2496, "3000")
+        bridge._update_cop(2496, "3500")
+        assert _published(bridge) == []
+        assert bridge.get_diagnostics()["offline_buffer"]["queued"] == 3
+
+        bridge._on_connect(bridge.client, None, None, 0, None)
+        published = _published(bridge)
+        assert published[0] == (bridge.lwt_topic, "online")
+        assert published[1:4] == [("open3e/cmnd", '{"mode": "write", "data": [[1100, "1"]]}'),
+                                  ("open3e/cmnd", '{"mode": "read", "data": [1100]}'),
+                                  ("open3e/bridge/cop", "3.5")]
+        assert bridge.get_diagnostics()["offline_buffer"]["replayed"] == 3
+
+    def test_discovery_not_buffered(self, bridge):
+        bridge.process_message("open3e/680_268_FlowTemperatureSensor/Actual", "20.0")
+        assert [t for t, _ in _published(bridge) if t.endswith("/config")]
+        assert bridge.get_diagnostics()["offline_buffer"]["queued"] == 0
+
+
+def test_disabled_by_default():
+    with patch("bridge.mqtt.Client") as MockClient:
+        MockClient.return_value = MagicMock()
+        from bridge import Open3EBridge
+        bridge = Open3EBridge(test_mode=False, add_test_prefix=False)
+    bridge.write_and_verify("680", 1100, "1")
+    assert bridge.client.publish.call_count == 2
+    assert bridge.get_diagnostics()["offline_buffer"] is None
+
+
+@pytest.mark.parametrize("extra, enabled", [([], True), (["--cleanup"], False)])
+def test_main_offline_buffer(extra, enabled, tmp_path):
+    from bridge import main
+    path = str(tmp_path / "buffer.jsonl")
+    with patch("bridge.get_generator_class") as mock_get_gen, \
+         patch("sys.argv", ["bridge", "--offline-buffer", path, "--offline-buffer-size", "50", *extra]):
+        mock_get_gen.return_value.return_value.auto_discovered_count = 0
+        with patch("bridge.Open3EBridge") as MockBridge, contextlib.suppress(SystemExit):
+            main()
+    kwargs = MockBridge.call_args.kwargs
+    assert kwargs["offline_buffer"] == (path if enabled else None)
+    assert kwargs["offline_buffer_size"] == 50
@@ -0,0 +1,159 @@
+"""Tests for deadline-based write verification (runtime/writes.py)."""
+import json
+import logging
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from runtime.writes import PendingWrites, values_match
+
+KEY = ("680", 396)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+class TestValuesMatch:
+    @pytest.mark.parametrize("expected, actual, tolerance, match", [
+        ("55.0", "55", 0.0, True),
+        ("45.25", "45.2", 0.05, True),
+        ("45.25", "45.2", 0.01, False),
+        (" on ", "on", 0.0, True),
+        ("on", "off", 1.0, False),
+    ])
+    def test_match(self, expected, actual, tolerance, match):
+        assert values_match(expected, actual, tolerance) is match
+
+
+class TestPendingWrites:
+    def test_dict_compatible(self, clock):
+        writes = PendingWrites(clock=clock)
+        writes[KEY] = "55.0"
+        assert writes == {KEY: "55.0"}
+        assert writes.pop(KEY) == "55.0"
+        assert KEY not in writes
+        assert writes.next_deadline() is None
+
+    def test_resolve_records_latency(self, clock):
+        writes = PendingWrites(clock=clock)
+        writes[KEY] = "55.0"
+        clock.now += 2.5
+        matched, write = writes.resolve(KEY, "55")
+        assert matched and write.expected == "55.0"
+        assert writes.resolve(KEY, "55") is None
+        stats = writes.stats()
+        assert stats["per_did"]["680_396"] == {"verified": 1, "mismatched": 0, "timed_out": 0, "retries": 0,
+                                               "mean_s": 2.5, "max_s": 2.5}
+        assert stats["latency"]["count"] == 1
+
+    def test_retries_then_timeout(self, clock):
+        writes = PendingWrites(timeout_s=10, retries=2, clock=clock)
+        writes[KEY] = "55.0"
+        assert writes.due() == []
+        assert writes.next_deadline() == 1010.0
+        results = []
+        for _ in range(3):
+            clock.now += 10
+            results.extend((key, retry) for key, _, retry in writes.due())
+        assert results == [(KEY, True), (KEY, True), (KEY, False)]
+        assert KEY not in writes
+        stats = writes.stats()
+        assert (stats["timed_out"], stats["per_did"]["680_396"]["retries"]) == (1, 2)
+
+    def test_late_value_not_compared(self, clock):
+        writes = PendingWrites(timeout_s=10, retries=0, clock=clock)
+        writes[KEY] = "55.0"
+        clock.now += 11
+        writes.due()
+        assert writes.resolve(KEY, "50.0") is None
+
+    def test_deadline_order(self, clock):
+        writes = PendingWrites(timeout_s=10, retries=0, clock=clock)
+        for did in range(100):
+            writes[("680", did)] = "1"
+            clock.now += 0.1
+        clock.now = 1010.05
+        assert [key for key, _, _ in writes.due()] == [("680", 0)]
+
+    def test_stale_heap_entries_compacted(self, clock):
+        writes = PendingWrites(clock=clock)
+        for _ in range(1000):
+            writes[KEY] = "55.0"
+            writes.resolve(KEY, "55.0")
+        assert len(writes._heap) <= 64 + 1
+        assert writes.stats()["verified"] == 1000
+
+
+class ManualSchedule:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, delay, callback):
+        self.calls.append((delay, callback))
+
+    def run(self):
+        calls, self.calls = self.calls, []
+        for _, callback in calls:
+            callback()
+
+
+@pytest.fixture
+def bridge():
+    with patch("bridge.mqtt.Client") as MockClient:
+        MockClient.return_value = MagicMock()
+        from bridge import Open3EBridge
+        bridge = Open3EBridge(test_mode=False, add_test_prefix=False, write_timeout=5, write_retries=1)
+    bridge._write_schedule = ManualSchedule()
+    bridge._pending_writes._clock = FakeClock()
+    return bridge
+
+
+def _reads(bridge):
+    return [json.loads(c.args[1]) for c in bridge.client.publish.call_args_list
+            if c.args[0] == "open3e/cmnd" and json.loads(c.args[1])["mode"] == "read"]
+
+
+class TestBridgeWriteDeadlines:
+    def test_retry_read_then_timeout(self, bridge, caplog):
+        bridge.write_and_verify("680", 396, "55.0")
+        schedule = bridge._write_schedule
+        assert len(schedule.calls) == 1
+        bridge._pending_writes._clock.now += 5
+        schedule.run()
+        assert len(_reads(bridge)) == 2
+        assert bridge._failed_writes == 0
+        bridge._pending_writes._clock.now += 5
+        with caplog.at_level(logging.WARNING):
+            schedule.run()
+        assert "TIMED OUT for DID 396" in caplog.text
+        assert bridge._failed_writes == 1
+        assert not bridge._pending_writes
+        assert schedule.calls == []
+        assert bridge.get_diagnostics()["writes"]["timed_out"] == 1
+
+    def test_verified_within_tolerance(self, bridge):
+        bridge.write_and_verify("680", 396, "55")
+        bridge.process_message("open3e/680_396_DomesticHotWaterTemperatureSetpoint", "55.004")
+        assert bridge._failed_writes == 0
+        assert bridge.get_diagnostics()["writes"]["per_did"]["680_396"]["verified"] == 1
+
+
+def test_main_write_args():
+    from bridge import main
+    with patch("bridge.get_generator_class") as mock_get_gen, \
+         patch("sys.argv", ["bridge", "--write-timeout", "10", "--write-retries", "3", "--write-tolerance", "0.5"]):
+        mock_get_gen.return_value.return_value.auto_discovered_count = 0
+        with patch("bridge.Open3EBridge") as MockBridge:
+            main()
+    kwargs = MockBridge.call_args.kwargs
+    assert (kwargs["write_timeout"], kwargs["write_retries"], kwargs["write_tolerance"]) == (10.0, 3, 0.5)
@@ -0,0 +1,99 @@
+"""Tests for persistent MQTT sessions and the resumed-session reconnect path."""
+import contextlib
+import socket
+from unittest.mock import MagicMock, patch
+
+import paho.mqtt.client as mqtt
+import pytest
+
+RESUMED = mqtt.ConnectFlags(session_present=True)
+NEW_SESSION = mqtt.ConnectFlags(session_present=False)
+
+
+def _bridge(**kwargs):
+    with patch("bridge.mqtt.Client") as MockClient:
+        MockClient.return_value = MagicMock()
+        from bridge import Open3EBridge
+        bridge = Open3EBridge(test_mode=False, add_test_prefix=False, **kwargs)
+    bridge.client_cls = MockClient
+    return bridge
+
+
+def _published_topics(bridge):
+    return [c.args[0] for c in bridge.client.publish.call_args_list]
+
+
+class TestClientSetup:
+    def test_default_clean_session(self):
+        bridge = _bridge()
+        bridge.client_cls.assert_called_once_with(mqtt.CallbackAPIVersion.VERSION2)
+        assert bridge.get_diagnostics()["session"]["persistent"] is False
+
+    def test_persistent_session_fixed_id(self):
+        bridge = _bridge(persistent_session=True)
+        bridge.client_cls.assert_called_once_with(
+            mqtt.CallbackAPIVersion.VERSION2, clean_session=False,
+            client_id=f"open3e-bridge-{socket.gethostname()}")
+
+    def test_explicit_client_id(self):
+        bridge = _bridge(client_id="heatpump", persistent_session=True)
+        assert bridge.client_cls.call_args.kwargs["client_id"] == "heatpump"
+        bridge = _bridge(client_id="heatpump")
+        assert bridge.client_cls.call_args.kwargs == {"client_id": "heatpump"}
+
+    def test_qos1_subscriptions(self):
+        bridge = _bridge(persistent_session=True)
+        bridge._on_connect(bridge.client, None, NEW_SESSION, 0, None)
+        bridge.client.subscribe.assert_any_call("open3e/+/+", 1)
+
+
+class TestReconnect:
+    @pytest.fixture
+    def bridge(self):
+        bridge = _bridge(persistent_session=True)
+        # A session left by the previous run does not skip the startup work
+        bridge._on_connect(bridge.client, None, RESUMED, 0, None)
+        assert bridge.client.subscribe.called
+        bridge._on_disconnect(bridge.client, None, None, 7, None)
+        bridge.client.reset_mock()
+        return bridge
+
+    def test_resumed_session_skips_subscribe_and_discovery(self, bridge):
+        bridge._on_connect(bridge.client, None, RESUMED, 0, None)
+        bridge.client.subscribe.assert_not_called()
+        topics = _published_topics(bridge)
+        assert bridge.lwt_topic in topics
+        assert "open3e/bridge/health" in topics
+        assert not [t for t in topics if t.endswith("/config")]
+        session = bridge.get_diagnostics()["session"]
+        assert (session["connects"], session["resumed"]) == (2, 1)
+        assert session["last_recovery_s"] is not None
+
+    def test_lost_session_full_path(self, bridge):
+        bridge._on_connect(bridge.client, None, NEW_SESSION, 0, None)
+        assert bridge.client.subscribe.called
+        assert "homeassistant/sensor/open3e_bridge_cop/config" in _published_topics(bridge)
+        assert bridge.get_diagnostics()["session"]["resumed"] == 0
+
+
+def test_clean_session_always_full_path():
+    bridge = _bridge()
+    bridge._on_connect(bridge.client, None, NEW_SESSION, 0, None)
+    bridge.client.reset_mock()
+    bridge._on_connect(bridge.client, None, RESUMED, 0, None)
+    assert bridge.client.subscribe.called
+
+
+@pytest.mark.parametrize("extra, persistent", [([], True), (["--cleanup"], False)])
+def test_main_persistent_session(extra, persistent):
+    from bridge import main
+    with patch("bridge.get_generator_class") as mock_get_gen, \
+         patch("sys.argv", ["bridge", "--persistent-session", "--client-id", "hp", *extra]):
+        mock_gen_cls = MagicMock()
+        mock_gen_cls.return_value.auto_discovered_count = 0
+        mock_get_gen.return_value = mock_gen_cls
+        with patch("bridge.Open3EBridge") as MockBridge, contextlib.suppress(SystemExit):
+            main()
+        kwargs = MockBridge.call_args.kwargs
+        assert kwargs["persistent_session"] is persistent
+        assert kwargs["client_id"] == ("hp" if persistent else None)
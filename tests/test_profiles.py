@@ -1,6 +1,7 @@
 """Tests for profile loading system (Phase 1.2)."""
 import json
 from pathlib import Path
+from unittest.mock import MagicMock, patch
 
 import pytest
 
@@ -220,3 +221,86 @@ class TestRoomSetpoints:
         topic = "open3e/680_424_MixerOneCircuitRoomTemperatureSetpoint/Reduced"
         out = gen.generate_discovery_message(topic, "16.0", test_mode=True)
         assert len(out) >= 1
+
+
+class TestRuntimeProfileDetection:
+    """Profile auto-detection from the device identification DIDs."""
+
+    FLOW = "open3e/680_268_FlowTemperatureSensor/Actual"
+    IDENT = "open3e/680_377_IdentNumber"
+    PROPERTY = "open3e/680_256_DeviceProperty"
+
+    def _bridge(self, **kwargs):
+        with patch("bridge.mqtt.Client") as MockClient:
+            MockClient.return_value = MagicMock()
+            from bridge import Open3EBridge
+            return Open3EBridge(config_dir=CONFIG_DIR, test_mode=False, add_test_prefix=False,
+                                language="en", **kwargs)
+
+    def test_detect_profile_from_pattern(self):
+        gen = HomeAssistantGenerator(config_dir=CONFIG_DIR, language="en", profile="common")
+        assert gen.detect_profile("Vitocal 250-A") == "vitocal"
+        assert gen.detect_profile("VDENS 300") == "vitodens"
+        assert gen.detect_profile("aroTHERM plus") is None  # pattern without profile
+        assert gen.detect_profile("unknown") is None
+        # Anchored: a serial number containing 250 names no model
+        assert gen.detect_profile("7525036802500128") is None
+        assert gen.detect_profile("Vitocal 252-AR") == "vitocal"
+
+    def test_naming_patterns_unchanged(self):
+        gen = HomeAssistantGenerator(config_dir=CONFIG_DIR, language="en", profile="common")
+        # Naming still matches loosely; only profile detection is anchored
+        assert gen._extract_device_info("Vitocal 250-SH")["model"] == "Vitocal 250-A"
+        assert gen._extract_device_info("Vitocal 252-AR")["model"] == "Vitocal 252-A"
+        assert gen.is_model_did(377)
+        assert not gen.is_model_did(256)
+
+    def test_switch_profile_swaps_plan(self):
+        gen = HomeAssistantGenerator(config_dir=CONFIG_DIR, language="en", profile="common")
+        assert 364 not in gen.plan.datapoints
+        reload = gen.switch_profile("vitodens")
+        assert reload is not None
+        assert 364 in reload.dids
+        assert 364 in gen.plan.datapoints  # Flame
+        assert 2351 not in gen.plan.datapoints  # no heat-pump DIDs
+        assert gen._active_profile == "vitodens"
+        assert gen.switch_profile("vitodens") is None
+        assert gen.switch_profile("nosuchprofile") is None
+
+    def test_bridge_starts_vitocal_and_switches(self):
+        bridge = self._bridge(detect_profile=True)
+        assert bridge.generator._active_profile == "vitocal"
+        bridge.process_message(self.FLOW, "30.0")
+        [(topic, payload)] = [c.args[:2] for c in bridge.client.publish.call_args_list]
+        assert json.loads(payload)["device"]["identifiers"] == ["open3e_680_indoor"]
+
+        bridge.client.publish.reset_mock()
+        bridge.process_message(self.IDENT, "VDENS 300")
+        assert bridge.generator._active_profile == "vitodens"
+        assert not bridge._profile_pending
+        [payload] = [c.args[1] for c in bridge.client.publish.call_args_list if c.args[0] == topic]
+        assert json.loads(payload)["device"]["identifiers"] == ["open3e_680_boiler"]
+
+    def test_vitocal_default_kept_without_match(self):
+        bridge = self._bridge(detect_profile=True)
+        bridge.process_message(self.IDENT, "7525036802500128")
+        assert bridge.generator._active_profile == "vitocal"
+        assert bridge._profile_pending
+
+    def test_no_detection_without_flag(self):
+        bridge = self._bridge()
+        bridge.process_message(self.IDENT, "VDENS")
+        assert bridge.generator._active_profile == "vitocal"
+
+    def test_detected_profile_remembered(self, tmp_path):
+        bridge = self._bridge(detect_profile=True, config_cache_dir=str(tmp_path))
+        bridge.process_message(self.IDENT, "VDENS 300")
+        assert bridge.generator._active_profile == "vitodens"
+        assert self._bridge(detect_profile=True, config_cache_dir=str(tmp_path)).generator._active_profile == "vitodens"
+
+    def test_only_model_name_remembered(self, tmp_path):
+        bridge = self._bridge(detect_profile=True, config_cache_dir=str(tmp_path))
+        bridge.process_message(self.PROPERTY, "VDENS 300")
+        assert bridge.generator._active_profile == "vitodens"
+        assert bridge._profile_pending
+        assert self._bridge(detect_profile=True, config_cache_dir=str(tmp_path)).generator._active_profile == "vitocal"
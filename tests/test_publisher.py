@@ -0,0 +1,265 @@
+"""Tests for the prioritized outbound publish queue (runtime/publisher.py)."""
+import signal
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from runtime.publisher import (
+    PRIORITY_COMMAND,
+    PRIORITY_DISCOVERY,
+    PRIORITY_HEALTH,
+    PRIORITY_STATE,
+    OutboundMessage,
+    OutboundPublisher,
+)
+
+
+class GatedClient:
+    """Client whose publish() blocks until released, to build up a queue."""
+
+    def __init__(self):
+        self.sent = []
+        self.gate = threading.Event()
+
+    def publish(self, topic, payload, **kwargs):
+        self.gate.wait(2.0)
+        self.sent.append(topic)
+
+
+class TestPassthrough:
+    def test_publishes_synchronously_before_start(self):
+        client = MagicMock()
+        pub = OutboundPublisher(client)
+        pub.submit("a/b", "1", priority=PRIORITY_STATE, retain=True)
+        client.publish.assert_called_once_with("a/b", "1", retain=True)
+
+    def test_default_kwargs_not_forwarded(self):
+        client = MagicMock()
+        OutboundPublisher(client).submit("open3e/cmnd", "{}", priority=PRIORITY_COMMAND)
+        client.publish.assert_called_once_with("open3e/cmnd", "{}")
+
+    def test_publish_error_counted(self):
+        client = MagicMock()
+        client.publish.side_effect = Exception("boom")
+        pub = OutboundPublisher(client)
+        pub.submit("a", "1")
+        assert pub.stats()["errors"] == 1
+
+    def test_refused_publish_not_counted(self):
+        client = MagicMock()
+        client.publish.return_value = MagicMock(rc=15)  # MQTT_ERR_QUEUE_SIZE
+        failed = []
+        pub = OutboundPublisher(client, on_failed=failed.append)
+        pub.submit("a", "1", priority=PRIORITY_STATE)
+        stats = pub.stats()
+        assert stats["errors"] == 1
+        assert stats["published"]["state"] == 0
+        assert [msg.topic for msg in failed] == ["a"]
+
+    def test_no_conn_qos1_left_to_paho(self):
+        client = MagicMock()
+        client.publish.return_value = MagicMock(rc=4)  # MQTT_ERR_NO_CONN
+        failed = []
+        pub = OutboundPublisher(client, on_failed=failed.append)
+        pub.submit("q1", "1", qos=1)
+        pub.submit("q0", "1")
+        assert pub.stats()["errors"] == 2
+        assert [msg.topic for msg in failed] == ["q0"]
+
+
+class TestOrdering:
+    def test_commands_overtake_queued_discovery(self):
+        client = GatedClient()
+        pub = OutboundPublisher(client)
+        pub.start()
+        try:
+            pub.submit("blocker", "x", priority=PRIORITY_DISCOVERY)
+            time.sleep(0.05)  # worker is now stuck in publish("blocker")
+            for i in range(5):
+                pub.submit(f"disc/{i}", "x", priority=PRIORITY_DISCOVERY)
+            pub.submit("health", "x", priority=PRIORITY_HEALTH)
+            pub.submit("cmd", "x", priority=PRIORITY_COMMAND)
+            client.gate.set()
+            assert pub.drain(2.0)
+        finally:
+            pub.stop()
+        assert client.sent[:3] == ["blocker", "cmd", "health"]
+        assert client.sent[3:] == [f"disc/{i}" for i in range(5)]
+
+    def test_fifo_within_lane(self):
+        client = MagicMock()
+        pub = OutboundPublisher(client)
+        pub.start()
+        try:
+            for i in range(20):
+                pub.submit(f"t/{i}", str(i), priority=PRIORITY_STATE)
+            assert pub.drain(2.0)
+        finally:
+            pub.stop()
+        assert [c.args[0] for c in client.publish.call_args_list] == [f"t/{i}" for i in range(20)]
+
+
+class TestRateLimit:
+    def test_rate_limits_throughput(self):
+        client = MagicMock()
+        pub = OutboundPublisher(client, rate=50)
+        pub.start()
+        try:
+            start = time.monotonic()
+            for i in range(75):
+                pub.submit(f"t/{i}", "x")
+            assert pub.drain(5.0)
+            elapsed = time.monotonic() - start
+        finally:
+            pub.stop()
+        # 50-message burst, then 25 more at 50/s
+        assert elapsed >= 0.4
+        assert client.publish.call_count == 75
+
+
+class TestBackpressure:
+    def test_full_queue_evicts_oldest_discovery_for_command(self):
+        client = GatedClient()
+        pub = OutboundPublisher(client, max_queue=3)
+        pub.start()
+        try:
+            pub.submit("blocker", "x")
+            time.sleep(0.05)
+            for i in range(3):
+                pub.submit(f"disc/{i}", "x", priority=PRIORITY_DISCOVERY)
+            assert pub.submit("cmd", "x", priority=PRIORITY_COMMAND)
+            stats = pub.stats()
+            assert stats["dropped"]["discovery"] == 1
+            assert stats["queued"] == {"command": 1, "state": 0, "health": 0, "discovery": 2}
+            client.gate.set()
+            assert pub.drain(2.0)
+        finally:
+            pub.stop()
+        assert "disc/0" not in client.sent
+        assert client.sent[1] == "cmd"
+
+    def test_eviction_reported(self):
+        client = GatedClient()
+        evicted = []
+        pub = OutboundPublisher(client, max_queue=1, on_evict=evicted.append)
+        pub.start()
+        try:
+            pub.submit("blocker", "x")
+            time.sleep(0.05)
+            pub.submit("disc/0", "x", priority=PRIORITY_DISCOVERY)
+            pub.submit("cmd", "x", priority=PRIORITY_COMMAND)
+            assert [msg.topic for msg in evicted] == ["disc/0"]
+        finally:
+            client.gate.set()
+            pub.stop()
+
+    def test_full_queue_rejects_lower_priority(self):
+        client = GatedClient()
+        pub = OutboundPublisher(client, max_queue=2)
+        pub.start()
+        try:
+            pub.submit("blocker", "x")
+            time.sleep(0.05)
+            pub.submit("cmd/1", "x", priority=PRIORITY_COMMAND)
+            pub.submit("cmd/2", "x", priority=PRIORITY_COMMAND)
+            assert not pub.submit("disc", "x", priority=PRIORITY_DISCOVERY)
+            assert pub.stats()["dropped"]["discovery"] == 1
+        finally:
+            client.gate.set()
+            pub.stop()
+
+
+class TestShutdown:
+    def test_stop_drains_queue(self):
+        client = MagicMock()
+        pub = OutboundPublisher(client, rate=200)
+        pub.start()
+        for i in range(100):
+            pub.submit(f"t/{i}", "x")
+        pub.stop(timeout=5.0)
+        assert client.publish.call_count == 100
+        assert not pub.running
+
+    def test_stop_is_bounded(self):
+        client = MagicMock()
+        pub = OutboundPublisher(client, rate=10)
+        pub.start()
+        for i in range(100):
+            pub.submit(f"t/{i}", "x")
+        start = time.monotonic()
+        pub.stop(timeout=0.2)
+        assert time.monotonic() - start < 2.0
+        stats = pub.stats()
+        assert stats["published"]["discovery"] + stats["dropped"]["discovery"] == 100
+        assert sum(stats["queued"].values()) == 0
+
+    def test_submit_after_stop_passes_through(self):
+        client = MagicMock()
+        pub = OutboundPublisher(client)
+        pub.start()
+        pub.stop()
+        pub.submit("late", "x")
+        client.publish.assert_called_once_with("late", "x")
+
+
+@pytest.fixture
+def bridge():
+    with patch("bridge.mqtt.Client") as MockClient:
+        MockClient.return_value = MagicMock()
+        from bridge import Open3EBridge
+        b = Open3EBridge(test_mode=False, add_test_prefix=False, publish_rate=25, publish_queue_size=500)
+        yield b
+        b.publisher.stop(timeout=0.1)
+
+
+class TestBridgeIntegration:
+    def test_constructor_configures_publisher(self, bridge):
+        assert bridge.publisher.rate == 25
+        assert bridge.publisher.max_queue == 500
+
+    def test_diagnostics_include_publisher_stats(self, bridge):
+        diag = bridge.get_diagnostics()
+        assert diag["publisher"]["rate_limit"] == 25
+        assert set(diag["publisher"]["queued"]) == {"command", "state", "health", "discovery"}
+
+    def test_shutdown_drains_before_offline(self, bridge):
+        bridge.publisher.start()
+        bridge.process_message("open3e/680_268_FlowTemperatureSensor/Actual", "22.5")
+        bridge._graceful_shutdown(signum=signal.SIGTERM)
+        topics = [c.args[0] for c in bridge.client.publish.call_args_list]
+        assert topics[-1] == bridge.lwt_topic
+        assert any(t.endswith("/config") for t in topics[:-1])
+        assert not bridge.publisher.running
+
+    def test_dropped_discovery_not_recorded(self, bridge):
+        topic = "open3e/680_268_FlowTemperatureSensor/Actual"
+        with patch.object(bridge.publisher, "submit", return_value=False):
+            bridge.process_message(topic, "22.5")
+        assert not bridge.published_digests
+        bridge.process_message(topic, "22.6")
+        assert bridge.published_digests
+
+    def test_evicted_discovery_forgotten(self, bridge):
+        bridge.process_message("open3e/680_268_FlowTemperatureSensor/Actual", "22.5")
+        [(topic, digest)] = bridge.published_digests.items()
+        [payload] = [c.args[1] for c in bridge.client.publish.call_args_list if c.args[0] == topic]
+        bridge._on_publish_evicted(OutboundMessage(topic, "{}", priority=PRIORITY_DISCOVERY))
+        assert bridge.published_digests == {topic: digest}  # a newer payload is still queued
+        bridge._on_publish_evicted(OutboundMessage(topic, payload, priority=PRIORITY_DISCOVERY))
+        assert topic not in bridge.published_digests
+
+    def test_refused_publish_buffered_offline(self, bridge, tmp_path):
+        from runtime.offline import OfflineBuffer
+        bridge.offline = OfflineBuffer(str(tmp_path / "buf.jsonl"))
+        bridge.client.is_connected.return_value = False
+        bridge._on_publish_failed(OutboundMessage("open3e/cmnd", "{}", qos=0, priority=PRIORITY_COMMAND))
+        bridge._on_publish_failed(OutboundMessage("x/config", "{}", priority=PRIORITY_DISCOVERY))
+        assert not bridge.offline.online
+        assert bridge.offline.stats()["queued"] == 1
+
+    def test_write_command_uses_command_lane(self, bridge):
+        with patch.object(bridge.publisher, "submit") as submit:
+            bridge.write_and_verify("680", 396, "50")
+        assert submit.call_args_list[0].kwargs["priority"] == PRIORITY_COMMAND
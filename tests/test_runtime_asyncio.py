@@ -0,0 +1,247 @@
+"""Tests for the asyncio runtime (runtime/aio.py)."""
+import asyncio
+import json
+import socket
+import threading
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+from runtime.aio import AsyncioRuntime
+from runtime.publisher import PRIORITY_COMMAND, PRIORITY_DISCOVERY, OutboundPublisher
+
+
+class FakeMessage:
+    def __init__(self, topic, payload):
+        self.topic = topic
+        self.payload = payload.encode("utf-8")
+        self.retain = False
+
+
+class FakeClient:
+    """Minimal paho client driven through the external-loop socket callbacks.
+
+    Lines written to `peer` are delivered on loop_read(): "CONNACK" fires
+    on_connect, "topic payload" fires on_message.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.published = []
+        self.subscribed = []
+        self.sock = None
+        self.peer = None
+        self.misc_rc = 0
+        self.reconnects = 0
+        self.disconnected = False
+        self._buffer = b""
+        self.on_connect = self.on_message = self.on_disconnect = None
+        self.on_socket_open = self.on_socket_close = None
+        self.on_socket_register_write = self.on_socket_unregister_write = None
+
+    def username_pw_set(self, *args):
+        pass
+
+    def will_set(self, *args, **kwargs):
+        pass
+
+    def reconnect_delay_set(self, **kwargs):
+        pass
+
+    def subscribe(self, topic, qos=0):
+        self.subscribed.append(topic)
+
+    def unsubscribe(self, topic):
+        for t in topic if isinstance(topic, list) else [topic]:
+            self.subscribed.remove(t)
+
+    def publish(self, topic, payload=None, **kwargs):
+        self.published.append((topic, payload, kwargs))
+        if topic in self.subscribed:
+            # Like a broker: e.g. the discovery seed marker comes back
+            self.send(topic, payload)
+        return SimpleNamespace(mid=len(self.published), rc=0)
+
+    def connect(self, host, port, keepalive):
+        self.sock, self.peer = socket.socketpair()
+        self.sock.setblocking(False)
+        self.on_socket_open(self, None, self.sock)
+        self.peer.sendall(b"CONNACK\n")
+
+    def reconnect(self):
+        self.reconnects += 1
+        self.misc_rc = 0
+
+    def loop_read(self):
+        self._buffer += self.sock.recv(4096)
+        *lines, self._buffer = self._buffer.split(b"\n")
+        for line in lines:
+            if line == b"CONNACK":
+                self.on_connect(self, None, {}, 0, None)
+            else:
+                topic, payload = line.decode().split(" ", 1)
+                self.on_message(self, None, FakeMessage(topic, payload))
+
+    def loop_write(self):
+        pass
+
+    def loop_misc(self):
+        return self.misc_rc
+
+    def disconnect(self):
+        self.disconnected = True
+        self.on_socket_close(self, None, self.sock)
+        self.sock.close()
+        self.peer.close()
+
+    def send(self, topic, payload):
+        self.peer.sendall(f"{topic} {payload}\n".encode())
+
+
+@pytest.fixture
+def bridge():
+    with patch("bridge.mqtt.Client", FakeClient):
+        from bridge import Open3EBridge
+        yield Open3EBridge(test_mode=False, add_test_prefix=False)
+
+
+async def _until(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "condition not reached"
+        await asyncio.sleep(0.01)
+
+
+class TestServe:
+    def test_message_flow_and_graceful_shutdown(self, bridge):
+        runtime = AsyncioRuntime(bridge)
+        client = bridge.client
+
+        async def scenario():
+            task = asyncio.ensure_future(runtime.serve())
+            await _until(lambda: "open3e/+/+" in client.subscribed)
+            client.send("open3e/680_268_FlowTemperatureSensor/Actual", "22.5")
+            await _until(lambda: bridge._discovery_published > 0)
+            runtime.request_stop()
+            await task
+
+        asyncio.run(scenario())
+        topics = [t for t, _, _ in client.published]
+        assert topics[0] == bridge.lwt_topic  # online
+        assert any(t.endswith("/config") for t in topics)
+        assert client.published[-1] == (bridge.lwt_topic, "offline", {"qos": 1, "retain": True})
+        assert bridge.delivery.stats()["tracked"] == 2  # online and offline LWT
+        assert client.disconnected
+        assert not bridge.ingest.running
+        assert not bridge.publisher.running
+
+    def test_no_extra_threads(self, bridge):
+        runtime = AsyncioRuntime(bridge)
+        before = threading.active_count()
+        seen = []
+
+        async def scenario():
+            task = asyncio.ensure_future(runtime.serve())
+            await _until(lambda: bridge.client.subscribed)
+            seen.append(threading.active_count())
+            runtime.request_stop()
+            await task
+
+        asyncio.run(scenario())
+        assert seen == [before]
+
+    def test_diagnostics_task_replaces_timer(self, bridge):
+        bridge._diagnostics_interval = 0.05
+        runtime = AsyncioRuntime(bridge)
+
+        async def scenario():
+            task = asyncio.ensure_future(runtime.serve())
+            await _until(lambda: any(t == bridge._diagnostics_topic for t, _, _ in bridge.client.published))
+            runtime.request_stop()
+            await task
+
+        asyncio.run(scenario())
+        assert bridge._diagnostics_timer is None
+        diag = next(json.loads(p) for t, p, _ in bridge.client.published if t == bridge._diagnostics_topic)
+        assert "ingest" in diag
+
+    def test_commands_batched_on_loop(self, bridge):
+        runtime = AsyncioRuntime(bridge)
+
+        async def scenario():
+            task = asyncio.ensure_future(runtime.serve())
+            await _until(lambda: bridge.client.subscribed)
+            bridge.write_and_verify("680", 396, "55.0")
+            bridge.write_and_verify("680", 397, "45.0")
+            await _until(lambda: bridge.commands.stats()["messages"] == 2)
+            runtime.request_stop()
+            await task
+
+        asyncio.run(scenario())
+        commands = [json.loads(p) for t, p, _ in bridge.client.published if t == "open3e/cmnd"]
+        assert commands == [{"mode": "write", "data": [[396, "55.0"], [397, "45.0"]]},
+                            {"mode": "read", "data": [396, 397]}]
+
+    def test_reconnects_after_connection_loss(self, bridge):
+        runtime = AsyncioRuntime(bridge, misc_interval=0.01)
+
+        async def scenario():
+            with patch("runtime.aio._RECONNECT_MIN_DELAY", 0.01):
+                task = asyncio.ensure_future(runtime.serve())
+                await _until(lambda: bridge.client.subscribed)
+                bridge.client.misc_rc = 4  # MQTT_ERR_NO_CONN
+                await _until(lambda: bridge.client.reconnects == 1)
+                runtime.request_stop()
+                await task
+
+        asyncio.run(scenario())
+
+
+class TestSimulate:
+    def test_replays_file(self, bridge, tmp_path):
+        sim = tmp_path / "sim.txt"
+        sim.write_text("# comment\nopen3e/680_268_FlowTemperatureSensor/Actual 22.5\n")
+        AsyncioRuntime(bridge).simulate(str(sim), delay=0)
+        topics = [t for t, _, _ in bridge.client.published]
+        assert any(t.endswith("/config") for t in topics)
+        assert (bridge.lwt_topic, "offline", {"qos": 1, "retain": True}) not in bridge.client.published
+        assert bridge.client.disconnected
+
+
+class TestPublisherServe:
+    def test_priority_order_on_event_loop(self):
+        client = FakeClient()
+        pub = OutboundPublisher(client)
+
+        async def scenario():
+            task = asyncio.ensure_future(pub.serve())
+            await asyncio.sleep(0)
+            # Enqueued within one loop iteration, so ordering is deterministic
+            for i in range(3):
+                pub.submit(f"disc/{i}", "x", priority=PRIORITY_DISCOVERY)
+            pub.submit("cmd", "x", priority=PRIORITY_COMMAND)
+            await _until(lambda: len(client.published) == 4)
+            await pub.aclose()
+            await task
+
+        asyncio.run(scenario())
+        assert [t for t, _, _ in client.published] == ["cmd", "disc/0", "disc/1", "disc/2"]
+
+    def test_rate_limit_on_event_loop(self):
+        client = FakeClient()
+        pub = OutboundPublisher(client, rate=100)
+
+        async def scenario():
+            task = asyncio.ensure_future(pub.serve())
+            await asyncio.sleep(0)
+            start = time.monotonic()
+            for i in range(130):
+                pub.submit(f"t/{i}", "x")
+            await _until(lambda: len(client.published) == 130)
+            elapsed = time.monotonic() - start
+            await pub.aclose()
+            await task
+            return elapsed
+
+        assert asyncio.run(scenario()) >= 0.25
@@ -0,0 +1,168 @@
+"""Tests for narrowed open3e subscriptions without auto-discovery (runtime/subscriptions.py)."""
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from runtime.subscriptions import BROAD_FILTERS, SubscriptionPlanner
+
+FLOW = "open3e/680_268_FlowTemperatureSensor/Actual"
+RETURN = "open3e/680_269_ReturnTemperatureSensor/Actual"
+UNKNOWN = "open3e/680_9999_SomethingElse"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestSubscriptionPlanner:
+    def test_learns_and_narrows(self):
+        clock = FakeClock()
+        planner = SubscriptionPlanner({268, 269}, settle_s=60, clock=clock)
+        assert planner.observe(FLOW, 268)
+        assert planner.observe("open3e/680_268_FlowTemperatureSensor/Min", 268)
+        assert not planner.observe(UNKNOWN, 9999)
+        assert not planner.due()
+        clock.now += 60
+        assert planner.due()
+        subscribe, unsubscribe = planner.narrow()
+        assert subscribe == ["open3e/680_268_FlowTemperatureSensor/#"]
+        assert unsubscribe == sorted(BROAD_FILTERS)
+        assert planner.filters() == subscribe
+
+    def test_new_level_restarts_settle_time(self):
+        clock = FakeClock()
+        planner = SubscriptionPlanner({268, 269}, settle_s=60, clock=clock)
+        planner.observe(FLOW, 268)
+        clock.now += 50
+        planner.observe(RETURN, 269)
+        clock.now += 50
+        assert not planner.due()
+
+    def test_nothing_learned_stays_broad(self):
+        clock = FakeClock()
+        planner = SubscriptionPlanner({268}, settle_s=60, clock=clock)
+        planner.observe(UNKNOWN, 9999)
+        clock.now += 600
+        assert not planner.due()
+        assert planner.filters() == sorted(BROAD_FILTERS)
+
+    def test_traffic_reduction_stats(self):
+        planner = SubscriptionPlanner({268}, settle_s=60, clock=FakeClock())
+        planner.observe(FLOW, 268)
+        for _ in range(3):
+            planner.observe(UNKNOWN, 9999)
+        stats = planner.stats()
+        assert stats["unwanted_ratio"] == 0.75
+        assert stats["mode"] == "learning"
+
+    def test_added_did_widens_again(self):
+        clock = FakeClock()
+        planner = SubscriptionPlanner({268}, settle_s=60, clock=clock)
+        planner.observe(FLOW, 268)
+        clock.now += 60
+        planner.narrow()
+        assert planner.update_wanted({268, 269}) == (sorted(BROAD_FILTERS), [])
+        assert not planner.narrowed
+        planner.observe(RETURN, 269)
+        clock.now += 60
+        subscribe, unsubscribe = planner.narrow()
+        assert subscribe == ["open3e/680_269_ReturnTemperatureSensor/#"]
+        assert unsubscribe == sorted(BROAD_FILTERS)
+
+    def test_dropped_did_unsubscribed(self):
+        clock = FakeClock()
+        planner = SubscriptionPlanner({268, 269}, settle_s=60, clock=clock)
+        planner.observe(FLOW, 268)
+        planner.observe(RETURN, 269)
+        clock.now += 60
+        planner.narrow()
+        assert planner.update_wanted({268}) == ([], ["open3e/680_269_ReturnTemperatureSensor/#"])
+
+    def test_did_first_seen_after_narrowing(self):
+        clock = FakeClock()
+        planner = SubscriptionPlanner({268, 269}, settle_s=60, rewiden_s=600, clock=clock)
+        planner.observe(FLOW, 268)
+        clock.now += 60
+        planner.narrow()
+        clock.now += 599
+        assert not planner.due()
+        clock.now += 1
+        assert planner.due()
+        assert planner.widen() == (sorted(BROAD_FILTERS), [])
+        # 269 only now starts to publish
+        assert planner.observe(RETURN, 269)
+        clock.now += 60
+        subscribe, unsubscribe = planner.narrow()
+        assert subscribe == ["open3e/680_269_ReturnTemperatureSensor/#"]
+        assert unsubscribe == sorted(BROAD_FILTERS)
+        assert planner.filters() == ["open3e/680_268_FlowTemperatureSensor/#",
+                                     "open3e/680_269_ReturnTemperatureSensor/#"]
+        # Every wanted DID seen: no more widening
+        clock.now += 600
+        assert not planner.due()
+        assert planner.stats()["rewidenings"] == 1
+
+
+@pytest.fixture
+def bridge():
+    with patch("bridge.mqtt.Client") as MockClient:
+        MockClient.return_value = MagicMock()
+        from bridge import Open3EBridge
+        bridge = Open3EBridge(test_mode=False, add_test_prefix=False, auto_discover=False,
+                              subscription_settle=60)
+    bridge._subscriptions._clock = clock = FakeClock()
+    bridge.clock = clock
+    return bridge
+
+
+class TestBridgeSubscriptions:
+    def test_single_subscribe_on_connect(self, bridge):
+        bridge._on_connect(bridge.client, None, None, 0, None)
+        [call] = bridge.client.subscribe.call_args_list
+        filters = [f for f, _ in call.args[0]]
+        # Retained discovery seeding first (runtime/retained.py)
+        assert filters[:2] == ["homeassistant/+/+/config", bridge._discovery_seed.marker_topic]
+        assert set(filters[2:]) == {*BROAD_FILTERS, "open3e/LWT", "homeassistant/status"}
+
+    def test_narrowed_after_settle(self, bridge):
+        bridge.process_message(FLOW, "20.0")
+        bridge.process_message(UNKNOWN, "1")
+        bridge.clock.now += 60
+        bridge.process_message(UNKNOWN, "1")
+        bridge.client.subscribe.assert_called_once_with([("open3e/680_268_FlowTemperatureSensor/#", 0)])
+        bridge.client.unsubscribe.assert_called_once_with(sorted(BROAD_FILTERS))
+        subscriptions = bridge.get_diagnostics()["subscriptions"]
+        assert subscriptions["mode"] == "narrow"
+        assert subscriptions["unwanted_ratio"] == pytest.approx(2 / 3, abs=0.001)
+
+        # A reconnect subscribes to the learned filters right away
+        bridge.client.subscribe.reset_mock()
+        bridge._on_connect(bridge.client, None, None, 0, None)
+        filters = [f for f, _ in bridge.client.subscribe.call_args.args[0]]
+        assert "open3e/680_268_FlowTemperatureSensor/#" in filters
+        assert not set(BROAD_FILTERS) & set(filters)
+
+    def test_widens_for_unseen_dids(self, bridge):
+        bridge.process_message(FLOW, "20.0")
+        bridge.clock.now += 60
+        bridge.process_message(FLOW, "20.0")
+        bridge.client.subscribe.reset_mock()
+        bridge.clock.now += bridge._subscriptions.rewiden_s
+        bridge.process_message(FLOW, "20.0")
+        bridge.client.subscribe.assert_called_once_with([(f, 0) for f in sorted(BROAD_FILTERS)])
+        assert bridge.get_diagnostics()["subscriptions"]["mode"] == "learning"
+
+    def test_cop_dids_wanted(self, bridge):
+        assert {2488, 2496} <= bridge._subscriptions.wanted_dids
+
+    def test_broad_with_auto_discover(self):
+        with patch("bridge.mqtt.Client") as MockClient:
+            MockClient.return_value = MagicMock()
+            from bridge import Open3EBridge
+            bridge = Open3EBridge(test_mode=False, add_test_prefix=False)
+        assert bridge._subscriptions is None
+        assert bridge.get_diagnostics()["subscriptions"]["mode"] == "broad"
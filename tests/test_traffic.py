@@ -0,0 +1,67 @@
+"""Tests for the synthetic open3e traffic generator (benchmarks/traffic.py)."""
+import io
+
+from benchmarks.traffic import NRC_PAYLOADS, TrafficGenerator, ecu_addresses, file_sink, main, stream
+
+
+class TestTrafficGenerator:
+    def test_cycle_covers_every_topic_on_every_ecu(self):
+        gen = TrafficGenerator("vitocal", ecus=2, unknown=3, seed=1)
+        topics = [t for t, _ in gen.cycle()]
+        assert len(topics) == len(set(topics)) == gen.topics_per_cycle
+        assert "open3e/680_268_FlowTemperature/Actual" in topics
+        assert "open3e/6a1_268_FlowTemperature/Actual" in topics
+        assert any(t.startswith("open3e/680_9000_") for t in topics)
+
+    def test_seed_is_reproducible(self):
+        first = list(TrafficGenerator(seed=7).messages(50))
+        assert first == list(TrafficGenerator(seed=7).messages(50))
+
+    def test_values_drift_within_bound(self):
+        gen = TrafficGenerator(drift=0.5, seed=3)
+        topic = "open3e/680_268_FlowTemperature/Actual"
+        values = [float(p) for t, p in gen.messages(gen.topics_per_cycle * 5) if t == topic]
+        assert len(values) == 5
+        assert all(abs(b - a) <= 0.51 for a, b in zip(values, values[1:]))
+
+    def test_nrc_injection(self):
+        payloads = [p for _, p in TrafficGenerator(nrc_ratio=0.5, seed=1).messages(200)]
+        nrc = sum(p in NRC_PAYLOADS for p in payloads)
+        assert 50 < nrc < 150
+
+    def test_ecu_addresses_extend_beyond_known(self):
+        ecus = ecu_addresses(8)
+        assert ecus[0] == "680"
+        assert len(set(ecus)) == 8
+
+
+class TestStream:
+    def test_rate_limited(self):
+        sent = []
+        result = stream(TrafficGenerator(seed=1).messages(20), lambda t, p: sent.append(t), rate=100)
+        assert len(sent) == 20
+        assert result["elapsed_s"] >= 0.18
+
+    def test_duration_stops_endless_stream(self):
+        result = stream(TrafficGenerator(seed=1).messages(), lambda t, p: None, rate=200, duration=0.1)
+        assert 10 <= result["sent"] <= 30
+
+    def test_capture_file_is_simulate_format(self):
+        buf = io.StringIO()
+        stream(TrafficGenerator(seed=1).messages(10), file_sink(buf))
+        lines = buf.getvalue().splitlines()
+        assert len(lines) == 10
+        assert all(line.startswith("open3e/") and len(line.split(" ", 1)) == 2 for line in lines)
+
+
+class TestMain:
+    def test_bridge_target_processes_messages(self, capsys):
+        assert main(["--profile", "common", "--count", "100", "--unknown", "5", "--bridge"]) == 0
+        out = capsys.readouterr().out
+        assert "sent=100" in out
+        assert "published=" in out
+
+    def test_output_file(self, tmp_path):
+        path = tmp_path / "capture.txt"
+        assert main(["--count", "25", "--seed", "1", "--output", str(path)]) == 0
+        assert len(path.read_text().splitlines()) == 25